@@ -10,8 +10,12 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, FastAPI, HTTPException, status
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
+from config import settings
+from services.telemetry import configure_tracing, render_metrics
+
 from .engine import ai_engine
 
 
@@ -101,4 +105,12 @@ app = FastAPI(
     description="Standalone AI module endpoints",
 )
 app.include_router(router)
+app.add_event_handler("startup", lambda: configure_tracing(settings))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
@@ -1,7 +1,7 @@
 """Runtime and workflow application ports."""
 from __future__ import annotations
 
-from typing import Any, AsyncIterator, Dict, List, Optional, Protocol
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Protocol, Tuple
 
 from .plugins import PluginManagerPort
 
@@ -27,6 +27,8 @@ class RuntimePort(Protocol):
         execution_context: Optional[dict] = None,
     ) -> List[Any]: ...
 
+    def get_tool_binding(self, group: str = "default", llm: Any = None) -> Any: ...
+
     def list_plugins(self, group: Optional[str] = None) -> List[Dict[str, Any]]: ...
 
     def get_handler_for_intent(self, intent: Optional[str]) -> str: ...
@@ -37,10 +39,16 @@ class RuntimePort(Protocol):
 
     def get_intent_labels(self) -> List[str]: ...
 
-    def get_intent_rules(self) -> Dict[str, List[str]]: ...
+    def get_intent_rules(self) -> Mapping[str, Tuple[str, ...]]: ...
 
     def get_intent_examples(self) -> List[Dict[str, str]]: ...
 
+    def get_intent_classifier(self) -> Any: ...
+
+    def get_keyword_matcher(self) -> Any: ...
+
+    def get_compiled(self, key: Any, build: Callable[[], Any]) -> Any: ...
+
 
 class WorkflowPort(Protocol):
     async def process_message(
@@ -71,4 +79,6 @@ class RuntimeFactoryPort(Protocol):
 
     def get_workflow(self, business_id: Optional[str] = None) -> WorkflowPort: ...
 
+    async def reload(self, business_id: str, drain_timeout: float = 30.0) -> bool: ...
+
     def clear(self, business_id: Optional[str] = None) -> None: ...
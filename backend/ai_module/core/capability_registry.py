@@ -106,14 +106,20 @@ def find_unsupported_capability(
     *,
     features: Optional[Dict[str, Any]] = None,
     config: Optional[Dict[str, Any]] = None,
+    matcher: Any = None,
 ) -> Optional[Dict[str, Any]]:
-    normalized = (message or "").strip().lower()
-    if not normalized:
+    if not (message or "").strip():
         return None
 
+    if matcher is None:
+        from .keyword_automaton import matcher_for_config
+
+        matcher = matcher_for_config(config)
+    capability_hits = matcher.features(message).capability_hits
+
     best_match: tuple[tuple[int, int, int], CapabilitySpec, list[str]] | None = None
-    for spec in build_capability_specs(config):
-        matched = [keyword for keyword in spec.keywords if keyword and keyword.lower() in normalized]
+    for spec in matcher.capability_specs:
+        matched = list(capability_hits.get(spec.key, ()))
         if not matched:
             continue
         if is_capability_enabled(spec, features):
@@ -0,0 +1,107 @@
+"""业务包配置热更新。
+
+监听业务配置目录，YAML 变化后由 ``ConfigLoader.refresh`` 重新加载，再由
+``AIRuntimeFactory.reload`` 重建业务包快照并原子替换运行时与工作流。
+
+安装了 watchfiles（``uvicorn[standard]`` 自带）时用文件系统事件唤醒，否则按固定间隔轮询；
+两种方式都以文件修改时间和大小判断配置是否真的变化，解析失败的文件保留旧配置。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, List, Optional
+
+try:
+    from watchfiles import awatch
+except ImportError:  # pragma: no cover - optional dependency
+    awatch = None
+
+logger = logging.getLogger(__name__)
+
+
+class BusinessConfigWatcher:
+    """后台任务：发现配置变化后重建对应业务包的运行时。"""
+
+    def __init__(
+        self,
+        loader: Any,
+        factory: Any,
+        *,
+        poll_seconds: float = 2.0,
+        drain_timeout: float = 30.0,
+        use_watchfiles: bool = True,
+    ):
+        self.loader = loader
+        self.factory = factory
+        self.poll_seconds = poll_seconds
+        self.drain_timeout = drain_timeout
+        self.use_watchfiles = use_watchfiles and awatch is not None
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _reload(self, business_id: str) -> None:
+        try:
+            await self.factory.reload(business_id, drain_timeout=self.drain_timeout)
+        except Exception as exc:
+            logger.error("Failed to rebuild runtime for %s, keeping the previous snapshot: %s", business_id, exc)
+
+    async def apply_changes(self) -> List[str]:
+        changed = self.loader.refresh()
+        if changed:
+            logger.info("Business config changed: %s", ", ".join(changed))
+            await asyncio.gather(*(self._reload(business_id) for business_id in changed))
+        return changed
+
+    async def _run(self) -> None:
+        if self.use_watchfiles:
+            async for _ in awatch(self.loader.config_dir, stop_event=self._stop):
+                try:
+                    await self.apply_changes()
+                except Exception as exc:
+                    logger.warning("Business config refresh failed: %s", exc)
+            return
+
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            if self._stop.is_set():
+                return
+            try:
+                await self.apply_changes()
+            except Exception as exc:
+                logger.warning("Business config refresh failed: %s", exc)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._stop.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+        finally:
+            self._task = None
+
+
+def create_config_watcher() -> BusinessConfigWatcher:
+    from config import config_loader, settings
+
+    from .runtime import runtime_factory
+
+    return BusinessConfigWatcher(
+        config_loader,
+        runtime_factory,
+        poll_seconds=settings.BUSINESS_CONFIG_POLL_SECONDS,
+        drain_timeout=settings.RUNTIME_DRAIN_TIMEOUT_SECONDS,
+    )
+
+
+__all__ = ["BusinessConfigWatcher", "create_config_watcher"]
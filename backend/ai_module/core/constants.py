@@ -129,6 +129,18 @@ DIALOGUE_ACT_SWITCH_TOPIC = "switch_topic"
 DIALOGUE_ACT_RESUME_TASK = "resume_task"
 DIALOGUE_ACT_UNCLEAR = "unclear"
 
+DIALOGUE_ACTS = {
+    DIALOGUE_ACT_NEW_REQUEST,
+    DIALOGUE_ACT_CONFIRM,
+    DIALOGUE_ACT_REJECT,
+    DIALOGUE_ACT_PROVIDE_SLOT,
+    DIALOGUE_ACT_SELECT_ITEM,
+    DIALOGUE_ACT_CORRECT,
+    DIALOGUE_ACT_SWITCH_TOPIC,
+    DIALOGUE_ACT_RESUME_TASK,
+    DIALOGUE_ACT_UNCLEAR,
+}
+
 CONTINUATION_DIALOGUE_ACTS = {
     DIALOGUE_ACT_CONFIRM,
     DIALOGUE_ACT_REJECT,
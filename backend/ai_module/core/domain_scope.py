@@ -2,10 +2,10 @@
 from __future__ import annotations
 
 import re
-from typing import Dict, List, Optional
+from typing import Dict, Mapping, Optional, Sequence
 
-from .capability_registry import build_capability_specs
-from .constants import DEFAULT_INTENT_RULES, INTENT_QA
+from .constants import DEFAULT_INTENT_RULES
+from .keyword_automaton import turn_features
 
 _SOCIAL_MESSAGE_RE = re.compile(
     r"^(你好|您好|hello|hi|在吗|哈哈|哈喽|谢谢|感谢|辛苦了|好的|ok|再见|拜拜)[!！。.\s]*$",
@@ -17,7 +17,7 @@ def is_simple_social_message(message: str) -> bool:
     return bool(_SOCIAL_MESSAGE_RE.match((message or "").strip()))
 
 
-def get_intent_rules(runtime=None) -> Dict[str, List[str]]:
+def get_intent_rules(runtime=None) -> Mapping[str, Sequence[str]]:
     if runtime is None:
         return {intent: list(keywords) for intent, keywords in DEFAULT_INTENT_RULES.items()}
     return runtime.get_intent_rules()
@@ -30,28 +30,9 @@ def get_runtime_config(runtime=None) -> Dict[str, object]:
 
 
 def has_business_signal(message: str, *, runtime=None) -> bool:
-    normalized = (message or "").strip().lower()
-    if not normalized:
+    if not (message or "").strip():
         return False
-
-    if re.search(r"(毕设|毕业设计|课设|选题)", normalized, re.IGNORECASE):
-        return True
-    if re.search(r"(找|想要|需要).*(项目|源码)", normalized, re.IGNORECASE):
-        return True
-
-    for intent, keywords in get_intent_rules(runtime).items():
-        if intent == INTENT_QA:
-            continue
-        for keyword in keywords:
-            if keyword and keyword.lower() in normalized:
-                return True
-
-    for spec in build_capability_specs(get_runtime_config(runtime)):
-        for keyword in spec.keywords:
-            if keyword and keyword.lower() in normalized:
-                return True
-
-    return False
+    return turn_features(message, runtime=runtime).has_business_signal
 
 
 def looks_out_of_business_scope(message: str, *, runtime=None) -> bool:
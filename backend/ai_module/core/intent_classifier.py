@@ -0,0 +1,446 @@
+"""本地轻量意图分类器。
+
+规则没有命中时，意图识别和轮次理解原本都要调用 LLM。这里提供一个纯 CPU 的快速通道：
+
+- 特征：字符 n-gram（默认 1~3）的 TF-IDF，子线性词频 + L2 归一化，对中文不需要分词
+- 模型：多分类 logistic 回归（softmax），numpy 实现，训练用 Adam + L2 正则
+- 置信度：在留出集上拟合温度系数（temperature scaling）做校准；消息的 n-gram 在词表中的
+  覆盖率低于 ``min_coverage`` 时置信度记为 0。此时 logits 几乎只剩偏置项，softmax 给出的高分
+  没有意义，这类业务外的消息应交给 LLM
+- 推理：只对出现的 n-gram 取权重行求和，单条耗时在亚毫秒级
+
+训练数据来自业务包 ``intent_classifier.examples``、规则关键词，以及导出的已标注流量
+（JSONL，每行 ``{"message": ..., "intent": ...}``）。模型以 JSON 保存为每个业务一个文件，
+由 ``AIRuntime.get_intent_classifier`` 加载；训练与评估见 ``backend/train_intent_classifier.py``。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_VERSION = 1
+MIN_FEATURE_COVERAGE = 0.35
+
+Example = Tuple[str, str]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (1, 3)) -> List[str]:
+    """带首尾边界标记的字符 n-gram，让“退款”和“退款了吗”共享片段但仍能区分位置。"""
+    normalized = normalize_text(text)
+    if not normalized:
+        return []
+    padded = f"^{normalized}$"
+    low, high = ngram_range
+    grams = []
+    for size in range(low, high + 1):
+        for start in range(0, len(padded) - size + 1):
+            gram = padded[start : start + size]
+            if gram not in ("^", "$"):
+                grams.append(gram)
+    return grams
+
+
+@dataclass(frozen=True)
+class IntentPrediction:
+    intent: str
+    confidence: float
+    duration_ms: float = 0.0
+    coverage: float = 1.0
+
+
+class IntentClassifier:
+    """字符 n-gram TF-IDF + softmax 线性模型。"""
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        vocabulary: Mapping[str, int],
+        idf: np.ndarray,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        *,
+        temperature: float = 1.0,
+        ngram_range: Tuple[int, int] = (1, 3),
+        min_coverage: float = MIN_FEATURE_COVERAGE,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        self.labels = list(labels)
+        self.vocabulary = dict(vocabulary)
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.temperature = float(temperature)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.min_coverage = float(min_coverage)
+        self.metadata = dict(metadata or {})
+
+    # ── 推理 ──────────────────────────────────────────────────────
+
+    def _encode(self, text: str) -> Tuple[np.ndarray, np.ndarray, float]:
+        """稀疏特征，以及消息 n-gram 中落在词表内的比例。"""
+        grams = char_ngrams(text, self.ngram_range)
+        counts = Counter(self.vocabulary[gram] for gram in grams if gram in self.vocabulary)
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), 0.0
+        coverage = sum(counts.values()) / len(grams)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        values = tf * self.idf[indices]
+        norm = float(np.linalg.norm(values))
+        if norm > 0:
+            values = values / norm
+        return indices, values, coverage
+
+    def _features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        indices, values, _ = self._encode(text)
+        return indices, values
+
+    def _logits(self, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        if indices.size == 0:
+            return self.bias.copy()
+        return values @ self.weights[indices] + self.bias
+
+    def logits(self, text: str) -> np.ndarray:
+        return self._logits(*self._features(text))
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        return _softmax(self.logits(text) / self.temperature)
+
+    def predict(self, text: str) -> IntentPrediction:
+        started = time.perf_counter()
+        indices, values, coverage = self._encode(text)
+        probabilities = _softmax(self._logits(indices, values) / self.temperature)
+        best = int(np.argmax(probabilities))
+        confidence = float(probabilities[best]) if coverage >= self.min_coverage else 0.0
+        return IntentPrediction(
+            intent=self.labels[best],
+            confidence=confidence,
+            duration_ms=(time.perf_counter() - started) * 1000,
+            coverage=coverage,
+        )
+
+    # ── 训练 ──────────────────────────────────────────────────────
+
+    @classmethod
+    def train(
+        cls,
+        examples: Sequence[Example],
+        *,
+        ngram_range: Tuple[int, int] = (1, 3),
+        max_features: int = 20000,
+        epochs: int = 80,
+        learning_rate: float = 0.05,
+        l2: float = 1e-4,
+        batch_size: int = 256,
+        calibration_split: float = 0.2,
+        seed: int = 13,
+    ) -> "IntentClassifier":
+        examples = [(text, label) for text, label in examples if normalize_text(text) and label]
+        if not examples:
+            raise ValueError("no training examples")
+        labels = sorted({label for _, label in examples})
+        if len(labels) < 2:
+            raise ValueError("need at least two intent labels to train a classifier")
+
+        rng = random.Random(seed)
+        calibration, training = _stratified_split(examples, calibration_split, rng)
+
+        temperature = 1.0
+        if calibration:
+            # 先在训练部分上拟合，用留出部分校准温度，再用全部数据重新训练
+            probe = cls._fit(training, labels, ngram_range, max_features, epochs, learning_rate, l2, batch_size, seed)
+            temperature = probe._fit_temperature(calibration)
+
+        model = cls._fit(examples, labels, ngram_range, max_features, epochs, learning_rate, l2, batch_size, seed)
+        model.temperature = temperature
+        model.metadata.update(
+            {
+                "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "examples": len(examples),
+                "calibration_examples": len(calibration),
+                "label_counts": dict(Counter(label for _, label in examples)),
+            }
+        )
+        return model
+
+    @classmethod
+    def _fit(
+        cls,
+        examples: Sequence[Example],
+        labels: List[str],
+        ngram_range: Tuple[int, int],
+        max_features: int,
+        epochs: int,
+        learning_rate: float,
+        l2: float,
+        batch_size: int,
+        seed: int,
+    ) -> "IntentClassifier":
+        document_frequency: Counter = Counter()
+        tokenized = []
+        for text, _ in examples:
+            grams = char_ngrams(text, ngram_range)
+            tokenized.append(grams)
+            document_frequency.update(set(grams))
+
+        vocabulary_terms = [gram for gram, _ in document_frequency.most_common(max_features)]
+        vocabulary = {gram: index for index, gram in enumerate(sorted(vocabulary_terms))}
+        total = len(examples)
+        idf = np.zeros(len(vocabulary), dtype=np.float32)
+        for gram, index in vocabulary.items():
+            idf[index] = math.log((1 + total) / (1 + document_frequency[gram])) + 1.0
+
+        model = cls(
+            labels,
+            vocabulary,
+            idf,
+            np.zeros((len(vocabulary), len(labels)), dtype=np.float32),
+            np.zeros(len(labels), dtype=np.float32),
+            ngram_range=ngram_range,
+        )
+        rows = [model._features(text) for text, _ in examples]
+        label_index = {label: index for index, label in enumerate(labels)}
+        targets = np.array([label_index[label] for _, label in examples], dtype=np.int64)
+
+        # Adam；每个批次把稀疏特征展开成稠密矩阵，内存只与批大小和词表大小有关
+        weights = np.zeros_like(model.weights)
+        bias = np.zeros_like(model.bias)
+        m_w, v_w = np.zeros_like(weights), np.zeros_like(weights)
+        m_b, v_b = np.zeros_like(bias), np.zeros_like(bias)
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        order = np.arange(total)
+        shuffler = np.random.default_rng(seed)
+        step = 0
+        for _ in range(epochs):
+            shuffler.shuffle(order)
+            for start in range(0, total, batch_size):
+                batch = order[start : start + batch_size]
+                x = np.zeros((len(batch), len(vocabulary)), dtype=np.float32)
+                for row, example_index in enumerate(batch):
+                    indices, values = rows[example_index]
+                    x[row, indices] = values
+                probabilities = _softmax(x @ weights + bias)
+                probabilities[np.arange(len(batch)), targets[batch]] -= 1.0
+                grad_w = x.T @ probabilities / len(batch) + l2 * weights
+                grad_b = probabilities.mean(axis=0)
+
+                step += 1
+                m_w = beta1 * m_w + (1 - beta1) * grad_w
+                v_w = beta2 * v_w + (1 - beta2) * grad_w * grad_w
+                m_b = beta1 * m_b + (1 - beta1) * grad_b
+                v_b = beta2 * v_b + (1 - beta2) * grad_b * grad_b
+                correction1 = 1 - beta1 ** step
+                correction2 = 1 - beta2 ** step
+                weights -= learning_rate * (m_w / correction1) / (np.sqrt(v_w / correction2) + eps)
+                bias -= learning_rate * (m_b / correction1) / (np.sqrt(v_b / correction2) + eps)
+
+        model.weights = weights
+        model.bias = bias
+        return model
+
+    def _fit_temperature(self, examples: Sequence[Example]) -> float:
+        label_index = {label: index for index, label in enumerate(self.labels)}
+        pairs = [(self.logits(text), label_index[label]) for text, label in examples if label in label_index]
+        if not pairs:
+            return 1.0
+        logits = np.stack([item[0] for item in pairs])
+        targets = np.array([item[1] for item in pairs])
+
+        def nll(temperature: float) -> float:
+            probabilities = _softmax(logits / temperature)
+            return float(-np.log(probabilities[np.arange(len(targets)), targets] + 1e-12).mean())
+
+        candidates = np.exp(np.linspace(np.log(0.05), np.log(10.0), 60))
+        return float(min(candidates, key=nll))
+
+    # ── 持久化 ────────────────────────────────────────────────────
+
+    def to_dict(self) -> Dict[str, Any]:
+        terms = [""] * len(self.vocabulary)
+        for gram, index in self.vocabulary.items():
+            terms[index] = gram
+        return {
+            "version": ARTIFACT_VERSION,
+            "labels": self.labels,
+            "ngram_range": list(self.ngram_range),
+            "temperature": self.temperature,
+            "min_coverage": self.min_coverage,
+            "terms": terms,
+            "idf": [round(float(value), 6) for value in self.idf],
+            "weights": [[round(float(value), 6) for value in row] for row in self.weights],
+            "bias": [round(float(value), 6) for value in self.bias],
+            "metadata": self.metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Mapping[str, Any]) -> "IntentClassifier":
+        if payload.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"unsupported intent classifier artifact version: {payload.get('version')}")
+        terms = payload["terms"]
+        labels = payload["labels"]
+        weights = np.asarray(payload["weights"], dtype=np.float32).reshape(len(terms), len(labels))
+        return cls(
+            labels,
+            {gram: index for index, gram in enumerate(terms)},
+            np.asarray(payload["idf"], dtype=np.float32),
+            weights,
+            np.asarray(payload["bias"], dtype=np.float32),
+            temperature=payload.get("temperature", 1.0),
+            ngram_range=tuple(payload.get("ngram_range", (1, 3))),
+            min_coverage=payload.get("min_coverage", MIN_FEATURE_COVERAGE),
+            metadata=payload.get("metadata"),
+        )
+
+    def save(self, path: Path | str) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path | str) -> "IntentClassifier":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _stratified_split(
+    examples: Sequence[Example],
+    fraction: float,
+    rng: random.Random,
+) -> Tuple[List[Example], List[Example]]:
+    """按标签留出一部分做校准；每个标签至少保留 4 条训练样本，样本太少时不留出。"""
+    by_label: Dict[str, List[Example]] = {}
+    for example in examples:
+        by_label.setdefault(example[1], []).append(example)
+
+    held_out: List[Example] = []
+    kept: List[Example] = []
+    for items in by_label.values():
+        items = list(items)
+        rng.shuffle(items)
+        count = int(len(items) * fraction) if len(items) >= 5 else 0
+        held_out.extend(items[:count])
+        kept.extend(items[count:])
+    if len(held_out) < 10:
+        return [], list(examples)
+    return held_out, kept
+
+
+# ── 训练数据与评估 ───────────────────────────────────────────────
+
+
+def business_examples(config: Mapping[str, Any], include_rules: bool = True) -> List[Example]:
+    """从业务包配置收集样本：``intent_classifier.examples`` 以及规则关键词（弱标注）。"""
+    classifier = config.get("intent_classifier") or {}
+    examples: List[Example] = []
+    for item in classifier.get("examples") or []:
+        message, intent = item.get("message"), item.get("intent")
+        if message and intent:
+            examples.append((str(message), str(intent)))
+    if include_rules:
+        for intent, keywords in (classifier.get("rules") or {}).items():
+            examples.extend((str(keyword), str(intent)) for keyword in keywords or [] if keyword)
+    return examples
+
+
+def load_labelled_traffic(paths: Iterable[Path | str], labels: Optional[Iterable[str]] = None) -> List[Example]:
+    """读取已标注流量（JSONL），丢弃标签不在业务标签集合中的行。"""
+    allowed = set(labels) if labels is not None else None
+    examples: List[Example] = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping malformed traffic line %s:%s", path, line_number)
+                    continue
+                message = record.get("message") or record.get("user_message")
+                intent = record.get("intent") or record.get("label")
+                if not message or not intent:
+                    continue
+                if allowed is not None and intent not in allowed:
+                    continue
+                examples.append((str(message), str(intent)))
+    return examples
+
+
+def evaluate(classifier: IntentClassifier, examples: Sequence[Example], threshold: float = 0.0) -> Dict[str, Any]:
+    """准确率、阈值以上的覆盖率与准确率、各标签 P/R、期望校准误差（ECE）和推理耗时。"""
+    if not examples:
+        return {"examples": 0}
+
+    predictions = [classifier.predict(text) for text, _ in examples]
+    correct = [prediction.intent == label for prediction, (_, label) in zip(predictions, examples)]
+    confident = [index for index, prediction in enumerate(predictions) if prediction.confidence >= threshold]
+
+    per_label: Dict[str, Dict[str, float]] = {}
+    for label in sorted({label for _, label in examples} | {p.intent for p in predictions}):
+        tp = sum(1 for p, (_, gold) in zip(predictions, examples) if p.intent == label and gold == label)
+        predicted = sum(1 for p in predictions if p.intent == label)
+        actual = sum(1 for _, gold in examples if gold == label)
+        per_label[label] = {
+            "precision": tp / predicted if predicted else 0.0,
+            "recall": tp / actual if actual else 0.0,
+            "support": actual,
+        }
+
+    bins: Dict[int, List[int]] = {}
+    for index, prediction in enumerate(predictions):
+        bins.setdefault(min(int(prediction.confidence * 10), 9), []).append(index)
+    ece = sum(
+        len(members) / len(examples)
+        * abs(
+            sum(correct[i] for i in members) / len(members)
+            - sum(predictions[i].confidence for i in members) / len(members)
+        )
+        for members in bins.values()
+    )
+
+    durations = sorted(prediction.duration_ms for prediction in predictions)
+    return {
+        "examples": len(examples),
+        "accuracy": sum(correct) / len(examples),
+        "threshold": threshold,
+        "coverage": len(confident) / len(examples),
+        "accuracy_above_threshold": (sum(correct[i] for i in confident) / len(confident)) if confident else None,
+        "ece": ece,
+        "latency_ms_p50": durations[len(durations) // 2],
+        "latency_ms_p99": durations[min(len(durations) - 1, int(len(durations) * 0.99))],
+        "per_label": per_label,
+    }
+
+
+__all__ = [
+    "IntentClassifier",
+    "IntentPrediction",
+    "business_examples",
+    "char_ngrams",
+    "evaluate",
+    "load_labelled_traffic",
+]
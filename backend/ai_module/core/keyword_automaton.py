@@ -0,0 +1,319 @@
+"""Compiled keyword automaton shared by every rule-matching path.
+
+A single user message used to be scanned keyword-by-keyword several times per
+turn: rule-based intent matching, the entry node's business-signal check, the
+domain-scope guard and the unsupported-capability lookup.  ``KeywordMatcher``
+compiles a business pack's merged intent rules, capability keywords and the
+project-seeking regex cues into one Aho-Corasick automaton, so one pass over
+the message yields a ``TurnFeatures`` object that all of those callers reuse.
+Recent results are memoized per matcher, which makes the second and later
+lookups within a turn a dictionary hit.
+"""
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from .capability_registry import CapabilitySpec, build_capability_specs
+from .constants import DEFAULT_INTENT_RULES, INTENT_QA, INTENT_RECOMMEND
+
+CUE_SMALLTALK = "smalltalk"
+CUE_GRADUATION_PROJECT = "graduation_project"
+# ``(找|要|想做|需要).*(项目|源码)``: the broader form used for intent rules
+CUE_PROJECT_SEEKING = "project_seeking"
+# ``(找|想要|需要).*(项目|源码)``: the stricter form used for domain scope
+CUE_PROJECT_WANTED = "project_wanted"
+
+SMALLTALK_RE = re.compile(
+    r"^(你好|您好|hello|hi|在吗|哈喽|谢谢|感谢|好的|ok|再见|拜拜|早上好|晚上好)[!！。.?？]*$",
+    re.IGNORECASE,
+)
+
+_GRADUATION_KEYWORDS = ("毕设", "毕业设计", "课设", "选题")
+_SEEKING_TRIGGERS = ("找", "要", "想做", "需要")
+_WANTED_TRIGGERS = ("找", "想要", "需要")
+_PROJECT_TARGETS = ("项目", "源码")
+
+_CUE_GRADUATION = "graduation"
+_CUE_SEEKING_TRIGGER = "seeking_trigger"
+_CUE_WANTED_TRIGGER = "wanted_trigger"
+_CUE_PROJECT_TARGET = "project_target"
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher over lower-cased patterns."""
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = tuple(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = next_node
+            self._out[node] = self._out[node] + (pattern_id,)
+
+        # Breadth-first pass so each node's failure link is resolved before its children
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield ``(end_offset, pattern_id)`` for every occurrence in ``text``."""
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        node = 0
+        for index, char in enumerate(text):
+            if node == 0 and char not in root:
+                continue
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern_id in out[node]:
+                yield index + 1, pattern_id
+
+
+@dataclass(frozen=True)
+class TurnFeatures:
+    """Everything the rule-matching paths need to know about one message."""
+
+    text: str
+    intent_hits: Tuple[Tuple[str, Tuple[str, ...]], ...]
+    capability_hits: Mapping[str, Tuple[str, ...]]
+    cues: FrozenSet[str]
+
+    def rule_match(self) -> Optional[Tuple[str, float, str]]:
+        """Rule-based intent as ``(intent, confidence, matched_on)``, same priority as before."""
+        if CUE_SMALLTALK in self.cues:
+            return INTENT_QA, 0.99, CUE_SMALLTALK
+        if CUE_GRADUATION_PROJECT in self.cues:
+            return INTENT_RECOMMEND, 0.98, CUE_GRADUATION_PROJECT
+        if CUE_PROJECT_SEEKING in self.cues:
+            return INTENT_RECOMMEND, 0.95, CUE_PROJECT_SEEKING
+        if self.intent_hits:
+            intent, keywords = self.intent_hits[0]
+            return intent, 0.95, keywords[0]
+        return None
+
+    @property
+    def has_business_signal(self) -> bool:
+        if CUE_GRADUATION_PROJECT in self.cues or CUE_PROJECT_WANTED in self.cues:
+            return True
+        if any(intent != INTENT_QA for intent, _ in self.intent_hits):
+            return True
+        return bool(self.capability_hits)
+
+
+def _has_ordered_pair(text: str, ends: Iterable[int], starts: Iterable[int]) -> bool:
+    # Mirrors ``trigger.*target`` without DOTALL: the gap may not cross a newline
+    starts = sorted(starts)
+    for end in sorted(ends):
+        for start in starts:
+            if start >= end and "\n" not in text[end:start]:
+                return True
+    return False
+
+
+class KeywordMatcher:
+    """One business pack's intent rules and capability keywords, compiled once."""
+
+    def __init__(
+        self,
+        intent_rules: Mapping[str, Iterable[str]],
+        capability_specs: Iterable[CapabilitySpec] = (),
+        memo_size: int = 256,
+    ):
+        self.intent_rules: Dict[str, Tuple[str, ...]] = {
+            intent: tuple(keywords) for intent, keywords in intent_rules.items()
+        }
+        self.capability_specs: Tuple[CapabilitySpec, ...] = tuple(capability_specs)
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, TurnFeatures]" = OrderedDict()
+
+        pattern_ids: Dict[str, int] = {}
+        intent_owners: List[List[Tuple[int, int, str, str]]] = []
+        capability_owners: List[List[Tuple[str, int, str]]] = []
+        cue_owners: Dict[int, List[str]] = {}
+
+        def register(keyword: str) -> Optional[int]:
+            pattern = keyword.lower()
+            if not pattern:
+                return None
+            pattern_id = pattern_ids.get(pattern)
+            if pattern_id is None:
+                pattern_id = pattern_ids[pattern] = len(intent_owners)
+                intent_owners.append([])
+                capability_owners.append([])
+            return pattern_id
+
+        for rank, (intent, keywords) in enumerate(self.intent_rules.items()):
+            for position, keyword in enumerate(keywords):
+                pattern_id = register(keyword or "")
+                if pattern_id is not None:
+                    intent_owners[pattern_id].append((rank, position, intent, keyword))
+        for spec in self.capability_specs:
+            for position, keyword in enumerate(spec.keywords):
+                pattern_id = register(keyword or "")
+                if pattern_id is not None:
+                    capability_owners[pattern_id].append((spec.key, position, keyword))
+        for cue, keywords in (
+            (_CUE_GRADUATION, _GRADUATION_KEYWORDS),
+            (_CUE_SEEKING_TRIGGER, _SEEKING_TRIGGERS),
+            (_CUE_WANTED_TRIGGER, _WANTED_TRIGGERS),
+            (_CUE_PROJECT_TARGET, _PROJECT_TARGETS),
+        ):
+            for keyword in keywords:
+                cue_owners.setdefault(register(keyword), []).append(cue)
+
+        self._intent_owners = tuple(tuple(entries) for entries in intent_owners)
+        self._capability_owners = tuple(tuple(entries) for entries in capability_owners)
+        self._cue_owners = {pattern_id: tuple(cues) for pattern_id, cues in cue_owners.items()}
+        self._automaton = AhoCorasick(sorted(pattern_ids, key=pattern_ids.get))
+
+    @classmethod
+    def from_business_config(
+        cls,
+        intent_rules: Mapping[str, Iterable[str]],
+        config: Optional[Dict[str, Any]] = None,
+    ) -> "KeywordMatcher":
+        return cls(intent_rules, build_capability_specs(config))
+
+    def scan(self, message: str) -> TurnFeatures:
+        """Single automaton pass over the message, bypassing the memo."""
+        text = (message or "").strip()
+        lowered = text.lower()
+
+        matched = set()
+        cue_spans: Dict[str, List[Tuple[int, int]]] = {}
+        cue_owners = self._cue_owners
+        patterns = self._automaton.patterns
+        for end, pattern_id in self._automaton.iter_matches(lowered):
+            matched.add(pattern_id)
+            if pattern_id in cue_owners:
+                span = (end - len(patterns[pattern_id]), end)
+                for cue in cue_owners[pattern_id]:
+                    cue_spans.setdefault(cue, []).append(span)
+
+        cues = set()
+        if SMALLTALK_RE.match(text):
+            cues.add(CUE_SMALLTALK)
+        if _CUE_GRADUATION in cue_spans:
+            cues.add(CUE_GRADUATION_PROJECT)
+        targets = [start for start, _ in cue_spans.get(_CUE_PROJECT_TARGET, ())]
+        if targets:
+            for trigger, cue in ((_CUE_SEEKING_TRIGGER, CUE_PROJECT_SEEKING), (_CUE_WANTED_TRIGGER, CUE_PROJECT_WANTED)):
+                ends = [end for _, end in cue_spans.get(trigger, ())]
+                if ends and _has_ordered_pair(lowered, ends, targets):
+                    cues.add(cue)
+
+        # Owners sort by (rule order, keyword order), matching the old nested loops
+        intent_hits: List[Tuple[str, Tuple[str, ...]]] = []
+        for _, _, intent, keyword in sorted(entry for pattern_id in matched for entry in self._intent_owners[pattern_id]):
+            if intent_hits and intent_hits[-1][0] == intent:
+                intent_hits[-1] = (intent, intent_hits[-1][1] + (keyword,))
+            else:
+                intent_hits.append((intent, (keyword,)))
+        capability_hits: Dict[str, Tuple[str, ...]] = {}
+        for key, _, keyword in sorted(entry for pattern_id in matched for entry in self._capability_owners[pattern_id]):
+            capability_hits[key] = capability_hits.get(key, ()) + (keyword,)
+        return TurnFeatures(text=text, intent_hits=tuple(intent_hits), capability_hits=capability_hits, cues=frozenset(cues))
+
+    def features(self, message: str) -> TurnFeatures:
+        """Memoized ``scan``: callers within one turn share the same result."""
+        key = (message or "").strip()
+        cached = self._memo.get(key)
+        if cached is not None:
+            self._memo.move_to_end(key)
+            return cached
+        features = self.scan(key)
+        self._memo[key] = features
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return features
+
+
+_default_matcher: Optional[KeywordMatcher] = None
+_adhoc_matchers: Dict[int, Tuple[Any, KeywordMatcher]] = {}
+_ADHOC_LIMIT = 32
+
+
+def _default_intent_rules() -> Dict[str, List[str]]:
+    return {intent: list(keywords) for intent, keywords in DEFAULT_INTENT_RULES.items()}
+
+
+def _adhoc(owner: Any, build) -> KeywordMatcher:
+    # Owners without a compiled matcher of their own (runtime stand-ins, bare configs)
+    # are cached by identity, like tool bindings are cached per model
+    cached = _adhoc_matchers.get(id(owner))
+    if cached is not None and cached[0] is owner:
+        return cached[1]
+    if len(_adhoc_matchers) >= _ADHOC_LIMIT:
+        _adhoc_matchers.clear()
+    matcher = build()
+    _adhoc_matchers[id(owner)] = (owner, matcher)
+    return matcher
+
+
+def get_keyword_matcher(runtime: Any = None) -> KeywordMatcher:
+    """The compiled matcher for a runtime's business pack (defaults when ``runtime`` is None)."""
+    global _default_matcher
+    if runtime is None:
+        if _default_matcher is None:
+            _default_matcher = KeywordMatcher.from_business_config(_default_intent_rules())
+        return _default_matcher
+
+    compiled = getattr(runtime, "get_keyword_matcher", None)
+    if compiled is not None:
+        return compiled()
+
+    def build() -> KeywordMatcher:
+        get_rules = getattr(runtime, "get_intent_rules", None)
+        rules = get_rules() if get_rules is not None else _default_intent_rules()
+        business_pack = getattr(runtime, "business_pack", None)
+        config = getattr(business_pack, "config", None) if business_pack is not None else None
+        return KeywordMatcher.from_business_config(rules, config if isinstance(config, dict) else None)
+
+    return _adhoc(runtime, build)
+
+
+def matcher_for_config(config: Optional[Dict[str, Any]] = None) -> KeywordMatcher:
+    """Matcher for callers that only hold a business config dict."""
+    if not config or not config.get("capability_registry"):
+        return get_keyword_matcher()
+    return _adhoc(config, lambda: KeywordMatcher.from_business_config(_default_intent_rules(), config))
+
+
+def turn_features(message: str, *, runtime: Any = None) -> TurnFeatures:
+    return get_keyword_matcher(runtime).features(message)
+
+
+__all__ = [
+    "AhoCorasick",
+    "CUE_GRADUATION_PROJECT",
+    "CUE_PROJECT_SEEKING",
+    "CUE_PROJECT_WANTED",
+    "CUE_SMALLTALK",
+    "KeywordMatcher",
+    "TurnFeatures",
+    "get_keyword_matcher",
+    "matcher_for_config",
+    "turn_features",
+]
@@ -0,0 +1,407 @@
+"""跨会话长期记忆索引。
+
+职责：
+- 按用户保存历史轮次与对话摘要，跨会话共享
+- 根据当前问题检索最相关的若干条记忆，并控制在令牌预算内
+
+默认使用字符二元组 + 标识符的 BM25 打分，不依赖外部服务；
+配置了向量模型时，额外用余弦相似度与词法分数融合。
+订单号、商品编号这类标识符单独加权，保证很早以前提到过的编号也能被召回。
+每条记忆写入时保存分词后的词频，检索时不再逐条重新分词；同一用户的多个会话
+并发写入时，读改写在分布式锁内完成，不会互相覆盖。
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import logging
+import math
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from .summarizer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+MEMORY_KIND_TURN = "turn"
+MEMORY_KIND_SUMMARY = "summary"
+
+_CJK_RUN = re.compile(r"[\u4e00-\u9fff]+")
+_WORD = re.compile(r"[A-Za-z0-9_\-]+")
+_IDENTIFIER_WEIGHT = 3.0
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+
+def tokenize_for_memory(text: str) -> List[str]:
+    """把文本切成检索用的词项：中文取字符二元组，英文/数字取整词。"""
+    if not text:
+        return []
+    terms: List[str] = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+    for word in _WORD.findall(text):
+        terms.append(word.lower())
+    return terms
+
+
+def _is_identifier(term: str) -> bool:
+    if term.isdigit():
+        return len(term) >= 6
+    return len(term) >= 4 and any(ch.isdigit() for ch in term) and any(ch.isalpha() for ch in term)
+
+
+def _encode_vector(vector: Sequence[float]) -> str:
+    import numpy as np
+
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode("ascii")
+
+
+def _decode_vector(payload: str):
+    import numpy as np
+
+    return np.frombuffer(base64.b64decode(payload), dtype=np.float16).astype(np.float32)
+
+
+@dataclass
+class MemoryRecord:
+    """一条长期记忆。"""
+
+    text: str
+    kind: str = MEMORY_KIND_TURN
+    session_id: str = ""
+    tokens: int = 0
+    created_at: float = field(default_factory=time.time)
+    source_ref: str = ""
+    vector: Optional[str] = None
+    terms: Optional[Dict[str, int]] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MemoryRecord":
+        known = {key: data[key] for key in cls.__dataclass_fields__ if key in data}
+        return cls(**known)
+
+    def term_counts(self) -> Dict[str, int]:
+        """检索用词频；旧版本写入、没有保存词频的记录在这里补算。"""
+        if self.terms is None:
+            self.terms = dict(Counter(tokenize_for_memory(self.text)))
+        return self.terms
+
+    def to_prompt_dict(self, score: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "text": self.text,
+            "tokens": self.tokens,
+            "session_id": self.session_id,
+            "created_at": self.created_at,
+            "score": round(score, 4),
+        }
+
+
+class LongTermMemoryIndex:
+    """按用户维护的长期记忆索引，存储复用 ``redis_cache`` 的结构化载荷接口。"""
+
+    KEY_TEMPLATE = "user:{user_id}:memory_index"
+    LOCK_SUFFIX = ":lock"
+
+    def __init__(
+        self,
+        cache=None,
+        embeddings=None,
+        max_records: int = 200,
+        ttl_seconds: int = 30 * 86400,
+        embedding_weight: float = 0.6,
+        lock_ttl_seconds: int = 10,
+        lock_wait_seconds: float = 5.0,
+    ):
+        self._cache = cache
+        self.embeddings = embeddings
+        self.max_records = max(1, int(max_records))
+        self.ttl_seconds = ttl_seconds
+        self.embedding_weight = embedding_weight
+        self.lock_ttl_seconds = max(1, int(lock_ttl_seconds))
+        self.lock_wait_seconds = max(0.0, float(lock_wait_seconds))
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from services.redis_cache import redis_cache
+
+            self._cache = redis_cache
+        return self._cache
+
+    def _key(self, user_id: str) -> str:
+        return self.KEY_TEMPLATE.format(user_id=user_id)
+
+    async def load(self, user_id: str) -> List[MemoryRecord]:
+        if not user_id:
+            return []
+        payload = await self.cache.get_payload(self._key(user_id))
+        if not isinstance(payload, list):
+            return []
+        records = []
+        for item in payload:
+            if isinstance(item, dict) and item.get("text"):
+                records.append(MemoryRecord.from_dict(item))
+        return records
+
+    async def _save(self, user_id: str, records: List[MemoryRecord]) -> None:
+        await self.cache.set_payload(
+            self._key(user_id),
+            [asdict(record) for record in records[-self.max_records :]],
+            expire=self.ttl_seconds,
+        )
+
+    @asynccontextmanager
+    async def _locked(self, user_id: str) -> AsyncIterator[None]:
+        """串行化同一用户索引的读改写；等锁超时或锁不可用时放行，最多丢一次写入而不阻塞回复。"""
+        key = self._key(user_id) + self.LOCK_SUFFIX
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_wait_seconds
+        delay = 0.02
+        acquired = False
+        while True:
+            try:
+                acquired = await self.cache.acquire_lock(key, token, self.lock_ttl_seconds)
+            except Exception as exc:
+                logger.warning("长期记忆写锁不可用 user=%s: %s", user_id, exc)
+                break
+            if acquired or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+        if not acquired:
+            logger.warning("未能获得长期记忆写锁 user=%s，直接写入", user_id)
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    await self.cache.release_lock(key, token)
+                except Exception as exc:
+                    logger.warning("释放长期记忆写锁失败 user=%s: %s", user_id, exc)
+
+    async def _embed_documents(self, texts: List[str]) -> List[Optional[str]]:
+        if self.embeddings is None or not texts:
+            return [None] * len(texts)
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(None, self.embeddings.embed_documents, texts)
+            return [_encode_vector(vector) for vector in vectors]
+        except Exception as exc:
+            logger.warning("长期记忆向量化失败，仅使用词法检索: %s", exc)
+            return [None] * len(texts)
+
+    async def _embed_query(self, text: str):
+        if self.embeddings is None or not text:
+            return None
+        try:
+            import numpy as np
+
+            vector = await asyncio.get_running_loop().run_in_executor(None, self.embeddings.embed_query, text)
+            return np.asarray(vector, dtype=np.float32)
+        except Exception as exc:
+            logger.warning("长期记忆查询向量化失败: %s", exc)
+            return None
+
+    async def add(self, user_id: str, records: List[MemoryRecord]) -> None:
+        if not user_id or not records:
+            return
+        vectors = await self._embed_documents([record.text for record in records])
+        for record, vector in zip(records, vectors):
+            record.vector = vector
+            if not record.tokens:
+                record.tokens = estimate_tokens(record.text)
+            record.term_counts()
+
+        async with self._locked(user_id):
+            existing = await self.load(user_id)
+            refs = {record.source_ref for record in records if record.source_ref}
+            if refs:
+                existing = [record for record in existing if record.source_ref not in refs]
+            await self._save(user_id, existing + records)
+
+    async def add_turn(
+        self,
+        user_id: str,
+        session_id: str,
+        user_message: str,
+        assistant_message: str,
+        *,
+        tokens: Optional[int] = None,
+    ) -> None:
+        text = f"用户：{user_message}\n助手：{assistant_message}"
+        source_ref = history_source_ref(session_id, {"user": user_message, "assistant": assistant_message})
+        await self.add(
+            user_id,
+            [
+                MemoryRecord(
+                    text=text,
+                    kind=MEMORY_KIND_TURN,
+                    session_id=session_id,
+                    tokens=tokens or 0,
+                    source_ref=source_ref,
+                )
+            ],
+        )
+
+    async def add_summary(self, user_id: str, session_id: str, summary: str) -> None:
+        if not summary:
+            return
+        # 同一会话只保留最新一份摘要
+        await self.add(
+            user_id,
+            [
+                MemoryRecord(
+                    text=f"会话摘要：{summary}",
+                    kind=MEMORY_KIND_SUMMARY,
+                    session_id=session_id,
+                    source_ref=summary_source_ref(session_id),
+                )
+            ],
+        )
+
+    def _lexical_scores(self, query: str, records: List[MemoryRecord]) -> List[float]:
+        query_terms = Counter(tokenize_for_memory(query))
+        if not query_terms or not records:
+            return [0.0] * len(records)
+
+        docs = [record.term_counts() for record in records]
+        lengths = [sum(doc.values()) for doc in docs]
+        avg_length = (sum(lengths) / len(lengths)) or 1.0
+        doc_freq: Counter = Counter()
+        for doc in docs:
+            doc_freq.update(term for term in query_terms if term in doc)
+
+        total = len(docs)
+        scores: List[float] = []
+        for doc, length in zip(docs, lengths):
+            score = 0.0
+            for term in query_terms:
+                tf = doc.get(term, 0)
+                if not tf:
+                    continue
+                idf = math.log(1 + (total - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                weight = _IDENTIFIER_WEIGHT if _is_identifier(term) else 1.0
+                norm = tf * (_BM25_K1 + 1) / (tf + _BM25_K1 * (1 - _BM25_B + _BM25_B * length / avg_length))
+                score += weight * idf * norm
+            scores.append(score)
+        return scores
+
+    async def retrieve(
+        self,
+        user_id: str,
+        query: str,
+        *,
+        token_budget: int = 600,
+        top_k: int = 4,
+        exclude_refs: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """检索与 ``query`` 最相关的记忆，按相关度贪心装入 ``token_budget``。"""
+        records = await self.load(user_id)
+        excluded = set(exclude_refs or ())
+        records = [record for record in records if not record.source_ref or record.source_ref not in excluded]
+        if not records or not query:
+            return []
+
+        lexical = self._lexical_scores(query, records)
+        peak = max(lexical) or 1.0
+        scores = [value / peak for value in lexical]
+
+        query_vector = await self._embed_query(query)
+        if query_vector is not None:
+            import numpy as np
+
+            query_norm = float(np.linalg.norm(query_vector)) or 1.0
+            for index, record in enumerate(records):
+                if not record.vector:
+                    continue
+                vector = _decode_vector(record.vector)
+                cosine = float(vector @ query_vector) / ((float(np.linalg.norm(vector)) or 1.0) * query_norm)
+                scores[index] = self.embedding_weight * max(cosine, 0.0) + (1 - self.embedding_weight) * scores[index]
+
+        ranked = sorted(
+            (pair for pair in zip(scores, records) if pair[0] > 0),
+            key=lambda pair: (pair[0], pair[1].created_at),
+            reverse=True,
+        )
+
+        selected: List[Dict[str, Any]] = []
+        used = 0
+        for score, record in ranked:
+            if len(selected) >= top_k:
+                break
+            tokens = record.tokens or estimate_tokens(record.text)
+            if used + tokens > token_budget:
+                continue
+            used += tokens
+            selected.append(record.to_prompt_dict(score))
+
+        # 输出时按时间顺序排列，便于模型理解前后关系
+        selected.sort(key=lambda item: item["created_at"])
+        return selected
+
+
+def history_source_ref(session_id: str, turn: Dict[str, Any]) -> str:
+    """历史轮次在长期记忆中的引用标识，用来排除已经原样放进提示词的轮次。"""
+    digest = hashlib.sha1(f"{turn.get('user', '')}\n{turn.get('assistant', '')}".encode("utf-8")).hexdigest()
+    return f"{session_id}:{digest[:16]}"
+
+
+def summary_source_ref(session_id: str) -> str:
+    return f"{session_id}:summary"
+
+
+_long_term_memory: Optional[LongTermMemoryIndex] = None
+
+
+def _build_embeddings(settings):
+    if not getattr(settings, "MEMORY_EMBEDDINGS_ENABLED", False) or not settings.SILICONFLOW_API_KEY:
+        return None
+    try:
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(
+            openai_api_key=settings.SILICONFLOW_API_KEY,
+            openai_api_base=settings.SILICONFLOW_BASE_URL,
+            model=settings.SILICONFLOW_EMBEDDING_MODEL,
+        )
+    except Exception as exc:
+        logger.warning("长期记忆向量模型初始化失败，仅使用词法检索: %s", exc)
+        return None
+
+
+def get_long_term_memory() -> Optional[LongTermMemoryIndex]:
+    """返回共享的长期记忆索引；``MEMORY_RETRIEVAL_ENABLED=false`` 时返回 None。"""
+    global _long_term_memory
+    from config import settings
+
+    if not getattr(settings, "MEMORY_RETRIEVAL_ENABLED", True):
+        return None
+    if _long_term_memory is None:
+        _long_term_memory = LongTermMemoryIndex(
+            embeddings=_build_embeddings(settings),
+            max_records=getattr(settings, "MEMORY_INDEX_MAX_RECORDS", 200),
+            ttl_seconds=getattr(settings, "MEMORY_INDEX_TTL_SECONDS", 30 * 86400),
+        )
+    return _long_term_memory
+
+
+__all__ = [
+    "LongTermMemoryIndex",
+    "MemoryRecord",
+    "get_long_term_memory",
+    "history_source_ref",
+    "summary_source_ref",
+    "tokenize_for_memory",
+]
@@ -3,19 +3,49 @@
 职责：
 - 从单个会话的最近几轮历史中提取短期上下文
 - 把当前任务停留点、待回答问题等状态拼成可直接喂给模型的记忆块
+- 上下文节点检索到长期记忆时，只保留最近少量轮次，其余由相关记忆补充
 
-这里不做长期偏好记忆，也不负责跨会话画像，只服务于当前会话里的短期承接。
+长期记忆的存储与检索见 ``long_term_memory``，这里只负责渲染。
 """
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
 
+from config import settings
+
 
 class MemoryContextBuilder:
     """把最近几轮对话和任务快照组装成统一的短期记忆视图。"""
 
-    def __init__(self, recent_turn_limit: int = 6):
+    def __init__(self, recent_turn_limit: int = 6, memory_recent_turns: Optional[int] = None):
         self.recent_turn_limit = recent_turn_limit
+        self.memory_recent_turns = (
+            memory_recent_turns if memory_recent_turns is not None else settings.MEMORY_RECENT_TURNS
+        )
+
+    @staticmethod
+    def has_retrieved_memories(state: Dict[str, Any]) -> bool:
+        """本轮是否做过长期记忆检索（结果可以为空列表）。"""
+        return state.get("retrieved_memories") is not None
+
+    def select_recent_turns(self, state: Dict[str, Any], default_limit: int) -> List[Dict[str, Any]]:
+        """返回需要原样放进提示词的最近轮次。
+
+        做过长期记忆检索时只保留最近 ``memory_recent_turns`` 轮，
+        更早的内容按相关度由检索结果提供；否则沿用调用方的固定窗口。
+        """
+        history = state.get("conversation_history") or []
+        limit = default_limit
+        if self.has_retrieved_memories(state):
+            limit = min(default_limit, self.memory_recent_turns)
+        if limit <= 0:
+            return []
+        return history[-limit:]
+
+    def build_relevant_memory_text(self, memories: Optional[List[Dict[str, Any]]]) -> str:
+        if not memories:
+            return "（无）"
+        return "\n".join(f"- {memory.get('text', '')}" for memory in memories)
 
     def build_recent_history_text(
         self,
@@ -73,11 +103,21 @@ class MemoryContextBuilder:
         include_task_snapshot: bool = True,
         limit: Optional[int] = None,
     ) -> str:
+        turns = self.select_recent_turns(state, limit or self.recent_turn_limit)
         sections = [
             "最近对话：",
-            self.build_recent_history_text(state.get("conversation_history") or [], limit=limit),
+            self.build_recent_history_text(turns, limit=len(turns) or None),
         ]
 
+        if self.has_retrieved_memories(state):
+            sections.extend(
+                [
+                    "",
+                    "相关历史记忆：",
+                    self.build_relevant_memory_text(state.get("retrieved_memories")),
+                ]
+            )
+
         if include_task_snapshot:
             sections.extend(
                 [
@@ -17,6 +17,8 @@ except Exception:  # pragma: no cover - compatibility path for isolated tests
     except Exception:  # pragma: no cover - package-relative fallback
         from ...state import ConversationState
 
+from services.telemetry import traced
+
 
 class BaseNode(ABC):
     """工作流抽象节点。"""
@@ -25,6 +27,13 @@ class BaseNode(ABC):
         self.llm = llm
         self.runtime = runtime
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 每个节点的 execute 自动记为一个 span，阶段耗时进入 /metrics
+        execute = cls.__dict__.get("execute")
+        if execute is not None and not getattr(execute, "__isabstractmethod__", False):
+            cls.execute = traced("node", cls.__name__)(execute)
+
     @abstractmethod
     async def execute(self, state: ConversationState) -> ConversationState:
         """执行当前节点逻辑。"""
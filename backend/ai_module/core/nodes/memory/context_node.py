@@ -1,11 +1,17 @@
 """
 上下文加载节点
 """
+import logging
 from datetime import datetime
+
+from config import settings
+from ai_module.core.long_term_memory import get_long_term_memory, history_source_ref, summary_source_ref
 from ai_module.core.nodes.common.base import BaseNode
 from ai_module.core.state import ConversationState
 from services.redis_cache import redis_cache
 
+logger = logging.getLogger(__name__)
+
 
 class ContextNode(BaseNode):
     """上下文加载节点"""
@@ -37,5 +43,29 @@ class ContextNode(BaseNode):
             state["pending_question"] = None
             state["pending_action"] = None
 
+        state["retrieved_memories"] = await self._retrieve_memories(state)
         state["timestamp"] = datetime.now().isoformat()
         return state
+
+    async def _retrieve_memories(self, state: ConversationState):
+        """按当前问题从长期记忆中检索相关片段；未启用时返回 None，提示词沿用固定窗口。"""
+        memory_index = get_long_term_memory()
+        if memory_index is None or not state.get("user_id"):
+            return None
+
+        session_id = state["session_id"]
+        # 最近几轮和本会话摘要已经原样进入提示词，不再重复召回
+        recent_turns = state.get("conversation_history", [])[-settings.MEMORY_RECENT_TURNS:]
+        exclude_refs = [history_source_ref(session_id, turn) for turn in recent_turns]
+        exclude_refs.append(summary_source_ref(session_id))
+        try:
+            return await memory_index.retrieve(
+                state["user_id"],
+                state.get("user_message", ""),
+                token_budget=settings.MEMORY_RETRIEVAL_TOKEN_BUDGET,
+                top_k=settings.MEMORY_RETRIEVAL_TOP_K,
+                exclude_refs=exclude_refs,
+            )
+        except Exception:
+            logger.warning("长期记忆检索失败，回退到最近对话窗口", exc_info=True)
+            return None
@@ -21,8 +21,9 @@ from ai_module.core.constants import (
     RESPONSE_MODE_CLARIFY_BEFORE_RESUME,
     RESPONSE_MODE_HELP_CURRENT_TASK,
 )
+from ai_module.core.long_term_memory import get_long_term_memory
 from ai_module.core.state import ConversationState
-from ai_module.core.summarizer import ConversationSummarizer
+from ai_module.core.summarizer import ConversationSummarizer, estimate_entry_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -131,14 +132,35 @@ class SaveContextNode(BaseNode):
         state["pending_question"] = pending_question
         state["pending_action"] = pending_action
 
+    async def _index_long_term_memory(self, state: ConversationState, tokens: int, summary: str | None = None) -> None:
+        memory_index = get_long_term_memory()
+        if memory_index is None or not state.get("user_id"):
+            return
+        try:
+            if summary is not None:
+                await memory_index.add_summary(state["user_id"], state["session_id"], summary)
+            else:
+                await memory_index.add_turn(
+                    state["user_id"],
+                    state["session_id"],
+                    state["user_message"],
+                    state["response"],
+                    tokens=tokens,
+                )
+        except Exception:
+            logger.warning("写入长期记忆失败", exc_info=True)
+
     async def execute(self, state: ConversationState) -> ConversationState:
         self._update_task_state(state)
 
+        tokens = estimate_entry_tokens(state["user_message"], state["response"])
         await redis_cache.add_message_to_context(
             session_id=state["session_id"],
             user_message=state["user_message"],
             assistant_message=state["response"],
+            tokens=tokens,
         )
+        await self._index_long_term_memory(state, tokens)
 
         await redis_cache.update_context(
             session_id=state["session_id"],
@@ -165,6 +187,7 @@ class SaveContextNode(BaseNode):
                         history=result["remaining_history"],
                         conversation_summary=result["summary"],
                     )
+                    await self._index_long_term_memory(state, 0, summary=result["summary"])
                 except Exception:
                     logger.warning("摘要生成失败，执行回退截断", exc_info=True)
                     truncated = self.summarizer.fallback_truncate(history)
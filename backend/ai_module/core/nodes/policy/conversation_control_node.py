@@ -7,7 +7,7 @@ from langchain_core.prompts import ChatPromptTemplate
 
 from ai_module.core.nodes.common.base import BaseNode
 from ai_module.core.domain_scope import looks_out_of_business_scope
-from ai_module.core.memory_builder import MemoryContextBuilder
+from ai_module.core.prompt_context import prompt_context
 from ai_module.core.out_of_scope_reply import compose_out_of_scope_reply
 from ai_module.core.constants import (
     INTENT_RECOMMEND,
@@ -37,7 +37,7 @@ class ConversationControlNode(BaseNode):
 
     def __init__(self, llm=None, runtime=None):
         super().__init__(llm=llm, runtime=runtime)
-        self.memory_builder = MemoryContextBuilder()
+        self.prompt_context = prompt_context
 
     def _build_reference_clarification(self, state: ConversationState, step_hint: Optional[str]) -> str:
         user_message = (state.get("user_message") or "").strip()
@@ -143,7 +143,7 @@ class ConversationControlNode(BaseNode):
         if self.llm is None:
             return await self._build_scope_redirect_reply(state, flow_label)
 
-        short_term_memory = self.memory_builder.build_short_term_memory_text(state)
+        short_term_memory = self.prompt_context.short_term_memory(state, consumer="conversation_control")
 
         prompt = ChatPromptTemplate.from_messages(
             [
@@ -13,7 +13,11 @@ from ai_module.core.constants import (
     INTENT_RECOMMEND,
     INTENT_TICKET,
 )
+from ai_module.core.prompt_context import prompt_context
 from ai_module.core.state import ConversationState
+from ai_module.core.tool_binding import build_tool_binding, tool_invocation_config
+from ai_module.core.tool_execution import get_tool_executor
+from ai_module.core.tool_planner import ToolPlanner
 from ai_module.core.nodes.common.base import BaseNode
 
 logger = logging.getLogger(__name__)
@@ -33,96 +37,104 @@ DEFAULT_SYSTEM_PROMPT = (
     "\n如果工具涉及当前用户的信息，必须基于系统已注入的执行上下文执行。"
 )
 
+_default_tool_planner = ToolPlanner.from_business_config(None)
+
 
 class FunctionCallingNode(BaseNode):
     """让大模型为当前业务包选择并调用合适的工具。"""
 
     def __init__(self, llm=None, runtime=None):
         super().__init__(llm=llm, runtime=runtime)
+        self.prompt_context = prompt_context
         self.tools = []
         self.tool_map = {}
         self.llm_with_tools = None
         self._refresh_tools()
 
-    def _refresh_tools(self, execution_context=None):
-        tools = []
+    def _refresh_tools(self):
+        # 绑定结果由运行时按业务包缓存，只在初始化时取一次；
+        # 当前用户等执行上下文在调用工具时注入，而不是重建工具。
         if self.runtime is not None:
-            tools = self.runtime.get_langchain_tools(
-                "default",
-                execution_context=execution_context,
-            )
-        if not tools and self.runtime is None:
-            tools = list(all_tools)
+            binding = self.runtime.get_tool_binding("default", self.llm)
+        else:
+            binding = build_tool_binding(all_tools, self.llm)
 
-        self.tools = tools
-        self.tool_map = {tool.name: tool for tool in tools}
-        self.llm_with_tools = self.llm.bind_tools(tools) if self.llm and tools else None
+        self.tools = list(binding.tools)
+        self.tool_map = dict(binding.tool_map)
+        self.llm_with_tools = binding.llm_with_tools
 
     def _get_system_prompt(self) -> str:
         if self.runtime is None:
             return DEFAULT_SYSTEM_PROMPT
         return self.runtime.get_prompt("function_calling_system_prompt", DEFAULT_SYSTEM_PROMPT)
 
+    def _get_tool_planner(self) -> ToolPlanner:
+        get_planner = getattr(self.runtime, "get_tool_planner", None)
+        if get_planner is None:
+            return _default_tool_planner
+        return get_planner()
+
     def _build_messages(self, state: ConversationState) -> list:
+        # 系统消息只放按业务包不变的内容，用户ID、记忆等每轮变化的数据放在最后一条消息里，
+        # 让同一业务包的请求共享字节一致的前缀，命中服务商的前缀缓存
         user_id = state.get("user_id", "")
         business_id = state.get("business_id") or "default"
-        system_message = (
-            f"{self._get_system_prompt()}"
-            f"\n当前业务包: {business_id}"
-            f"\n当前用户ID: {user_id}。如果工具需要 user_id，优先使用系统上下文。"
-        )
+        system_message = f"{self._get_system_prompt()}\n当前业务包: {business_id}"
 
         messages = [("system", system_message)]
-        for turn in state.get("conversation_history", [])[-3:]:
+        for turn in self.prompt_context.recent_turns(state, 3, consumer="function_calling"):
             messages.append(("human", turn.get("user", "")))
             messages.append(("assistant", turn.get("assistant", "")))
 
+        context_lines = [f"当前用户ID: {user_id}。如果工具需要 user_id，优先使用系统上下文。"]
+        memories = self.prompt_context.memories(state, consumer="function_calling")
+        if memories:
+            context_lines.append(f"相关历史记忆:\n{memories}")
         intent = state.get("intent", "未知")
-        messages.append(("human", f"[用户意图: {intent}] {state['user_message']}"))
+        messages.append(("human", "\n".join(context_lines) + f"\n\n[用户意图: {intent}] {state['user_message']}"))
         return messages
 
     async def execute(self, state: ConversationState) -> ConversationState:
-        self._refresh_tools(execution_context=state.get("execution_context"))
-
         if state.get("intent") in SKIP_INTENTS or state.get("confidence", 0) < 0.6:
             state["tool_result"] = None
             state["tool_used"] = None
             logger.info("Skipping tool calling for intent=%s", state.get("intent"))
             return state
 
-        if self.llm_with_tools is None:
+        # 意图明确且参数都在消息里（如带订单号的订单查询）时，按业务包规则直接调用工具，不再问 LLM
+        plan = self._get_tool_planner().plan(state.get("intent"), state.get("user_message", ""), self.tool_map)
+        if not plan.planned and self.llm_with_tools is None:
             state["tool_result"] = None
             state["tool_used"] = None
             return state
 
         try:
-            response = await self.llm_with_tools.ainvoke(self._build_messages(state))
-            if not response.tool_calls:
+            if plan.planned:
+                logger.info("Planned tool calls for intent=%s without LLM: %s", state.get("intent"), plan.rule.tool)
+                tool_calls = plan.tool_calls
+            else:
+                response = await self.llm_with_tools.ainvoke(self._build_messages(state))
+                tool_calls = response.tool_calls
+            if not tool_calls:
                 state["tool_result"] = None
                 state["tool_used"] = None
                 return state
 
-            tool_results = []
-            for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-                logger.info("Calling tool: %s args=%s", tool_name, tool_args)
-
-                tool_fn = self.tool_map.get(tool_name)
-                if tool_fn is None:
-                    tool_results.append({"tool": tool_name, "error": f"工具不存在: {tool_name}"})
-                    continue
-
-                try:
-                    result = await tool_fn.ainvoke(tool_args)
-                    tool_results.append({"tool": tool_name, "result": result})
-                    logger.info("Tool call succeeded: %s", tool_name)
-                except Exception as exc:
-                    logger.error("Tool call failed: %s error=%s", tool_name, exc)
-                    tool_results.append({"tool": tool_name, "error": str(exc)})
+            # 同一次回复里的工具调用彼此独立，并发执行，结果保持模型给出的顺序
+            outcomes = await get_tool_executor().run(
+                tool_calls,
+                self.tool_map,
+                config=tool_invocation_config(state.get("execution_context")),
+            )
+            tool_results = [
+                {"tool": outcome.name, "result": outcome.result}
+                if outcome.ok
+                else {"tool": outcome.name, "error": outcome.error}
+                for outcome in outcomes
+            ]
 
             state["tool_result"] = tool_results
-            state["tool_used"] = ", ".join(tool_call["name"] for tool_call in response.tool_calls)
+            state["tool_used"] = ", ".join(tool_call["name"] for tool_call in tool_calls)
         except Exception as exc:
             logger.error("Function calling failed: %s", exc, exc_info=True)
             state["tool_result"] = None
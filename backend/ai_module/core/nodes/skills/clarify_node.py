@@ -4,7 +4,7 @@
 from __future__ import annotations
 
 from ai_module.core.nodes.common.base import BaseNode
-from ai_module.core.memory_builder import MemoryContextBuilder
+from ai_module.core.prompt_context import prompt_context
 from ai_module.core.state import ConversationState
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -14,7 +14,7 @@ class ClarifyNode(BaseNode):
 
     def __init__(self, llm=None):
         super().__init__(llm=llm)
-        self.memory_builder = MemoryContextBuilder()
+        self.prompt_context = prompt_context
     
     async def execute(self, state: ConversationState) -> ConversationState:
         """执行意图澄清"""
@@ -34,10 +34,7 @@ class ClarifyNode(BaseNode):
         response = await self.llm.ainvoke(
             prompt.format_messages(
                 message=state["user_message"],
-                short_term_memory=self.memory_builder.build_short_term_memory_text(
-                    state,
-                    include_task_snapshot=True,
-                ),
+                short_term_memory=self.prompt_context.short_term_memory(state, consumer="clarify"),
             )
         )
 
@@ -61,10 +58,7 @@ class ClarifyNode(BaseNode):
 
         messages = prompt.format_messages(
             message=state["user_message"],
-            short_term_memory=self.memory_builder.build_short_term_memory_text(
-                state,
-                include_task_snapshot=True,
-            ),
+            short_term_memory=self.prompt_context.short_term_memory(state, consumer="clarify"),
         )
 
         full_response = ""
@@ -4,6 +4,7 @@ from __future__ import annotations
 from typing import AsyncIterator
 
 from ...state import ConversationState
+from ...streaming import StreamChunk
 
 from .base_step_node import TopicAdvisorStepNode
 
@@ -12,6 +13,6 @@ class TopicAdvisorExecuteNode(TopicAdvisorStepNode):
     async def execute(self, state: ConversationState) -> ConversationState:
         return await self.service.run_agent(state)
 
-    async def execute_stream(self, state: ConversationState) -> AsyncIterator[str]:
-        async for token in self.service.run_agent_stream(state):
-            yield token
+    async def execute_stream(self, state: ConversationState) -> AsyncIterator[StreamChunk]:
+        async for chunk in self.service.run_agent_stream(state):
+            yield chunk
@@ -1,13 +1,10 @@
 """意图识别节点。"""
 from __future__ import annotations
 
-import hashlib
-import json
 import logging
-import re
 from collections import Counter
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Mapping, Sequence
 
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -21,17 +18,15 @@ from ai_module.core.constants import (
     DIALOGUE_ACT_RESUME_TASK,
     INTENT_DOCUMENT_ANALYSIS,
     INTENT_QA,
-    INTENT_RECOMMEND,
 )
+from ai_module.core.keyword_automaton import turn_features
 from ai_module.core.state import ConversationState
+from ai_module.core.turn_analysis import current_turn_analysis
 from ai_module.core.nodes.common.base import BaseNode
 
-logger = logging.getLogger(__name__)
+from services.llm_response_cache import with_response_cache
 
-_SMALLTALK_RE = re.compile(
-    r"^(你好|您好|hello|hi|在吗|哈喽|谢谢|感谢|好的|ok|再见|拜拜|早上好|晚上好)[!！。.?？]*$",
-    re.IGNORECASE,
-)
+logger = logging.getLogger(__name__)
 
 
 def _format_intent_history(intent_history: List[dict], max_entries: int) -> str:
@@ -58,9 +53,6 @@ def _find_fallback_intent(intent_history: List[dict], threshold: float) -> str |
 class IntentRecognitionNode(BaseNode):
     """带运行时可配置提示词和标签的兜底意图分类器。"""
 
-    _intent_cache: Dict[str, Dict[str, float | str]] = {}
-    _cache_max_size = 1000
-
     def __init__(self, llm=None, runtime=None):
         super().__init__(llm=llm, runtime=runtime)
 
@@ -69,7 +61,7 @@ class IntentRecognitionNode(BaseNode):
             return list(DEFAULT_INTENT_LABELS)
         return self.runtime.get_intent_labels()
 
-    def _get_intent_rules(self) -> Dict[str, List[str]]:
+    def _get_intent_rules(self) -> Mapping[str, Sequence[str]]:
         if self.runtime is None:
             return {intent: list(keywords) for intent, keywords in DEFAULT_INTENT_RULES.items()}
         return self.runtime.get_intent_rules()
@@ -80,6 +72,16 @@ class IntentRecognitionNode(BaseNode):
         return self.runtime.get_intent_examples()
 
     def _build_prompt_template(self, include_history: bool) -> ChatPromptTemplate:
+        # 模板只由业务包快照决定，按快照缓存，热更新后随新快照重建
+        get_compiled = getattr(self.runtime, "get_compiled", None)
+        if get_compiled is None:
+            return self._compile_prompt_template(include_history)
+        return get_compiled(
+            ("intent_prompt", include_history),
+            lambda: self._compile_prompt_template(include_history),
+        )
+
+    def _compile_prompt_template(self, include_history: bool) -> ChatPromptTemplate:
         if self.runtime is not None:
             prompt_key = "intent_history_system_prompt" if include_history else "intent_system_prompt"
             configured = self.runtime.get_prompt(prompt_key)
@@ -109,15 +111,6 @@ class IntentRecognitionNode(BaseNode):
             f"可选标签：{label_text}",
         ]
 
-        if include_history:
-            system_parts.extend(
-                [
-                    "",
-                    "最近的意图历史（从旧到新）：",
-                    "{intent_history}",
-                ]
-            )
-
         system_parts.extend(
             [
                 "",
@@ -134,30 +127,34 @@ class IntentRecognitionNode(BaseNode):
         if example_lines:
             system_parts.extend(["", "示例：", "\n".join(example_lines)])
 
-        messages = [("system", "\n".join(system_parts)), ("human", "{message}")]
+        # 意图历史每轮都在变，放进用户消息，系统提示词保持按业务包不变，便于命中前缀缓存
+        human = "最近的意图历史（从旧到新）：\n{intent_history}\n\n用户消息：{message}" if include_history else "{message}"
+        messages = [("system", "\n".join(system_parts)), ("human", human)]
         return ChatPromptTemplate.from_messages(messages)
 
     def _match_by_rules(self, message: str) -> tuple[str, float] | None:
-        text = message.strip()
-        if _SMALLTALK_RE.match(text):
-            logger.info("Rule matched smalltalk intent=qa")
-            return INTENT_QA, 0.99
-
-        if re.search(r"(毕设|毕业设计|课设|选题)", text, re.IGNORECASE):
-            logger.info("Rule matched graduation-project intent=recommend")
-            return INTENT_RECOMMEND, 0.98
-
-        if re.search(r"(找|要|想做|需要).*(项目|源码)", text, re.IGNORECASE):
-            logger.info("Rule matched project-seeking intent=recommend")
-            return INTENT_RECOMMEND, 0.95
-
-        message_lower = text.lower()
-        for intent, keywords in self._get_intent_rules().items():
-            for keyword in keywords:
-                if keyword and keyword.lower() in message_lower:
-                    logger.info("Rule matched intent=%s keyword=%s", intent, keyword)
-                    return intent, 0.95
-        return None
+        # 规则、能力关键词和正则线索已按业务包编译成一个自动机，同一轮内各调用方复用同一份扫描结果
+        match = turn_features(message, runtime=self.runtime).rule_match()
+        if match is None:
+            return None
+        intent, confidence, matched_on = match
+        logger.info("Rule matched intent=%s on=%s", intent, matched_on)
+        return intent, confidence
+
+    def _match_by_classifier(self, message: str) -> tuple[str, float] | None:
+        # 本地分类器的校准置信度达到阈值才采用，否则交给 LLM
+        get_classifier = getattr(self.runtime, "get_intent_classifier", None)
+        classifier = get_classifier() if get_classifier is not None else None
+        if classifier is None:
+            return None
+        prediction = classifier.predict(message)
+        if prediction.intent not in self._get_valid_intents():
+            return None
+        if prediction.confidence < settings.INTENT_CLASSIFIER_THRESHOLD:
+            logger.debug("Classifier below threshold intent=%s confidence=%.2f", prediction.intent, prediction.confidence)
+            return None
+        logger.info("Classifier matched intent=%s confidence=%.2f", prediction.intent, prediction.confidence)
+        return prediction.intent, prediction.confidence
 
     def _append_intent_history(
         self,
@@ -177,35 +174,6 @@ class IntentRecognitionNode(BaseNode):
         ]
         state["intent_history"] = updated_history
 
-    def _build_cache_key(self, state: ConversationState, user_message: str) -> str:
-        attachment_signature = []
-        for attachment in state.get("attachments") or []:
-            attachment_signature.append(
-                {
-                    "file_id": attachment.get("file_id"),
-                    "file_type": attachment.get("file_type"),
-                    "image_intent": attachment.get("image_intent"),
-                }
-            )
-
-        history_signature = []
-        for entry in (state.get("intent_history") or [])[-settings.INTENT_HISTORY_SIZE:]:
-            history_signature.append(
-                {
-                    "intent": entry.get("intent"),
-                    "confidence": round(float(entry.get("confidence", 0.0)), 2),
-                }
-            )
-
-        payload = {
-            "business_id": state.get("business_id") or "default",
-            "message": user_message.lower(),
-            "attachments": attachment_signature,
-            "history": history_signature,
-            "valid_intents": self._get_valid_intents(),
-        }
-        return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
-
     async def execute(self, state: ConversationState) -> ConversationState:
         valid_intents = set(self._get_valid_intents())
         has_attachments = bool(state.get("attachments"))
@@ -279,17 +247,21 @@ class IntentRecognitionNode(BaseNode):
             self._append_intent_history(state, intent_history, rule_result[0], rule_result[1])
             return state
 
-        cache_key = self._build_cache_key(state, user_message)
-        cached = self._intent_cache.get(cache_key)
-        if cached:
-            state["intent"] = cached["intent"]
-            state["confidence"] = cached["confidence"]
-            self._append_intent_history(
-                state,
-                intent_history,
-                cached["intent"],
-                cached["confidence"],
-            )
+        classifier_result = self._match_by_classifier(user_message)
+        if classifier_result:
+            state["intent"] = classifier_result[0]
+            state["confidence"] = classifier_result[1]
+            self._append_intent_history(state, intent_history, classifier_result[0], classifier_result[1])
+            return state
+
+        # 流程中的切换请求复用入口节点合并调用里的全局意图，不再单独调用一次 LLM
+        merged = current_turn_analysis()
+        analysis = await merged.get() if merged is not None else None
+        if analysis is not None and analysis.global_intent in valid_intents:
+            confidence = analysis.global_intent_confidence or 0.9
+            state["intent"] = analysis.global_intent
+            state["confidence"] = confidence
+            self._append_intent_history(state, intent_history, analysis.global_intent, confidence)
             return state
 
         try:
@@ -302,7 +274,8 @@ class IntentRecognitionNode(BaseNode):
             else:
                 messages = template.format_messages(message=user_message[:200])
 
-            response = await self.llm.ainvoke(messages)
+            # 相同提示词（消息 + 意图历史 + 业务标签）的分类结果跨 worker 复用
+            response = await with_response_cache(self.llm, "intent").ainvoke(messages)
             raw = response.content.strip().strip("\"'")
 
             intent = INTENT_QA
@@ -334,13 +307,4 @@ class IntentRecognitionNode(BaseNode):
             state["confidence"],
         )
 
-        if len(self._intent_cache) >= self._cache_max_size:
-            keys_to_remove = list(self._intent_cache.keys())[: self._cache_max_size // 2]
-            for key in keys_to_remove:
-                del self._intent_cache[key]
-
-        self._intent_cache[cache_key] = {
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-        }
         return state
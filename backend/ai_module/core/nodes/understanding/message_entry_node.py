@@ -20,8 +20,10 @@ from typing import Any, Dict, List, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 
+from config import settings
 from ai_module.core.capability_registry import find_unsupported_capability
 from ai_module.core.domain_scope import looks_out_of_business_scope
+from ai_module.core.keyword_automaton import get_keyword_matcher, turn_features
 from ai_module.core.nodes.common.base import BaseNode
 from ai_module.core.nodes.understanding.intent_node import IntentRecognitionNode
 from ai_module.core.nodes.understanding.turn_understanding_node import TurnUnderstandingNode
@@ -49,6 +51,7 @@ from ai_module.core.constants import (
     RESPONSE_MODE_ANSWER_THEN_RESUME,
 )
 from ai_module.core.state import ConversationState
+from ai_module.core.turn_analysis import MergedTurnAnalysis, current_turn_analysis, merged_turn_analysis
 
 logger = logging.getLogger(__name__)
 
@@ -178,7 +181,7 @@ class MessageEntryNode(BaseNode):
         self.global_intent_classifier._append_intent_history(state, intent_history, intent, confidence)
 
     def _has_supported_business_signal(self, message: str) -> bool:
-        rule_result = self.global_intent_classifier._match_by_rules(message or "")
+        rule_result = turn_features(message or "", runtime=self.runtime).rule_match()
         return bool(rule_result and rule_result[0] != INTENT_QA)
 
     def _looks_out_of_business_scope(self, state: ConversationState) -> bool:
@@ -224,6 +227,7 @@ class MessageEntryNode(BaseNode):
             state.get("user_message", ""),
             features=features if isinstance(features, dict) else {},
             config=config if isinstance(config, dict) else {},
+            matcher=get_keyword_matcher(self.runtime),
         )
 
     def _build_unsupported_capability_state(
@@ -325,6 +329,12 @@ class MessageEntryNode(BaseNode):
         if self.llm is None:
             return None
 
+        merged = current_turn_analysis()
+        if merged is not None:
+            analysis = await merged.get()
+            if analysis is not None:
+                return analysis.inflow()
+
         prompt = self._build_inflow_prompt()
         payload = {
             "message": state.get("user_message"),
@@ -520,7 +530,58 @@ class MessageEntryNode(BaseNode):
             self._append_preselected_intent(state, active_flow, confidence)
         return state
 
+    def _build_turn_analysis(
+        self,
+        state: ConversationState,
+        *,
+        active_flow: Optional[str],
+        current_step: Optional[str],
+        expected_user_acts: List[str],
+    ) -> Optional[MergedTurnAnalysis]:
+        if self.llm is None or not settings.TURN_MERGED_UNDERSTANDING_ENABLED:
+            return None
+
+        def build_payload() -> Dict[str, Any]:
+            # 第一次需要 LLM 时才构造，规则阶段写入的对话动作和槽位作为初步判断
+            return {
+                "message": state.get("user_message"),
+                "active_flow": active_flow,
+                "current_step": current_step,
+                "pending_action": state.get("pending_action"),
+                "pending_question": state.get("pending_question"),
+                "expected_user_acts": expected_user_acts,
+                "last_intent": state.get("last_intent"),
+                "last_quick_actions_count": len(state.get("last_quick_actions") or []),
+                "recent_history": self._format_recent_history(state.get("conversation_history") or []),
+                "task_snapshot": self.memory_builder.build_task_snapshot_text(state),
+                "rule_guess": {
+                    "dialogue_act": state.get("dialogue_act"),
+                    "domain_intent": state.get("domain_intent"),
+                    "self_contained_request": bool(state.get("self_contained_request")),
+                    "continue_previous_task": bool(state.get("continue_previous_task")),
+                    "slot_updates": state.get("slot_updates") or {},
+                },
+            }
+
+        return MergedTurnAnalysis(
+            self.llm,
+            build_payload=build_payload,
+            valid_intents=self.inflow_understanding._get_valid_intents(),
+            runtime=self.runtime,
+        )
+
     async def _run_inflow_classifier(self, state: ConversationState) -> ConversationState:
+        # 轮次理解、流程内分类和切换时的全局意图共用一次合并的 LLM 调用
+        session = self._build_turn_analysis(
+            state,
+            active_flow=state.get("active_flow"),
+            current_step=state.get("current_step"),
+            expected_user_acts=state.get("expected_user_acts") or [],
+        )
+        with merged_turn_analysis(session):
+            return await self._classify_inflow(state)
+
+    async def _classify_inflow(self, state: ConversationState) -> ConversationState:
         active_flow = state.get("active_flow")
         current_step = state.get("current_step")
         expected_user_acts = state.get("expected_user_acts") or []
@@ -12,10 +12,11 @@ from __future__ import annotations
 import json
 import logging
 import re
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Sequence
 
 from langchain_core.prompts import ChatPromptTemplate
 
+from config import settings
 from ai_module.core.nodes.common.base import BaseNode
 from ai_module.core.memory_builder import MemoryContextBuilder
 from ai_module.core.constants import (
@@ -32,6 +33,7 @@ from ai_module.core.constants import (
     INTENT_QA,
 )
 from ai_module.core.state import ConversationState
+from ai_module.core.turn_analysis import current_turn_analysis
 
 logger = logging.getLogger(__name__)
 
@@ -168,7 +170,7 @@ class TurnUnderstandingNode(BaseNode):
 
         return updates
 
-    def _get_intent_rules(self) -> Dict[str, List[str]]:
+    def _get_intent_rules(self) -> Mapping[str, Sequence[str]]:
         if self.runtime is None:
             return {intent: list(keywords) for intent, keywords in DEFAULT_INTENT_RULES.items()}
         return self.runtime.get_intent_rules()
@@ -195,6 +197,18 @@ class TurnUnderstandingNode(BaseNode):
 
         return max(scores.items(), key=lambda item: item[1])[0]
 
+    def _classify_intent(self, message: str) -> Optional[str]:
+        get_classifier = getattr(self.runtime, "get_intent_classifier", None)
+        classifier = get_classifier() if get_classifier is not None else None
+        if classifier is None:
+            return None
+        prediction = classifier.predict(message)
+        if prediction.intent not in self._get_valid_intents():
+            return None
+        if prediction.confidence < settings.INTENT_CLASSIFIER_THRESHOLD:
+            return None
+        return prediction.intent
+
     def _looks_like_explicit_request(self, message: str) -> bool:
         return bool(_REQUEST_FRAME_RE.search(message) or self._match_explicit_intent_signal(message))
 
@@ -204,6 +218,13 @@ class TurnUnderstandingNode(BaseNode):
         return self.runtime.get_intent_labels()
 
     def _build_prompt_template(self) -> ChatPromptTemplate:
+        # 模板只由业务包快照决定，按快照缓存，热更新后随新快照重建
+        get_compiled = getattr(self.runtime, "get_compiled", None)
+        if get_compiled is None:
+            return self._compile_prompt_template()
+        return get_compiled("turn_understanding_prompt", self._compile_prompt_template)
+
+    def _compile_prompt_template(self) -> ChatPromptTemplate:
         if self.runtime is not None:
             configured = self.runtime.get_prompt("turn_understanding_system_prompt")
             if configured:
@@ -328,6 +349,21 @@ class TurnUnderstandingNode(BaseNode):
         need_clarification: bool,
         slot_updates: Dict[str, Any],
     ) -> Optional[Dict[str, Any]]:
+        rule_guess = {
+            "dialogue_act": dialogue_act,
+            "domain_intent": domain_intent,
+            "self_contained_request": self_contained_request,
+            "continue_previous_task": continue_previous_task,
+            "need_clarification": need_clarification,
+            "slot_updates": slot_updates,
+        }
+        # 流程中的轮次由入口节点合并为一次调用，同一份结果还会供流程内分类和全局意图使用
+        merged = current_turn_analysis()
+        if merged is not None:
+            analysis = await merged.get(rule_guess=rule_guess)
+            if analysis is not None:
+                return analysis.understanding()
+
         try:
             prompt = self._build_prompt_template()
             payload = {
@@ -339,14 +375,7 @@ class TurnUnderstandingNode(BaseNode):
                 "last_quick_actions_count": len(state.get("last_quick_actions") or []),
                 "recent_history": self._format_recent_history(state.get("conversation_history") or []),
                 "task_snapshot": self.memory_builder.build_task_snapshot_text(state),
-                "rule_guess": {
-                    "dialogue_act": dialogue_act,
-                    "domain_intent": domain_intent,
-                    "self_contained_request": self_contained_request,
-                    "continue_previous_task": continue_previous_task,
-                    "need_clarification": need_clarification,
-                    "slot_updates": slot_updates,
-                },
+                "rule_guess": rule_guess,
                 "valid_intents": self._get_valid_intents(),
             }
             response = await self.llm.ainvoke(
@@ -549,6 +578,15 @@ class TurnUnderstandingNode(BaseNode):
         else:
             understanding_confidence = 0.6
 
+        # 独立的新请求只缺业务意图时，本地分类器有把握就不再调用 LLM
+        if (
+            explicit_intent is None
+            and dialogue_act == DIALOGUE_ACT_NEW_REQUEST
+            and self_contained_request
+            and not need_clarification
+        ):
+            explicit_intent = self._classify_intent(message)
+
         llm_result = None
         if self._should_use_llm(
             message=message,
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 
 @dataclass
@@ -58,3 +58,6 @@ class HandlerRegistry:
 
     def has(self, name: str) -> bool:
         return name in self._handlers
+
+    def names(self) -> List[str]:
+        return list(self._handlers)
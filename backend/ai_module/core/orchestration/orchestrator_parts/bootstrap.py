@@ -1,8 +1,11 @@
 """Bootstrap mixin for node/workflow factories and registry wiring."""
 from __future__ import annotations
 
+import logging
 from importlib import import_module
-from typing import Any
+from typing import Any, List
+
+logger = logging.getLogger(__name__)
 
 
 class WorkflowBootstrapMixin:
@@ -31,6 +34,28 @@ class WorkflowBootstrapMixin:
             stream_enabled=True,
         )
 
+    def warm_up(self) -> List[str]:
+        """Instantiate every lazily registered handler and workflow package.
+
+        Called from the startup orchestrator so the first request does not pay
+        for module imports and node construction. Failures are logged and the
+        entry stays lazy.
+        """
+        warmed: List[str] = []
+        for name in self.handlers.names():
+            try:
+                self.handlers.get(name)
+                warmed.append(name)
+            except Exception as exc:
+                logger.warning("Handler %s warm-up failed: %s", name, exc)
+        for name in self.workflows.names():
+            try:
+                self.workflows.get(name)
+                warmed.append(f"workflow:{name}")
+            except Exception as exc:
+                logger.warning("Workflow %s warm-up failed: %s", name, exc)
+        return warmed
+
     def _get_or_create_node(self, key: str, factory):
         node = self._lazy_nodes.get(key)
         if node is None:
@@ -1,14 +1,40 @@
 """Public entrypoint mixin for AIWorkflow."""
 from __future__ import annotations
 
+from contextlib import nullcontext
 from datetime import datetime
 
+from services.telemetry import span
+
 from ...constants import INTENT_QA
+from ...prompt_context import finalize_prompt_context
+from ...speculation import finalize_speculation
+from ..turn_sequencer import get_turn_sequencer
+
+
+async def _drain(events) -> None:
+    async for _ in events:
+        pass
 
 
 class WorkflowEntrypointsMixin:
     """Request-level entrypoint methods."""
 
+    def _get_turn_sequencer(self):
+        return get_turn_sequencer()
+
+    def _track_turn(self):
+        # 登记到所属运行时，业务包热更新替换运行时后据此等待旧轮次排空
+        track_turn = getattr(self.runtime, "track_turn", None)
+        return track_turn() if track_turn is not None else nullcontext()
+
+    @staticmethod
+    def _coalesced_result(leader_result, owns_reply: bool = False) -> dict:
+        result = dict(leader_result or {})
+        # leader 断开后接手的 follower 按普通轮次返回并保存回复
+        result["coalesced"] = not owns_reply
+        return result
+
     async def process_message(
         self,
         user_id: str,
@@ -18,27 +44,93 @@ class WorkflowEntrypointsMixin:
         purchase_flow=None,
         aftersales_flow=None,
     ):
-        start_time = datetime.now()
-        if purchase_flow or aftersales_flow:
-            final_state = await self._load_context_only(
-                user_id=user_id,
-                session_id=session_id,
-                message=message,
-                attachments=attachments,
-                purchase_flow=purchase_flow,
-                aftersales_flow=aftersales_flow,
+        with self._track_turn():
+            return await self._process_message(
+                user_id, session_id, message, attachments, purchase_flow, aftersales_flow
             )
-            final_state = await self.generate_response(final_state)
-        else:
-            prepared_state = await self.prepare_intent(
-                user_id=user_id,
-                session_id=session_id,
-                message=message,
-                attachments=attachments,
+
+    async def _process_message(
+        self,
+        user_id: str,
+        session_id: str,
+        message: str,
+        attachments=None,
+        purchase_flow=None,
+        aftersales_flow=None,
+    ):
+        sequencer = self._get_turn_sequencer()
+        if sequencer is None:
+            return await self._process_turn(
+                user_id, session_id, message, attachments, purchase_flow, aftersales_flow
+            )
+
+        async with sequencer.turn(
+            session_id,
+            message,
+            attachments,
+            exclusive=bool(purchase_flow or aftersales_flow),
+        ) as turn:
+            if not turn.is_leader:
+                # 消息已并入同会话正在收集的轮次，直接复用该轮结果
+                leader_result = await turn.wait_result()
+                return self._coalesced_result(leader_result, turn.owns_reply)
+
+            work = self._lead_turn(
+                turn, user_id, session_id, turn.attachments or attachments, purchase_flow, aftersales_flow
             )
-            final_state = await self.generate_response(prepared_state)
+            if not turn.shared:
+                return await work
+            # 有 follower 时本轮在独立任务里执行，leader 被取消也会跑完并交给 follower
+            task = turn.share(work)
+            try:
+                return await turn.wait_result()
+            finally:
+                await turn.settle(task)
+
+    async def _lead_turn(self, turn, user_id, session_id, attachments, purchase_flow, aftersales_flow):
+        final_state = await self._process_turn(
+            user_id, session_id, turn.message, attachments, purchase_flow, aftersales_flow
+        )
+        final_state["coalesced_messages"] = turn.coalesced_count
+        turn.set_result(final_state)
+        return final_state
+
+    async def _process_turn(
+        self,
+        user_id: str,
+        session_id: str,
+        message: str,
+        attachments=None,
+        purchase_flow=None,
+        aftersales_flow=None,
+    ):
+        start_time = datetime.now()
+        with span("turn", stage="turn"):
+            if purchase_flow or aftersales_flow:
+                final_state = await self._load_context_only(
+                    user_id=user_id,
+                    session_id=session_id,
+                    message=message,
+                    attachments=attachments,
+                    purchase_flow=purchase_flow,
+                    aftersales_flow=aftersales_flow,
+                )
+                final_state = await self.generate_response(final_state)
+            else:
+                prepared_state = await self.prepare_intent(
+                    user_id=user_id,
+                    session_id=session_id,
+                    message=message,
+                    attachments=attachments,
+                )
+                try:
+                    with span("generate_response", stage="pipeline"):
+                        final_state = await self.generate_response(prepared_state)
+                finally:
+                    finalize_speculation(prepared_state)
 
         final_state["processing_time"] = (datetime.now() - start_time).total_seconds()
+        finalize_prompt_context(final_state)
         return final_state
 
     async def process_message_stream(
@@ -50,30 +142,112 @@ class WorkflowEntrypointsMixin:
         purchase_flow=None,
         aftersales_flow=None,
     ):
-        start_time = datetime.now()
+        with self._track_turn():
+            async for event in self._process_message_stream(
+                user_id, session_id, message, attachments, purchase_flow, aftersales_flow
+            ):
+                yield event
 
-        if purchase_flow or aftersales_flow:
-            state = await self._load_context_only(
-                user_id=user_id,
-                session_id=session_id,
-                message=message,
-                attachments=attachments,
-                purchase_flow=purchase_flow,
-                aftersales_flow=aftersales_flow,
-            )
-            intent = (
-                state.get("intent")
-                or (state.get("active_task") or {}).get("intent")
-                or state.get("last_intent")
-                or INTENT_QA
-            )
-        else:
-            state = await self.prepare_intent(user_id, session_id, message, attachments)
-            intent = state.get("intent", INTENT_QA)
+    async def _process_message_stream(
+        self,
+        user_id,
+        session_id,
+        message,
+        attachments=None,
+        purchase_flow=None,
+        aftersales_flow=None,
+    ):
+        sequencer = self._get_turn_sequencer()
+        if sequencer is None:
+            async for event in self._process_turn_stream(
+                user_id, session_id, message, attachments, purchase_flow, aftersales_flow
+            ):
+                yield event
+            return
+
+        async with sequencer.turn(
+            session_id,
+            message,
+            attachments,
+            exclusive=bool(purchase_flow or aftersales_flow),
+        ) as turn:
+            if not turn.is_leader:
+                # 消息已并入同会话的轮次，转发该轮的事件。只在 intent / end 上带 coalesced 标记，
+                # 内容增量保持原样以便 SSE 合并写出；回复由 leader 保存，leader 断开后由接手的 follower 保存
+                async for event in turn.relay():
+                    if event.get("type") in ("intent", "end"):
+                        event = {**event, "coalesced": not turn.owns_reply}
+                    yield event
+                return
 
-        yield {"type": "intent", "intent": intent}
+            events = self._lead_turn_stream(
+                turn, user_id, session_id, turn.attachments or attachments, purchase_flow, aftersales_flow
+            )
+            if not turn.shared:
+                async for event in events:
+                    yield event
+                return
+            # 有 follower 时本轮在独立任务里执行，leader 的客户端断开也会跑完并交给 follower
+            task = turn.share(_drain(events))
+            try:
+                async for event in turn.relay():
+                    yield event
+            finally:
+                await turn.settle(task)
 
-        async for event in self.generate_response_stream(state):
-            if event.get("type") == "end":
-                event["processing_time"] = (datetime.now() - start_time).total_seconds()
+    async def _lead_turn_stream(self, turn, user_id, session_id, attachments, purchase_flow, aftersales_flow):
+        end_event = {}
+        async for event in self._process_turn_stream(
+            user_id, session_id, turn.message, attachments, purchase_flow, aftersales_flow
+        ):
+            if event.get("type") == "intent":
+                end_event["intent"] = event.get("intent")
+            elif event.get("type") == "end":
+                event["coalesced_messages"] = turn.coalesced_count
+                end_event.update(event)
+            turn.publish(event)
             yield event
+        turn.set_result(end_event)
+
+    async def _process_turn_stream(
+        self,
+        user_id,
+        session_id,
+        message,
+        attachments=None,
+        purchase_flow=None,
+        aftersales_flow=None,
+    ):
+        start_time = datetime.now()
+
+        with span("turn_stream", stage="turn"):
+            if purchase_flow or aftersales_flow:
+                state = await self._load_context_only(
+                    user_id=user_id,
+                    session_id=session_id,
+                    message=message,
+                    attachments=attachments,
+                    purchase_flow=purchase_flow,
+                    aftersales_flow=aftersales_flow,
+                )
+                intent = (
+                    state.get("intent")
+                    or (state.get("active_task") or {}).get("intent")
+                    or state.get("last_intent")
+                    or INTENT_QA
+                )
+            else:
+                state = await self.prepare_intent(user_id, session_id, message, attachments)
+                intent = state.get("intent", INTENT_QA)
+
+            try:
+                yield {"type": "intent", "intent": intent}
+
+                async for event in self.generate_response_stream(state):
+                    if event.get("type") == "end":
+                        event["processing_time"] = (datetime.now() - start_time).total_seconds()
+                        finalize_prompt_context(state)
+                    yield event
+            finally:
+                # 流被中断时同样要取消未认领的预取任务
+                finalize_speculation(state)
@@ -7,6 +7,7 @@ from typing import Dict, Optional
 
 from ...constants import INTENT_RECOMMEND
 from ...state import ConversationState
+from ...streaming import as_stream_event
 
 logger = logging.getLogger(__name__)
 
@@ -81,8 +82,8 @@ class WorkflowExecuteMixin:
         try:
             stream_workflow = self.workflows.get_stream(workflow_name)
             if stream_workflow is not None:
-                async for token in stream_workflow.execute_stream(state):
-                    yield {"type": "content", "delta": token}
+                async for chunk in stream_workflow.execute_stream(state):
+                    yield as_stream_event(chunk)
             else:
                 result_state = await workflow.execute(state)
                 state.update(result_state)
@@ -253,8 +254,8 @@ class WorkflowExecuteMixin:
         stream_node = self.handlers.get_stream(route)
         if stream_node is not None:
             try:
-                async for token in stream_node.execute_stream(state):
-                    yield {"type": "content", "delta": token}
+                async for chunk in stream_node.execute_stream(state):
+                    yield as_stream_event(chunk)
             except Exception as exc:
                 logger.error("Streaming node %s failed: %s", route, exc, exc_info=True)
                 state["response"] = "抱歉，处理您的请求时出现了问题，请稍后再试。"
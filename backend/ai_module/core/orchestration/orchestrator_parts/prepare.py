@@ -4,7 +4,10 @@ from __future__ import annotations
 import logging
 import time
 
+from services.telemetry import bind_trace_state, span
+
 from ...constants import CONTROL_RESPONSE_MODES
+from ...speculation import get_speculative_prefetcher
 from ...state import ConversationState
 
 logger = logging.getLogger(__name__)
@@ -24,6 +27,12 @@ class WorkflowPrepareMixin:
         confidence = float(state.get("confidence") or 0.0)
         return not state.get("intent") and confidence < 0.6
 
+    def _start_speculation(self, state: ConversationState) -> None:
+        """意图识别期间提前启动可能用到的检索/查询，由路由后的处理器认领。"""
+        prefetcher = get_speculative_prefetcher()
+        if prefetcher is not None:
+            prefetcher.start(state)
+
     async def _load_context_only(
         self,
         user_id: str,
@@ -41,6 +50,7 @@ class WorkflowPrepareMixin:
             purchase_flow=purchase_flow,
             aftersales_flow=aftersales_flow,
         )
+        bind_trace_state(state)
         return await self.context_node.execute(state)
 
     async def _run_prepare_pipeline(self, state: ConversationState) -> ConversationState:
@@ -51,6 +61,8 @@ class WorkflowPrepareMixin:
         state = await self.context_node.execute(state)
         logger.info("context_node completed in %.2fs", time.time() - t0)
 
+        self._start_speculation(state)
+
         t0 = time.time()
         state = await self.message_entry_node.execute(state)
         logger.info(
@@ -127,4 +139,7 @@ class WorkflowPrepareMixin:
             purchase_flow=purchase_flow,
             aftersales_flow=aftersales_flow,
         )
-        return await self._run_prepare_pipeline(state)
+        # 本轮后续的 span 都从这份状态读取 business_id / intent / route
+        bind_trace_state(state)
+        with span("prepare_intent", stage="pipeline"):
+            return await self._run_prepare_pipeline(state)
@@ -46,6 +46,8 @@ class WorkflowStateMixin:
             "task_stack": [],
             "pending_question": None,
             "pending_action": None,
+            "retrieved_memories": None,
+            "prompt_metrics": None,
             "entry_classifier": None,
             "has_active_flow": False,
             "active_flow": None,
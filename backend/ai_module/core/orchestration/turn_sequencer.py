@@ -0,0 +1,372 @@
+"""
+会话级轮次排序器。
+
+同一会话的消息按到达顺序逐轮处理：进程内用 ``asyncio.Lock`` 排队，
+跨进程用 Redis 锁互斥，避免并发请求对会话上下文做读改写时相互覆盖。
+锁在轮次执行期间按 TTL 的三分之一定期续期，长时间的流式回复不会中途失去互斥。
+
+会话已有轮次在执行或排队时，新消息先等待合并窗口，期间连续到达的消息
+（如“在吗”/“我想退款”/“订单号…”）合并为一轮，只跑一次工作流；
+空闲会话的消息立即执行，不额外等待。被合并的请求（follower）通过
+``TurnTicket.relay`` 收到与 leader 相同的事件流。
+
+有 follower 的轮次在独立任务里执行（``TurnTicket.share``）：leader 的客户端断开时不取消工作流，
+改由第一个仍在等待的 follower 接手保存回复，leader 等本轮执行完再以 ``TurnHandedOff`` 退出。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class TurnHandedOff(asyncio.CancelledError):
+    """leader 的请求已取消，但本轮已交给 follower 继续执行并保存回复。"""
+
+
+@dataclass
+class _TurnBatch:
+    """一轮待处理的消息集合，由首条消息的请求（leader）负责执行。"""
+
+    messages: List[str] = field(default_factory=list)
+    attachments: List[Dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+    closed: asyncio.Event = field(default_factory=asyncio.Event)
+    done: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+    followers: int = 0
+    coalesce: bool = True
+    events: List[Any] = field(default_factory=list)
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+    # 负责保存回复的请求：0 为 leader，follower 按加入顺序从 1 编号；None 表示已无人等待
+    owner: Optional[int] = 0
+    departed: Set[int] = field(default_factory=set)
+
+    def add(self, message: str, attachments: Optional[List[Dict[str, Any]]]) -> None:
+        self.messages.append(message or "")
+        if attachments:
+            self.attachments.extend(attachments)
+
+    def notify(self) -> None:
+        # 每次换一个新的 Event，等待中的 follower 都会被唤醒，之后的等待不受影响
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def next_follower(self) -> Optional[int]:
+        return next((position for position in range(1, self.followers + 1) if position not in self.departed), None)
+
+
+@dataclass
+class _SessionQueue:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    pending: Optional[_TurnBatch] = None
+    waiters: int = 0
+
+
+class TurnTicket:
+    """一次请求在排序器中的凭证。
+
+    leader 执行合并后的消息并通过 ``set_result`` 回填结果，流式执行时用 ``publish`` 转发事件；
+    follower 的消息已并入 leader 的轮次，只需 ``wait_result`` 或 ``relay``。
+    """
+
+    def __init__(self, batch: _TurnBatch, is_leader: bool, position: int = 0):
+        self._batch = batch
+        self.is_leader = is_leader
+        self.position = position
+
+    @property
+    def message(self) -> str:
+        return "\n".join(text for text in self._batch.messages if text.strip())
+
+    @property
+    def attachments(self) -> List[Dict[str, Any]]:
+        return list(self._batch.attachments)
+
+    @property
+    def coalesced_count(self) -> int:
+        return len(self._batch.messages)
+
+    @property
+    def shared(self) -> bool:
+        return self._batch.followers > 0
+
+    @property
+    def owns_reply(self) -> bool:
+        """本请求是否负责保存该轮回复；leader 断开后由接手的 follower 负责。"""
+        return self._batch.owner == self.position
+
+    def set_result(self, result: Any) -> None:
+        if not self._batch.done.done():
+            self._batch.done.set_result(result)
+            self._batch.notify()
+
+    async def wait_result(self) -> Any:
+        return await asyncio.shield(self._batch.done)
+
+    def publish(self, event: Any) -> None:
+        """leader 输出的事件，同时转发给本轮所有 follower；没有 follower 时不保留。"""
+        if self._batch.followers:
+            self._batch.events.append(event)
+            self._batch.notify()
+
+    async def relay(self) -> AsyncIterator[Any]:
+        """按顺序产出 leader 发布的事件，直到该轮结束；leader 失败时抛出同样的异常。"""
+        batch = self._batch
+        index = 0
+        while True:
+            changed = batch.changed
+            while index < len(batch.events):
+                yield batch.events[index]
+                index += 1
+            if batch.done.done():
+                break
+            await changed.wait()
+        await self.wait_result()
+
+    def share(self, work: Awaitable[Any]) -> asyncio.Task:
+        """在独立任务里执行有 follower 的轮次，``work`` 负责回填结果；leader 的取消不会传到这里。"""
+        batch = self._batch
+
+        async def run() -> None:
+            try:
+                await work
+            except asyncio.CancelledError:
+                if not batch.done.done():
+                    batch.done.cancel()
+                raise
+            except Exception as exc:
+                if not batch.done.done():
+                    batch.done.set_exception(exc)
+            finally:
+                batch.notify()
+
+        return asyncio.create_task(run())
+
+    async def settle(self, task: asyncio.Task) -> None:
+        """leader 离开共享轮次时调用。
+
+        本轮未结束说明 leader 的请求被取消（客户端断开）：有 follower 在等时把回复交给它，
+        继续持有会话锁直到本轮执行完，然后抛出 ``TurnHandedOff``；已无人等待时取消执行。
+        """
+        batch = self._batch
+        if batch.done.done():
+            await asyncio.wait({task})
+            return
+        owner = batch.next_follower()
+        if owner is None:
+            task.cancel()
+            await asyncio.wait({task})
+            return
+        batch.owner = owner
+        logger.info("Turn leader left, follower %s takes over the reply", owner)
+        await asyncio.shield(task)
+        raise TurnHandedOff()
+
+    def _depart(self) -> None:
+        # follower 在本轮结束前离开；若它正负责保存回复，转交给下一个仍在等待的 follower
+        batch = self._batch
+        batch.departed.add(self.position)
+        if batch.owner == self.position:
+            batch.owner = batch.next_follower()
+
+
+class TurnSequencer:
+    """按会话串行化 AI 轮次，并合并突发消息。"""
+
+    LOCK_KEY_PREFIX = "session:{session_id}:turn_lock"
+
+    def __init__(
+        self,
+        coalesce_window: float = 0.3,
+        lock_ttl_seconds: int = 120,
+        lock_wait_seconds: float = 30.0,
+        cache=None,
+    ):
+        self.coalesce_window = max(0.0, float(coalesce_window))
+        self.lock_ttl_seconds = max(1, int(lock_ttl_seconds))
+        self.lock_wait_seconds = max(0.0, float(lock_wait_seconds))
+        self._cache = cache
+        self._queues: Dict[str, _SessionQueue] = {}
+        self.stats: Dict[str, int] = {"turns": 0, "coalesced_messages": 0, "lock_timeouts": 0}
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from services.redis_cache import redis_cache
+
+            self._cache = redis_cache
+        return self._cache
+
+    def _join(
+        self,
+        session_id: str,
+        message: str,
+        attachments: Optional[List[Dict[str, Any]]],
+        exclusive: bool,
+    ) -> TurnTicket:
+        queue = self._queues.setdefault(session_id, _SessionQueue())
+        # 只有会话已有轮次在执行或排队时才值得等待后续消息
+        busy = queue.lock.locked() or queue.waiters > 0
+        queue.waiters += 1
+        pending = queue.pending
+
+        if pending is not None and not pending.closed.is_set():
+            if not exclusive:
+                pending.add(message, attachments)
+                pending.followers += 1
+                self.stats["coalesced_messages"] += 1
+                return TurnTicket(pending, is_leader=False, position=pending.followers)
+            # 结构化流程（下单/售后）不参与合并，且必须排在已到达的消息之后
+            pending.closed.set()
+
+        batch = _TurnBatch(coalesce=busy)
+        batch.add(message, attachments)
+        if exclusive:
+            batch.closed.set()
+            queue.pending = None
+        else:
+            queue.pending = batch
+        return TurnTicket(batch, is_leader=True)
+
+    def _leave(self, session_id: str) -> None:
+        queue = self._queues.get(session_id)
+        if queue is None:
+            return
+        queue.waiters -= 1
+        if queue.waiters <= 0 and not queue.lock.locked():
+            self._queues.pop(session_id, None)
+
+    async def _acquire_distributed(self, session_id: str) -> Optional[str]:
+        key = self.LOCK_KEY_PREFIX.format(session_id=session_id)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_wait_seconds
+        delay = 0.02
+        while True:
+            try:
+                if await self.cache.acquire_lock(key, token, self.lock_ttl_seconds):
+                    return token
+            except Exception as exc:
+                logger.warning("Turn lock unavailable for session=%s: %s", session_id, exc)
+                return None
+            if time.monotonic() >= deadline:
+                # 宁可放行也不阻塞用户，锁 TTL 会回收异常退出实例持有的锁
+                self.stats["lock_timeouts"] += 1
+                logger.warning("Timed out waiting for turn lock of session=%s", session_id)
+                return None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def _renew_distributed(self, session_id: str, token: str) -> None:
+        key = self.LOCK_KEY_PREFIX.format(session_id=session_id)
+        interval = self.lock_ttl_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await self.cache.extend_lock(key, token, self.lock_ttl_seconds)
+            except Exception as exc:
+                logger.warning("Failed to renew turn lock of session=%s: %s", session_id, exc)
+                continue
+            if not renewed:
+                logger.warning("Turn lock of session=%s expired before the turn finished", session_id)
+                return
+
+    async def _release_distributed(self, session_id: str, token: Optional[str]) -> None:
+        if token is None:
+            return
+        key = self.LOCK_KEY_PREFIX.format(session_id=session_id)
+        try:
+            await self.cache.release_lock(key, token)
+        except Exception as exc:
+            logger.warning("Failed to release turn lock of session=%s: %s", session_id, exc)
+
+    @asynccontextmanager
+    async def turn(
+        self,
+        session_id: str,
+        message: str,
+        attachments: Optional[List[Dict[str, Any]]] = None,
+        *,
+        exclusive: bool = False,
+    ) -> AsyncIterator[TurnTicket]:
+        """进入会话的一个轮次。
+
+        leader 在上下文内独占会话，follower 立即返回，调用方应改为等待 leader 的结果。
+        """
+        ticket = self._join(session_id, message, attachments, exclusive)
+        if not ticket.is_leader:
+            try:
+                yield ticket
+            finally:
+                if not ticket._batch.done.done():
+                    ticket._depart()
+                self._leave(session_id)
+            return
+
+        batch = ticket._batch
+        queue = self._queues[session_id]
+        try:
+            async with queue.lock:
+                remaining = self.coalesce_window - (time.monotonic() - batch.created_at)
+                if batch.coalesce and remaining > 0 and not batch.closed.is_set():
+                    try:
+                        await asyncio.wait_for(batch.closed.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                batch.closed.set()
+                if queue.pending is batch:
+                    queue.pending = None
+
+                self.stats["turns"] += 1
+                token = await self._acquire_distributed(session_id)
+                renewal = (
+                    asyncio.create_task(self._renew_distributed(session_id, token)) if token is not None else None
+                )
+                try:
+                    yield ticket
+                finally:
+                    if renewal is not None:
+                        renewal.cancel()
+                    await self._release_distributed(session_id, token)
+        except BaseException as exc:
+            if batch.followers and not batch.done.done():
+                if isinstance(exc, Exception):
+                    batch.done.set_exception(exc)
+                else:
+                    batch.done.cancel()
+            raise
+        finally:
+            if not batch.done.done():
+                if batch.followers:
+                    batch.done.set_exception(RuntimeError("turn finished without a result"))
+                else:
+                    batch.done.cancel()
+            batch.notify()
+            self._leave(session_id)
+
+
+_turn_sequencer: Optional[TurnSequencer] = None
+
+
+def get_turn_sequencer() -> Optional[TurnSequencer]:
+    """返回进程内共享的排序器；``TURN_SEQUENCER_ENABLED=false`` 时返回 None。"""
+    global _turn_sequencer
+    from config import settings
+
+    if not getattr(settings, "TURN_SEQUENCER_ENABLED", True):
+        return None
+    if _turn_sequencer is None:
+        _turn_sequencer = TurnSequencer(
+            coalesce_window=getattr(settings, "TURN_COALESCE_WINDOW_MS", 300) / 1000,
+            lock_ttl_seconds=getattr(settings, "TURN_LOCK_TTL_SECONDS", 120),
+            lock_wait_seconds=getattr(settings, "TURN_LOCK_WAIT_SECONDS", 30),
+        )
+    return _turn_sequencer
+
+
+__all__ = ["TurnHandedOff", "TurnSequencer", "TurnTicket", "get_turn_sequencer"]
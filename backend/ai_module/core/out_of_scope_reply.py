@@ -5,6 +5,8 @@ import re
 
 from langchain_core.prompts import ChatPromptTemplate
 
+from services.llm_response_cache import with_response_cache
+
 _TRAVEL_RE = re.compile(r"(旅行|旅游|出游|景点|攻略|机票|酒店|新疆|西藏|北京|上海|城市|去哪玩)")
 _WEATHER_RE = re.compile(r"(天气|下雨|下雪|气温|冷不冷|热不热|温度)")
 _FOOD_RE = re.compile(r"(吃什么|好吃|餐厅|美食|火锅|奶茶|咖啡|饭店)")
@@ -39,41 +41,42 @@ _ANCHOR_TOKENS = (
 _FULL_REPLY_PROMPT = ChatPromptTemplate.from_messages(
     [
         (
-            “system”,
-            “””你是中文业务助手，正在帮用户处理业务。用户临时岔开聊了别的话题，你要自然地接住并带回业务。
+            "system",
+            """你是中文业务助手，正在帮用户处理业务。用户临时岔开聊了别的话题，你要自然地接住并带回业务。
 
-核心目标：像真人客服随口接话一样，在同一段话里顺势回到业务。不要有”先回应、再转折”的两段式模板感。
+核心目标：像真人客服随口接话一样，在同一段话里顺势回到业务。不要有“先回应、再转折”的两段式模板感。
 
 要求：
 1. 接住用户的话，但不要展开讲、不要科普、不要评价得太满。
 2. 在同一段回复里顺势带回业务，方式不限——追问、提醒、调侃、反问都行。
 3. 整体 1-3 句，像同事间随口一说。每次换不同的说法和句式，避免千篇一律。
-4. 参考”业务引导目标”的意思，但必须用自己的话重新表达，禁止照搬原文。
-5. 如果有”对话上下文”，利用里面的具体信息（比如用户刚才选了什么、聊到哪一步），让回引更具体而不是泛泛的。
+4. 参考“业务引导目标”的意思，但必须用自己的话重新表达，禁止照搬原文。
+5. 如果有“对话上下文”，利用里面的具体信息（比如用户刚才选了什么、聊到哪一步），让回引更具体而不是泛泛的。
 
-禁止出现的表达：
-- “我先接一下””我先简短说一下””先放一放”
-- “我们先说回刚才的XX””我们先接着刚才的XX任务”
+不自然示例（禁止出现的表达）：
+- 不要直接写“我们先说回刚才的项目选择”这类生硬的转折
+- “我先接一下”“我先简短说一下”“先放一放”
+- “我们先说回刚才的XX”“我们先接着刚才的XX任务”
 - “XX确实挺XX的。” 开头（这个句式用太多了）
 
-风格多样化示例（注意每条风格都不同）：
+更自然示例（注意每条风格都不同）：
 - 哈哈俄罗斯冬天是真冷，不过咱先把订单的事搞定？刚才您还没选呢。
 - 俄罗斯啊，等这边处理完可以慢慢聊。您那 7 个订单里要看哪个？
 - 好家伙直接飞俄罗斯了，订单那边您还继续不？
 - 新加坡好地方，回头可以聊。对了您刚才项目选到哪一步了？
 - 火锅确实治愈，吃完再说。您那个退货申请要不要先提交了？
 
-只输出最终回复，不要解释。”””,
+只输出最终回复，不要解释。""",
         ),
         (
-            “human”,
-            “””用户消息：{message}
+            "human",
+            """用户消息：{message}
 当前业务：{business_name}
 当前主线任务：{task_hint}
 对话上下文：{context_hint}
 业务引导目标（参考意思，不要照搬）：{redirect}
 
-直接输出回复：”””,
+直接输出回复：""",
         ),
     ]
 )
@@ -141,7 +144,8 @@ async def compose_out_of_scope_reply(
         return fallback
 
     try:
-        response = await llm.ainvoke(
+        # 同一条越界消息和引导语的回复可以复用
+        response = await with_response_cache(llm, "out_of_scope").ainvoke(
             _FULL_REPLY_PROMPT.format_messages(
                 message=(message or "").strip(),
                 business_name=business_name or "当前业务",
@@ -0,0 +1,315 @@
+"""单轮提示词上下文组装器。
+
+同一轮里多个模型调用（函数调用、问答、选题助手、澄清、对话控制）都会用到
+摘要、最近对话、相关记忆、任务快照、检索文档和附件这些上下文片段。
+这里统一负责：
+
+- 每个片段在本轮只渲染一次，结果缓存在会话状态上
+- 按片段统一执行令牌预算，不同调用方的截断规则保持一致
+- 记录每个片段、每个调用方消耗的提示词令牌，写入 ``state["prompt_metrics"]``
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+
+from .memory_builder import MemoryContextBuilder
+from .summarizer import estimate_tokens, trim_history_to_budget
+
+logger = logging.getLogger(__name__)
+
+SECTION_SUMMARY = "summary"
+SECTION_RECENT_HISTORY = "recent_history"
+SECTION_MEMORIES = "memories"
+SECTION_TASK_SNAPSHOT = "task_snapshot"
+SECTION_DOCS = "docs"
+SECTION_ATTACHMENTS = "attachments"
+
+DEFAULT_SECTION_BUDGETS: Dict[str, int] = {
+    SECTION_SUMMARY: 400,
+    SECTION_RECENT_HISTORY: 1200,
+    SECTION_MEMORIES: 600,
+    SECTION_TASK_SNAPSHOT: 200,
+    SECTION_DOCS: 1500,
+    SECTION_ATTACHMENTS: 2500,
+}
+
+EMPTY_TEXT = "（无）"
+
+
+def parse_section_budgets(raw: str) -> Dict[str, int]:
+    """解析 ``summary=400,docs=1500`` 形式的预算配置，未配置的片段使用默认值。"""
+    budgets = dict(DEFAULT_SECTION_BUDGETS)
+    for item in (raw or "").split(","):
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if not name or not value.strip():
+            continue
+        try:
+            budgets[name] = int(value)
+        except ValueError:
+            logger.warning("忽略无效的提示词片段预算配置: %s", item)
+    return budgets
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """把文本截断到令牌预算以内，按字符长度二分查找截断位置。"""
+    if not text or budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + "…"
+
+
+_file_service = None
+
+
+def _default_attachment_loader(file_path: str) -> str:
+    global _file_service
+    if _file_service is None:
+        from services.file_service import FileService
+
+        _file_service = FileService()
+    return _file_service.extract_text(file_path) or ""
+
+
+class PromptContextAssembler:
+    """按轮次缓存、按片段预算组装提示词上下文。"""
+
+    STATE_KEY = "_prompt_context"
+    METRICS_KEY = "prompt_metrics"
+
+    def __init__(
+        self,
+        memory_builder: Optional[MemoryContextBuilder] = None,
+        budgets: Optional[Dict[str, int]] = None,
+        attachment_loader: Optional[Callable[[str], str]] = None,
+    ):
+        self.memory_builder = memory_builder or MemoryContextBuilder()
+        self.budgets = dict(budgets) if budgets is not None else parse_section_budgets(
+            getattr(settings, "PROMPT_SECTION_TOKEN_BUDGETS", "")
+        )
+        self.attachment_loader = attachment_loader or _default_attachment_loader
+
+    # ── 缓存与指标 ────────────────────────────────────────────────
+
+    def _memo(self, state: Dict[str, Any]) -> Dict[Tuple, Tuple[Any, Any, int]]:
+        memo = state.get(self.STATE_KEY)
+        if memo is None:
+            memo = {}
+            state[self.STATE_KEY] = memo
+        return memo
+
+    def _record(self, state: Dict[str, Any], section: str, tokens: int, consumer: Optional[str]) -> None:
+        metrics = state.get(self.METRICS_KEY)
+        if metrics is None:
+            metrics = {"sections": {}, "calls": {}}
+            state[self.METRICS_KEY] = metrics
+        metrics["sections"][section] = tokens
+        if consumer:
+            call = metrics["calls"].setdefault(consumer, {})
+            call[section] = tokens
+
+    def _cached(
+        self,
+        state: Dict[str, Any],
+        section: str,
+        key: Tuple,
+        source: Any,
+        render: Callable[[], Tuple[Any, int]],
+        consumer: Optional[str],
+    ):
+        """读取或渲染一个片段。
+
+        ``source`` 是片段依赖的状态对象，节点替换了该对象（如重新检索文档）时缓存自动失效。
+        """
+        memo = self._memo(state)
+        memo_key = (section,) + key
+        cached = memo.get(memo_key)
+        if cached is None or cached[0] is not source:
+            value, tokens = render()
+            cached = (source, value, tokens)
+            memo[memo_key] = cached
+        _, value, tokens = cached
+        self._record(state, section, tokens, consumer)
+        return value
+
+    def budget(self, section: str) -> int:
+        return self.budgets.get(section, DEFAULT_SECTION_BUDGETS.get(section, 0))
+
+    # ── 片段 ──────────────────────────────────────────────────────
+
+    def summary(self, state: Dict[str, Any], *, consumer: Optional[str] = None) -> str:
+        raw = state.get("conversation_summary") or ""
+
+        def render():
+            text = truncate_to_tokens(raw, self.budget(SECTION_SUMMARY))
+            return text, estimate_tokens(text)
+
+        return self._cached(state, SECTION_SUMMARY, (raw,), None, render, consumer)
+
+    def recent_turns(
+        self,
+        state: Dict[str, Any],
+        limit: int,
+        *,
+        consumer: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """需要原样进入提示词的最近轮次，先按窗口再按令牌预算裁剪。"""
+        history = state.get("conversation_history") or []
+        key = (limit, len(history), state.get("retrieved_memories") is not None)
+
+        def render():
+            turns = self.memory_builder.select_recent_turns(state, limit)
+            turns = trim_history_to_budget(turns, self.budget(SECTION_RECENT_HISTORY))
+            text = self.memory_builder.build_recent_history_text(turns, limit=len(turns) or None)
+            return turns, estimate_tokens(text) if turns else 0
+
+        return self._cached(state, SECTION_RECENT_HISTORY, key, history, render, consumer)
+
+    def recent_history_text(self, state: Dict[str, Any], limit: int, *, consumer: Optional[str] = None) -> str:
+        turns = self.recent_turns(state, limit, consumer=consumer)
+        return self.memory_builder.build_recent_history_text(turns, limit=len(turns) or None)
+
+    def memories(self, state: Dict[str, Any], *, consumer: Optional[str] = None) -> str:
+        memories = state.get("retrieved_memories") or []
+
+        def render():
+            kept, used = [], 0
+            for memory in memories:
+                tokens = memory.get("tokens") or estimate_tokens(memory.get("text", ""))
+                if used + tokens > self.budget(SECTION_MEMORIES):
+                    continue
+                kept.append(memory)
+                used += tokens
+            if not kept:
+                return "", 0
+            text = self.memory_builder.build_relevant_memory_text(kept)
+            return text, estimate_tokens(text)
+
+        return self._cached(state, SECTION_MEMORIES, (len(memories),), memories, render, consumer)
+
+    def task_snapshot(self, state: Dict[str, Any], *, consumer: Optional[str] = None) -> str:
+        active_task = state.get("active_task") or {}
+        key = (
+            state.get("active_flow"),
+            state.get("current_step"),
+            state.get("pending_action"),
+            state.get("pending_question"),
+            state.get("last_intent"),
+        )
+
+        def render():
+            text = truncate_to_tokens(
+                self.memory_builder.build_task_snapshot_text(state),
+                self.budget(SECTION_TASK_SNAPSHOT),
+            )
+            return text, estimate_tokens(text) if text != EMPTY_TEXT else 0
+
+        return self._cached(state, SECTION_TASK_SNAPSHOT, key, active_task, render, consumer)
+
+    def docs(self, state: Dict[str, Any], *, consumer: Optional[str] = None) -> str:
+        docs = state.get("retrieved_docs") or []
+
+        def render():
+            remaining = self.budget(SECTION_DOCS)
+            parts: List[str] = []
+            for index, doc in enumerate(docs):
+                if remaining <= 0:
+                    break
+                part = truncate_to_tokens(f"文档{index + 1}：{doc.get('content', '')}", remaining)
+                if not part:
+                    break
+                parts.append(part)
+                remaining -= estimate_tokens(part)
+            text = "\n\n".join(parts)
+            return text, estimate_tokens(text)
+
+        return self._cached(state, SECTION_DOCS, (len(docs),), docs, render, consumer)
+
+    def attachments(self, state: Dict[str, Any], *, consumer: Optional[str] = None) -> str:
+        attachments = state.get("attachments") or []
+        paths = tuple(attachment.get("file_path", "") for attachment in attachments)
+
+        def render():
+            remaining = self.budget(SECTION_ATTACHMENTS)
+            parts: List[str] = []
+            for attachment in attachments:
+                file_path = attachment.get("file_path", "")
+                if not file_path or remaining <= 0:
+                    continue
+                text = self.attachment_loader(file_path)
+                if not text:
+                    continue
+                part = truncate_to_tokens(f"《{attachment.get('file_name', '文件')}》\n{text}", remaining)
+                parts.append(part)
+                remaining -= estimate_tokens(part)
+            text = "\n\n".join(parts)
+            return text, estimate_tokens(text)
+
+        return self._cached(state, SECTION_ATTACHMENTS, paths, None, render, consumer)
+
+    # ── 组合视图 ──────────────────────────────────────────────────
+
+    def short_term_memory(
+        self,
+        state: Dict[str, Any],
+        *,
+        include_task_snapshot: bool = True,
+        limit: Optional[int] = None,
+        consumer: Optional[str] = None,
+    ) -> str:
+        """与 ``MemoryContextBuilder.build_short_term_memory_text`` 相同的版式，但走统一的缓存与预算。"""
+        turn_limit = limit or self.memory_builder.recent_turn_limit
+        sections = ["最近对话：", self.recent_history_text(state, turn_limit, consumer=consumer)]
+
+        if self.memory_builder.has_retrieved_memories(state):
+            sections.extend(["", "相关历史记忆：", self.memories(state, consumer=consumer) or EMPTY_TEXT])
+
+        if include_task_snapshot:
+            sections.extend(["", "任务快照：", self.task_snapshot(state, consumer=consumer)])
+
+        return "\n".join(sections)
+
+
+prompt_context = PromptContextAssembler()
+
+
+def finalize_prompt_context(state: Dict[str, Any]) -> None:
+    """轮次结束时释放片段缓存，并把本轮的提示词令牌用量写入日志。"""
+    state.pop(PromptContextAssembler.STATE_KEY, None)
+    metrics = state.get(PromptContextAssembler.METRICS_KEY)
+    if not metrics:
+        return
+    logger.info(
+        "prompt context tokens session=%s sections=%s calls=%s",
+        state.get("session_id"),
+        metrics.get("sections"),
+        metrics.get("calls"),
+    )
+
+
+__all__ = [
+    "DEFAULT_SECTION_BUDGETS",
+    "PromptContextAssembler",
+    "SECTION_ATTACHMENTS",
+    "SECTION_DOCS",
+    "SECTION_MEMORIES",
+    "SECTION_RECENT_HISTORY",
+    "SECTION_SUMMARY",
+    "SECTION_TASK_SNAPSHOT",
+    "finalize_prompt_context",
+    "parse_section_budgets",
+    "prompt_context",
+    "truncate_to_tokens",
+]
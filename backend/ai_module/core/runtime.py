@@ -11,14 +11,29 @@
 """
 from __future__ import annotations
 
+import asyncio
+import copy
+import logging
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
 
 from adapters import EcommerceAdapter
 from config import config_loader, init_chat_model, init_intent_model, settings
 from ai_module.infrastructure.plugins import PluginManager, register_builtin_tool_plugins
+from services.llm_gateway import create_chat_model
+from services.shared_cache import CacheNamespace
+from services.telemetry import llm_callbacks
 
 from .constants import DEFAULT_INTENT_HANDLER_MAP, DEFAULT_INTENT_LABELS, DEFAULT_INTENT_RULES
+from .keyword_automaton import KeywordMatcher
+from .tool_binding import ToolBinding, build_tool_binding
+from .tool_planner import ToolPlanner
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass(frozen=True)
@@ -37,11 +52,43 @@ class BusinessPack:
 
     业务包是业务差异的最小装配单元，可以在不分叉工作流内核的前提下，
     覆盖提示词、启用插件、意图标签和处理器映射。
+
+    业务包是一份编译好的不可变快照：合并默认值后的标签、规则、示例、处理器映射和
+    插件分组在构造时算好，每轮多次调用只是读取；由快照派生的产物（提示词模板等）
+    通过 ``get_compiled`` 按快照缓存。配置变化时构造新的业务包整体替换，而不是原地修改。
     """
 
     def __init__(self, business_id: str, config: Dict[str, Any]):
         self.business_id = business_id
-        self.config = config
+        self.config = copy.deepcopy(config)
+
+        classifier = self.config.get("intent_classifier") or {}
+        labels: List[str] = []
+        for label in list(classifier.get("labels") or []) + list(DEFAULT_INTENT_LABELS):
+            if label not in labels:
+                labels.append(label)
+        self._intent_labels: Tuple[str, ...] = tuple(labels)
+
+        merged: Dict[str, List[str]] = {
+            intent: list(keywords)
+            for intent, keywords in DEFAULT_INTENT_RULES.items()
+        }
+        for intent, keywords in (classifier.get("rules") or {}).items():
+            combined = merged.setdefault(intent, [])
+            for keyword in list(keywords):
+                if keyword not in combined:
+                    combined.append(keyword)
+        self._intent_rules: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {intent: tuple(keywords) for intent, keywords in merged.items()}
+        )
+        self._intent_examples: Tuple[Dict[str, str], ...] = tuple(classifier.get("examples", []))
+
+        handler_map = dict(DEFAULT_INTENT_HANDLER_MAP)
+        handler_map.update(self.config.get("intent_handlers", {}))
+        self._handler_map: Mapping[str, str] = MappingProxyType(handler_map)
+
+        self._plugin_names: Dict[Optional[str], List[str]] = {}
+        self._compiled: Dict[Any, Any] = {}
 
     @property
     def business_name(self) -> str:
@@ -57,13 +104,20 @@ class BusinessPack:
     def get_prompt(self, prompt_name: str, default: Optional[str] = None) -> Optional[str]:
         return self.config.get("prompts", {}).get(prompt_name, default)
 
+    def get_compiled(self, key: Any, build: Callable[[], Any]) -> Any:
+        # 快照不可变，派生产物构建一次即可；并发首建时多构建一次也无妨
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled.setdefault(key, build())
+        return compiled
+
     def get_enabled_plugin_names(self, group: Optional[str] = None) -> Optional[List[str]]:
-        plugin_configs = self.config.get("plugins", [])
-        if not plugin_configs:
-            return []
+        cached = self._plugin_names.get(group)
+        if cached is not None:
+            return list(cached)
 
         names: List[str] = []
-        for plugin in plugin_configs:
+        for plugin in self.config.get("plugins", []):
             if not plugin.get("enabled", True):
                 continue
 
@@ -79,41 +133,28 @@ class BusinessPack:
             if name:
                 names.append(name)
 
-        return names
+        self._plugin_names[group] = names
+        return list(names)
 
     def get_intent_labels(self) -> List[str]:
-        classifier = self.config.get("intent_classifier", {})
-        labels = list(classifier.get("labels") or [])
-        merged: List[str] = []
-        for label in labels + list(DEFAULT_INTENT_LABELS):
-            if label not in merged:
-                merged.append(label)
-        return merged
-
-    def get_intent_rules(self) -> Dict[str, List[str]]:
-        classifier = self.config.get("intent_classifier", {})
-        rules = classifier.get("rules") or {}
-        merged: Dict[str, List[str]] = {
-            intent: list(keywords)
-            for intent, keywords in DEFAULT_INTENT_RULES.items()
-        }
-        for intent, keywords in rules.items():
-            combined = list(merged.get(intent, []))
-            for keyword in list(keywords):
-                if keyword not in combined:
-                    combined.append(keyword)
-            merged[intent] = combined
-        return merged
+        return list(self._intent_labels)
+
+    def get_intent_rules(self) -> Mapping[str, Tuple[str, ...]]:
+        # 只读视图，调用方不要修改
+        return self._intent_rules
 
     def get_intent_examples(self) -> List[Dict[str, str]]:
-        classifier = self.config.get("intent_classifier", {})
-        return list(classifier.get("examples", []))
+        return list(self._intent_examples)
+
+    def get_intent_classifier_path(self) -> Path:
+        configured = (self.config.get("intent_classifier") or {}).get("model_path")
+        if configured:
+            path = Path(configured)
+            return path if path.is_absolute() else Path(settings.INTENT_CLASSIFIER_DIR) / path
+        return Path(settings.INTENT_CLASSIFIER_DIR) / f"{self.business_id}.json"
 
     def get_handler_for_intent(self, intent: Optional[str]) -> str:
-        handler_overrides = self.config.get("intent_handlers", {})
-        if intent in handler_overrides:
-            return handler_overrides[intent]
-        return DEFAULT_INTENT_HANDLER_MAP.get(intent, "clarify")
+        return self._handler_map.get(intent, "clarify")
 
     def get_business_info(self) -> Dict[str, Any]:
         return {
@@ -139,7 +180,18 @@ class AIRuntime:
         self.plugin_manager = PluginManager()
         self.plugin_manager.set_adapter(adapter)
         register_builtin_tool_plugins(self.plugin_manager)
-        self._model_cache: Dict[tuple[str, tuple[tuple[str, Any], ...]], Any] = {}
+        # 模型实例无法序列化，只用本地层；按 (角色, 覆盖配置) 缓存并限制容量
+        self._model_cache = CacheNamespace(
+            "runtime_models",
+            local_only=True,
+            max_local_entries=getattr(settings, "RUNTIME_MODEL_CACHE_MAX_ENTRIES", 32),
+        )
+        self._tool_bindings: Dict[tuple[str, int], tuple[Any, ToolBinding]] = {}
+        self._intent_classifier: Any = None
+        self._intent_classifier_loaded = False
+        self._inflight_turns = 0
+        self._drained = threading.Event()
+        self._drained.set()
 
     def build_context(
         self,
@@ -160,28 +212,94 @@ class AIRuntime:
         # 按角色和覆盖配置缓存模型实例，避免同一业务包的请求重复初始化模型。
         overrides = self.business_pack.get_llm_overrides()
         cache_key = (role, tuple(sorted(overrides.items())))
-        if cache_key in self._model_cache:
-            return self._model_cache[cache_key]
+        return self._model_cache.get_or_create(cache_key, lambda: self._create_chat_model(role, overrides))
 
+    def _create_chat_model(self, role: str, overrides: Mapping[str, Any]):
+        # 模型统一经 LLM 网关创建：共享连接池、并发限制、重试、对冲与熔断
         if role == "intent":
-            model = init_intent_model(
-                provider=overrides.get("provider"),
+            return create_chat_model(
+                init_intent_model,
+                role=role,
+                provider=overrides.get("provider") or settings.INTENT_MODEL_PROVIDER or settings.LLM_PROVIDER,
                 model=overrides.get("intent_model") or overrides.get("model"),
                 api_key=overrides.get("api_key"),
                 base_url=overrides.get("base_url"),
+                callbacks=llm_callbacks(),
             )
-        else:
-            model = init_chat_model(
-                provider=overrides.get("provider"),
-                model=overrides.get("model"),
-                api_key=overrides.get("api_key"),
-                base_url=overrides.get("base_url"),
-                temperature=overrides.get("temperature"),
-                max_tokens=overrides.get("max_tokens"),
-            )
+        return create_chat_model(
+            init_chat_model,
+            role=role,
+            provider=overrides.get("provider"),
+            model=overrides.get("model"),
+            api_key=overrides.get("api_key"),
+            base_url=overrides.get("base_url"),
+            temperature=overrides.get("temperature"),
+            max_tokens=overrides.get("max_tokens"),
+            callbacks=llm_callbacks(),
+        )
+
+    def get_intent_classifier(self):
+        # 本地意图分类器按业务包加载一次；未启用或没有训练产物时返回 None，调用方直接走 LLM
+        if self._intent_classifier_loaded:
+            return self._intent_classifier
+        self._intent_classifier_loaded = True
+        if not settings.INTENT_CLASSIFIER_ENABLED:
+            return None
+
+        path = self.business_pack.get_intent_classifier_path()
+        if not path.exists():
+            logger.info("No intent classifier artifact for %s at %s", self.business_pack.business_id, path)
+            return None
+        try:
+            from .intent_classifier import IntentClassifier
+
+            self._intent_classifier = IntentClassifier.load(path)
+        except Exception as exc:
+            logger.warning("Failed to load intent classifier %s: %s", path, exc)
+        return self._intent_classifier
+
+    def get_keyword_matcher(self) -> KeywordMatcher:
+        # 意图规则、能力关键词和正则线索按业务包快照编译一次，所有规则匹配路径共用
+        return self.get_compiled(
+            "keyword_matcher",
+            lambda: KeywordMatcher.from_business_config(self.get_intent_rules(), self.business_pack.config),
+        )
+
+    def get_tool_planner(self) -> ToolPlanner:
+        # 确定性工具规划规则按业务包快照编译一次
+        return self.get_compiled(
+            "tool_planner",
+            lambda: ToolPlanner.from_business_config(self.business_pack.config),
+        )
 
-        self._model_cache[cache_key] = model
-        return model
+    def get_compiled(self, key: Any, build: Callable[[], Any]) -> Any:
+        return self.business_pack.get_compiled(key, build)
+
+    @property
+    def inflight_turns(self) -> int:
+        return self._inflight_turns
+
+    @contextmanager
+    def track_turn(self) -> Iterator[None]:
+        # 热更新替换运行时后，旧运行时要等这里登记的进行中轮次全部结束才算排空
+        self._inflight_turns += 1
+        self._drained.clear()
+        try:
+            yield
+        finally:
+            self._inflight_turns -= 1
+            if self._inflight_turns == 0:
+                self._drained.set()
+
+    async def wait_drained(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self._drained.is_set():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(0.05, remaining))
+        return True
 
     def get_langchain_tools(
         self,
@@ -198,6 +316,18 @@ class AIRuntime:
             if hasattr(plugin, "to_langchain_tool")
         ]
 
+    def get_tool_binding(self, group: str = "default", llm: Any = None) -> ToolBinding:
+        # 工具集合只取决于业务包和分组，绑定结果按 (分组, 模型) 缓存；
+        # 执行上下文在调用工具时通过 tool_invocation_config 注入。
+        cache_key = (group, id(llm))
+        cached = self._tool_bindings.get(cache_key)
+        if cached is not None and cached[0] is llm:
+            return cached[1]
+
+        binding = build_tool_binding(self.get_langchain_tools(group), llm)
+        self._tool_bindings[cache_key] = (llm, binding)
+        return binding
+
     def list_plugins(self, group: Optional[str] = None) -> List[Dict[str, Any]]:
         names = self.business_pack.get_enabled_plugin_names(group=group)
         plugins = self.plugin_manager.get_plugins(names=names, group=group)
@@ -215,7 +345,7 @@ class AIRuntime:
     def get_intent_labels(self) -> List[str]:
         return self.business_pack.get_intent_labels()
 
-    def get_intent_rules(self) -> Dict[str, List[str]]:
+    def get_intent_rules(self) -> Mapping[str, Tuple[str, ...]]:
         return self.business_pack.get_intent_rules()
 
     def get_intent_examples(self) -> List[Dict[str, str]]:
@@ -227,11 +357,15 @@ class AIRuntimeFactory:
 
     这样可以复用“一套内核、多套业务包”的骨架设计：
     每个业务拥有独立的运行时与工作流对象，但不会在每次请求时重复构建。
+
+    业务配置热更新时，``reload`` 先在锁外构建好新的运行时和工作流，再在锁内一次性替换；
+    新请求立即拿到新快照，已经拿到旧工作流的进行中轮次继续在旧快照上跑完。
     """
 
     def __init__(self):
         self._runtimes: Dict[str, AIRuntime] = {}
         self._workflows: Dict[str, Any] = {}
+        self._lock = threading.RLock()
 
     def get_default_business_id(self) -> str:
         configured = getattr(settings, "DEFAULT_BUSINESS_ID", None)
@@ -249,43 +383,90 @@ class AIRuntimeFactory:
             return EcommerceAdapter(business_id, config)
         return EcommerceAdapter(business_id, config)
 
-    def get_runtime(self, business_id: Optional[str] = None) -> AIRuntime:
-        resolved_business_id = business_id or self.get_default_business_id()
-        if resolved_business_id in self._runtimes:
-            return self._runtimes[resolved_business_id]
-
-        config = config_loader.get_config(resolved_business_id)
+    def _build_runtime(self, business_id: str) -> AIRuntime:
+        config = config_loader.get_config(business_id)
         if not config:
-            raise ValueError(f"Business pack not configured: {resolved_business_id}")
+            raise ValueError(f"Business pack not configured: {business_id}")
 
-        runtime = AIRuntime(
-            business_pack=BusinessPack(resolved_business_id, config),
-            adapter=self._create_adapter(resolved_business_id, config),
+        return AIRuntime(
+            business_pack=BusinessPack(business_id, config),
+            adapter=self._create_adapter(business_id, config),
         )
-        self._runtimes[resolved_business_id] = runtime
-        return runtime
 
-    def get_workflow(self, business_id: Optional[str] = None):
-        resolved_business_id = business_id or self.get_default_business_id()
-        if resolved_business_id in self._workflows:
-            return self._workflows[resolved_business_id]
+    def _build_workflow(self, runtime: AIRuntime):
+        from .orchestration import AIWorkflow
 
-        runtime = self.get_runtime(resolved_business_id)
+        return AIWorkflow(runtime=runtime)
 
-        from .orchestration import AIWorkflow
+    def get_runtime(self, business_id: Optional[str] = None) -> AIRuntime:
+        resolved_business_id = business_id or self.get_default_business_id()
+        runtime = self._runtimes.get(resolved_business_id)
+        if runtime is not None:
+            return runtime
 
-        workflow = AIWorkflow(runtime=runtime)
-        self._workflows[resolved_business_id] = workflow
-        return workflow
+        with self._lock:
+            runtime = self._runtimes.get(resolved_business_id)
+            if runtime is None:
+                runtime = self._build_runtime(resolved_business_id)
+                self._runtimes[resolved_business_id] = runtime
+            return runtime
 
-    def clear(self, business_id: Optional[str] = None):
-        if business_id is None:
-            self._runtimes.clear()
-            self._workflows.clear()
-            return
+    def get_workflow(self, business_id: Optional[str] = None):
+        resolved_business_id = business_id or self.get_default_business_id()
+        workflow = self._workflows.get(resolved_business_id)
+        if workflow is not None:
+            return workflow
+
+        with self._lock:
+            workflow = self._workflows.get(resolved_business_id)
+            if workflow is None:
+                workflow = self._build_workflow(self.get_runtime(resolved_business_id))
+                self._workflows[resolved_business_id] = workflow
+            return workflow
+
+    async def reload(self, business_id: str, drain_timeout: float = 30.0) -> bool:
+        """用当前配置重建业务包快照并原子替换，然后等待旧运行时上的进行中轮次排空。
+
+        运行时和工作流（全部节点与模型客户端）在线程池里构造，不阻塞事件循环上的请求；锁内只做替换。
+        """
+        if not config_loader.get_config(business_id):
+            old_runtime = self._runtimes.get(business_id)
+            self.clear(business_id)
+            logger.info("Business pack %s removed", business_id)
+        else:
+            had_workflow = business_id in self._workflows
+            runtime = await asyncio.to_thread(self._build_runtime, business_id)
+            workflow = await asyncio.to_thread(self._build_workflow, runtime) if had_workflow else None
+            with self._lock:
+                old_runtime = self._runtimes.get(business_id)
+                self._runtimes[business_id] = runtime
+                if workflow is not None:
+                    self._workflows[business_id] = workflow
+                else:
+                    self._workflows.pop(business_id, None)
+            logger.info("Business pack %s reloaded", business_id)
+
+        if old_runtime is None or old_runtime.inflight_turns == 0:
+            return True
+        drained = await old_runtime.wait_drained(drain_timeout)
+        if not drained:
+            logger.warning(
+                "Business pack %s: %d turns still running on the previous snapshot after %.0fs",
+                business_id,
+                old_runtime.inflight_turns,
+                drain_timeout,
+            )
+        return drained
 
-        self._runtimes.pop(business_id, None)
-        self._workflows.pop(business_id, None)
+    def clear(self, business_id: Optional[str] = None):
+        with self._lock:
+            if business_id is None:
+                self._runtimes.clear()
+                self._workflows.clear()
+                return
+
+            self._runtimes.pop(business_id, None)
+            self._workflows.pop(business_id, None)
 
 
 runtime_factory = AIRuntimeFactory()
@@ -0,0 +1,225 @@
+"""准备阶段的推测式预取。
+
+意图识别/轮次理解要等一次模型调用，而路由之后的知识检索、订单列表查询
+只依赖用户原话。这里在准备流水线开始时，按消息特征提前启动这些下游工作：
+
+- 只预取不调用 LLM 的部分：知识检索只做向量/BM25 召回，查询改写与重排在认领后执行；
+  订单按消息是否带订单号预取详情查找或列表展示所需的条数
+- 路由到的处理器用 ``claim_prefetched`` 认领结果，命中则跳过重复查询
+- 轮次结束时仍未被认领的任务会被取消，计为浪费
+
+命中/浪费/失败次数按预取类型记录在 ``SpeculativePrefetcher.stats``，
+同时写入 ``ai_speculative_prefetch_total{kind, result}``（started / hit / wasted / failed）。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_KNOWLEDGE_DOCS = "knowledge_docs"
+PREFETCH_ORDER_LIST = "order_list"
+
+STATE_KEY = "_speculation"
+
+SPECULATIVE_PREFETCHES = registry.counter(
+    "ai_speculative_prefetch_total",
+    "Speculative prefetches by kind and result: started, hit, wasted, failed.",
+    ("kind", "result"),
+)
+# stats 字段名与指标 result 标签的对应关系
+_RESULTS = {"started": "started", "hits": "hit", "wasted": "wasted", "failed": "failed"}
+
+# 预测函数返回本轮预取的 key（用于认领时比对），返回 None 表示不预取
+Predictor = Callable[[Dict[str, Any]], Optional[Hashable]]
+Fetcher = Callable[[Hashable], Awaitable[Any]]
+
+_QUESTION_RE = re.compile(r"[?？]|怎么|如何|什么|哪些|哪个|多少|能不能|可以吗|是否|为什么|吗$|介绍|说明|区别")
+_ORDER_RE = re.compile(r"订单|物流|快递|发货|到货|签收|ORD\d", re.IGNORECASE)
+# 与订单查询 ``resolve_mode`` 的订单号格式一致：带订单号走详情，否则走列表
+_ORDER_NO_RE = re.compile(r"ORD\d{14}[A-Z0-9]{6}", re.IGNORECASE)
+_LIGHT_CHAT_RE = re.compile(
+    r"^(你好|您好|hello|hi|哈喽|在吗|谢谢|感谢|好的|ok|嗯|再见|拜拜)[!！。\s]*$",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class _Speculation:
+    kind: str
+    key: Hashable
+    task: asyncio.Task
+    claimed: bool = False
+
+
+@dataclass
+class _TurnSpeculations:
+    """挂在会话状态上的本轮预取任务。"""
+
+    prefetcher: "SpeculativePrefetcher"
+    items: Dict[str, _Speculation] = field(default_factory=dict)
+
+
+class SpeculativePrefetcher:
+    """按消息特征启动下游预取任务，并统计命中与浪费。"""
+
+    def __init__(self):
+        self._kinds: Dict[str, tuple] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def register(self, kind: str, predictor: Predictor, fetcher: Fetcher) -> None:
+        self._kinds[kind] = (predictor, fetcher)
+        self.stats.setdefault(kind, {"started": 0, "hits": 0, "wasted": 0, "failed": 0})
+
+    def _count(self, kind: str, field: str) -> None:
+        self.stats.setdefault(kind, {"started": 0, "hits": 0, "wasted": 0, "failed": 0})[field] += 1
+        SPECULATIVE_PREFETCHES.inc(kind=kind, result=_RESULTS[field])
+
+    def start(self, state: Dict[str, Any]) -> None:
+        """为本轮启动所有命中预测的预取任务，结果挂在 ``state["_speculation"]`` 上。"""
+        turn = state.get(STATE_KEY)
+        if turn is None:
+            turn = _TurnSpeculations(prefetcher=self)
+            state[STATE_KEY] = turn
+        pending = turn.items
+        for kind, (predictor, fetcher) in self._kinds.items():
+            if kind in pending:
+                continue
+            try:
+                key = predictor(state)
+            except Exception as exc:
+                logger.debug("Speculation predictor %s failed: %s", kind, exc)
+                continue
+            if key is None:
+                continue
+
+            task = asyncio.ensure_future(fetcher(key))
+            # 被取消或无人认领的任务也要取走异常，避免事件循环告警
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            pending[kind] = _Speculation(kind=kind, key=key, task=task)
+            self._count(kind, "started")
+        if pending:
+            logger.info("Speculative prefetch started kinds=%s", sorted(pending))
+
+    async def claim(self, state: Dict[str, Any], kind: str, key: Hashable) -> Optional[Any]:
+        """认领预取结果；没有预取、key 不一致或预取失败时返回 None，调用方照常查询。"""
+        turn = state.get(STATE_KEY)
+        speculation = turn.items.get(kind) if turn is not None else None
+        if speculation is None or speculation.claimed or speculation.key != key:
+            return None
+
+        speculation.claimed = True
+        try:
+            result = await asyncio.shield(speculation.task)
+        except asyncio.CancelledError:
+            if not speculation.task.cancelled():
+                raise
+            self._count(kind, "failed")
+            return None
+        except Exception as exc:
+            logger.warning("Speculative %s prefetch failed, falling back: %s", kind, exc)
+            self._count(kind, "failed")
+            return None
+
+        self._count(kind, "hits")
+        return result
+
+    def finalize(self, state: Dict[str, Any]) -> None:
+        """轮次结束：取消未被认领的预取任务并记为浪费。"""
+        turn = state.pop(STATE_KEY, None)
+        pending = turn.items if turn is not None else {}
+        wasted = []
+        for kind, speculation in pending.items():
+            if speculation.claimed:
+                continue
+            if not speculation.task.done():
+                speculation.task.cancel()
+            self._count(kind, "wasted")
+            wasted.append(kind)
+        if pending:
+            logger.info(
+                "Speculative prefetch session=%s claimed=%s wasted=%s",
+                state.get("session_id"),
+                sorted(kind for kind, item in pending.items() if item.claimed),
+                wasted,
+            )
+
+
+def _predict_knowledge_docs(state: Dict[str, Any]) -> Optional[str]:
+    message = (state.get("user_message") or "").strip()
+    if len(message) < 4 or _LIGHT_CHAT_RE.match(message):
+        return None
+    if state.get("purchase_flow") or state.get("aftersales_flow") or state.get("pending_action"):
+        return None
+    if _ORDER_RE.search(message) or not _QUESTION_RE.search(message):
+        return None
+    return message
+
+
+def _predict_order_list(state: Dict[str, Any]) -> Optional[tuple]:
+    message = state.get("user_message") or ""
+    user_id = state.get("user_id")
+    if not user_id or state.get("purchase_flow") or not _ORDER_RE.search(message):
+        return None
+    return user_id, "detail" if _ORDER_NO_RE.search(message) else "list"
+
+
+async def _fetch_knowledge_docs(query: str):
+    from ai_module.core.workflows.qa_flow.service import search_knowledge_candidates
+
+    return await search_knowledge_candidates(query)
+
+
+async def _fetch_order_list(key: tuple):
+    from ai_module.core.workflows.order_query.contracts import OrderQueryMode
+    from ai_module.core.workflows.order_query.service import fetch_recent_orders, recent_orders_page_size
+
+    user_id, mode = key
+    return await fetch_recent_orders(user_id, page_size=recent_orders_page_size(OrderQueryMode(mode)))
+
+
+_prefetcher: Optional[SpeculativePrefetcher] = None
+
+
+def get_speculative_prefetcher() -> Optional[SpeculativePrefetcher]:
+    """返回共享的预取器；``SPECULATIVE_PREFETCH_ENABLED=false`` 时返回 None。"""
+    global _prefetcher
+    from config import settings
+
+    if not getattr(settings, "SPECULATIVE_PREFETCH_ENABLED", True):
+        return None
+    if _prefetcher is None:
+        _prefetcher = SpeculativePrefetcher()
+        _prefetcher.register(PREFETCH_KNOWLEDGE_DOCS, _predict_knowledge_docs, _fetch_knowledge_docs)
+        _prefetcher.register(PREFETCH_ORDER_LIST, _predict_order_list, _fetch_order_list)
+    return _prefetcher
+
+
+async def claim_prefetched(state: Dict[str, Any], kind: str, key: Hashable) -> Optional[Any]:
+    """供处理器调用：认领本轮的推测式预取结果，未预取时返回 None。"""
+    turn = state.get(STATE_KEY)
+    if turn is None:
+        return None
+    return await turn.prefetcher.claim(state, kind, key)
+
+
+def finalize_speculation(state: Dict[str, Any]) -> None:
+    turn = state.get(STATE_KEY)
+    if turn is not None:
+        turn.prefetcher.finalize(state)
+
+
+__all__ = [
+    "PREFETCH_KNOWLEDGE_DOCS",
+    "PREFETCH_ORDER_LIST",
+    "SpeculativePrefetcher",
+    "claim_prefetched",
+    "finalize_speculation",
+    "get_speculative_prefetcher",
+]
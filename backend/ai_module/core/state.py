@@ -29,6 +29,8 @@ class ConversationState(TypedDict):
     task_stack: Optional[List[Dict[str, Any]]]
     pending_question: Optional[str]
     pending_action: Optional[str]
+    retrieved_memories: Optional[List[Dict[str, Any]]]
+    prompt_metrics: Optional[Dict[str, Any]]
 
     # 中间处理态
     entry_classifier: Optional[str]
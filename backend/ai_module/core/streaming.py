@@ -0,0 +1,76 @@
+"""流式输出的约定。
+
+节点和工作流的 ``execute_stream`` 产出两类片段：
+
+- ``str``：回复正文增量，编排层包装为 ``{"type": "content", "delta": ...}``
+- ``dict``：结构化事件（如工具循环的进度提示），编排层原样转发
+
+进度事件使用前端已支持的 ``thinking`` 类型，不会混入回复正文和会话记录。
+"""
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
+
+StreamChunk = Union[str, Dict[str, Any]]
+
+PROGRESS_EVENT_TYPE = "thinking"
+
+
+def progress_event(message: str) -> Dict[str, Any]:
+    return {"type": PROGRESS_EVENT_TYPE, "content": message}
+
+
+def as_stream_event(chunk: StreamChunk) -> Dict[str, Any]:
+    if isinstance(chunk, dict):
+        return chunk
+    return {"type": "content", "delta": chunk}
+
+
+def chunk_text(chunk: Any) -> str:
+    """取出模型流式增量中的文本；部分提供方的 content 是分段列表。"""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return ""
+
+
+async def astream_message(llm: Any, messages: list, stop_on_tool_calls: bool = True) -> AsyncIterator[Tuple[Optional[str], Any]]:
+    """用 ``astream`` 生成一条回复，边生成边产出 ``(文本增量, None)``，最后产出 ``(None, 完整消息)``。
+
+    一旦出现工具调用增量就停止转发正文（``stop_on_tool_calls``），
+    避免把工具调用轮次里的零散文本当成最终回答推给用户。
+    """
+    gathered = None
+    forwarding = True
+    async for chunk in llm.astream(messages):
+        gathered = chunk if gathered is None else gathered + chunk
+        if stop_on_tool_calls and getattr(chunk, "tool_call_chunks", None):
+            forwarding = False
+        if forwarding:
+            text = chunk_text(chunk)
+            if text:
+                yield text, None
+
+    if gathered is not None:
+        try:
+            from langchain_core.messages import message_chunk_to_message
+
+            gathered = message_chunk_to_message(gathered)
+        except Exception:  # pragma: no cover - non-langchain chunks in tests
+            pass
+    yield None, gathered
+
+
+__all__ = [
+    "PROGRESS_EVENT_TYPE",
+    "StreamChunk",
+    "as_stream_event",
+    "astream_message",
+    "chunk_text",
+    "progress_event",
+]
@@ -12,6 +12,8 @@
 """
 
 import logging
+from bisect import bisect_left
+from itertools import accumulate
 
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -35,28 +37,112 @@ SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
 ])
 
 
+class HeuristicTokenEstimator:
+    """默认估算器：中文大约每 2 个字符记作 1 个令牌。"""
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return max(1, len(text) // 2)
+
+
+class TiktokenEstimator:
+    """使用本地 tiktoken 词表计数，比字符启发式更接近真实计费。"""
+
+    name = "tiktoken"
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        import tiktoken
+
+        self._encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+_token_estimator = None
+
+
+def _build_token_estimator():
+    name = (getattr(settings, "TOKEN_ESTIMATOR", "heuristic") or "heuristic").strip().lower()
+    if name == TiktokenEstimator.name:
+        try:
+            return TiktokenEstimator(getattr(settings, "TOKEN_ESTIMATOR_ENCODING", "cl100k_base"))
+        except Exception as exc:
+            logger.warning("tiktoken 估算器不可用，回退到字符启发式: %s", exc)
+    return HeuristicTokenEstimator()
+
+
+def get_token_estimator():
+    """返回当前使用的令牌估算器（任何带 ``count(text) -> int`` 的对象）。"""
+    global _token_estimator
+    if _token_estimator is None:
+        _token_estimator = _build_token_estimator()
+    return _token_estimator
+
+
+def set_token_estimator(estimator) -> None:
+    """替换全局令牌估算器；传入 None 则按配置重新创建。"""
+    global _token_estimator
+    _token_estimator = estimator
+
+
 def estimate_tokens(text: str) -> int:
     """估算一段文本的令牌数量。
 
-    这里采用简单启发式：中文大约每 2 个字符记作 1 个令牌，
+    默认采用简单启发式：中文大约每 2 个字符记作 1 个令牌，
     对中英文混合内容也能给出相对保守的估算值。
     """
     if not text:
         return 0
-    return max(1, len(text) // 2)
+    return get_token_estimator().count(text)
+
+
+def estimate_entry_tokens(user_text: str, assistant_text: str) -> int:
+    """估算一条历史消息（用户 + 助手）的令牌数量，写入历史时随条目保存。"""
+    return estimate_tokens(user_text) + estimate_tokens(assistant_text)
+
+
+def history_entry_tokens(msg: dict) -> int:
+    """读取历史条目上保存的令牌数，旧数据没有该字段时现场估算。"""
+    tokens = msg.get("tokens")
+    if isinstance(tokens, int) and tokens >= 0:
+        return tokens
+    return estimate_entry_tokens(msg.get("user", ""), msg.get("assistant", ""))
 
 
 def estimate_history_tokens(history: list) -> int:
     """估算一组历史消息的总令牌数量。
 
-    每条历史消息默认包含“用户内容”和“助手内容”两个字段。
+    每条历史消息默认包含“用户内容”和“助手内容”两个字段，
+    已保存 ``tokens`` 的条目直接复用，不再重复估算。
     """
-    total = 0
-    for msg in history:
-        user_text = msg.get("user", "")
-        assistant_text = msg.get("assistant", "")
-        total += estimate_tokens(user_text) + estimate_tokens(assistant_text)
-    return total
+    return sum(history_entry_tokens(msg) for msg in history)
+
+
+def history_token_prefix_sums(history: list) -> list:
+    """返回历史令牌数的前缀和，``prefix[i]`` 为前 i 条消息的令牌总数。"""
+    return list(accumulate((history_entry_tokens(msg) for msg in history), initial=0))
+
+
+def trim_history_to_budget(history: list, budget: int, prefix_sums: list | None = None) -> list:
+    """丢弃最早的消息，直到剩余历史的令牌总数不超过预算。
+
+    基于前缀和二分查找需要丢弃的条数，只保留最近的完整消息。
+    """
+    if not history:
+        return history
+    prefix = prefix_sums if prefix_sums is not None else history_token_prefix_sums(history)
+    overflow = prefix[-1] - max(0, budget)
+    if overflow <= 0:
+        return history
+    # 找到最小的 k，使丢弃前 k 条后 total - prefix[k] <= budget
+    drop = bisect_left(prefix, overflow)
+    return history[drop:]
 
 
 def _format_history_for_summary(history: list) -> str:
@@ -154,28 +240,19 @@ class ConversationSummarizer:
     def _enforce_token_limit(self, summary: str, remaining_history: list) -> list:
         """确保“摘要 + 保留历史”的总令牌数不超过上限。
 
-        如果超限，就持续移除保留历史中最早的消息，
-        直到满足约束。
+        如果超限，就移除保留历史中最早的若干条消息，
+        需要移除的条数通过令牌前缀和二分查找得到。
 
         需求 3.5：总令牌数不得超过上下文上限。
         """
         summary_tokens = estimate_tokens(summary)
-
-        while remaining_history:
-            history_tokens = estimate_history_tokens(remaining_history)
-            total_tokens = summary_tokens + history_tokens
-
-            if total_tokens <= self.max_tokens:
-                break
-
-            # 超限时优先移除保留历史中最早的一条消息。
-            remaining_history = remaining_history[1:]
+        trimmed = trim_history_to_budget(remaining_history, self.max_tokens - summary_tokens)
+        if len(trimmed) < len(remaining_history):
             logger.debug(
-                f"令牌超限，截断最早消息。当前: {len(remaining_history)} 条, "
-                f"估算令牌数: {summary_tokens + estimate_history_tokens(remaining_history)}"
+                f"令牌超限，截断最早消息。当前: {len(trimmed)} 条, "
+                f"估算令牌数: {summary_tokens + estimate_history_tokens(trimmed)}"
             )
-
-        return remaining_history
+        return trimmed
 
     def fallback_truncate(self, history: list) -> dict:
         """摘要失败时的兜底截断策略。
@@ -0,0 +1,52 @@
+"""
+按业务包和工具分组缓存的工具绑定。
+
+工具的 JSON Schema 和 ``llm.bind_tools`` 的结果与请求无关，只需构建一次；
+当前用户等执行上下文在调用工具时通过 ``RunnableConfig`` 传入，
+不再写回共享的节点属性，避免并发请求互相覆盖。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Sequence, Tuple
+
+EXECUTION_CONTEXT_KEY = "execution_context"
+
+
+def tool_invocation_config(execution_context: Optional[dict]) -> dict:
+    """调用工具时附带的配置，插件从中读取本次请求的执行上下文。"""
+    return {"configurable": {EXECUTION_CONTEXT_KEY: execution_context}}
+
+
+def execution_context_from_config(config: Optional[Mapping[str, Any]]) -> Optional[dict]:
+    if not config:
+        return None
+    return (config.get("configurable") or {}).get(EXECUTION_CONTEXT_KEY)
+
+
+@dataclass(frozen=True)
+class ToolBinding:
+    """一组工具及其绑定后的模型，只读，可在请求间共享。"""
+
+    tools: Tuple[Any, ...] = ()
+    tool_map: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+    llm_with_tools: Any = None
+
+
+def build_tool_binding(tools: Sequence[Any], llm: Any = None) -> ToolBinding:
+    tools = tuple(tools)
+    return ToolBinding(
+        tools=tools,
+        tool_map=MappingProxyType({tool.name: tool for tool in tools}),
+        llm_with_tools=llm.bind_tools(list(tools)) if llm is not None and tools else None,
+    )
+
+
+__all__ = [
+    "EXECUTION_CONTEXT_KEY",
+    "ToolBinding",
+    "build_tool_binding",
+    "execution_context_from_config",
+    "tool_invocation_config",
+]
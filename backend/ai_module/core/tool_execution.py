@@ -0,0 +1,164 @@
+"""同一次模型回复中多个工具调用的并发执行。
+
+函数调用节点和选题助手的智能体循环都会拿到一组 ``tool_calls``，彼此独立，
+每个工具各自打开数据库会话。这里统一负责：
+
+- 在信号量限制下并发执行，单次回复最多同时执行 ``max_concurrency`` 个
+- 每个工具单独超时，超时后取消对应调用，不影响其他调用
+- 结果按模型给出的调用顺序返回，与执行完成的先后无关
+- 每次调用的耗时按工具名和结果写入 ``ai_tool_call_latency_seconds``
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from services.telemetry import TOOL_CALL_LATENCY
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_MISSING = "missing"
+
+
+@dataclass
+class ToolCallOutcome:
+    """单个工具调用的执行结果；``error`` 仅在失败、超时或工具不存在时有值。"""
+
+    name: str
+    args: Dict[str, Any] = field(default_factory=dict)
+    call_id: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    outcome: str = OUTCOME_OK
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome == OUTCOME_OK
+
+
+def parse_tool_timeouts(raw: str) -> Dict[str, float]:
+    """解析 ``get_project_detail=5,search_projects=8`` 形式的按工具超时配置。"""
+    timeouts: Dict[str, float] = {}
+    for item in (raw or "").split(","):
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if not name or not value.strip():
+            continue
+        try:
+            timeouts[name] = float(value)
+        except ValueError:
+            logger.warning("忽略无效的工具超时配置: %s", item)
+    return timeouts
+
+
+class ToolCallExecutor:
+    """并发执行一次模型回复里的工具调用。"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        default_timeout: Optional[float] = 15.0,
+        timeouts: Optional[Mapping[str, float]] = None,
+    ):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.default_timeout = default_timeout if default_timeout and default_timeout > 0 else None
+        self.timeouts = dict(timeouts or {})
+
+    def timeout_for(self, tool_name: str) -> Optional[float]:
+        timeout = self.timeouts.get(tool_name, self.default_timeout)
+        return timeout if timeout and timeout > 0 else None
+
+    async def run(
+        self,
+        tool_calls: Sequence[Mapping[str, Any]],
+        tool_map: Mapping[str, Any],
+        config: Optional[dict] = None,
+    ) -> List[ToolCallOutcome]:
+        """执行全部调用，返回与 ``tool_calls`` 一一对应的结果列表。"""
+        if not tool_calls:
+            return []
+
+        # 信号量按回复创建：限制的是单次扇出，不让某一轮独占连接池
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return list(
+            await asyncio.gather(
+                *(self._run_one(tool_call, tool_map, config, semaphore) for tool_call in tool_calls)
+            )
+        )
+
+    async def _run_one(
+        self,
+        tool_call: Mapping[str, Any],
+        tool_map: Mapping[str, Any],
+        config: Optional[dict],
+        semaphore: asyncio.Semaphore,
+    ) -> ToolCallOutcome:
+        outcome = ToolCallOutcome(
+            name=tool_call["name"],
+            args=tool_call.get("args") or {},
+            call_id=tool_call.get("id"),
+        )
+        tool = tool_map.get(outcome.name)
+        if tool is None:
+            outcome.outcome = OUTCOME_MISSING
+            outcome.error = f"工具不存在: {outcome.name}"
+            return outcome
+
+        timeout = self.timeout_for(outcome.name)
+        async with semaphore:
+            logger.info("Calling tool: %s args=%s", outcome.name, outcome.args)
+            started = time.perf_counter()
+            try:
+                outcome.result = await asyncio.wait_for(
+                    tool.ainvoke(outcome.args, config=config),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                outcome.outcome = OUTCOME_TIMEOUT
+                outcome.error = f"工具调用超时（{timeout:g} 秒）"
+                logger.warning("Tool call timed out: %s after %ss", outcome.name, timeout)
+            except Exception as exc:
+                outcome.outcome = OUTCOME_ERROR
+                outcome.error = str(exc)
+                logger.error("Tool call failed: %s error=%s", outcome.name, exc)
+            finally:
+                outcome.duration = time.perf_counter() - started
+
+        TOOL_CALL_LATENCY.observe(outcome.duration, tool=outcome.name, outcome=outcome.outcome)
+        return outcome
+
+
+_executor: Optional[ToolCallExecutor] = None
+
+
+def get_tool_executor() -> ToolCallExecutor:
+    """返回按 ``TOOL_MAX_CONCURRENCY`` / ``TOOL_CALL_TIMEOUT(S)`` 配置的共享执行器。"""
+    global _executor
+    if _executor is None:
+        from config import settings
+
+        _executor = ToolCallExecutor(
+            max_concurrency=getattr(settings, "TOOL_MAX_CONCURRENCY", 4),
+            default_timeout=getattr(settings, "TOOL_CALL_TIMEOUT", 15.0),
+            timeouts=parse_tool_timeouts(getattr(settings, "TOOL_CALL_TIMEOUTS", "")),
+        )
+    return _executor
+
+
+__all__ = [
+    "OUTCOME_ERROR",
+    "OUTCOME_MISSING",
+    "OUTCOME_OK",
+    "OUTCOME_TIMEOUT",
+    "ToolCallExecutor",
+    "ToolCallOutcome",
+    "get_tool_executor",
+    "parse_tool_timeouts",
+]
@@ -0,0 +1,193 @@
+"""结构化意图的确定性工具规划。
+
+函数调用节点对 ``SKIP_INTENTS`` 以外的每个意图都要先问一次 LLM 该调哪个工具。
+很多请求其实已经把参数写在消息里：带 ``ORD…`` 订单号的订单查询、带商品 ID 或
+书名号商品名的商品咨询。``ToolPlanner`` 按业务包配置的规则，把 (意图, 槽位) 直接映射成工具调用：
+
+- 槽位由内置抽取器从消息中提取（``order_no`` / ``product_id`` / ``product_name``），
+  同一槽位抽到多个不同取值视为有歧义
+- 规则按配置顺序匹配，第一条意图、关键词都满足且槽位齐全的规则生效；
+  工具未在当前业务包启用的规则直接跳过
+- 槽位缺失或有歧义时不做规划，仍由 LLM 选择工具
+
+业务包配置（``tool_planner``）::
+
+    tool_planner:
+      enabled: true
+      rules:
+        - intent: 订单查询
+          keywords: [物流, 快递]      # 可选，消息需命中其一
+          tool: get_logistics
+          args: {order_no: order_no}  # 工具参数 -> 槽位
+
+每次规划的结果按意图写入 ``ai_tool_planner_total``：``planned`` 为省掉的 LLM 工具选择调用，
+``missing`` / ``ambiguous`` / ``no_rule`` 为退回 LLM 的原因。
+"""
+from __future__ import annotations
+
+import logging
+import re
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .constants import INTENT_ORDER_QUERY, INTENT_PRODUCT_INQUIRY
+
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+RESULT_PLANNED = "planned"
+RESULT_MISSING = "missing"
+RESULT_AMBIGUOUS = "ambiguous"
+RESULT_NO_RULE = "no_rule"
+
+TOOL_PLANNER_RESULTS = registry.counter(
+    "ai_tool_planner_total",
+    "Deterministic tool planning by intent and result: planned, missing, ambiguous, no_rule.",
+    ("intent", "result"),
+)
+
+_ORDER_NO_RE = re.compile(r"(?<![A-Za-z0-9])ORD\d{6,}[A-Z0-9]*(?![A-Za-z0-9])")
+_PRODUCT_ID_RE = re.compile(
+    r"(?<![0-9a-fA-F-])[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?![0-9a-fA-F-])"
+)
+_PRODUCT_NAME_RE = re.compile(r"《([^《》]{2,60})》|「([^「」]{2,60})」|“([^“”]{2,60})”")
+
+
+def _extract_order_no(message: str) -> List[str]:
+    return _ORDER_NO_RE.findall(message)
+
+
+def _extract_product_id(message: str) -> List[str]:
+    return [value.lower() for value in _PRODUCT_ID_RE.findall(message)]
+
+
+def _extract_product_name(message: str) -> List[str]:
+    return [next(group for group in groups if group).strip() for groups in _PRODUCT_NAME_RE.findall(message)]
+
+
+SLOT_EXTRACTORS: Dict[str, Callable[[str], List[str]]] = {
+    "order_no": _extract_order_no,
+    "product_id": _extract_product_id,
+    "product_name": _extract_product_name,
+}
+
+DEFAULT_RULES: Tuple[Dict[str, Any], ...] = (
+    {
+        "intent": INTENT_ORDER_QUERY,
+        "keywords": ["物流", "快递", "发货", "到哪", "签收"],
+        "tool": "get_logistics",
+        "args": {"order_no": "order_no"},
+    },
+    {"intent": INTENT_ORDER_QUERY, "tool": "query_order", "args": {"order_no": "order_no"}},
+    {
+        "intent": INTENT_PRODUCT_INQUIRY,
+        "keywords": ["库存", "还有货", "有没有货", "卖完"],
+        "tool": "check_inventory",
+        "args": {"product_id": "product_id"},
+    },
+    {"intent": INTENT_PRODUCT_INQUIRY, "tool": "search_products", "args": {"keyword": "product_name"}},
+)
+
+
+@dataclass(frozen=True)
+class ToolPlanRule:
+    intent: str
+    tool: str
+    args: Mapping[str, str]
+    keywords: Tuple[str, ...] = ()
+
+    def matches(self, intent: Optional[str], message: str) -> bool:
+        if intent != self.intent:
+            return False
+        return not self.keywords or any(keyword in message for keyword in self.keywords)
+
+
+@dataclass
+class ToolPlan:
+    """一次规划的结果；``tool_calls`` 与 LLM 返回的 ``tool_calls`` 格式一致。"""
+
+    result: str
+    tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+    rule: Optional[ToolPlanRule] = None
+
+    @property
+    def planned(self) -> bool:
+        return self.result == RESULT_PLANNED
+
+
+def _parse_rules(raw_rules: Iterable[Mapping[str, Any]]) -> List[ToolPlanRule]:
+    rules: List[ToolPlanRule] = []
+    for raw in raw_rules:
+        intent, tool, args = raw.get("intent"), raw.get("tool"), raw.get("args") or {}
+        unknown_slots = [slot for slot in args.values() if slot not in SLOT_EXTRACTORS]
+        if not intent or not tool or not args or unknown_slots:
+            logger.warning("Ignoring invalid tool planner rule: %s", raw)
+            continue
+        rules.append(
+            ToolPlanRule(
+                intent=intent,
+                tool=tool,
+                args=dict(args),
+                keywords=tuple(raw.get("keywords") or ()),
+            )
+        )
+    return rules
+
+
+class ToolPlanner:
+    """按规则把 (意图, 槽位) 映射为工具调用，见模块说明。"""
+
+    def __init__(self, rules: Sequence[ToolPlanRule], *, enabled: bool = True):
+        self.rules = list(rules)
+        self.enabled = enabled
+
+    @classmethod
+    def from_business_config(cls, config: Optional[Mapping[str, Any]]) -> "ToolPlanner":
+        section = (config or {}).get("tool_planner") or {}
+        raw_rules = section.get("rules")
+        return cls(
+            _parse_rules(DEFAULT_RULES if raw_rules is None else raw_rules),
+            enabled=bool(section.get("enabled", True)),
+        )
+
+    def plan(self, intent: Optional[str], message: str, available_tools: Iterable[str]) -> ToolPlan:
+        plan = self._plan(intent, message or "", set(available_tools))
+        if self.enabled:
+            TOOL_PLANNER_RESULTS.inc(intent=intent or "", result=plan.result)
+        return plan
+
+    def _plan(self, intent: Optional[str], message: str, available_tools: set) -> ToolPlan:
+        if not self.enabled:
+            return ToolPlan(RESULT_NO_RULE)
+
+        # 没有规则命中记为 no_rule；有规则命中但都没能填齐槽位时，记录最先遇到的原因
+        fallback = RESULT_NO_RULE
+        slot_cache: Dict[str, List[str]] = {}
+        for rule in self.rules:
+            if rule.tool not in available_tools or not rule.matches(intent, message):
+                continue
+
+            args: Dict[str, Any] = {}
+            for arg_name, slot in rule.args.items():
+                if slot not in slot_cache:
+                    slot_cache[slot] = list(dict.fromkeys(SLOT_EXTRACTORS[slot](message)))
+                values = slot_cache[slot]
+                if len(values) != 1:
+                    reason = RESULT_MISSING if not values else RESULT_AMBIGUOUS
+                    fallback = reason if fallback == RESULT_NO_RULE else fallback
+                    break
+                args[arg_name] = values[0]
+            else:
+                tool_call = {"name": rule.tool, "args": args, "id": f"plan_{uuid.uuid4().hex[:12]}"}
+                return ToolPlan(RESULT_PLANNED, [tool_call], rule)
+        return ToolPlan(fallback)
+
+
+__all__ = [
+    "SLOT_EXTRACTORS",
+    "ToolPlan",
+    "ToolPlanRule",
+    "ToolPlanner",
+]
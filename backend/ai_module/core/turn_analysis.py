@@ -0,0 +1,275 @@
+"""已有活动流程时的单次轮次分析。
+
+流程中的一句话原本可能串行触发三次 LLM 调用：``TurnUnderstandingNode`` 推断对话动作和槽位、
+``MessageEntryNode`` 判断这句话对当前流程的作用、切换任务时 ``IntentRecognitionNode`` 再做一次
+全局意图识别。这里把三者合并为一个结构化输出提示词：
+
+- ``MergedTurnAnalysis``：一轮内的分析会话，第一个需要 LLM 的环节触发唯一一次调用，
+  之后的环节直接复用同一份结果；只有确实需要 LLM 时才会调用
+- ``TurnAnalysis``：输出 schema，标签必须来自固定集合，业务意图必须是当前业务包的标签，
+  校验失败视为没有结果
+- ``merged_turn_analysis(session)``：在上下文中激活会话，各环节用 ``current_turn_analysis()`` 取用；
+  未激活、调用失败或校验失败时，各环节退回原来各自的 LLM 调用
+
+结果写入 ``ai_turn_analysis_total``：``merged`` 合并调用成功、``reused`` 后续环节复用
+（即省下的一次往返）、``invalid`` 输出未通过校验、``error`` 调用失败。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, ValidationError, ValidationInfo, field_validator
+
+from .constants import DIALOGUE_ACTS, INFLOW_TYPES
+
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+SLOT_KEYS = ("budget_max", "budget_target", "language", "difficulty", "price_preference")
+
+RESULT_MERGED = "merged"
+RESULT_REUSED = "reused"
+RESULT_INVALID = "invalid"
+RESULT_ERROR = "error"
+
+TURN_ANALYSIS_CALLS = registry.counter(
+    "ai_turn_analysis_total",
+    "Merged in-flow turn analysis by result: merged, reused, invalid, error.",
+    ("result",),
+)
+
+DEFAULT_SYSTEM_PROMPT = """你是对话理解器，不直接回复用户。用户当前正处在一个进行中的业务流程里。
+一次性判断这句话的对话动作、对当前流程的作用、补充的槽位和它本身的业务意图。
+只输出一个 JSON 对象，不要输出解释，不要输出 markdown。
+
+输出字段：
+- dialogue_act: 必须是 new_request/confirm/reject/provide_slot/select_item/correct/switch_topic/resume_task/unclear 之一
+- inflow_type: 必须是 valid_current_input/related_question/related_blocker/correction/switch_flow/cancel_flow/handoff/irrelevant/unknown 之一
+- domain_intent: 这句话在当前流程语境下的业务标签，必须是 valid_intents 之一；不确定时填 null
+- global_intent: 不考虑当前流程、只看这句话本身时的业务标签，必须是 valid_intents 之一；不确定时填 null
+- global_intent_confidence: global_intent 的置信度，0 到 1 之间的小数
+- self_contained_request: 布尔值，这句话本身是否足以作为一个新的独立请求
+- continue_previous_task: 布尔值，这句话是否明显是在继续当前流程
+- need_clarification: 布尔值，这句话是否过于模糊，系统应该先澄清
+- confidence: 整体判断的置信度，0 到 1 之间的小数
+- slot_updates: 对象，可提取 budget_max、budget_target、language、difficulty、price_preference，提取不到就输出 {{}}
+
+判断原则：
+1. 只有当消息可以被当前流程直接消费时，inflow_type 才用 valid_current_input。
+2. 只有当用户明确开启不同业务任务时，inflow_type 才用 switch_flow。
+3. irrelevant 用于不会替换当前任务、但值得自然接住的插话或闲聊。
+4. 消息过于模糊、无法安全执行时，inflow_type 用 unknown，need_clarification 为 true。
+5. 句子本身已经表达完整需求时，优先视为 self_contained_request=true。
+6. 不要编造标签；rule_guess 是规则的初步判断，仅供参考。"""
+
+
+def extract_json_block(text: str) -> Optional[str]:
+    if not text:
+        return None
+    fenced = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, re.DOTALL)
+    if fenced:
+        return fenced.group(1)
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end == -1 or end <= start:
+        return None
+    return text[start : end + 1]
+
+
+def _clamp_confidence(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return max(0.0, min(1.0, float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+class TurnAnalysis(BaseModel):
+    """合并调用的输出 schema；业务标签按 ``context={"valid_intents": ...}`` 校验。"""
+
+    dialogue_act: str
+    inflow_type: str
+    domain_intent: Optional[str] = None
+    global_intent: Optional[str] = None
+    global_intent_confidence: Optional[float] = None
+    self_contained_request: bool = False
+    continue_previous_task: bool = False
+    need_clarification: bool = False
+    confidence: Optional[float] = None
+    slot_updates: Dict[str, Any] = {}
+
+    @field_validator("dialogue_act")
+    @classmethod
+    def _check_dialogue_act(cls, value: str) -> str:
+        if value not in DIALOGUE_ACTS:
+            raise ValueError(f"unknown dialogue_act: {value}")
+        return value
+
+    @field_validator("inflow_type")
+    @classmethod
+    def _check_inflow_type(cls, value: str) -> str:
+        if value not in INFLOW_TYPES:
+            raise ValueError(f"unknown inflow_type: {value}")
+        return value
+
+    @field_validator("domain_intent", "global_intent", mode="before")
+    @classmethod
+    def _check_intent(cls, value: Any, info: ValidationInfo) -> Optional[str]:
+        # 模型常把“不确定”写成空串或 "null"，统一按未识别处理；不在业务包里的标签同样丢弃
+        valid_intents = (info.context or {}).get("valid_intents")
+        if not isinstance(value, str) or not value or value == "null":
+            return None
+        if valid_intents is not None and value not in valid_intents:
+            return None
+        return value
+
+    @field_validator("global_intent_confidence", "confidence", mode="before")
+    @classmethod
+    def _check_confidence(cls, value: Any) -> Optional[float]:
+        return _clamp_confidence(value)
+
+    @field_validator("slot_updates", mode="before")
+    @classmethod
+    def _check_slot_updates(cls, value: Any) -> Dict[str, Any]:
+        if not isinstance(value, dict):
+            return {}
+        return {key: item for key, item in value.items() if key in SLOT_KEYS and item not in (None, "")}
+
+    def understanding(self) -> Dict[str, Any]:
+        """``TurnUnderstandingNode._infer_with_llm`` 的返回格式。"""
+        return {
+            "dialogue_act": self.dialogue_act,
+            "domain_intent": self.domain_intent,
+            "self_contained_request": self.self_contained_request,
+            "continue_previous_task": self.continue_previous_task,
+            "need_clarification": self.need_clarification,
+            "confidence": self.confidence,
+            "slot_updates": dict(self.slot_updates),
+        }
+
+    def inflow(self) -> Dict[str, Any]:
+        """``MessageEntryNode._infer_inflow_with_llm`` 的返回格式。"""
+        return {
+            "inflow_type": self.inflow_type,
+            "domain_intent": self.domain_intent,
+            "continue_previous_task": self.continue_previous_task,
+            "need_clarification": self.need_clarification,
+            "confidence": self.confidence,
+        }
+
+
+def parse_turn_analysis(raw: str, valid_intents: Optional[Iterable[str]] = None) -> Optional[TurnAnalysis]:
+    """解析并校验模型输出；任何字段不合法都返回 None，由调用方退回逐个调用。"""
+    json_block = extract_json_block(raw)
+    if not json_block:
+        return None
+    try:
+        payload = json.loads(json_block)
+        if not isinstance(payload, dict):
+            return None
+        context = {"valid_intents": set(valid_intents)} if valid_intents is not None else None
+        return TurnAnalysis.model_validate(payload, context=context)
+    except (ValueError, ValidationError) as exc:
+        logger.info("Turn analysis output rejected: %s", exc)
+        return None
+
+
+def build_prompt_template(runtime: Any = None) -> ChatPromptTemplate:
+    def compile_template() -> ChatPromptTemplate:
+        configured = runtime.get_prompt("turn_analysis_system_prompt") if runtime is not None else None
+        return ChatPromptTemplate.from_messages(
+            [("system", configured or DEFAULT_SYSTEM_PROMPT), ("human", "{input_payload}")]
+        )
+
+    # 模板只由业务包快照决定，按快照缓存，热更新后随新快照重建
+    get_compiled = getattr(runtime, "get_compiled", None)
+    if get_compiled is None:
+        return compile_template()
+    return get_compiled("turn_analysis_prompt", compile_template)
+
+
+def _count(result: str) -> None:
+    TURN_ANALYSIS_CALLS.inc(result=result)
+
+
+class MergedTurnAnalysis:
+    """一轮内最多调用一次 LLM 的轮次分析会话。
+
+    ``build_payload`` 在第一次 ``get`` 时才调用，此时规则阶段已经写入状态，
+    提示词里可以带上规则的初步判断。
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        *,
+        build_payload: Callable[[], Dict[str, Any]],
+        valid_intents: Iterable[str],
+        runtime: Any = None,
+    ):
+        self.llm = llm
+        self.build_payload = build_payload
+        self.valid_intents = list(valid_intents)
+        self.runtime = runtime
+        self.attempted = False
+        self.analysis: Optional[TurnAnalysis] = None
+
+    async def get(self, rule_guess: Optional[Dict[str, Any]] = None) -> Optional[TurnAnalysis]:
+        if self.attempted:
+            if self.analysis is not None:
+                _count(RESULT_REUSED)
+            return self.analysis
+        self.attempted = True
+
+        payload = self.build_payload()
+        payload["valid_intents"] = self.valid_intents
+        if rule_guess is not None:
+            payload["rule_guess"] = rule_guess
+        try:
+            prompt = build_prompt_template(self.runtime)
+            response = await self.llm.ainvoke(
+                prompt.format_messages(input_payload=json.dumps(payload, ensure_ascii=False, indent=2))
+            )
+        except Exception as exc:
+            logger.warning("Merged turn analysis failed, falling back to separate calls: %s", exc)
+            _count(RESULT_ERROR)
+            return None
+
+        raw = response.content if hasattr(response, "content") else str(response)
+        self.analysis = parse_turn_analysis(raw, self.valid_intents)
+        _count(RESULT_MERGED if self.analysis is not None else RESULT_INVALID)
+        return self.analysis
+
+
+_current: ContextVar[Optional[MergedTurnAnalysis]] = ContextVar("ai_turn_analysis", default=None)
+
+
+def current_turn_analysis() -> Optional[MergedTurnAnalysis]:
+    return _current.get()
+
+
+@contextmanager
+def merged_turn_analysis(session: Optional[MergedTurnAnalysis]) -> Iterator[Optional[MergedTurnAnalysis]]:
+    token = _current.set(session)
+    try:
+        yield session
+    finally:
+        _current.reset(token)
+
+
+__all__ = [
+    "MergedTurnAnalysis",
+    "TurnAnalysis",
+    "current_turn_analysis",
+    "extract_json_block",
+    "merged_turn_analysis",
+    "parse_turn_analysis",
+]
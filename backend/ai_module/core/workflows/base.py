@@ -5,6 +5,9 @@ from abc import ABC, abstractmethod
 from typing import AsyncIterator
 
 from ..state import ConversationState
+from ..streaming import StreamChunk
+
+from services.telemetry import traced
 
 
 class BaseWorkflow(ABC):
@@ -13,12 +16,22 @@ class BaseWorkflow(ABC):
     name: str = "workflow"
     stream_enabled: bool = False
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        execute = cls.__dict__.get("execute")
+        if execute is not None and not getattr(execute, "__isabstractmethod__", False):
+            cls.execute = traced("workflow", cls.__dict__.get("name", cls.__name__))(execute)
+
     @abstractmethod
     async def execute(self, state: ConversationState) -> ConversationState:
         """Execute a full workflow turn and return updated conversation state."""
 
-    async def execute_stream(self, state: ConversationState) -> AsyncIterator[str]:
-        """Stream workflow output token-by-token when supported."""
+    async def execute_stream(self, state: ConversationState) -> AsyncIterator[StreamChunk]:
+        """Stream workflow output.
+
+        Workflows without an LLM answer step emit the finished response as one
+        message; LLM-backed workflows override this and forward ``astream`` deltas.
+        """
         result = await self.execute(state)
-        for char in result.get("response", ""):
-            yield char
+        if result.get("response"):
+            yield result["response"]
@@ -4,10 +4,28 @@ from __future__ import annotations
 import logging
 import re
 
+from ...speculation import PREFETCH_ORDER_LIST, claim_prefetched
 from .contracts import OrderQueryMode
 
 logger = logging.getLogger(__name__)
 
+RECENT_ORDERS_PAGE_SIZE = 100  # 订单详情在最近的订单里按订单号查找
+ORDER_LIST_PAGE_SIZE = 10  # 订单列表只展示最近 10 笔
+
+
+def recent_orders_page_size(mode: OrderQueryMode) -> int:
+    return RECENT_ORDERS_PAGE_SIZE if mode == OrderQueryMode.DETAIL else ORDER_LIST_PAGE_SIZE
+
+
+async def fetch_recent_orders(user_id: str, page_size: int = RECENT_ORDERS_PAGE_SIZE) -> list:
+    """查询用户最近的订单，订单详情/列表处理与推测式预取共用。"""
+    from database.connection import get_db_context
+    from services.order_service import OrderService
+
+    async with get_db_context() as db:
+        result = await OrderService(db).list_orders(user_id=user_id, page=1, page_size=page_size)
+    return result.get("items", [])
+
 
 class OrderQueryService:
     """Operational logic behind the order query workflow."""
@@ -138,14 +156,17 @@ class OrderQueryService:
         from database.connection import get_db_context
         from services.order_service import OrderService
 
+        orders = await claim_prefetched(state, PREFETCH_ORDER_LIST, (state["user_id"], OrderQueryMode.DETAIL))
+
         async with get_db_context() as db:
             order_service = OrderService(db)
-            result = await order_service.list_orders(
-                user_id=state["user_id"],
-                page=1,
-                page_size=100,
-            )
-            orders = result.get("items", [])
+            if orders is None:
+                result = await order_service.list_orders(
+                    user_id=state["user_id"],
+                    page=1,
+                    page_size=RECENT_ORDERS_PAGE_SIZE,
+                )
+                orders = result.get("items", [])
 
             target_order = None
             for order in orders:
@@ -237,17 +258,10 @@ class OrderQueryService:
             ]
             return state
 
-        from database.connection import get_db_context
-        from services.order_service import OrderService
-
-        async with get_db_context() as db:
-            order_service = OrderService(db)
-            result = await order_service.list_orders(
-                user_id=state["user_id"],
-                page=1,
-                page_size=10,
-            )
-            orders = result.get("items", [])
+        orders = await claim_prefetched(state, PREFETCH_ORDER_LIST, (state["user_id"], OrderQueryMode.LIST))
+        if orders is None:
+            orders = await fetch_recent_orders(state["user_id"], page_size=ORDER_LIST_PAGE_SIZE)
+        orders = orders[:ORDER_LIST_PAGE_SIZE]
 
         if not orders:
             state["response"] = "您还没有订单记录。如果您想购买商品，可以前往商城首页浏览。"
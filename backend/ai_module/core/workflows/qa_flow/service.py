@@ -8,21 +8,36 @@ from langchain_core.prompts import ChatPromptTemplate
 
 from config import settings
 from services.knowledge_retriever import knowledge_retriever
+from services.startup import aresolve_lazy
 
-from ...memory_builder import MemoryContextBuilder
 from ...out_of_scope_reply import compose_out_of_scope_reply
-
-memory_builder = MemoryContextBuilder()
-_file_service = None
-
-
-def _get_file_service():
-    global _file_service
-    if _file_service is None:
-        from services.file_service import FileService
-
-        _file_service = FileService()
-    return _file_service
+from ...prompt_context import prompt_context
+from ...speculation import PREFETCH_KNOWLEDGE_DOCS, claim_prefetched
+
+
+async def search_knowledge_candidates(query: str):
+    """推测式预取只做向量/BM25 检索；改写、重排要调用 LLM，等确认走问答后再执行。"""
+    retriever = await aresolve_lazy(knowledge_retriever)
+    return await retriever.search_candidates(
+        query=query,
+        collection_name="knowledge_base",
+        top_k=settings.RETRIEVAL_TOP_K,
+        use_hybrid=settings.RAG_USE_HYBRID_SEARCH,
+    )
+
+
+async def retrieve_knowledge_docs(query: str, candidates=None):
+    """按全局 RAG 配置检索知识库；``candidates`` 为预取到的候选，传入时跳过原始查询的检索。"""
+    retriever = await aresolve_lazy(knowledge_retriever)
+    return await retriever.retrieve(
+        query=query,
+        collection_name="knowledge_base",
+        top_k=settings.RETRIEVAL_TOP_K,
+        use_hybrid=settings.RAG_USE_HYBRID_SEARCH,
+        use_rerank=settings.RAG_USE_RERANK,
+        use_query_rewrite=settings.RAG_USE_QUERY_REWRITE,
+        candidates=candidates,
+    )
 
 
 _GREETING_RE = re.compile(
@@ -48,6 +63,44 @@ SIMPLE_PROMPT = ChatPromptTemplate.from_messages(
 )
 
 
+RAG_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """你是 {business_name} 的 AI 客服助手。
+你的首要职责是处理与当前业务、知识库资料和用户附件相关的问题。
+
+规则:
+1. 只有当用户问题与当前业务、知识库或附件明确相关时，才结合资料回答。
+2. 如果用户问题明显超出当前业务范围，或者检索到的资料不足以支撑回答，不要强行把无关知识拼进回答。
+3. 这类情况请直接礼貌拒绝，并自然引导用户回到当前业务，可参考用户消息中给出的引导方向。
+4. 即使知识库里有内容，只要和用户当前问题不相关，也不要引用它们来硬答。
+5. 如果问题属于业务范围，但资料不足，请明确说明当前没有足够信息，不要编造。
+6. 回复保持简洁、自然、专业，优先控制在 2 到 4 句。""",
+        ),
+        (
+            "human",
+            """当前业务说明：
+{business_profile}
+
+引导方向：{scope_hint}
+
+知识库内容：
+{docs}
+
+附件内容：
+{attachments}
+{conversation_summary_section}
+历史对话：
+{short_term_memory}
+
+用户问题：
+{question}""",
+        ),
+    ]
+)
+
+
 class QAFlowService:
     """Operational logic behind the QA workflow."""
 
@@ -122,41 +175,8 @@ class QAFlowService:
         return configured or ""
 
     def build_rag_prompt(self, state) -> ChatPromptTemplate:
-        return ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """你是 {business_name} 的 AI 客服助手。
-你的首要职责是处理与当前业务、知识库资料和用户附件相关的问题。
-
-规则:
-1. 只有当用户问题与当前业务、知识库或附件明确相关时，才结合资料回答。
-2. 如果用户问题明显超出当前业务范围，或者检索到的资料不足以支撑回答，不要强行把无关知识拼进回答。
-3. 这类情况请直接礼貌拒绝，并自然引导用户回到当前业务，可参考引导方向：{scope_hint}。
-4. 即使知识库里有内容，只要和用户当前问题不相关，也不要引用它们来硬答。
-5. 如果问题属于业务范围，但资料不足，请明确说明当前没有足够信息，不要编造。
-6. 回复保持简洁、自然、专业，优先控制在 2 到 4 句。
-{conversation_summary_section}""",
-                ),
-                (
-                    "human",
-                    """当前业务说明：
-{business_profile}
-
-知识库内容：
-{docs}
-
-附件内容：
-{attachments}
-
-历史对话：
-{short_term_memory}
-
-用户问题：
-{question}""",
-                ),
-            ]
-        )
+        # 模板只含占位符，与业务包无关，模块加载时构建一次
+        return RAG_PROMPT
 
     async def prepare_messages(self, state):
         user_message = state["user_message"]
@@ -167,33 +187,18 @@ class QAFlowService:
             state["_qa_messages"] = SIMPLE_PROMPT.format_messages(question=user_message)
             return state["_qa_messages"]
 
-        attachment_texts = []
-        file_service = _get_file_service()
-        for attachment in state.get("attachments") or []:
-            file_path = attachment.get("file_path", "")
-            if not file_path:
-                continue
-            text = file_service.extract_text(file_path)
-            if text:
-                attachment_texts.append(f"《{attachment.get('file_name', '文件')}》\n{text[:5000]}")
-
-        docs = await knowledge_retriever.retrieve(
-            query=user_message,
-            collection_name="knowledge_base",
-            top_k=settings.RETRIEVAL_TOP_K,
-            use_hybrid=settings.RAG_USE_HYBRID_SEARCH,
-            use_rerank=settings.RAG_USE_RERANK,
-            use_query_rewrite=settings.RAG_USE_QUERY_REWRITE,
-        )
+        candidates = await claim_prefetched(state, PREFETCH_KNOWLEDGE_DOCS, user_message)
+        docs = await retrieve_knowledge_docs(user_message, candidates=candidates)
         state["retrieved_docs"] = [{"content": doc.page_content, "metadata": doc.metadata} for doc in docs]
         state["sources"] = [doc.metadata for doc in docs]
 
-        docs_text = "\n\n".join(f"文档{i + 1}：{doc.page_content}" for i, doc in enumerate(docs)) or "无"
-        attachment_content = "\n\n".join(attachment_texts) if attachment_texts else "无"
-        short_term_memory = memory_builder.build_short_term_memory_text(state)
+        docs_text = prompt_context.docs(state, consumer="qa") or "无"
+        attachment_content = prompt_context.attachments(state, consumer="qa") or "无"
+        short_term_memory = prompt_context.short_term_memory(state, consumer="qa")
 
-        summary = state.get("conversation_summary", "")
-        conversation_summary_section = f"\n对话历史摘要：\n{summary}" if summary else ""
+        summary = prompt_context.summary(state, consumer="qa")
+        # 摘要、引导方向随轮次变化，放在用户消息里，系统提示词保持按业务包不变，便于命中前缀缓存
+        conversation_summary_section = f"\n对话历史摘要：\n{summary}\n" if summary else ""
 
         state["_qa_messages"] = self.build_rag_prompt(state).format_messages(
             business_name=self.business_name(state),
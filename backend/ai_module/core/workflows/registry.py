@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Callable, Dict, Optional
+from typing import Callable, Dict, List, Optional
 
 from .base import BaseWorkflow
 
@@ -44,3 +44,6 @@ class WorkflowRegistry:
         if registration is None or not registration.stream_enabled:
             return None
         return self._resolve(registration)
+
+    def names(self) -> List[str]:
+        return list(self._workflows)
@@ -0,0 +1,282 @@
+"""选题助手智能体循环的预算控制与跨轮观察记忆。
+
+智能体循环原本最多调用 5 次 LLM 再强制总结一次，没有时间和 token 上限；工具结果在本轮结束后丢弃，
+用户下一句“第二个怎么样”又会触发同样的搜索。这里提供：
+
+- ``AgentBudget``：每轮的迭代次数、耗时（秒）和 token 上限，来自 ``TOPIC_ADVISOR_AGENT_*`` 配置
+- ``AgentLoopController``：在每次调用 LLM 前检查预算；模型重复请求本轮已经拿到结果的工具调用时
+  提前结束（说明已有信息足够回答），两种情况都转入强制总结
+- ``ObservationStore``：按会话保存 ``search_projects`` / ``get_project_detail`` 的成功结果，
+  存放在共享缓存的 ``topic_advisor_observations`` 命名空间，多 worker 可见。之后轮次的相同调用
+  直接复用，已获取的项目摘要也写进提示词，模型可以直接引用而不必重新查询。该命名空间只走共享层，
+  保存时重新读取并只合并本轮新增的条目，不会用本进程的旧值覆盖其他 worker 写入的观察
+
+循环的结束原因写入 ``ai_topic_advisor_agent_stops_total``（answered / repeated / iterations / time / tokens），
+工具调用按是否复用写入 ``ai_topic_advisor_observations_total``（reused / fetched）。
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+REUSABLE_TOOLS = ("search_projects", "get_project_detail")
+
+STOP_ANSWERED = "answered"
+STOP_REPEATED = "repeated"
+STOP_ITERATIONS = "iterations"
+STOP_TIME = "time"
+STOP_TOKENS = "tokens"
+
+OBSERVATION_REUSED = "reused"
+OBSERVATION_FETCHED = "fetched"
+
+AGENT_STOPS = registry.counter(
+    "ai_topic_advisor_agent_stops_total",
+    "Topic advisor agent loop endings by reason: answered, repeated, iterations, time, tokens.",
+    ("reason",),
+)
+OBSERVATION_REQUESTS = registry.counter(
+    "ai_topic_advisor_observations_total",
+    "Reusable topic advisor tool calls by tool and result: reused, fetched.",
+    ("tool", "result"),
+)
+
+
+def observation_key(tool: str, args: Mapping[str, Any]) -> str:
+    """工具名 + 去掉空值后按键排序的参数；参数顺序或省略默认值不影响命中。"""
+    normalized = {key: value for key, value in (args or {}).items() if value not in (None, "")}
+    raw = json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str)
+    if len(raw) > 120:
+        raw = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return f"{tool}:{raw}"
+
+
+def response_tokens(response: Any) -> int:
+    """从模型回复上读取本次调用消耗的 token；服务商未返回用量时为 0。"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    metadata = getattr(response, "response_metadata", None) or {}
+    token_usage = metadata.get("token_usage") or {}
+    return int(token_usage.get("total_tokens") or 0)
+
+
+@dataclass(frozen=True)
+class AgentBudget:
+    max_iterations: int = 5
+    max_seconds: float = 20.0
+    max_tokens: int = 12000
+
+    @classmethod
+    def from_settings(cls, settings: Any = None) -> "AgentBudget":
+        if settings is None:
+            from config import settings
+        return cls(
+            max_iterations=int(getattr(settings, "TOPIC_ADVISOR_AGENT_MAX_ITERATIONS", cls.max_iterations)),
+            max_seconds=float(getattr(settings, "TOPIC_ADVISOR_AGENT_TIME_BUDGET_SECONDS", cls.max_seconds)),
+            max_tokens=int(getattr(settings, "TOPIC_ADVISOR_AGENT_TOKEN_BUDGET", cls.max_tokens)),
+        )
+
+
+class AgentLoopController:
+    """一轮智能体循环的预算与提前结束判断；``max_seconds`` / ``max_tokens`` 为 0 表示不限制该项。"""
+
+    def __init__(self, budget: AgentBudget, *, clock: Callable[[], float] = time.monotonic):
+        self.budget = budget
+        self.clock = clock
+        self.started_at = clock()
+        self.iterations = 0
+        self.tokens = 0
+        self.reason: Optional[str] = None
+        self._seen_calls: set = set()
+
+    @property
+    def elapsed(self) -> float:
+        return self.clock() - self.started_at
+
+    def exhausted(self) -> Optional[str]:
+        """调用 LLM 前检查预算，超出时返回原因。"""
+        if self.iterations >= max(1, self.budget.max_iterations):
+            return STOP_ITERATIONS
+        if self.budget.max_seconds and self.elapsed >= self.budget.max_seconds:
+            return STOP_TIME
+        if self.budget.max_tokens and self.tokens >= self.budget.max_tokens:
+            return STOP_TOKENS
+        return None
+
+    def record(self, response: Any) -> None:
+        self.iterations += 1
+        self.tokens += response_tokens(response)
+
+    def repeats(self, tool_calls: Iterable[Mapping[str, Any]]) -> bool:
+        """本次请求的工具调用全部在本轮执行过时为 True：模型没有新的信息需求，应直接作答。"""
+        keys = [observation_key(call.get("name", ""), call.get("args") or {}) for call in tool_calls]
+        if keys and all(key in self._seen_calls for key in keys):
+            return True
+        self._seen_calls.update(keys)
+        return False
+
+    def finish(self, reason: str) -> None:
+        self.reason = reason
+        if reason != STOP_ANSWERED:
+            logger.info(
+                "Topic advisor agent stopped early: reason=%s iterations=%s tokens=%s elapsed=%.2fs",
+                reason,
+                self.iterations,
+                self.tokens,
+                self.elapsed,
+            )
+        AGENT_STOPS.inc(reason=reason)
+
+
+def _count_observation(tool: str, result: str) -> None:
+    OBSERVATION_REQUESTS.inc(tool=tool, result=result)
+
+
+class SessionObservations:
+    """一个会话已获取的可复用工具结果，按写入顺序保留最近 ``max_entries`` 条。"""
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None, *, max_entries: int = 20):
+        self.entries: Dict[str, Dict[str, Any]] = dict(entries or {})
+        self.max_entries = max_entries
+        self.added: List[str] = []
+
+    def lookup(self, tool: str, args: Mapping[str, Any]) -> Optional[Any]:
+        if tool not in REUSABLE_TOOLS:
+            return None
+        entry = self.entries.get(observation_key(tool, args))
+        if entry is None:
+            return None
+        _count_observation(tool, OBSERVATION_REUSED)
+        return copy.deepcopy(entry["result"])
+
+    def remember(self, tool: str, args: Mapping[str, Any], result: Any) -> None:
+        if tool not in REUSABLE_TOOLS:
+            return
+        _count_observation(tool, OBSERVATION_FETCHED)
+        if not isinstance(result, dict) or not result.get("success"):
+            return
+        key = observation_key(tool, args)
+        # 经 JSON 往返后与共享层读出的结果一致
+        entry = json.loads(
+            json.dumps({"tool": tool, "args": dict(args or {}), "result": result}, ensure_ascii=False, default=str)
+        )
+        self._put(key, entry)
+        if key in self.added:
+            self.added.remove(key)
+        self.added.append(key)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.added)
+
+    def _put(self, key: str, entry: Dict[str, Any]) -> None:
+        self.entries.pop(key, None)
+        self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            self.entries.pop(next(iter(self.entries)))
+
+    def merged_into(self, current: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """把本轮新增的条目合并到共享层的最新内容上，保留其他 worker 期间写入的条目。"""
+        merged = SessionObservations(current, max_entries=self.max_entries)
+        for key in self.added:
+            if key in self.entries:
+                merged._put(key, self.entries[key])
+        return merged.entries
+
+    def summary(self, max_projects: int = 8) -> str:
+        """提示词里的已获取项目摘要；最近的结果在最后。"""
+        lines: List[str] = []
+        for entry in self.entries.values():
+            result = entry["result"]
+            if entry["tool"] == "search_projects":
+                args = entry.get("args") or {}
+                condition = json.dumps(args, ensure_ascii=False, sort_keys=True)
+                lines.append(f"- search_projects {condition}:")
+                for index, project in enumerate((result.get("projects") or [])[:max_projects], start=1):
+                    lines.append(
+                        f"  {index}. id={project.get('id')} {project.get('title', '')} "
+                        f"价格{project.get('price')} 难度{project.get('difficulty') or '未知'}"
+                    )
+            else:
+                lines.append(
+                    f"- get_project_detail id={result.get('project_id')}: {result.get('title', '')} "
+                    f"价格{result.get('price')} 技术栈{','.join(map(str, result.get('tech_stack') or []))}"
+                )
+        return "\n".join(lines)
+
+
+class ObservationStore:
+    """会话级观察记忆，存放在共享缓存；共享缓存不可用时不做跨轮复用。"""
+
+    def __init__(self, namespace: Any = None, *, max_entries: int = 20):
+        self._namespace = namespace
+        self.max_entries = max_entries
+
+    @classmethod
+    def from_settings(cls) -> "ObservationStore":
+        from config import settings
+        from services.shared_cache import get_shared_cache
+
+        namespace = get_shared_cache().namespace(
+            "topic_advisor_observations",
+            ttl_seconds=int(getattr(settings, "TOPIC_ADVISOR_OBSERVATION_TTL_SECONDS", 1800)),
+            shared_only=True,
+        )
+        return cls(namespace, max_entries=int(getattr(settings, "TOPIC_ADVISOR_OBSERVATION_MAX_ENTRIES", 20)))
+
+    async def _read(self, session_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        try:
+            entries = await self._namespace.get(session_id)
+        except Exception:
+            logger.warning("Failed to load topic advisor observations for session=%s", session_id, exc_info=True)
+            return None
+        return entries if isinstance(entries, dict) else None
+
+    async def load(self, session_id: Optional[str]) -> SessionObservations:
+        if self._namespace is None or not session_id:
+            return SessionObservations(max_entries=self.max_entries)
+        return SessionObservations(await self._read(session_id), max_entries=self.max_entries)
+
+    async def save(self, session_id: Optional[str], observations: SessionObservations) -> None:
+        if self._namespace is None or not session_id or not observations.dirty:
+            return
+        entries = observations.merged_into(await self._read(session_id))
+        try:
+            await self._namespace.set(session_id, entries)
+        except Exception:
+            logger.warning("Failed to save topic advisor observations for session=%s", session_id, exc_info=True)
+
+
+_store: Optional[ObservationStore] = None
+
+
+def get_observation_store() -> ObservationStore:
+    global _store
+    if _store is None:
+        try:
+            _store = ObservationStore.from_settings()
+        except Exception:
+            logger.warning("Shared cache unavailable, topic advisor observations stay within one turn", exc_info=True)
+            _store = ObservationStore()
+    return _store
+
+
+__all__ = [
+    "AgentBudget",
+    "AgentLoopController",
+    "ObservationStore",
+    "REUSABLE_TOOLS",
+    "SessionObservations",
+    "get_observation_store",
+    "observation_key",
+]
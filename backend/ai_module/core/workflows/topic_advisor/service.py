@@ -10,12 +10,24 @@ from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from services.function_tools import topic_advisor_tools
 
 from ...constants import DIALOGUE_ACT_REJECT, INTENT_RECOMMEND
+from ...prompt_context import prompt_context
 from ...state import ConversationState
+from ...streaming import astream_message, progress_event
+from ...tool_binding import build_tool_binding, tool_invocation_config
+from ...tool_execution import OUTCOME_MISSING, get_tool_executor
+from .agent_controller import (
+    STOP_ANSWERED,
+    STOP_REPEATED,
+    AgentBudget,
+    AgentLoopController,
+    SessionObservations,
+    get_observation_store,
+)
 from .contracts import TopicAdvisorMode
 
 logger = logging.getLogger(__name__)
 
-MAX_AGENT_ITERATIONS = 5
+FINAL_ANSWER_INSTRUCTION = "请直接给出最终推荐结论，不要再调用工具。"
 
 DEFAULT_SYSTEM_PROMPT = """你是毕业设计商城的智能选题助手智能体。
 你的目标是帮助用户完成选题、项目对比、技术栈匹配和个性化推荐。
@@ -40,6 +52,7 @@ class TopicAdvisorService:
     def __init__(self, llm=None, runtime=None):
         self.llm = llm
         self.runtime = runtime
+        self.prompt_context = prompt_context
         self.tools = []
         self.tool_map = {}
         self.llm_with_tools = None
@@ -49,35 +62,47 @@ class TopicAdvisorService:
         state.setdefault("topic_advisor_projects", [])
         state.setdefault("topic_advisor_tool_results", [])
 
-    def _refresh_tools(self, execution_context=None):
-        tools = []
+    def _refresh_tools(self):
+        # 复用运行时按业务包缓存的工具绑定，执行上下文在每次工具调用时注入。
+        binding = None
         if self.runtime is not None:
-            tools = self.runtime.get_langchain_tools(
-                "topic_advisor",
-                execution_context=execution_context,
-            )
-        if not tools:
-            tools = list(topic_advisor_tools)
+            binding = self.runtime.get_tool_binding("topic_advisor", self.llm)
+        if binding is None or not binding.tools:
+            binding = build_tool_binding(topic_advisor_tools, self.llm)
 
-        self.tools = tools
-        self.tool_map = {tool.name: tool for tool in tools}
-        self.llm_with_tools = self.llm.bind_tools(self.tools) if self.llm and self.tools else None
+        self.tools = list(binding.tools)
+        self.tool_map = dict(binding.tool_map)
+        self.llm_with_tools = binding.llm_with_tools
 
-    def _build_history_str(self, history: List[Dict[str, Any]]) -> str:
-        if not history:
+    def _build_history_str(self, history: List[Dict[str, Any]], memories: str = "") -> str:
+        if not history and not memories:
             return "无"
-        return "\n".join(
-            f"用户: {turn.get('user', '')}\n助手: {turn.get('assistant', '')}"
-            for turn in history[-5:]
-        )
+        parts = []
+        if memories:
+            parts.append("相关历史记忆:\n" + memories)
+        if history:
+            parts.append(
+                "\n".join(
+                    f"用户: {turn.get('user', '')}\n助手: {turn.get('assistant', '')}"
+                    for turn in history[-5:]
+                )
+            )
+        return "\n".join(parts)
 
     def _get_system_prompt(self) -> str:
         if self.runtime is None:
             return DEFAULT_SYSTEM_PROMPT
         return self.runtime.get_prompt("topic_advisor_system_prompt", DEFAULT_SYSTEM_PROMPT)
 
-    def _build_messages(self, state: ConversationState) -> List[Any]:
-        history_str = self._build_history_str(state.get("conversation_history", []))
+    def _build_messages(
+        self,
+        state: ConversationState,
+        observations: SessionObservations | None = None,
+    ) -> List[Any]:
+        history_str = self._build_history_str(
+            self.prompt_context.recent_turns(state, 5, consumer="topic_advisor"),
+            self.prompt_context.memories(state, consumer="topic_advisor"),
+        )
         user_id = state.get("user_id", "")
         business_id = state.get("business_id") or "default"
         business_name = business_id
@@ -100,15 +125,26 @@ class TopicAdvisorService:
             f"当前任务: {json.dumps(active_task, ensure_ascii=False)}\n"
             f"挂起任务数量: {len(task_stack)}\n"
         )
+        observation_summary = observations.summary() if observations is not None else ""
+        if observation_summary:
+            dialogue_context += (
+                "本会话已获取的项目（可直接引用，相同参数的查询会直接复用这些结果）:\n"
+                f"{observation_summary}\n"
+            )
 
+        # 系统提示词和业务档案在前、按轮变化的数据在后，同一业务包的请求共享可缓存的前缀
         return [
-            SystemMessage(content=self._get_system_prompt()),
-            HumanMessage(
+            SystemMessage(
                 content=(
+                    f"{self._get_system_prompt()}\n\n"
                     f"业务包: {business_id}\n"
-                    f"业务名称: {business_name}\n"
-                    f"用户ID: {user_id}\n"
+                    f"业务名称: {business_name}"
+                )
+            ),
+            HumanMessage(
+                content=(
                     f"历史对话:\n{history_str}\n\n"
+                    f"用户ID: {user_id}\n"
                     f"{dialogue_context}"
                     f"用户最新消息: {state.get('user_message', '')}"
                 )
@@ -199,96 +235,145 @@ class TopicAdvisorService:
         state["quick_actions"] = self._build_refinement_quick_actions()
         state["topic_advisor_tool_results"] = []
 
-    async def _run_agent_loop_stream(self, messages: list):
-        tool_call_log = []
+    def _new_controller(self) -> AgentLoopController:
+        return AgentLoopController(AgentBudget.from_settings())
+
+    async def _execute_tool_calls(
+        self,
+        tool_calls: list,
+        iteration: int,
+        messages: list,
+        tool_call_log: list,
+        tool_config: dict,
+        observations: SessionObservations | None = None,
+    ) -> None:
+        # 本会话已获取过的搜索和详情直接复用，其余调用并发执行，日志和 ToolMessage 仍按调用顺序追加
+        reused = {}
+        if observations is not None:
+            for index, tool_call in enumerate(tool_calls):
+                cached = observations.lookup(tool_call["name"], tool_call.get("args") or {})
+                if cached is not None:
+                    reused[index] = cached
+        pending = [tool_call for index, tool_call in enumerate(tool_calls) if index not in reused]
+        outcomes = iter(await get_tool_executor().run(pending, self.tool_map, config=tool_config))
+
+        for index, tool_call in enumerate(tool_calls):
+            if index in reused:
+                name, args, call_id = tool_call["name"], tool_call.get("args") or {}, tool_call.get("id")
+                result = reused[index]
+            else:
+                outcome = next(outcomes)
+                name, args, call_id = outcome.name, outcome.args, outcome.call_id
+                if outcome.ok:
+                    result = outcome.result
+                    if observations is not None:
+                        observations.remember(name, args, result)
+                elif outcome.outcome == OUTCOME_MISSING:
+                    result = {"error": f"未知工具: {name}"}
+                else:
+                    logger.error("Topic advisor tool failed: %s error=%s", name, outcome.error)
+                    result = {"error": outcome.error}
+
+            log_entry = {
+                "iteration": iteration + 1,
+                "tool": name,
+                "args": args,
+                "result": result,
+            }
+            if index in reused:
+                log_entry["reused"] = True
+            tool_call_log.append(log_entry)
+            messages.append(
+                ToolMessage(
+                    content=json.dumps(result, ensure_ascii=False, default=str),
+                    tool_call_id=call_id or f"call_{iteration}_{name}",
+                )
+            )
 
-        for iteration in range(MAX_AGENT_ITERATIONS):
+    async def _run_agent_loop_stream(
+        self,
+        messages: list,
+        execution_context=None,
+        observations: SessionObservations | None = None,
+    ):
+        tool_call_log = []
+        tool_config = tool_invocation_config(execution_context)
+        controller = self._new_controller()
+
+        while True:
+            reason = controller.exhausted()
+            if reason is not None:
+                break
+            iteration = controller.iterations
             logger.info("Topic advisor iteration=%s", iteration + 1)
-            response = await self.llm_with_tools.ainvoke(messages)
-
-            if not response.tool_calls:
-                for char in response.content:
-                    yield {"type": "token", "content": char}
+            response = None
+            # 边生成边转发正文；本轮若是工具调用，进度提示在执行工具前发出
+            async for delta, message in astream_message(self.llm_with_tools, messages):
+                if delta is not None:
+                    yield {"type": "token", "content": delta}
+                else:
+                    response = message
+            controller.record(response)
+
+            if response is None or not response.tool_calls:
+                controller.finish(STOP_ANSWERED)
                 yield {"type": "done", "tool_call_log": tool_call_log}
                 return
+            if controller.repeats(response.tool_calls):
+                reason = STOP_REPEATED
+                break
 
             messages.append(response)
             for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call.get("args", {})
-                tool_call_id = tool_call.get("id", f"call_{iteration}_{tool_name}")
-
-                yield {"type": "status", "message": self._get_tool_description(tool_name, tool_args)}
-
-                try:
-                    tool = self.tool_map.get(tool_name)
-                    result = await tool.ainvoke(tool_args) if tool else {"error": f"未知工具: {tool_name}"}
-                except Exception as exc:
-                    logger.error("Topic advisor tool failed: %s error=%s", tool_name, exc)
-                    result = {"error": str(exc)}
-
-                tool_call_log.append(
-                    {
-                        "iteration": iteration + 1,
-                        "tool": tool_name,
-                        "args": tool_args,
-                        "result": result,
-                    }
-                )
-                messages.append(
-                    ToolMessage(
-                        content=json.dumps(result, ensure_ascii=False, default=str),
-                        tool_call_id=tool_call_id,
-                    )
-                )
+                yield {
+                    "type": "status",
+                    "message": self._get_tool_description(tool_call["name"], tool_call.get("args", {})),
+                }
+            await self._execute_tool_calls(
+                response.tool_calls, iteration, messages, tool_call_log, tool_config, observations
+            )
 
-        logger.warning("Topic advisor reached max iterations, forcing final summary")
-        messages.append(HumanMessage(content="请直接给出最终推荐结论，不要再调用工具。"))
-        final = await self.llm_with_tools.ainvoke(messages)
-        for char in final.content:
-            yield {"type": "token", "content": char}
+        controller.finish(reason)
+        messages.append(HumanMessage(content=FINAL_ANSWER_INSTRUCTION))
+        async for delta, _ in astream_message(self.llm_with_tools, messages):
+            if delta is not None:
+                yield {"type": "token", "content": delta}
         yield {"type": "done", "tool_call_log": tool_call_log}
 
-    async def _run_agent_loop(self, messages: list) -> tuple[str, list]:
+    async def _run_agent_loop(
+        self,
+        messages: list,
+        execution_context=None,
+        observations: SessionObservations | None = None,
+    ) -> tuple[str, list]:
         tool_call_log = []
-
-        for iteration in range(MAX_AGENT_ITERATIONS):
+        tool_config = tool_invocation_config(execution_context)
+        controller = self._new_controller()
+
+        # 每次调用 LLM 前检查迭代、耗时和 token 预算；预算用尽或模型重复请求已有结果时转入强制总结
+        while True:
+            reason = controller.exhausted()
+            if reason is not None:
+                break
+            iteration = controller.iterations
             logger.info("Topic advisor iteration=%s", iteration + 1)
             response = await self.llm_with_tools.ainvoke(messages)
+            controller.record(response)
 
             if not response.tool_calls:
+                controller.finish(STOP_ANSWERED)
                 return response.content, tool_call_log
+            if controller.repeats(response.tool_calls):
+                reason = STOP_REPEATED
+                break
 
             messages.append(response)
-            for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call.get("args", {})
-                tool_call_id = tool_call.get("id", f"call_{iteration}_{tool_name}")
-
-                try:
-                    tool = self.tool_map.get(tool_name)
-                    result = await tool.ainvoke(tool_args) if tool else {"error": f"未知工具: {tool_name}"}
-                except Exception as exc:
-                    logger.error("Topic advisor tool failed: %s error=%s", tool_name, exc)
-                    result = {"error": str(exc)}
-
-                tool_call_log.append(
-                    {
-                        "iteration": iteration + 1,
-                        "tool": tool_name,
-                        "args": tool_args,
-                        "result": result,
-                    }
-                )
-                messages.append(
-                    ToolMessage(
-                        content=json.dumps(result, ensure_ascii=False, default=str),
-                        tool_call_id=tool_call_id,
-                    )
-                )
+            await self._execute_tool_calls(
+                response.tool_calls, iteration, messages, tool_call_log, tool_config, observations
+            )
 
-        logger.warning("Topic advisor reached max iterations, forcing final summary")
-        messages.append(HumanMessage(content="请直接给出最终推荐结论，不要再调用工具。"))
+        controller.finish(reason)
+        messages.append(HumanMessage(content=FINAL_ANSWER_INSTRUCTION))
         final = await self.llm_with_tools.ainvoke(messages)
         return final.content, tool_call_log
 
@@ -363,17 +448,21 @@ class TopicAdvisorService:
             return
 
     async def run_agent(self, state: ConversationState) -> ConversationState:
-        self._refresh_tools(execution_context=state.get("execution_context"))
-        messages = self._build_messages(state)
+        store = get_observation_store()
+        observations = await store.load(state.get("session_id"))
+        messages = self._build_messages(state, observations)
 
         try:
-            final_response, tool_call_log = await self._run_agent_loop(messages)
+            final_response, tool_call_log = await self._run_agent_loop(
+                messages, state.get("execution_context"), observations
+            )
             state["response"] = (
                 final_response
                 or "请告诉我您的选题需求，例如：我想做一个 Java 医疗管理系统，预算 500 元以内。"
             )
             state["topic_advisor_tool_results"] = tool_call_log
             self._inject_project_actions(state, tool_call_log)
+            await store.save(state.get("session_id"), observations)
         except Exception as exc:
             logger.error("Topic advisor failed: %s", exc, exc_info=True)
             state["response"] = "抱歉，分析您的选题需求时出现了问题，请稍后重试。"
@@ -381,24 +470,26 @@ class TopicAdvisorService:
         return state
 
     async def run_agent_stream(self, state: ConversationState):
-        self._refresh_tools(execution_context=state.get("execution_context"))
-        messages = self._build_messages(state)
+        store = get_observation_store()
+        observations = await store.load(state.get("session_id"))
+        messages = self._build_messages(state, observations)
 
         try:
             final_response = ""
             tool_call_log = []
-            async for event in self._run_agent_loop_stream(messages):
+            async for event in self._run_agent_loop_stream(messages, state.get("execution_context"), observations):
                 if event["type"] == "token":
                     final_response += event["content"]
                     yield event["content"]
                 elif event["type"] == "status":
-                    yield f"\n[{event['message']}]\n"
+                    yield progress_event(event["message"])
                 elif event["type"] == "done":
                     tool_call_log = event.get("tool_call_log", [])
 
             state["response"] = final_response
             state["topic_advisor_tool_results"] = tool_call_log
             self._inject_project_actions(state, tool_call_log)
+            await store.save(state.get("session_id"), observations)
         except Exception as exc:
             logger.error("Topic advisor stream failed: %s", exc, exc_info=True)
             yield "抱歉，分析您的选题需求时出现了问题，请稍后重试。"
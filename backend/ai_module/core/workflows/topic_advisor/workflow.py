@@ -9,6 +9,7 @@ from ...nodes.topic_advisor import (
     TopicAdvisorPrepareNode,
 )
 from ...state import ConversationState
+from ...streaming import StreamChunk
 from ..base import BaseWorkflow
 from .contracts import TopicAdvisorMode
 from .service import TopicAdvisorService
@@ -44,7 +45,7 @@ class TopicAdvisorWorkflow(BaseWorkflow):
 
         return state
 
-    async def execute_stream(self, state: ConversationState) -> AsyncIterator[str]:
+    async def execute_stream(self, state: ConversationState) -> AsyncIterator[StreamChunk]:
         current = TopicAdvisorState.START
 
         while current != TopicAdvisorState.END:
@@ -46,6 +46,9 @@ class RuntimeFactoryAdapter:
     def get_workflow(self, business_id: Optional[str] = None) -> WorkflowPort:
         return WorkflowPortAdapter(self._factory.get_workflow(business_id))
 
+    async def reload(self, business_id: str, drain_timeout: float = 30.0) -> bool:
+        return await self._factory.reload(business_id, drain_timeout=drain_timeout)
+
     def clear(self, business_id: Optional[str] = None) -> None:
         self._factory.clear(business_id)
 
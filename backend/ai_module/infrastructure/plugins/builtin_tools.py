@@ -8,11 +8,20 @@ from __future__ import annotations
 
 from typing import Any, Awaitable, Callable, Iterable, Optional
 
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
 
 from .base import AIPlugin
 from .manager import PluginManager
+from ai_module.core.tool_binding import execution_context_from_config
+from services.telemetry import span
+from services.tool_result_cache import (
+    ToolCachePolicy,
+    canonical_args_key,
+    get_tool_result_cache,
+    product_tag,
+)
 from services.function_tools import (
     all_tools,
     get_logistics,
@@ -28,6 +37,44 @@ PLUGIN_ALIASES = {
     "get_personalized_recommendations": {"recommend_products"},
 }
 
+
+# 语义上是集合、顺序不影响结果的列表参数；其余列表（如 compare_projects 的 project_ids）按输入顺序返回结果，保留顺序
+_UNORDERED_LIST_ARGS = frozenset({"user_skills"})
+
+
+def _normalized_args_key(args: dict) -> str:
+    # 字符串去掉首尾空白，集合类列表参数排序
+    normalized = {}
+    for name, value in args.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        elif isinstance(value, (list, tuple, set)):
+            value = [str(item).strip() for item in value]
+            if name in _UNORDERED_LIST_ARGS or isinstance(args[name], set):
+                value.sort()
+        normalized[name] = value
+    return canonical_args_key(normalized)
+
+
+def _project_tags(args: dict) -> tuple:
+    return (product_tag(args.get("project_id")),)
+
+
+def _compared_project_tags(args: dict) -> tuple:
+    return tuple(product_tag(project_id) for project_id in args.get("project_ids") or ())
+
+
+# 只读商品类工具的结果缓存策略；商品变更通过 publish_product_changed 失效
+TOOL_CACHE_POLICIES = {
+    "search_products": ToolCachePolicy(ttl_seconds=120, key=_normalized_args_key),
+    "search_projects": ToolCachePolicy(ttl_seconds=120, key=_normalized_args_key),
+    "get_project_detail": ToolCachePolicy(ttl_seconds=300, key=_normalized_args_key, tags=_project_tags),
+    "compare_projects": ToolCachePolicy(ttl_seconds=300, key=_normalized_args_key, tags=_compared_project_tags),
+    "check_tech_stack_match": ToolCachePolicy(ttl_seconds=300, key=_normalized_args_key, tags=_project_tags),
+}
+
 ToolExecutor = Callable[[Optional[dict], "LangChainToolPlugin"], Awaitable[Any]]
 
 
@@ -77,6 +124,7 @@ class LangChainToolPlugin(AIPlugin):
         args_schema=None,
         description: Optional[str] = None,
         executor: Optional[Callable[..., Awaitable[Any]]] = None,
+        cache_policy: Optional[ToolCachePolicy] = None,
     ):
         super().__init__(adapter=adapter)
         self._tool = tool
@@ -85,6 +133,7 @@ class LangChainToolPlugin(AIPlugin):
         self._args_schema = args_schema or getattr(tool, "args_schema", None)
         self._description = description or getattr(tool, "description", "") or ""
         self._executor = executor
+        self.cache_policy = cache_policy
 
     @property
     def name(self) -> str:
@@ -111,6 +160,17 @@ class LangChainToolPlugin(AIPlugin):
         return super().get_schema()
 
     async def execute(self, execution_context: Optional[dict] = None, **kwargs):
+        with span(self.name, stage="tool"):
+            if self.cache_policy is None:
+                return await self._execute(execution_context, kwargs)
+            return await get_tool_result_cache().get_or_execute(
+                self.name,
+                self.cache_policy,
+                kwargs,
+                lambda: self._execute(execution_context, kwargs),
+            )
+
+    async def _execute(self, execution_context: Optional[dict], kwargs: dict):
         if self._executor is not None:
             return await self._executor(
                 execution_context=execution_context,
@@ -120,8 +180,12 @@ class LangChainToolPlugin(AIPlugin):
         return await self._tool.ainvoke(kwargs)
 
     def to_langchain_tool(self, execution_context: Optional[dict] = None):
-        async def _bound_executor(**kwargs):
-            return await self.execute(execution_context=execution_context, **kwargs)
+        # 未显式绑定上下文时，从调用时的 config 中读取，工具实例即可跨请求复用。
+        async def _bound_executor(config: RunnableConfig, **kwargs):
+            context = execution_context
+            if context is None:
+                context = execution_context_from_config(config)
+            return await self.execute(execution_context=context, **kwargs)
 
         return StructuredTool.from_function(
             coroutine=_bound_executor,
@@ -137,6 +201,7 @@ class LangChainToolPlugin(AIPlugin):
                 "plugin_type": "tool",
                 "aliases": sorted(self.aliases),
                 "groups": sorted(self.groups),
+                "cacheable": self.cache_policy is not None,
             }
         )
         return metadata
@@ -348,7 +413,7 @@ def register_builtin_tool_plugins(manager: PluginManager) -> PluginManager:
     for tool_name, entry in catalogue.items():
         plugin = specialized_plugins.get(tool_name)
         if plugin is None:
-            plugin = LangChainToolPlugin(entry["tool"])
+            plugin = LangChainToolPlugin(entry["tool"], cache_policy=TOOL_CACHE_POLICIES.get(tool_name))
 
         plugin.aliases.update(entry["aliases"])
         plugin.groups.update(entry["groups"])
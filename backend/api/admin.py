@@ -16,6 +16,7 @@ from schemas import (
 )
 from services.auth_service import AuthService
 from services.knowledge_retriever import knowledge_retriever
+from services.startup import aresolve_lazy
 
 router = APIRouter()
 security = HTTPBearer()
@@ -145,7 +146,8 @@ async def upload_knowledge_document(
             }
         }]
         
-        doc_ids = await knowledge_retriever.add_documents(documents, "knowledge_base")
+        retriever = await aresolve_lazy(knowledge_retriever)
+        doc_ids = await retriever.add_documents(documents, "knowledge_base")
         
         return {
             "document_id": doc_ids[0],
@@ -166,7 +168,8 @@ async def delete_knowledge_document(
 ):
     """删除知识库文档"""
     try:
-        await knowledge_retriever.delete_document(document_id, "knowledge_base")
+        retriever = await aresolve_lazy(knowledge_retriever)
+        await retriever.delete_document(document_id, "knowledge_base")
         return {"message": "文档已删除"}
     except Exception as e:
         raise HTTPException(
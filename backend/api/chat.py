@@ -1,17 +1,17 @@
 """Chat session and messaging endpoints."""
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
 from typing import Any, Dict, List, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.responses import Response
-from starlette.types import Receive, Scope, Send
 
+from ai_module.core.orchestration.turn_sequencer import TurnHandedOff
 from ai_module.engine import ai_engine
+from config import settings
 from database import get_db
 from schemas import ConversationResponse, MessageCreate, MessageResponse, SessionCreate, SessionResponse
 from services.attachment_service import AttachmentService
@@ -19,6 +19,9 @@ from services.auth_service import AuthService
 from services.message_service import MessageService
 from services.session_service import SessionService
 from services.smart_questions_service import smart_questions_service
+from services.startup import aresolve_lazy
+
+from .sse import SSEResponse
 
 logger = logging.getLogger(__name__)
 
@@ -132,6 +135,32 @@ async def _persist_assistant_turn(
     return assistant_message
 
 
+async def _persist_abandoned_turn(
+    db: AsyncSession,
+    session_id: str,
+    partial_response: str,
+    event_state: Dict[str, Any],
+) -> None:
+    """Apply ``STREAM_ABANDONED_PERSIST`` to a turn whose client disconnected.
+
+    ``partial`` keeps the text generated so far, flagged as interrupted, so the
+    history shows what the user saw; ``none`` keeps only the user message.
+    """
+    policy = getattr(settings, "STREAM_ABANDONED_PERSIST", "partial")
+    if policy != "partial" or not partial_response:
+        logger.info("Discarding abandoned stream turn session=%s policy=%s", session_id, policy)
+        return
+    try:
+        await _persist_assistant_turn(
+            db,
+            session_id=session_id,
+            content=partial_response,
+            metadata={"intent": event_state.get("intent"), "interrupted": True},
+        )
+    except Exception:
+        logger.warning("Failed to persist abandoned stream turn session=%s", session_id, exc_info=True)
+
+
 @router.post("/session", response_model=SessionResponse)
 async def create_session(
     session_data: SessionCreate,
@@ -205,6 +234,19 @@ async def send_message(
         aftersales_flow=message_data.aftersales_flow,
     )
 
+    if result.get("coalesced"):
+        # 该消息已与同会话的前几条合并为一轮：返回同一份回复，由那一轮的请求负责保存
+        return ConversationResponse(
+            message_id="",
+            content=result.get("response", ""),
+            sources=result.get("sources"),
+            intent=result.get("intent"),
+            ticket_id=result.get("ticket_id"),
+            processing_time=result.get("processing_time"),
+            quick_actions=result.get("quick_actions"),
+            recommended_products=result.get("recommended_products"),
+        )
+
     assistant_message = await _persist_assistant_turn(
         db,
         session_id=message_data.session_id,
@@ -224,40 +266,6 @@ async def send_message(
     )
 
 
-class SSEResponse(Response):
-    def __init__(self, handler, status_code: int = 200):
-        self.handler = handler
-        self.status_code = status_code
-        self.background = None
-
-    async def __call__(self, scope: Scope, receive: Receive, send: Send):
-        await send(
-            {
-                "type": "http.response.start",
-                "status": self.status_code,
-                "headers": [
-                    [b"content-type", b"text/event-stream; charset=utf-8"],
-                    [b"cache-control", b"no-cache, no-store"],
-                    [b"connection", b"keep-alive"],
-                    [b"x-accel-buffering", b"no"],
-                ],
-            }
-        )
-
-        async def send_event(data: dict):
-            payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
-            await send(
-                {
-                    "type": "http.response.body",
-                    "body": payload.encode("utf-8"),
-                    "more_body": True,
-                }
-            )
-
-        await self.handler(send_event)
-        await send({"type": "http.response.body", "body": b"", "more_body": False})
-
-
 @router.post("/stream")
 async def stream_message(
     message_data: MessageCreate,
@@ -288,6 +296,8 @@ async def stream_message(
                 purchase_flow=message_data.purchase_flow,
                 aftersales_flow=message_data.aftersales_flow,
             ):
+                if "coalesced" in event:
+                    event_state["coalesced"] = event["coalesced"]
                 if event.get("type") == "content":
                     full_response += event.get("delta", "")
                 elif event.get("type") == "intent":
@@ -295,13 +305,20 @@ async def stream_message(
                 elif event.get("type") == "end":
                     event_state.update(event)
                 await send_event(event)
+        except asyncio.CancelledError as exc:
+            # 客户端断开：工作流已被取消，按策略决定是否保存已生成的部分回复。被合并的请求没有自己的回复；
+            # 本轮交给 follower 时工作流已跑完，完整回复由接手的 follower 保存
+            if not event_state.get("coalesced") and not isinstance(exc, TurnHandedOff):
+                await _persist_abandoned_turn(db, message_data.session_id, full_response, event_state)
+            raise
         except Exception as exc:
             logger.exception("Streaming chat failed for session=%s", message_data.session_id)
             await send_event({"type": "error", "message": "stream processing failed"})
             await send_event({"type": "end", "status": "error"})
             return
 
-        if full_response:
+        # 被合并的请求转发的是 leader 的回复，leader 已保存（leader 断开时 end 事件把保存交给接手的 follower）
+        if full_response and not event_state.get("coalesced"):
             await _persist_assistant_turn(
                 db,
                 session_id=message_data.session_id,
@@ -324,6 +341,8 @@ async def get_smart_questions(
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
+    # 服务可能仍在启动线程里构造，在线程池里等待，不阻塞事件循环
+    questions_service = await aresolve_lazy(smart_questions_service)
     try:
         from services.order_service import OrderService
 
@@ -344,10 +363,10 @@ async def get_smart_questions(
             )
 
         if mode == "fast":
-            questions = smart_questions_service._get_rule_based_questions(order_data)
+            questions = questions_service._get_rule_based_questions(order_data)
             return {"questions": questions, "mode": "fast"}
 
-        questions = await smart_questions_service.generate_smart_questions(
+        questions = await questions_service.generate_smart_questions(
             user_id=user_id,
             user_profile={},
             recent_orders=order_data,
@@ -357,6 +376,6 @@ async def get_smart_questions(
     except Exception as exc:
         logger.warning("Failed to build smart questions: %s", exc, exc_info=True)
         return {
-            "questions": smart_questions_service._get_rule_based_questions(),
+            "questions": questions_service._get_rule_based_questions(),
             "mode": "fallback",
         }
@@ -0,0 +1,258 @@
+"""Server-Sent Events transport for streamed chat replies.
+
+``SSEWriter`` sits between the workflow event stream and the ASGI ``send``:
+
+- consecutive ``content`` deltas are merged and written once per flush window
+  (``SSE_FLUSH_INTERVAL_MS``) or once the pending text reaches ``SSE_FLUSH_BYTES``
+- other events (start, intent, thinking, end, error) flush immediately, after
+  any content queued before them, so ordering is preserved
+- a comment line is written every ``SSE_HEARTBEAT_SECONDS`` of silence so
+  proxies keep idle connections open during long retrieval or tool calls
+- every body write awaits ``send``; with the pending buffer capped at one flush
+  window the producer is throttled to the client's read rate
+
+``SSEResponse`` also watches ``receive()`` for ``http.disconnect``. When the
+client goes away the handler task is cancelled, which cancels the workflow
+task tree under it (LLM streams, retrieval, tool calls); the handler decides
+what to persist for the abandoned turn.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+try:
+    import orjson
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from config import settings
+
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = b": keep-alive\n\n"
+
+SSE_IO = registry.counter(
+    "ai_sse_io_total",
+    "SSE transport activity: events produced, body writes, bytes and heartbeats.",
+    ("kind",),
+)
+STREAM_ABANDONED = registry.counter(
+    "ai_stream_abandoned_total",
+    "Streams whose client disconnected before the reply finished.",
+    ("path",),
+)
+
+
+def encode_event(data: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        body = orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        body = json.dumps(data, ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")
+    return b"data: " + body + b"\n\n"
+
+
+def _is_plain_content(data: Dict[str, Any]) -> bool:
+    return data.get("type") == "content" and len(data) == 2 and isinstance(data.get("delta"), str)
+
+
+class SSEWriter:
+    """Coalescing, heartbeat-emitting writer for one SSE response body."""
+
+    def __init__(
+        self,
+        send: Send,
+        *,
+        flush_interval: float = 0.03,
+        flush_bytes: int = 4096,
+        heartbeat_interval: float = 15.0,
+    ):
+        self._send = send
+        self.flush_interval = max(0.0, flush_interval)
+        self.flush_bytes = max(1, flush_bytes)
+        self.heartbeat_interval = heartbeat_interval
+        self._buffer = bytearray()
+        self._deltas: List[str] = []
+        self._delta_size = 0
+        self._pending = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._ticker: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self._last_write = time.monotonic()
+        self._discarded = False
+        self.stats = {"events": 0, "writes": 0, "bytes": 0, "heartbeats": 0}
+
+    async def __aenter__(self) -> "SSEWriter":
+        self._ticker = asyncio.create_task(self._run_ticker())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except (asyncio.CancelledError, Exception):
+                pass
+        if exc_type is None and not self._discarded:
+            await self.flush()
+        for kind, value in self.stats.items():
+            if value:
+                SSE_IO.inc(value, kind=kind)
+        logger.debug("SSE stream closed stats=%s", self.stats)
+
+    async def send_event(self, data: Dict[str, Any]) -> None:
+        if self._error is not None:
+            raise self._error
+        self.stats["events"] += 1
+
+        if _is_plain_content(data):
+            if not data["delta"]:
+                return
+            self._deltas.append(data["delta"])
+            self._delta_size += len(data["delta"].encode("utf-8"))
+            if self._delta_size >= self.flush_bytes:
+                await self.flush()
+            else:
+                self._pending.set()
+            return
+
+        self._take_deltas()
+        self._buffer += encode_event(data)
+        await self.flush()
+
+    def discard(self) -> None:
+        """Drop anything still buffered; used once the client has disconnected."""
+        self._discarded = True
+        self._deltas.clear()
+        self._delta_size = 0
+        self._buffer.clear()
+
+    def _take_deltas(self) -> None:
+        if not self._deltas:
+            return
+        self._buffer += encode_event({"type": "content", "delta": "".join(self._deltas)})
+        self._deltas.clear()
+        self._delta_size = 0
+
+    async def flush(self) -> None:
+        async with self._lock:
+            self._take_deltas()
+            self._pending.clear()
+            if not self._buffer:
+                return
+            payload = bytes(self._buffer)
+            self._buffer.clear()
+            await self._write(payload)
+
+    async def _write(self, payload: bytes) -> None:
+        await self._send({"type": "http.response.body", "body": payload, "more_body": True})
+        self._last_write = time.monotonic()
+        self.stats["writes"] += 1
+        self.stats["bytes"] += len(payload)
+
+    async def _run_ticker(self) -> None:
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._pending.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    async with self._lock:
+                        if time.monotonic() - self._last_write >= self.heartbeat_interval:
+                            await self._write(HEARTBEAT)
+                            self.stats["heartbeats"] += 1
+                    continue
+                # Coalescing window: let following deltas join this write.
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # A failed write (usually a gone client) surfaces on the next send_event.
+            self._error = exc
+
+
+class SSEResponse(Response):
+    def __init__(self, handler: Callable[[Callable[[dict], Awaitable[None]]], Awaitable[None]], status_code: int = 200):
+        self.handler = handler
+        self.status_code = status_code
+        self.background = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": [
+                    [b"content-type", b"text/event-stream; charset=utf-8"],
+                    [b"cache-control", b"no-cache, no-store"],
+                    [b"connection", b"keep-alive"],
+                    [b"x-accel-buffering", b"no"],
+                ],
+            }
+        )
+
+        async with SSEWriter(
+            send,
+            flush_interval=getattr(settings, "SSE_FLUSH_INTERVAL_MS", 30) / 1000,
+            flush_bytes=getattr(settings, "SSE_FLUSH_BYTES", 4096),
+            heartbeat_interval=getattr(settings, "SSE_HEARTBEAT_SECONDS", 15.0),
+        ) as writer:
+            disconnected = await run_until_disconnect(self.handler(writer.send_event), receive)
+            if disconnected:
+                writer.discard()
+
+        if disconnected:
+            path = scope.get("path", "")
+            STREAM_ABANDONED.inc(path=path)
+            logger.info("Client disconnected from %s, stream cancelled after %s events", path, writer.stats["events"])
+            return
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _wait_for_disconnect(receive: Receive) -> None:
+    while True:
+        message = await receive()
+        if message.get("type") == "http.disconnect":
+            return
+
+
+async def run_until_disconnect(handler: Awaitable[None], receive: Receive) -> bool:
+    """Run ``handler`` until it finishes or the client disconnects.
+
+    Returns True when the client went away first; the handler task has then
+    been cancelled and awaited, so its cleanup has already run.
+    """
+    handler_task = asyncio.ensure_future(handler)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await asyncio.wait({handler_task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Also reached when the response itself is cancelled (server shutdown).
+        for task in (handler_task, watcher):
+            if not task.done():
+                task.cancel()
+
+    if handler_task.done():
+        try:
+            await watcher
+        except asyncio.CancelledError:
+            pass
+        handler_task.result()
+        return False
+
+    try:
+        await handler_task
+    except asyncio.CancelledError:
+        pass
+    return True
+
+
+__all__ = ["SSEResponse", "SSEWriter", "encode_event", "run_until_disconnect"]
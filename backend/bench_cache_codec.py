@@ -0,0 +1,124 @@
+"""对比会话上下文在不同缓存编码下的体积与编解码耗时
+
+用法:
+    python bench_cache_codec.py [轮数] [重复次数]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from services.cache_codec import PayloadCodec  # noqa: E402
+
+
+def build_context(turns: int) -> dict:
+    """构造接近真实会话的上下文：历史、工具结果、快捷操作、任务栈。"""
+    history = []
+    for i in range(turns):
+        history.append(
+            {
+                "user": f"帮我看看订单 ORD2024{i:06d} 现在到哪了，另外推荐几个 Python 的毕业设计项目",
+                "assistant": (
+                    f"订单 ORD2024{i:06d} 已支付，卖家正在准备交付文件。"
+                    "为您推荐以下项目：基于 Django 的图书管理系统、基于 Flask 的在线问诊平台、"
+                    "基于 FastAPI 的校园二手交易平台，难度适中，预算 500 元以内。"
+                ),
+                "timestamp": "2026-01-01T12:00:00",
+            }
+        )
+
+    quick_actions = [
+        {
+            "type": "product",
+            "data": {
+                "product_id": f"p-{i}",
+                "title": f"基于 Spring Boot 的项目 {i}",
+                "price": 399.0 + i,
+                "rating": 4.8,
+                "tech_stack": ["Java", "Spring Boot", "Vue", "MySQL"],
+                "description": "前后端分离，包含管理后台和小程序端，附带部署文档与论文模板。" * 2,
+            },
+        }
+        for i in range(5)
+    ]
+
+    return {
+        "history": history,
+        "user_profile": {"vip": True, "preferred_language": "Python"},
+        "last_intent": "推荐",
+        "intent_history": [
+            {"intent": "推荐", "confidence": 0.95, "turn": i, "timestamp": "2026-01-01T12:00:00"}
+            for i in range(turns)
+        ],
+        "conversation_summary": "用户在找 Python 方向的毕业设计项目，预算 500 元以内，同时关注订单交付进度。",
+        "last_quick_actions": quick_actions,
+        "active_task": {"id": "task-1", "intent": "推荐", "status": "awaiting_user", "slots": {"budget_max": 500}},
+        "task_stack": [],
+        "pending_question": "您更想要哪一个？",
+        "pending_action": "select_recommended_item",
+        "updated_at": "2026-01-01T12:00:00",
+    }
+
+
+def bench_legacy(context: dict, repeat: int) -> tuple[int, float, float]:
+    payload = json.dumps(context, ensure_ascii=False)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        json.dumps(context, ensure_ascii=False)
+    encode_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        json.loads(payload)
+    decode_s = time.perf_counter() - t0
+    return len(payload.encode("utf-8")), encode_s, decode_s
+
+
+def bench_codec(codec: PayloadCodec, context: dict, repeat: int) -> tuple[int, float, float]:
+    payload = codec.encode(context)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        codec.encode(context)
+    encode_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        codec.decode(payload)
+    decode_s = time.perf_counter() - t0
+    return len(payload), encode_s, decode_s
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    context = build_context(turns)
+
+    variants = [
+        ("json (legacy)", None),
+        ("json", PayloadCodec(serializer="json", compression="none")),
+        ("json+zstd", PayloadCodec(serializer="json", compression="zstd")),
+        ("json+lz4", PayloadCodec(serializer="json", compression="lz4")),
+        ("msgpack", PayloadCodec(serializer="msgpack", compression="none")),
+        ("msgpack+zstd", PayloadCodec(serializer="msgpack", compression="zstd")),
+    ]
+
+    print(f"上下文轮数: {turns}, 重复次数: {repeat}")
+    print(f"{'编码':<16} {'实际编码':<16} {'字节数':>8} {'编码(us)':>10} {'解码(us)':>10}")
+    print("-" * 64)
+    for label, codec in variants:
+        if codec is None:
+            size, encode_s, decode_s = bench_legacy(context, repeat)
+            effective = "json/none"
+        else:
+            size, encode_s, decode_s = bench_codec(codec, context, repeat)
+            effective = f"{codec.serializer}/{codec.compression}"
+        print(
+            f"{label:<16} {effective:<16} {size:>8} "
+            f"{encode_s / repeat * 1e6:>10.1f} {decode_s / repeat * 1e6:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""对比逐关键词子串扫描与编译后的关键词自动机在一轮对话中的耗时
+
+旧路径每轮对同一条消息做四次扫描：规则意图、入口节点业务信号、领域范围判断、
+不支持能力匹配（后两者每次还会重建能力规格）。新路径按业务包编译一次自动机，
+每轮只扫描一次，得到的 TurnFeatures 由各调用方复用。
+
+用法:
+    python bench_keyword_matching.py [重复次数]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from ai_module.core.capability_registry import build_capability_specs  # noqa: E402
+from ai_module.core.constants import DEFAULT_INTENT_RULES, INTENT_QA, INTENT_RECOMMEND  # noqa: E402
+from ai_module.core.keyword_automaton import SMALLTALK_RE, KeywordMatcher  # noqa: E402
+
+MESSAGES = [
+    "帮我推荐几个 Java 的毕业设计项目，预算 800 以内",
+    "我的订单 ORD2024000123 什么时候发货，物流到哪了",
+    "这个项目我不想要了，能申请退款吗",
+    "购物车里的东西能用优惠券吗",
+    "去新疆旅行有什么推荐的路线",
+    "你好",
+    "Spring Boot 和 Django 哪个更适合做后台管理系统",
+    "我想找一个带小程序端的源码，最好有部署文档",
+    "能开电子发票吗",
+    "今天天气怎么样",
+]
+
+
+def _legacy_rule_match(message, rules):
+    text = message.strip()
+    if SMALLTALK_RE.match(text):
+        return INTENT_QA
+    if re.search(r"(毕设|毕业设计|课设|选题)", text, re.IGNORECASE):
+        return INTENT_RECOMMEND
+    if re.search(r"(找|要|想做|需要).*(项目|源码)", text, re.IGNORECASE):
+        return INTENT_RECOMMEND
+    lowered = text.lower()
+    for intent, keywords in rules.items():
+        for keyword in keywords:
+            if keyword and keyword.lower() in lowered:
+                return intent
+    return None
+
+
+def _legacy_business_signal(message, rules, config):
+    normalized = message.strip().lower()
+    if re.search(r"(毕设|毕业设计|课设|选题)", normalized, re.IGNORECASE):
+        return True
+    if re.search(r"(找|想要|需要).*(项目|源码)", normalized, re.IGNORECASE):
+        return True
+    for intent, keywords in rules.items():
+        if intent != INTENT_QA and any(keyword and keyword.lower() in normalized for keyword in keywords):
+            return True
+    for spec in build_capability_specs(config):
+        if any(keyword and keyword.lower() in normalized for keyword in spec.keywords):
+            return True
+    return False
+
+
+def _legacy_capabilities(message, config):
+    normalized = message.strip().lower()
+    return {
+        spec.key: [keyword for keyword in spec.keywords if keyword.lower() in normalized]
+        for spec in build_capability_specs(config)
+    }
+
+
+def legacy_turn(message, rules, config):
+    _legacy_rule_match(message, rules)  # IntentRecognitionNode._match_by_rules
+    _legacy_rule_match(message, rules)  # MessageEntryNode._has_supported_business_signal
+    _legacy_business_signal(message, rules, config)  # domain_scope.has_business_signal
+    _legacy_capabilities(message, config)  # find_unsupported_capability
+
+
+def compiled_turn(message, matcher):
+    features = matcher.scan(message)
+    features.rule_match()
+    features.rule_match()
+    features.has_business_signal  # noqa: B018
+    features.capability_hits  # noqa: B018
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rules = {intent: list(keywords) for intent, keywords in DEFAULT_INTENT_RULES.items()}
+    config = {}
+
+    t0 = time.perf_counter()
+    matcher = KeywordMatcher.from_business_config(rules, config)
+    compile_s = time.perf_counter() - t0
+
+    turns = repeat * len(MESSAGES)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            legacy_turn(message, rules, config)
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            compiled_turn(message, matcher)
+    compiled_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            matcher.features(message)
+    memo_s = time.perf_counter() - t0
+
+    print(f"关键词数: {len(matcher._automaton.patterns)}, 消息数: {len(MESSAGES)}, 轮数: {turns}")
+    print(f"自动机编译耗时: {compile_s * 1e3:.2f} ms（每个业务包一次）")
+    print(f"{'路径':<28} {'每轮(us)':>10}")
+    print("-" * 40)
+    print(f"{'逐关键词扫描 x4':<28} {legacy_s / turns * 1e6:>10.1f}")
+    print(f"{'自动机单次扫描 + 复用':<28} {compiled_s / turns * 1e6:>10.1f}")
+    print(f"{'同轮再次取 TurnFeatures':<28} {memo_s / turns * 1e6:>10.1f}")
+    print(f"加速比: {legacy_s / compiled_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,16 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8080
     DEFAULT_BUSINESS_ID: str = "graduation-marketplace"
+
+    # 业务包配置热更新：监听 config/businesses/*.yaml，变化后重建快照并原子替换运行时
+    BUSINESS_CONFIG_HOT_RELOAD: bool = True
+    BUSINESS_CONFIG_POLL_SECONDS: float = 2.0  # 未安装 watchfiles 时的轮询间隔
+    RUNTIME_DRAIN_TIMEOUT_SECONDS: float = 30.0  # 替换后等待旧运行时上进行中轮次结束的最长时间
+
+    # 启动编排：重量级子系统在 lifespan 中后台并发初始化，关键子系统完成前 /ready 返回 503
+    STARTUP_WARMUP_ENABLED: bool = True  # 预先构建默认工作流、实例化惰性节点、加载知识检索器
+    STARTUP_WARMUP_LLM: bool = True  # 预先建立到 LLM 提供方的连接
+    STARTUP_SUBSYSTEM_TIMEOUT_SECONDS: float = 120.0  # 单个子系统初始化的最长时间
     
     # 数据库配置
     MYSQL_HOST: str = "localhost"
@@ -38,7 +48,20 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_REQUIRED: bool = False
     CONTEXT_CACHE_TTL_SECONDS: int = 86400
-    
+    CACHE_CODEC_SERIALIZER: str = "json"  # 可选: json(优先使用orjson), msgpack
+    CACHE_CODEC_COMPRESSION: str = "zstd"  # 可选: zstd, lz4, none
+    CACHE_CODEC_COMPRESS_THRESHOLD: int = 1024  # 超过该字节数才压缩
+
+    # 共享缓存门面（services/shared_cache.py）：进程内 LRU + Redis 两层，按命名空间隔离
+    SHARED_CACHE_REDIS_TIER: bool = True  # 关闭后只用进程内本地层
+    SHARED_CACHE_LOCAL_MAX_ENTRIES: int = 1024  # 每个命名空间本地层的默认条目上限
+    RUNTIME_MODEL_CACHE_MAX_ENTRIES: int = 32  # 每个运行时缓存的模型实例上限
+
+    # 并发相同操作合并（services/single_flight.py）：检索、商品详情、工具调用、LLM 缓存未命中
+    SINGLE_FLIGHT_DISTRIBUTED: bool = False  # 通过 Redis 锁跨 worker 合并（需要 Redis）
+    SINGLE_FLIGHT_LOCK_TTL_SECONDS: int = 30  # 执行者持锁上限，超时后其他 worker 可接手
+    SINGLE_FLIGHT_WAIT_TIMEOUT_SECONDS: float = 10.0  # 等待其他 worker 结果的上限，超时本地执行
+
     # FAISS配置
     FAISS_PERSIST_DIRECTORY: str = str(DATA_DIR / "faiss")
     
@@ -90,14 +113,97 @@ class Settings(BaseSettings):
     RETRIEVAL_TOP_K: int = 3
     REQUEST_TIMEOUT: int = 30
     
+    # 会话轮次排序配置
+    TURN_SEQUENCER_ENABLED: bool = True  # 同一会话的消息按顺序逐轮处理
+    TURN_COALESCE_WINDOW_MS: int = 300  # 会话已有轮次在执行或排队时，该窗口内连续到达的消息合并为一轮，0 表示不合并
+    TURN_LOCK_TTL_SECONDS: int = 120  # 会话轮次锁的过期时间，轮次执行期间每三分之一 TTL 续期一次
+    TURN_LOCK_WAIT_SECONDS: int = 30  # 等待其他实例释放轮次锁的最长时间
+
     # 意图追踪配置
     INTENT_HISTORY_SIZE: int = 5  # 提供给 LLM 的意图历史条数
     INTENT_FALLBACK_THRESHOLD: float = 0.6  # 回退到历史意图的置信度阈值
+
+    # 本地意图分类器（字符 n-gram TF-IDF + 线性模型），规则未命中时先于 LLM 使用
+    INTENT_CLASSIFIER_ENABLED: bool = True
+    INTENT_CLASSIFIER_DIR: str = str(DATA_DIR / "intent_classifiers")  # 每个业务一个 <business_id>.json
+    INTENT_CLASSIFIER_THRESHOLD: float = 0.85  # 校准后置信度低于该值时回退到 LLM
+
+    # 已有活动流程时，对话动作、流程内作用、槽位和全局意图合并为一次 LLM 调用；输出校验失败时退回逐个调用
+    TURN_MERGED_UNDERSTANDING_ENABLED: bool = True
     
     # 对话摘要配置
     SUMMARY_TRIGGER_THRESHOLD: int = 10  # 触发摘要的对话轮数阈值
     CONTEXT_MAX_TOKENS: int = 3000  # 上下文最大 token 数
+    TOKEN_ESTIMATOR: str = "heuristic"  # 可选: heuristic(按字符估算), tiktoken(本地词表计数)
+    TOKEN_ESTIMATOR_ENCODING: str = "cl100k_base"  # tiktoken 使用的编码
     
+    # 长期记忆检索配置
+    MEMORY_RETRIEVAL_ENABLED: bool = True  # 按相关度从跨会话记忆中检索，而不是固定拼接最近几轮
+    MEMORY_RECENT_TURNS: int = 2  # 启用检索后仍原样保留的最近轮数
+    MEMORY_RETRIEVAL_TOP_K: int = 4  # 每轮最多注入的记忆条数
+    MEMORY_RETRIEVAL_TOKEN_BUDGET: int = 600  # 注入记忆的令牌预算
+    MEMORY_INDEX_MAX_RECORDS: int = 200  # 每个用户保留的记忆条数上限
+    MEMORY_INDEX_TTL_SECONDS: int = 2592000  # 记忆索引过期时间（30天）
+    MEMORY_EMBEDDINGS_ENABLED: bool = False  # 是否用 SiliconFlow 向量模型增强检索
+
+    # 链路追踪与指标
+    METRICS_ENABLED: bool = True  # 是否开放 /metrics
+    TRACING_SAMPLE_RATE: float = 1.0  # 链路采样率（0~1），只影响 span 导出与日志，指标总是记录
+    TRACING_LOG_SPANS: bool = False  # 是否把采样到的 span 写入日志
+    TRACING_OTLP_ENDPOINT: str = ""  # OTLP/HTTP 地址，如 http://otel-collector:4318，为空不导出
+    TRACING_SERVICE_NAME: str = "ai-customer-service"
+
+    # 工具调用：同一次模型回复中的多个工具调用并发执行
+    TOOL_MAX_CONCURRENCY: int = 4  # 单次回复内同时执行的工具调用上限
+    TOOL_CALL_TIMEOUT: float = 15.0  # 单个工具调用超时（秒）
+    TOOL_CALL_TIMEOUTS: str = ""  # 按工具覆盖超时，格式: 工具名=秒,工具名=秒
+
+    # 选题助手智能体循环：每轮的迭代、耗时和 token 预算，以及跨轮复用的搜索/详情结果
+    TOPIC_ADVISOR_AGENT_MAX_ITERATIONS: int = 5  # 强制总结前最多调用 LLM 的次数
+    TOPIC_ADVISOR_AGENT_TIME_BUDGET_SECONDS: float = 20.0  # 每轮耗时上限（秒），0 表示不限制
+    TOPIC_ADVISOR_AGENT_TOKEN_BUDGET: int = 12000  # 每轮 token 上限，0 表示不限制
+    TOPIC_ADVISOR_OBSERVATION_TTL_SECONDS: int = 1800  # 会话观察记忆的有效期（秒）
+    TOPIC_ADVISOR_OBSERVATION_MAX_ENTRIES: int = 20  # 每个会话最多保留的工具结果条数
+
+    # LLM 网关：所有模型调用共享连接池、并发限制、重试、对冲请求与熔断
+    LLM_GATEWAY_ENABLED: bool = True
+    LLM_PROVIDER_CONCURRENCY: int = 16  # 单个提供方同时在途的请求上限
+    LLM_ROLE_CONCURRENCY: str = "intent=8,chat=12"  # 按角色限制并发，格式: 角色=数量,角色=数量
+    LLM_MAX_RETRIES: int = 2  # 超时、连接错误、429、5xx 的重试次数
+    LLM_RETRY_BASE_DELAY: float = 0.3  # 指数退避基数（秒），实际等待带随机抖动
+    LLM_RETRY_MAX_DELAY: float = 3.0
+    LLM_HEDGE_ROLES: str = "intent"  # 启用对冲请求的角色，逗号分隔，为空关闭
+    LLM_HEDGE_DELAY_MS: int = 800  # 首个请求超过该时间未返回时发出对冲请求
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 连续瞬时故障达到该次数后熔断
+    LLM_CIRCUIT_RECOVERY_SECONDS: float = 30.0  # 熔断持续时间，之后放行一次探测请求
+    LLM_HTTP_MAX_CONNECTIONS: int = 50  # 每个提供方共享连接池的连接上限
+    LLM_HTTP_MAX_KEEPALIVE: int = 20
+    LLM_HTTP_TIMEOUT: float = 60.0  # 单次 HTTP 请求超时（秒）
+
+    # 确定性提示词的 LLM 回复缓存（意图识别、查询改写、重排、越界回复），本地 LRU + Redis 共享层
+    LLM_RESPONSE_CACHE_ENABLED: bool = True
+    LLM_RESPONSE_CACHE_MAX_ENTRIES: int = 2048  # 本地层最多缓存条目数
+    LLM_RESPONSE_CACHE_TTL: int = 3600  # 缓存有效期（秒）
+
+    # 只读工具结果缓存（本地 LRU + Redis 共享层），商品变更时按标签失效
+    TOOL_RESULT_CACHE_ENABLED: bool = True
+    TOOL_RESULT_CACHE_MAX_ENTRIES: int = 512  # 本地层最多缓存条目数
+    TOOL_RESULT_CACHE_TAG_VERSION_TTL_SECONDS: int = 5  # 本地缓存失效标签版本号的秒数，其他实例的商品变更最多晚这么久生效
+
+    # 流式回复（SSE）传输
+    SSE_FLUSH_INTERVAL_MS: int = 30  # 正文增量合并窗口（毫秒）
+    SSE_FLUSH_BYTES: int = 4096  # 待发送正文达到该字节数时立即写出
+    SSE_HEARTBEAT_SECONDS: float = 15.0  # 空闲时发送心跳注释的间隔
+    STREAM_ABANDONED_PERSIST: str = "partial"  # 客户端中途断开时: partial 保存已生成部分并标记 interrupted, none 不保存回复
+
+    # 推测式预取：意图识别期间提前启动知识检索、订单列表查询
+    SPECULATIVE_PREFETCH_ENABLED: bool = True
+
+    # 提示词上下文片段预算（令牌数），格式: 片段=预算,片段=预算
+    PROMPT_SECTION_TOKEN_BUDGETS: str = (
+        "summary=400,recent_history=1200,memories=600,task_snapshot=200,docs=1500,attachments=2500"
+    )
+
     # 高级RAG配置
     RAG_USE_HYBRID_SEARCH: bool = True  # 是否使用混合检索(向量+BM25)
     RAG_USE_RERANK: bool = True  # 是否使用LLM重排序
@@ -120,7 +226,7 @@ class Settings(BaseSettings):
                 return True
         return value
 
-    @field_validator("FAISS_PERSIST_DIRECTORY", "UPLOAD_DIR", mode="before")
+    @field_validator("FAISS_PERSIST_DIRECTORY", "UPLOAD_DIR", "INTENT_CLASSIFIER_DIR", mode="before")
     @classmethod
     def resolve_data_paths(cls, value):
         """Resolve relative storage paths against the backend directory."""
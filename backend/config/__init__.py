@@ -34,6 +34,10 @@ def init_chat_model(
     model: str | None = None,
     api_key: str | None = None,
     base_url: str | None = None,
+    callbacks: list | None = None,
+    http_client: Any = None,
+    http_async_client: Any = None,
+    max_retries: int | None = None,
 ):
     """Create the primary chat model, optionally overriding provider details."""
     from langchain.chat_models import init_chat_model as _init_chat_model
@@ -51,6 +55,10 @@ def init_chat_model(
         **_compact_kwargs(
             api_key=resolved_api_key,
             base_url=resolved_base_url,
+            callbacks=callbacks,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            max_retries=max_retries,
         ),
     )
 
@@ -60,6 +68,10 @@ def init_intent_model(
     model: str | None = None,
     api_key: str | None = None,
     base_url: str | None = None,
+    callbacks: list | None = None,
+    http_client: Any = None,
+    http_async_client: Any = None,
+    max_retries: int | None = None,
 ):
     """Create the dedicated intent-recognition model."""
     from langchain.chat_models import init_chat_model as _init_chat_model
@@ -77,6 +89,10 @@ def init_intent_model(
         **_compact_kwargs(
             api_key=resolved_api_key,
             base_url=resolved_base_url,
+            callbacks=callbacks,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            max_retries=max_retries,
         ),
     )
 
@@ -4,7 +4,7 @@
 """
 import yaml
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import logging
 
@@ -28,6 +28,7 @@ class ConfigLoader:
         
         self.config_dir = Path(config_dir)
         self._configs: Dict[str, Dict[str, Any]] = {}
+        self._stamps: Dict[str, Tuple[int, int]] = {}
         self._load_all_configs()
     
     def _load_all_configs(self):
@@ -40,12 +41,18 @@ class ConfigLoader:
         for config_file in self.config_dir.glob("*.yaml"):
             try:
                 business_id = config_file.stem
+                self._stamps[business_id] = self._file_stamp(config_file)
                 config = self._load_config_file(config_file)
                 self._configs[business_id] = config
                 logger.info(f"加载配置: {business_id}")
             except Exception as e:
                 logger.error(f"加载配置文件失败 {config_file}: {e}")
     
+    @staticmethod
+    def _file_stamp(config_file: Path) -> Tuple[int, int]:
+        stat = config_file.stat()
+        return stat.st_mtime_ns, stat.st_size
+    
     def _load_config_file(self, config_file: Path) -> Dict[str, Any]:
         """
         加载单个配置文件
@@ -97,23 +104,60 @@ class ConfigLoader:
         """
         return self._configs.get(business_id)
     
-    def reload_config(self, business_id: str):
+    def reload_config(self, business_id: str) -> bool:
         """
         重新加载指定业务的配置
         
         Args:
             business_id: 业务标识
+            
+        Returns:
+            是否加载成功；失败时保留原配置
         """
         config_file = self.config_dir / f"{business_id}.yaml"
         if config_file.exists():
             try:
+                self._stamps[business_id] = self._file_stamp(config_file)
                 config = self._load_config_file(config_file)
                 self._configs[business_id] = config
                 logger.info(f"重新加载配置: {business_id}")
+                return True
             except Exception as e:
                 logger.error(f"重新加载配置失败 {business_id}: {e}")
         else:
             logger.warning(f"配置文件不存在: {config_file}")
+        return False
+    
+    def refresh(self) -> List[str]:
+        """
+        按文件修改时间和大小检查配置目录，重新加载有变化的业务配置
+        
+        解析失败的文件保留原配置，直到文件再次变化。
+        
+        Returns:
+            配置发生变化（新增、修改或删除）的业务ID列表
+        """
+        changed: List[str] = []
+        seen = set()
+        for config_file in self.config_dir.glob("*.yaml"):
+            business_id = config_file.stem
+            seen.add(business_id)
+            try:
+                stamp = self._file_stamp(config_file)
+            except OSError:
+                continue
+            if self._stamps.get(business_id) == stamp:
+                continue
+            if self.reload_config(business_id):
+                changed.append(business_id)
+        
+        for business_id in list(self._configs):
+            if business_id not in seen:
+                self._configs.pop(business_id, None)
+                self._stamps.pop(business_id, None)
+                logger.info(f"配置已删除: {business_id}")
+                changed.append(business_id)
+        return changed
     
     def list_businesses(self) -> list:
         """
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from sqlalchemy.orm import declarative_base
 from config import settings
 from contextlib import asynccontextmanager
+from services.telemetry import instrument_sqlalchemy
 
 # 创建异步引擎
 # 根据数据库类型自动配置连接池
@@ -27,6 +28,9 @@ else:
         pool_pre_ping=True,
     )
 
+# 记录每条 SQL 的耗时，进入 /metrics 的 db 阶段
+instrument_sqlalchemy(engine)
+
 # 创建异步会话工厂
 async_session = async_sessionmaker(
     engine,
@@ -4,20 +4,83 @@ FastAPI应用主入口
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-from config import settings
-from api import api_router
-from services.redis_cache import redis_cache
+from services.startup import StartupOrchestrator, resolve_lazy, startup_profile
+
+with startup_profile.importing("config"):
+    from config import settings
+with startup_profile.importing("api"):
+    from api import api_router
+with startup_profile.importing("services"):
+    from services.llm_gateway import get_llm_gateway
+    from services.redis_cache import redis_cache
+    from services.telemetry import configure_tracing, render_metrics
 
 
 logger = logging.getLogger(__name__)
 
 
+def _init_knowledge_retriever():
+    from services.knowledge_retriever import knowledge_retriever
+
+    resolve_lazy(knowledge_retriever)
+
+
+def _init_workflow():
+    """构建默认业务的工作流并实例化惰性注册的节点和工作流包"""
+    from ai_module.core.runtime import runtime_factory
+
+    runtime_factory.get_workflow().warm_up()
+
+
+def _init_smart_questions():
+    from services.smart_questions_service import smart_questions_service
+
+    resolve_lazy(smart_questions_service)
+
+
+def _preload_document_parsers():
+    from services.file_service import FileService
+
+    FileService.preload_parsers()
+
+
+async def _warm_up_llm_connections():
+    await get_llm_gateway().warm_up(settings.LLM_PROVIDER, settings.LLM_BASE_URL, settings.LLM_API_KEY)
+
+
+def build_startup() -> StartupOrchestrator:
+    """注册启动子系统；关闭预热时不注册任何子系统，各组件在首次使用时初始化"""
+    startup = StartupOrchestrator(startup_profile)
+    if not settings.STARTUP_WARMUP_ENABLED:
+        return startup
+    timeout = settings.STARTUP_SUBSYSTEM_TIMEOUT_SECONDS
+    startup.register("knowledge_retriever", _init_knowledge_retriever, timeout=timeout)
+    startup.register("workflow", _init_workflow, timeout=timeout)
+    startup.register("smart_questions", _init_smart_questions, critical=False, timeout=timeout)
+    startup.register("document_parsers", _preload_document_parsers, critical=False, timeout=timeout)
+    if settings.STARTUP_WARMUP_LLM and settings.LLM_GATEWAY_ENABLED:
+        # 模型客户端在构建工作流时创建，连接预热排在其后
+        startup.register(
+            "llm_connections",
+            _warm_up_llm_connections,
+            critical=False,
+            after=("workflow",),
+            timeout=timeout,
+        )
+    return startup
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时
     settings.validate_runtime_configuration()
+    configure_tracing(settings)
+    startup = build_startup()
+    app.state.startup = startup
+    await startup.start()
     try:
         await redis_cache.connect()
         logger.info("Redis连接成功")
@@ -25,15 +88,26 @@ async def lifespan(app: FastAPI):
         if settings.REDIS_REQUIRED:
             raise
         logger.warning("Redis连接失败，将使用内存缓存: %s", e)
+
+    config_watcher = None
+    if settings.BUSINESS_CONFIG_HOT_RELOAD:
+        from ai_module.core.config_watcher import create_config_watcher
+
+        config_watcher = create_config_watcher()
+        await config_watcher.start()
     
     yield
     
     # 关闭时
+    await startup.stop()
+    if config_watcher is not None:
+        await config_watcher.stop()
     try:
         await redis_cache.disconnect()
         logger.info("Redis连接已关闭")
     except Exception as e:
         logger.warning("Redis断开连接失败: %s", e)
+    await get_llm_gateway().aclose()
 
 
 # 创建FastAPI应用
@@ -75,6 +149,34 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查：关键子系统初始化完成前返回 503"""
+    startup = getattr(app.state, "startup", None)
+    if startup is None:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    readiness = startup.readiness()
+    status_code = 200 if readiness["ready"] else 503
+    return JSONResponse(
+        {"status": "ready" if readiness["ready"] else "starting", **readiness},
+        status_code=status_code,
+    )
+
+
+@app.get("/startup-profile", include_in_schema=False)
+async def startup_profile_report():
+    """启动耗时：各模块组导入耗时和各子系统初始化耗时"""
+    return startup_profile.report()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标（各阶段耗时直方图等）"""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,243 @@
+"""Pluggable binary codec for cache payloads.
+
+Every encoded payload starts with a two-byte header:
+
+- byte 0: payload format version (``PAYLOAD_VERSION``)
+- byte 1: serializer id in the low nibble, compression id in the high nibble
+
+Payloads without a known version byte are treated as legacy UTF-8 JSON, so
+entries written before the codec existed can still be read.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import ormsgpack
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    ormsgpack = None
+
+try:
+    import zstandard
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_VERSION = 1
+
+SERIALIZER_JSON = "json"
+SERIALIZER_MSGPACK = "msgpack"
+COMPRESSION_NONE = "none"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSION_LZ4 = "lz4"
+
+_SERIALIZER_IDS = {SERIALIZER_JSON: 1, SERIALIZER_MSGPACK: 2}
+_COMPRESSION_IDS = {COMPRESSION_NONE: 0, COMPRESSION_ZSTD: 1, COMPRESSION_LZ4: 2}
+_SERIALIZER_NAMES = {value: key for key, value in _SERIALIZER_IDS.items()}
+_COMPRESSION_NAMES = {value: key for key, value in _COMPRESSION_IDS.items()}
+
+
+class CodecError(ValueError):
+    """Raised when a payload cannot be decoded."""
+
+
+def _json_default(value: Any) -> Any:
+    return str(value)
+
+
+def _dump_json(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def _load_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def _dump_msgpack(obj: Any) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True, default=_json_default)
+    return ormsgpack.packb(obj, default=_json_default, option=ormsgpack.OPT_NON_STR_KEYS)
+
+
+def _load_msgpack(data: bytes) -> Any:
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return ormsgpack.unpackb(data)
+
+
+def _serializer_available(name: str) -> bool:
+    if name == SERIALIZER_JSON:
+        return True
+    if name == SERIALIZER_MSGPACK:
+        return msgpack is not None or ormsgpack is not None
+    return False
+
+
+def _compression_available(name: str) -> bool:
+    if name == COMPRESSION_NONE:
+        return True
+    if name == COMPRESSION_ZSTD:
+        return zstandard is not None
+    if name == COMPRESSION_LZ4:
+        return lz4_frame is not None
+    return False
+
+
+_SERIALIZERS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    SERIALIZER_JSON: (_dump_json, _load_json),
+    SERIALIZER_MSGPACK: (_dump_msgpack, _load_msgpack),
+}
+
+
+class PayloadCodec:
+    """Serialize and optionally compress cache payloads behind a version header."""
+
+    def __init__(
+        self,
+        serializer: str = SERIALIZER_JSON,
+        compression: str = COMPRESSION_ZSTD,
+        compress_threshold: int = 1024,
+        compression_level: int = 3,
+    ):
+        serializer = (serializer or SERIALIZER_JSON).strip().lower()
+        compression = (compression or COMPRESSION_NONE).strip().lower()
+
+        if serializer not in _SERIALIZER_IDS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        if compression not in _COMPRESSION_IDS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+
+        if not _serializer_available(serializer):
+            logger.warning("Cache serializer %s is unavailable, falling back to json", serializer)
+            serializer = SERIALIZER_JSON
+        if not _compression_available(compression):
+            logger.warning("Cache compression %s is unavailable, storing payloads uncompressed", compression)
+            compression = COMPRESSION_NONE
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_threshold = max(0, int(compress_threshold))
+        self.compression_level = compression_level
+        self._zstd_compressor = None
+        self._zstd_decompressor = None
+
+    def _compress(self, data: bytes) -> Tuple[str, bytes]:
+        if self.compression == COMPRESSION_NONE or len(data) < self.compress_threshold:
+            return COMPRESSION_NONE, data
+
+        if self.compression == COMPRESSION_ZSTD:
+            if self._zstd_compressor is None:
+                self._zstd_compressor = zstandard.ZstdCompressor(level=self.compression_level)
+            compressed = self._zstd_compressor.compress(data)
+        else:
+            compressed = lz4_frame.compress(data)
+
+        # 压缩收益太小时保留原文，避免解压开销白白浪费。
+        if len(compressed) >= len(data):
+            return COMPRESSION_NONE, data
+        return self.compression, compressed
+
+    def _decompress(self, compression: str, data: bytes) -> bytes:
+        if compression == COMPRESSION_NONE:
+            return data
+        if not _compression_available(compression):
+            raise CodecError(f"compression {compression} is required to decode this payload")
+        if compression == COMPRESSION_ZSTD:
+            if self._zstd_decompressor is None:
+                self._zstd_decompressor = zstandard.ZstdDecompressor()
+            return self._zstd_decompressor.decompress(data)
+        return lz4_frame.decompress(data)
+
+    def encode(self, obj: Any) -> bytes:
+        dump, _ = _SERIALIZERS[self.serializer]
+        compression, body = self._compress(dump(obj))
+        flags = _SERIALIZER_IDS[self.serializer] | (_COMPRESSION_IDS[compression] << 4)
+        return bytes((PAYLOAD_VERSION, flags)) + body
+
+    def decode(self, payload: bytes | str | None) -> Any:
+        if payload is None:
+            return None
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if not payload:
+            return None
+
+        if payload[0] != PAYLOAD_VERSION or len(payload) < 2:
+            return self._decode_legacy(payload)
+
+        flags = payload[1]
+        serializer = _SERIALIZER_NAMES.get(flags & 0x0F)
+        compression = _COMPRESSION_NAMES.get(flags >> 4)
+        if serializer is None or compression is None:
+            raise CodecError(f"unknown payload flags: {flags:#04x}")
+        if not _serializer_available(serializer):
+            raise CodecError(f"serializer {serializer} is required to decode this payload")
+
+        _, load = _SERIALIZERS[serializer]
+        try:
+            return load(self._decompress(compression, payload[2:]))
+        except CodecError:
+            raise
+        except Exception as exc:
+            raise CodecError(f"failed to decode {serializer}/{compression} payload: {exc}") from exc
+
+    @staticmethod
+    def _decode_legacy(payload: bytes) -> Any:
+        try:
+            return json.loads(payload.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise CodecError(f"failed to decode legacy json payload: {exc}") from exc
+
+
+def build_codec(
+    serializer: Optional[str] = None,
+    compression: Optional[str] = None,
+    compress_threshold: Optional[int] = None,
+) -> PayloadCodec:
+    """Build a codec from explicit values, defaulting to application settings."""
+    from config import settings
+
+    return PayloadCodec(
+        serializer=serializer or getattr(settings, "CACHE_CODEC_SERIALIZER", SERIALIZER_JSON),
+        compression=compression or getattr(settings, "CACHE_CODEC_COMPRESSION", COMPRESSION_ZSTD),
+        compress_threshold=(
+            compress_threshold
+            if compress_threshold is not None
+            else getattr(settings, "CACHE_CODEC_COMPRESS_THRESHOLD", 1024)
+        ),
+    )
+
+
+__all__ = [
+    "COMPRESSION_LZ4",
+    "COMPRESSION_NONE",
+    "COMPRESSION_ZSTD",
+    "CodecError",
+    "PAYLOAD_VERSION",
+    "PayloadCodec",
+    "SERIALIZER_JSON",
+    "SERIALIZER_MSGPACK",
+    "build_codec",
+]
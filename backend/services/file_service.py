@@ -10,12 +10,10 @@ from typing import Optional
 
 import aiofiles
 from fastapi import UploadFile
-from PIL import Image
-from docx import Document as DocxDocument
-from pypdf import PdfReader
 
 from config import settings
 from .paddleocr_service import vision_llm_service
+from .shared_cache import get_shared_cache
 
 
 class FileService:
@@ -26,7 +24,11 @@ class FileService:
     def __init__(self):
         self.upload_dir = Path(settings.UPLOAD_DIR).resolve()
         self.upload_dir.mkdir(parents=True, exist_ok=True)
-        self._pending_analysis: dict[str, asyncio.Task] = {}
+        # Strong references keep background analysis tasks alive until they finish.
+        self._analysis_tasks: set[asyncio.Task] = set()
+        # Analysis results are shared across workers so a file uploaded on one
+        # worker can be read by a chat turn served by another.
+        self._analysis_cache = get_shared_cache().namespace("image_analysis", ttl_seconds=86400)
 
     def _get_file_extension(self, filename: str) -> str:
         return filename.rsplit(".", 1)[1].lower() if "." in filename else ""
@@ -102,7 +104,9 @@ class FileService:
 
         if self._is_image_file(file.filename) and vision_llm_service.is_available():
             result["analysis_pending"] = True
-            self._pending_analysis[file_id] = asyncio.create_task(self._analyze_image_async(file_id))
+            task = asyncio.create_task(self._analyze_image_async(file_id))
+            self._analysis_tasks.add(task)
+            task.add_done_callback(self._analysis_tasks.discard)
 
         return result
 
@@ -127,10 +131,9 @@ class FileService:
                 "confidence": analysis.get("confidence", 0),
             }
             await self._write_json(self._analysis_path(file_id), payload)
+            await self._analysis_cache.set(file_id, payload)
         except Exception as exc:
             print(f"Image analysis failed for {file_id}: {exc}")
-        finally:
-            self._pending_analysis.pop(file_id, None)
 
     async def get_file_metadata(self, file_id: str) -> Optional[dict]:
         metadata = await self._read_json(self._metadata_path(file_id))
@@ -197,7 +200,10 @@ class FileService:
             metadata = await self.get_owned_file_metadata(file_id, user_id, session_id=session_id)
             if not metadata:
                 return None
-        return await self._read_json(self._analysis_path(file_id))
+        return await self._analysis_cache.get_or_load(
+            file_id,
+            lambda: self._read_json(self._analysis_path(file_id)),
+        )
 
     async def get_file(
         self,
@@ -230,16 +236,29 @@ class FileService:
             print(f"Text extraction failed: {exc}")
             return ""
 
+    @staticmethod
+    def preload_parsers() -> None:
+        """Import the document/image parsers ahead of the first upload."""
+        import docx  # noqa: F401
+        import pypdf  # noqa: F401
+        from PIL import Image  # noqa: F401
+
     def _extract_pdf_text(self, file_path: str) -> str:
+        from pypdf import PdfReader
+
         reader = PdfReader(file_path)
         return "\n".join((page.extract_text() or "") for page in reader.pages)
 
     def _extract_docx_text(self, file_path: str) -> str:
+        from docx import Document as DocxDocument
+
         document = DocxDocument(file_path)
         return "\n".join(paragraph.text for paragraph in document.paragraphs)
 
     def analyze_image(self, file_path: str) -> dict:
         try:
+            from PIL import Image
+
             image = Image.open(file_path)
             return {
                 "width": image.width,
@@ -12,18 +12,31 @@ import json
 import pickle
 import numpy as np
 from pathlib import Path
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from config import settings, init_chat_model
+from services.llm_gateway import create_chat_model
+from services.llm_response_cache import with_response_cache
+from services.single_flight import RESULT_LEADER, SingleFlight
+from services.startup import LazyProxy
+from services.telemetry import traced
 
 logger = logging.getLogger(__name__)
 
-try:
-    import faiss
-except ImportError:
-    faiss = None
-    logger.warning("FAISS not available. Install with: pip install faiss-cpu")
+# faiss 和 langchain_openai 导入较重，推迟到检索器首次构造时（见 _load_faiss）
+faiss = None
+
+
+def _load_faiss():
+    global faiss
+    if faiss is None:
+        try:
+            import faiss as _faiss
+        except ImportError:
+            logger.warning("FAISS not available. Install with: pip install faiss-cpu")
+            return None
+        faiss = _faiss
+    return faiss
 
 try:
     from rank_bm25 import BM25Okapi
@@ -32,6 +45,10 @@ except ImportError:
     logger.warning("BM25Okapi not available.")
 
 
+# 检索结果是 Document 对象，只在进程内合并
+_retrieve_flight = SingleFlight("knowledge_retrieve")
+
+
 class FAISSCollection:
     """模拟ChromaDB Collection接口的FAISS封装"""
 
@@ -189,7 +206,7 @@ class KnowledgeRetriever:
     """高级RAG知识检索器 (FAISS)"""
 
     def __init__(self):
-        self.available = faiss is not None
+        self.available = _load_faiss() is not None
         self.client = None
         self.embeddings = None
         self.llm = None
@@ -199,6 +216,8 @@ class KnowledgeRetriever:
 
         if self.available:
             try:
+                from langchain_openai import OpenAIEmbeddings
+
                 persist_dir = settings.FAISS_PERSIST_DIRECTORY
 
                 self.embeddings = OpenAIEmbeddings(
@@ -207,7 +226,7 @@ class KnowledgeRetriever:
                     model=settings.SILICONFLOW_EMBEDDING_MODEL
                 )
 
-                self.llm = init_chat_model(temperature=0)
+                self.llm = create_chat_model(init_chat_model, role="retrieval", temperature=0)
                 self.knowledge_collection = FAISSCollection("knowledge_base", persist_dir)
                 self.product_collection = FAISSCollection("product_catalog", persist_dir)
 
@@ -240,6 +259,7 @@ class KnowledgeRetriever:
         except Exception as e:
             logger.error(f"构建BM25索引失败: {e}")
 
+    @traced("retrieval", "query_rewrite")
     async def _query_rewrite(self, query: str) -> List[str]:
         if not self.llm:
             return [query]
@@ -253,13 +273,14 @@ class KnowledgeRetriever:
 4. 每行一个查询,不要编号"""),
                 ("human", "原始问题: {query}\n\n请生成3个改写查询:")
             ])
-            response = await self.llm.ainvoke(prompt.format_messages(query=query))
+            response = await with_response_cache(self.llm, "query_rewrite").ainvoke(prompt.format_messages(query=query))
             rewritten = [q.strip() for q in response.content.strip().split('\n') if q.strip()]
             return [query] + rewritten[:3]
         except Exception as e:
             logger.error(f"查询改写失败: {e}")
             return [query]
 
+    @traced("retrieval", "vector_search")
     async def _vector_search(
         self, query: str, collection_name: str, top_k: int,
         filter_metadata: Optional[Dict] = None
@@ -291,6 +312,7 @@ class KnowledgeRetriever:
             logger.error(f"向量检索失败: {e}")
             return []
 
+    @traced("retrieval", "bm25_search")
     def _bm25_search(self, query: str, collection_name: str, top_k: int) -> List[Tuple[Document, float]]:
         if not BM25Okapi or collection_name not in self.bm25_index:
             return []
@@ -313,6 +335,7 @@ class KnowledgeRetriever:
             logger.error(f"BM25检索失败: {e}")
             return []
 
+    @traced("retrieval", "rerank_documents")
     async def _rerank_documents(
         self, query: str, docs_with_scores: List[Tuple[Document, float]], top_k: int
     ) -> List[Document]:
@@ -328,7 +351,7 @@ class KnowledgeRetriever:
 返回格式: 每行一个文档编号,按相关性从高到低排序,只返回编号,用逗号分隔。"""),
                 ("human", "问题: {query}\n\n候选文档:\n{docs}\n\n请返回文档编号(按相关性排序):")
             ])
-            response = await self.llm.ainvoke(prompt.format_messages(query=query, docs=docs_text))
+            response = await with_response_cache(self.llm, "rerank").ainvoke(prompt.format_messages(query=query, docs=docs_text))
             ranking_str = response.content.strip()
             rankings = [int(x.strip()) - 1 for x in ranking_str.split(',') if x.strip().isdigit()]
             reranked_docs = []
@@ -345,37 +368,96 @@ class KnowledgeRetriever:
             logger.error(f"重排序失败: {e}")
             return [doc for doc, _ in docs_with_scores[:top_k]]
 
+    def _collection_empty(self, collection_name: str) -> bool:
+        collection = (
+            self.knowledge_collection
+            if collection_name == "knowledge_base"
+            else self.product_collection
+        )
+        return collection.count() == 0
+
+    async def _search_query(
+        self, query: str, collection_name: str, top_k: int,
+        filter_metadata: Optional[Dict], use_hybrid: bool
+    ) -> List[Tuple[Document, float]]:
+        """单个查询的向量检索 + BM25 检索，BM25 分数归一化到 0~1"""
+        docs_with_scores = await self._vector_search(query, collection_name, top_k * 2, filter_metadata)
+        if use_hybrid and BM25Okapi:
+            bm25_results = self._bm25_search(query, collection_name, top_k * 2)
+            if bm25_results:
+                max_bm25_score = max(score for _, score in bm25_results)
+                if max_bm25_score > 0:
+                    bm25_results = [(doc, score / max_bm25_score) for doc, score in bm25_results]
+            docs_with_scores.extend(bm25_results)
+        return docs_with_scores
+
+    @traced("retrieval", "search_candidates")
+    async def search_candidates(
+        self, query: str, collection_name: str = "knowledge_base",
+        top_k: int = 3, filter_metadata: Optional[Dict] = None, use_hybrid: bool = True
+    ) -> List[Tuple[Document, float]]:
+        """只做原始查询的向量/BM25 检索，不调用 LLM；结果交给 ``retrieve(candidates=...)`` 完成改写与重排"""
+        if not self.available or not self.embeddings or self._collection_empty(collection_name):
+            return []
+        try:
+            return await self._search_query(query, collection_name, top_k, filter_metadata, use_hybrid)
+        except Exception as e:
+            logger.error(f"候选检索失败: {e}")
+            return []
+
+    @traced("retrieval", "retrieve")
     async def retrieve(
         self, query: str, collection_name: str = "knowledge_base",
         top_k: int = 3, filter_metadata: Optional[Dict] = None,
-        use_hybrid: bool = True, use_rerank: bool = True, use_query_rewrite: bool = True
+        use_hybrid: bool = True, use_rerank: bool = True, use_query_rewrite: bool = True,
+        candidates: Optional[List[Tuple[Document, float]]] = None
+    ) -> List[Document]:
+        """检索文档；并发的相同检索（含改写、重排的 LLM 调用）合并为一次执行
+
+        ``candidates`` 为 ``search_candidates`` 提前取得的原始查询结果，传入时不再重复检索原始查询
+        """
+        flight_key = json.dumps(
+            [query, collection_name, top_k, filter_metadata, use_hybrid, use_rerank, use_query_rewrite],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        docs, result = await _retrieve_flight.do_with_status(
+            flight_key,
+            lambda: self._retrieve(
+                query, collection_name, top_k, filter_metadata, use_hybrid, use_rerank, use_query_rewrite,
+                candidates
+            ),
+        )
+        if result == RESULT_LEADER:
+            return docs
+        # 合并的调用拿到各自的副本，避免调用方修改 metadata 时互相影响
+        return [Document(page_content=doc.page_content, metadata=dict(doc.metadata)) for doc in docs]
+
+    async def _retrieve(
+        self, query: str, collection_name: str, top_k: int, filter_metadata: Optional[Dict],
+        use_hybrid: bool, use_rerank: bool, use_query_rewrite: bool,
+        candidates: Optional[List[Tuple[Document, float]]] = None
     ) -> List[Document]:
         if not self.available or not self.embeddings:
             return []
         # 知识库为空时直接返回，跳过所有 LLM 调用（query_rewrite、rerank 等）
-        collection = (
-            self.knowledge_collection
-            if collection_name == "knowledge_base"
-            else self.product_collection
-        )
-        if collection.count() == 0:
+        if self._collection_empty(collection_name):
             logger.info(f"集合 '{collection_name}' 为空，跳过检索")
             return []
         try:
-            all_docs_with_scores = []
-            queries = [query]
+            if candidates is None:
+                all_docs_with_scores = await self._search_query(
+                    query, collection_name, top_k, filter_metadata, use_hybrid
+                )
+            else:
+                all_docs_with_scores = list(candidates)
             if use_query_rewrite:
-                queries = await self._query_rewrite(query)
-            for q in queries:
-                vector_results = await self._vector_search(q, collection_name, top_k * 2, filter_metadata)
-                all_docs_with_scores.extend(vector_results)
-                if use_hybrid and BM25Okapi:
-                    bm25_results = self._bm25_search(q, collection_name, top_k * 2)
-                    if bm25_results:
-                        max_bm25_score = max(score for _, score in bm25_results)
-                        if max_bm25_score > 0:
-                            bm25_results = [(doc, score / max_bm25_score) for doc, score in bm25_results]
-                    all_docs_with_scores.extend(bm25_results)
+                # 改写结果的第一条是原始查询，已在上面检索过
+                for q in (await self._query_rewrite(query))[1:]:
+                    all_docs_with_scores.extend(
+                        await self._search_query(q, collection_name, top_k, filter_metadata, use_hybrid)
+                    )
             doc_scores = {}
             for doc, score in all_docs_with_scores:
                 doc_key = doc.page_content[:100]
@@ -541,5 +623,5 @@ class KnowledgeRetriever:
         }
 
 
-# 全局知识检索器实例
-knowledge_retriever = KnowledgeRetriever()
+# 全局知识检索器实例：首次访问时构造，服务启动时由 lifespan 在后台预先初始化
+knowledge_retriever = LazyProxy(KnowledgeRetriever, "knowledge_retriever")
@@ -19,6 +19,7 @@ from langchain_core.documents import Document as LangchainDocument
 
 from config import settings
 from .knowledge_retriever import knowledge_retriever
+from .startup import aresolve_lazy
 
 logger = logging.getLogger(__name__)
 
@@ -285,14 +286,15 @@ class KnowledgeService:
             print(f"[DEBUG] 文档数据准备完成")
 
             # 添加到向量数据库
-            print(f"[DEBUG] knowledge_retriever.available: {knowledge_retriever.available}")
+            retriever = await aresolve_lazy(knowledge_retriever)
+            print(f"[DEBUG] knowledge_retriever.available: {retriever.available}")
             indexed = False
             index_error = ""
-            if knowledge_retriever.available:
+            if retriever.available:
                 try:
                     print(f"[DEBUG] 开始添加文档到向量数据库")
-                    await knowledge_retriever.delete_by_metadata({"doc_id": doc_id}, "knowledge_base")
-                    await knowledge_retriever.add_documents(documents, "knowledge_base")
+                    await retriever.delete_by_metadata({"doc_id": doc_id}, "knowledge_base")
+                    await retriever.add_documents(documents, "knowledge_base")
                     print(f"[DEBUG] 文档添加到向量数据库成功")
                     indexed = True
                 except Exception as e:
@@ -345,7 +347,8 @@ class KnowledgeService:
         force: bool = False,
     ) -> Dict[str, Any]:
         """(Re)index a stored knowledge file into FAISS."""
-        if not knowledge_retriever.available:
+        retriever = await aresolve_lazy(knowledge_retriever)
+        if not retriever.available:
             raise RuntimeError("knowledge_retriever unavailable")
 
         file_path = file_path or self._find_document_path(doc_id)
@@ -370,9 +373,9 @@ class KnowledgeService:
 
         existing_chunk_ids = list(meta.get("chunk_ids", []))
         if existing_chunk_ids:
-            await knowledge_retriever.delete_documents(existing_chunk_ids, "knowledge_base")
+            await retriever.delete_documents(existing_chunk_ids, "knowledge_base")
         else:
-            await knowledge_retriever.delete_by_metadata({"doc_id": doc_id}, "knowledge_base")
+            await retriever.delete_by_metadata({"doc_id": doc_id}, "knowledge_base")
 
         documents = self._build_documents(
             doc_id=doc_id,
@@ -383,7 +386,7 @@ class KnowledgeService:
             title=title,
             description=description,
         )
-        chunk_ids = await knowledge_retriever.add_documents(documents, "knowledge_base")
+        chunk_ids = await retriever.add_documents(documents, "knowledge_base")
 
         self._upsert_metadata(
             doc_id=doc_id,
@@ -407,7 +410,8 @@ class KnowledgeService:
 
     async def reindex_documents(self, force: bool = False) -> Dict[str, Any]:
         """Backfill existing uploaded documents into the vector store."""
-        if not knowledge_retriever.available:
+        retriever = await aresolve_lazy(knowledge_retriever)
+        if not retriever.available:
             return {
                 "success": False,
                 "message": "知识检索器不可用",
@@ -508,13 +512,14 @@ class KnowledgeService:
         """删除知识库文档"""
         try:
             # 从向量数据库删除
-            if knowledge_retriever.available:
+            retriever = await aresolve_lazy(knowledge_retriever)
+            if retriever.available:
                 meta = self.metadata.get(doc_id, {})
                 chunk_ids = meta.get("chunk_ids", [])
                 if chunk_ids:
-                    await knowledge_retriever.delete_documents(chunk_ids, "knowledge_base")
+                    await retriever.delete_documents(chunk_ids, "knowledge_base")
                 else:
-                    await knowledge_retriever.delete_by_metadata({"doc_id": doc_id}, "knowledge_base")
+                    await retriever.delete_by_metadata({"doc_id": doc_id}, "knowledge_base")
 
             # 删除文件
             for ext in ['pdf', 'doc', 'docx', 'txt', 'md']:
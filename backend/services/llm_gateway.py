@@ -0,0 +1,527 @@
+"""
+LLM 调用网关。
+
+所有模型实例都经 ``create_chat_model`` / ``LLMGateway.wrap`` 包装，节点照常调用
+``ainvoke`` / ``astream`` / ``bind_tools``，网关在调用外层统一负责：
+
+- 共享 HTTP 连接池：同一提供方的模型复用一组 httpx 客户端（``LLM_HTTP_*``），
+  并关闭 SDK 自带重试，避免与网关重试叠加
+- 并发限制：按提供方（``LLM_PROVIDER_CONCURRENCY``）和角色（``LLM_ROLE_CONCURRENCY``）的信号量
+- 重试：只重试超时、连接错误、429 和 5xx，指数退避加全抖动；流式调用只在首个增量之前重试
+- 对冲请求：``LLM_HEDGE_ROLES`` 中的角色（默认意图识别）在 ``LLM_HEDGE_DELAY_MS`` 内未返回时
+  再发一路请求，先成功者胜出，另一路取消
+- 熔断：提供方连续 ``LLM_CIRCUIT_FAILURE_THRESHOLD`` 次瞬时故障后打开，
+  ``LLM_CIRCUIT_RECOVERY_SECONDS`` 内直接抛出 ``LLMUnavailableError``，
+  调用方按原有异常分支走规则兜底；冷却后放行一次探测请求
+
+各类事件写入 ``ai_llm_gateway_events_total``（provider / role / event）。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+LLM_GATEWAY_EVENTS = registry.counter(
+    "ai_llm_gateway_events_total",
+    "LLM gateway events: ok, error, retry, rejected, hedge, hedge_won, circuit_open, circuit_closed.",
+    ("provider", "role", "event"),
+)
+
+# 走 OpenAI 兼容接口、可以注入 httpx 客户端的提供方
+OPENAI_COMPATIBLE_PROVIDERS = frozenset({"openai", "deepseek"})
+
+_RETRYABLE_ERROR_NAMES = frozenset(
+    {
+        "APITimeoutError",
+        "APIConnectionError",
+        "RateLimitError",
+        "InternalServerError",
+        "ServiceUnavailableError",
+        "TimeoutException",
+        "TransportError",
+        "RemoteProtocolError",
+    }
+)
+
+
+class LLMUnavailableError(RuntimeError):
+    """提供方熔断期间的快速失败，调用方应走规则或缓存兜底。"""
+
+    def __init__(self, provider: str, role: str):
+        super().__init__(f"LLM provider '{provider}' is unavailable (circuit open, role={role})")
+        self.provider = provider
+        self.role = role
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """超时、连接错误、限流和服务端错误视为瞬时故障；参数错误、鉴权失败等不重试。"""
+    if isinstance(exc, LLMUnavailableError):
+        return False
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 409, 429) or status >= 500
+    return any(cls.__name__ in _RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+def parse_role_limits(raw: str) -> Dict[str, int]:
+    """解析 ``intent=8,chat=12`` 形式的按角色并发配置。"""
+    limits: Dict[str, int] = {}
+    for item in (raw or "").split(","):
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if not name or not value.strip():
+            continue
+        try:
+            limits[name] = int(value)
+        except ValueError:
+            logger.warning("忽略无效的角色并发配置: %s", item)
+    return limits
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = 2
+    base_delay: float = 0.3
+    max_delay: float = 3.0
+
+    def delay(self, attempt: int) -> float:
+        """第 ``attempt`` 次重试前的等待时间（full jitter）。"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """按提供方统计连续瞬时故障的熔断器：closed → open → half_open → closed。"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probing = False
+            # 半开状态只放行一个探测请求
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> bool:
+        """记录成功；返回 True 表示熔断器由此关闭。"""
+        with self._lock:
+            recovered = self._state != self.CLOSED
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+            return recovered
+
+    def record_failure(self) -> bool:
+        """记录一次瞬时故障；返回 True 表示熔断器由此打开。"""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+                return True
+            return False
+
+
+class LLMGateway:
+    """进程内共享的模型调用网关，见模块说明。"""
+
+    def __init__(
+        self,
+        *,
+        provider_concurrency: int = 16,
+        role_concurrency: Optional[Dict[str, int]] = None,
+        retry: Optional[RetryPolicy] = None,
+        hedge_roles: Iterable[str] = ("intent",),
+        hedge_delay: float = 0.8,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        http_max_connections: int = 50,
+        http_max_keepalive: int = 20,
+        http_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.provider_concurrency = max(1, provider_concurrency)
+        self.role_concurrency = dict(role_concurrency or {})
+        self.retry = retry or RetryPolicy()
+        self.hedge_roles = frozenset(role for role in hedge_roles if role)
+        self.hedge_delay = hedge_delay
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.http_max_connections = http_max_connections
+        self.http_max_keepalive = http_max_keepalive
+        self.http_timeout = http_timeout
+        self._clock = clock
+        self._semaphores: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._http_clients: Dict[str, Dict[str, Any]] = {}
+        # 启动时多个子系统可能在线程池里同时创建模型
+        self._clients_lock = threading.Lock()
+
+    # ── 资源 ──────────────────────────────────────────────────────
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers.setdefault(
+                provider,
+                CircuitBreaker(self.failure_threshold, self.recovery_timeout, clock=self._clock),
+            )
+        return breaker
+
+    def _semaphore(self, provider: str, role: str = "") -> Optional[asyncio.Semaphore]:
+        limit = self.role_concurrency.get(role) if role else self.provider_concurrency
+        if not limit:
+            return None
+        key = (provider, role)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._semaphores.setdefault(key, asyncio.Semaphore(limit))
+        return semaphore
+
+    def client_kwargs(self, provider: str) -> Dict[str, Any]:
+        """模型初始化参数：共享连接池并关闭 SDK 重试；非 OpenAI 兼容提供方返回空字典。"""
+        provider = (provider or "").lower()
+        if provider not in OPENAI_COMPATIBLE_PROVIDERS:
+            return {}
+        clients = self._http_clients.get(provider)
+        if clients is None:
+            try:
+                import httpx
+                from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+            except ImportError:  # pragma: no cover - optional dependency
+                return {"max_retries": 0}
+            with self._clients_lock:
+                clients = self._http_clients.get(provider)
+                if clients is None:
+                    limits = httpx.Limits(
+                        max_connections=self.http_max_connections,
+                        max_keepalive_connections=self.http_max_keepalive,
+                    )
+                    clients = {
+                        "http_client": DefaultHttpxClient(limits=limits, timeout=self.http_timeout),
+                        "http_async_client": DefaultAsyncHttpxClient(limits=limits, timeout=self.http_timeout),
+                    }
+                    self._http_clients[provider] = clients
+        return {"max_retries": 0, **clients}
+
+    async def warm_up(self, provider: str, base_url: str, api_key: str = "") -> bool:
+        """用共享异步客户端预先建立到提供方的连接（DNS、TCP、TLS），供首个请求复用。
+
+        只请求一次 ``GET {base_url}/models``；收到任何 HTTP 响应都算成功，网络错误返回 False。
+        """
+        clients = self.client_kwargs(provider)
+        client = clients.get("http_async_client")
+        if client is None or not base_url:
+            return False
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        try:
+            await client.get(f"{base_url.rstrip('/')}/models", headers=headers)
+        except Exception as exc:
+            logger.warning("LLM connection warm-up for %s failed: %s", provider, exc)
+            return False
+        return True
+
+    async def aclose(self) -> None:
+        for clients in self._http_clients.values():
+            await clients["http_async_client"].aclose()
+            clients["http_client"].close()
+        self._http_clients.clear()
+
+    def wrap(self, model: Any, *, provider: str, role: str) -> "GatewayChatModel":
+        if isinstance(model, GatewayChatModel):
+            return model
+        return GatewayChatModel(model, self, provider=(provider or "").lower(), role=role)
+
+    # ── 调用 ──────────────────────────────────────────────────────
+
+    def _record(self, provider: str, role: str, event: str) -> None:
+        LLM_GATEWAY_EVENTS.inc(provider=provider, role=role, event=event)
+
+    def _admit(self, provider: str, role: str) -> CircuitBreaker:
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            self._record(provider, role, "rejected")
+            raise LLMUnavailableError(provider, role)
+        return breaker
+
+    def _on_success(self, breaker: CircuitBreaker, provider: str, role: str) -> None:
+        if breaker.record_success():
+            logger.info("LLM provider %s recovered, circuit closed", provider)
+            self._record(provider, role, "circuit_closed")
+        self._record(provider, role, "ok")
+
+    def _on_failure(self, breaker: CircuitBreaker, provider: str, role: str, exc: BaseException) -> bool:
+        """记录失败；返回是否还值得重试。"""
+        self._record(provider, role, "error")
+        if not is_retryable_error(exc):
+            # 非瞬时故障说明提供方可达，不计入熔断，也释放可能占用的半开探测名额
+            breaker.record_success()
+            return False
+        if breaker.record_failure():
+            logger.warning("LLM provider %s circuit opened after %s", provider, type(exc).__name__)
+            self._record(provider, role, "circuit_open")
+            return False
+        return True
+
+    async def _call_once(self, call: Callable[[], Awaitable[Any]], provider: str, role: str) -> Any:
+        # 先取角色名额再取提供方名额，避免排队中的请求占住提供方的并发
+        role_semaphore = self._semaphore(provider, role)
+        provider_semaphore = self._semaphore(provider)
+        if role_semaphore is not None:
+            await role_semaphore.acquire()
+        try:
+            if provider_semaphore is not None:
+                async with provider_semaphore:
+                    return await call()
+            return await call()
+        finally:
+            if role_semaphore is not None:
+                role_semaphore.release()
+
+    async def _call_hedged(self, call: Callable[[], Awaitable[Any]], provider: str, role: str) -> Any:
+        primary = asyncio.ensure_future(self._call_once(call, provider, role))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+        if done:
+            return primary.result()
+
+        self._record(provider, role, "hedge")
+        hedge = asyncio.ensure_future(self._call_once(call, provider, role))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._record(provider, role, "hedge_won")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, call: Callable[[], Awaitable[Any]], *, provider: str, role: str) -> Any:
+        """执行一次非流式调用；``call`` 每次尝试都会重新调用以创建新请求。"""
+        breaker = self._admit(provider, role)
+        hedged = role in self.hedge_roles and self.hedge_delay > 0
+        attempt = 0
+        while True:
+            try:
+                if hedged:
+                    result = await self._call_hedged(call, provider, role)
+                else:
+                    result = await self._call_once(call, provider, role)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                if not self._on_failure(breaker, provider, role, exc) or attempt >= self.retry.max_retries:
+                    raise
+                delay = self.retry.delay(attempt)
+                attempt += 1
+                self._record(provider, role, "retry")
+                logger.info("Retrying LLM call provider=%s role=%s attempt=%s in %.2fs: %s", provider, role, attempt, delay, exc)
+                await asyncio.sleep(delay)
+                continue
+            self._on_success(breaker, provider, role)
+            return result
+
+    async def stream(self, call: Callable[[], AsyncIterator[Any]], *, provider: str, role: str) -> AsyncIterator[Any]:
+        """执行一次流式调用；已经产出增量后出错不再重试，直接抛给调用方。"""
+        breaker = self._admit(provider, role)
+        attempt = 0
+        while True:
+            started = False
+            try:
+                role_semaphore = self._semaphore(provider, role)
+                provider_semaphore = self._semaphore(provider)
+                if role_semaphore is not None:
+                    await role_semaphore.acquire()
+                try:
+                    if provider_semaphore is not None:
+                        await provider_semaphore.acquire()
+                    try:
+                        async for chunk in call():
+                            started = True
+                            yield chunk
+                    finally:
+                        if provider_semaphore is not None:
+                            provider_semaphore.release()
+                finally:
+                    if role_semaphore is not None:
+                        role_semaphore.release()
+            except (asyncio.CancelledError, GeneratorExit):
+                raise
+            except Exception as exc:
+                if not self._on_failure(breaker, provider, role, exc) or started or attempt >= self.retry.max_retries:
+                    raise
+                delay = self.retry.delay(attempt)
+                attempt += 1
+                self._record(provider, role, "retry")
+                await asyncio.sleep(delay)
+                continue
+            self._on_success(breaker, provider, role)
+            return
+
+
+class GatewayChatModel:
+    """把模型（或 ``bind_tools`` 之后的 Runnable）的调用转交给网关的代理。"""
+
+    def __init__(self, model: Any, gateway: LLMGateway, *, provider: str, role: str):
+        self.model = model
+        self.gateway = gateway
+        self.provider = provider
+        self.role = role
+
+    def _derive(self, model: Any) -> "GatewayChatModel":
+        return GatewayChatModel(model, self.gateway, provider=self.provider, role=self.role)
+
+    async def ainvoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        return await self.gateway.call(
+            lambda: self.model.ainvoke(input, config, **kwargs),
+            provider=self.provider,
+            role=self.role,
+        )
+
+    async def astream(self, input: Any, config: Any = None, **kwargs: Any) -> AsyncIterator[Any]:
+        async for chunk in self.gateway.stream(
+            lambda: self.model.astream(input, config, **kwargs),
+            provider=self.provider,
+            role=self.role,
+        ):
+            yield chunk
+
+    def invoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        # 同步调用只在少数脚本中使用，仍然受熔断保护
+        breaker = self.gateway._admit(self.provider, self.role)
+        try:
+            result = self.model.invoke(input, config, **kwargs)
+        except Exception as exc:
+            self.gateway._on_failure(breaker, self.provider, self.role, exc)
+            raise
+        self.gateway._on_success(breaker, self.provider, self.role)
+        return result
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "GatewayChatModel":
+        return self._derive(self.model.bind_tools(tools, **kwargs))
+
+    def bind(self, **kwargs: Any) -> "GatewayChatModel":
+        return self._derive(self.model.bind(**kwargs))
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> "GatewayChatModel":
+        return self._derive(self.model.with_structured_output(schema, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    def __repr__(self) -> str:
+        return f"GatewayChatModel(provider={self.provider!r}, role={self.role!r}, model={self.model!r})"
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """返回按 ``LLM_*`` 网关配置创建的进程级共享网关。"""
+    global _gateway
+    if _gateway is not None:
+        return _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            from config import settings
+
+            _gateway = LLMGateway(
+                provider_concurrency=getattr(settings, "LLM_PROVIDER_CONCURRENCY", 16),
+                role_concurrency=parse_role_limits(getattr(settings, "LLM_ROLE_CONCURRENCY", "")),
+                retry=RetryPolicy(
+                    max_retries=getattr(settings, "LLM_MAX_RETRIES", 2),
+                    base_delay=getattr(settings, "LLM_RETRY_BASE_DELAY", 0.3),
+                    max_delay=getattr(settings, "LLM_RETRY_MAX_DELAY", 3.0),
+                ),
+                hedge_roles=[role.strip() for role in getattr(settings, "LLM_HEDGE_ROLES", "intent").split(",")],
+                hedge_delay=getattr(settings, "LLM_HEDGE_DELAY_MS", 800) / 1000,
+                failure_threshold=getattr(settings, "LLM_CIRCUIT_FAILURE_THRESHOLD", 5),
+                recovery_timeout=getattr(settings, "LLM_CIRCUIT_RECOVERY_SECONDS", 30.0),
+                http_max_connections=getattr(settings, "LLM_HTTP_MAX_CONNECTIONS", 50),
+                http_max_keepalive=getattr(settings, "LLM_HTTP_MAX_KEEPALIVE", 20),
+                http_timeout=getattr(settings, "LLM_HTTP_TIMEOUT", 60.0),
+            )
+    return _gateway
+
+
+def create_chat_model(factory: Callable[..., Any], *, role: str, provider: Optional[str] = None, **kwargs: Any) -> Any:
+    """用 ``config.init_chat_model`` / ``init_intent_model`` 创建模型并接入网关。
+
+    ``LLM_GATEWAY_ENABLED=false`` 时原样返回模型。
+    """
+    from config import settings
+
+    if not getattr(settings, "LLM_GATEWAY_ENABLED", True):
+        return factory(provider=provider, **kwargs)
+
+    gateway = get_llm_gateway()
+    resolved_provider = provider or settings.LLM_PROVIDER
+    model = factory(provider=resolved_provider, **gateway.client_kwargs(resolved_provider), **kwargs)
+    return gateway.wrap(model, provider=resolved_provider, role=role)
+
+
+__all__ = [
+    "CircuitBreaker",
+    "GatewayChatModel",
+    "LLMGateway",
+    "LLMUnavailableError",
+    "RetryPolicy",
+    "create_chat_model",
+    "get_llm_gateway",
+    "is_retryable_error",
+    "parse_role_limits",
+]
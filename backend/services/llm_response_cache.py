@@ -0,0 +1,290 @@
+"""确定性提示词的 LLM 回复缓存。
+
+意图识别、查询改写、检索重排、越界回复这类调用，相同输入得到的回复可以直接复用。
+调用点通过 ``with_response_cache(llm, namespace)`` 显式开启，存储使用共享缓存门面
+（``services.shared_cache``）的 ``llm_response`` 命名空间：
+
+- 本地层：进程内 LRU + TTL
+- 共享层：Redis（不可用时退化为 ``redis_cache`` 的内存实现），多个 worker 共享
+- 同一 key 的并发未命中只调用一次模型，其余调用复用其结果；``SINGLE_FLIGHT_DISTRIBUTED``
+  开启时跨 worker 合并
+
+缓存 key 由模型标识（类名、模型名、温度、最大 token、绑定参数）、规范化后的消息
+（类型 + 折叠空白后的内容）和调用参数共同决定。只缓存不含工具调用的非空回复。
+
+命中、未命中按命名空间写入 ``ai_llm_cache_requests_total``，命中时按原回复的
+token 用量累加 ``ai_llm_cache_tokens_saved_total``。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.shared_cache import RESULT_COALESCED, LocalLRUCache, SharedCache, get_shared_cache
+from services.llm_gateway import GatewayChatModel
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "llm_cache"
+
+RESULT_LOCAL_HIT = "local_hit"
+RESULT_SHARED_HIT = "shared_hit"
+RESULT_MISS = "miss"
+RESULT_BYPASS = "bypass"
+
+LLM_CACHE_REQUESTS = registry.counter(
+    "ai_llm_cache_requests_total",
+    "LLM response cache lookups by call site and result.",
+    ("namespace", "result"),
+)
+LLM_CACHE_TOKENS_SAVED = registry.counter(
+    "ai_llm_cache_tokens_saved_total",
+    "Tokens not spent because the response was served from the LLM cache.",
+    ("namespace",),
+)
+
+_MODEL_IDENTITY_ATTRS = (
+    "model_name",
+    "model",
+    "temperature",
+    "max_tokens",
+    "top_p",
+    "openai_api_base",
+    "base_url",
+)
+
+
+def model_signature(llm: Any) -> Dict[str, Any]:
+    """模型标识：同一份提示词在不同模型或参数下不共享缓存。"""
+    model = llm.model if isinstance(llm, GatewayChatModel) else llm
+    signature: Dict[str, Any] = {}
+    bound_kwargs = None
+    if hasattr(model, "bound") and hasattr(model, "kwargs"):
+        bound_kwargs = model.kwargs
+        model = model.bound
+    signature["class"] = type(model).__name__
+    for attr in _MODEL_IDENTITY_ATTRS:
+        value = getattr(model, attr, None)
+        if isinstance(value, (str, int, float, bool)):
+            signature[attr] = value
+    if bound_kwargs:
+        signature["bound"] = bound_kwargs
+    return signature
+
+
+def _normalize_content(content: Any) -> Any:
+    if isinstance(content, str):
+        return " ".join(content.split())
+    return content
+
+
+def normalize_messages(messages: Any) -> Any:
+    if isinstance(messages, str):
+        return _normalize_content(messages)
+    if hasattr(messages, "to_messages"):
+        messages = messages.to_messages()
+    normalized = []
+    for message in messages or []:
+        if isinstance(message, (tuple, list)) and len(message) == 2:
+            normalized.append([str(message[0]), _normalize_content(message[1])])
+            continue
+        entry = [getattr(message, "type", type(message).__name__), _normalize_content(getattr(message, "content", message))]
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            entry.append(tool_calls)
+        normalized.append(entry)
+    return normalized
+
+
+def make_cache_key(namespace: str, llm: Any, messages: Any, params: Optional[Dict[str, Any]] = None) -> str:
+    raw = json.dumps(
+        [model_signature(llm), normalize_messages(messages), params or {}],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return f"{KEY_PREFIX}:{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def _message_text(response: Any) -> Optional[str]:
+    content = getattr(response, "content", None)
+    return content if isinstance(content, str) else None
+
+
+def _total_tokens(response: Any) -> int:
+    usage = getattr(response, "usage_metadata", None) or {}
+    try:
+        return int(usage.get("total_tokens") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _restore_message(payload: Dict[str, Any]) -> Any:
+    from langchain_core.messages import AIMessage
+
+    return AIMessage(
+        content=payload["content"],
+        response_metadata={"cache": "hit", "model_name": payload.get("model_name")},
+    )
+
+
+class LLMResponseCache:
+    """按 (模型, 规范化消息, 参数) 缓存 LLM 回复。
+
+    传入 ``backend`` 时使用独立的门面实例（测试或自定义存储），否则使用进程级共享门面。
+    """
+
+    STORE_NAMESPACE = "llm_response"
+
+    def __init__(
+        self,
+        backend: Any = None,
+        max_local_entries: int = 2048,
+        default_ttl: int = 3600,
+        enabled: bool = True,
+        distributed_flight: bool = False,
+    ):
+        cache = SharedCache(backend) if backend is not None else get_shared_cache()
+        self.store = cache.namespace(
+            self.STORE_NAMESPACE,
+            ttl_seconds=default_ttl,
+            max_local_entries=max_local_entries,
+            distributed_flight=distributed_flight,
+        )
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def local(self) -> LocalLRUCache:
+        return self.store.local
+
+    def _count(self, namespace: str, result: str, tokens_saved: int = 0) -> None:
+        counts = self.stats.setdefault(namespace, {})
+        counts[result] = counts.get(result, 0) + 1
+        LLM_CACHE_REQUESTS.inc(namespace=namespace, result=result)
+        if tokens_saved:
+            counts["tokens_saved"] = counts.get("tokens_saved", 0) + tokens_saved
+            LLM_CACHE_TOKENS_SAVED.inc(tokens_saved, namespace=namespace)
+
+    def hit_rate(self, namespace: str) -> float:
+        counts = self.stats.get(namespace, {})
+        hits = counts.get(RESULT_LOCAL_HIT, 0) + counts.get(RESULT_SHARED_HIT, 0) + counts.get(RESULT_COALESCED, 0)
+        total = hits + counts.get(RESULT_MISS, 0)
+        return hits / total if total else 0.0
+
+    def tokens_saved(self, namespace: str) -> int:
+        return self.stats.get(namespace, {}).get("tokens_saved", 0)
+
+    async def get_or_invoke(
+        self,
+        namespace: str,
+        key: str,
+        invoke: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[int] = None,
+    ) -> Any:
+        if not self.enabled:
+            return await invoke()
+
+        invoked: Dict[str, Any] = {}
+
+        async def load() -> Optional[Dict[str, Any]]:
+            response = await invoke()
+            invoked["response"] = response
+            text = _message_text(response)
+            if not text or getattr(response, "tool_calls", None):
+                return None
+            return {
+                "content": text,
+                "tokens": _total_tokens(response),
+                "model_name": (getattr(response, "response_metadata", None) or {}).get("model_name"),
+            }
+
+        payload, result = await self.store.get_or_load_with_status(
+            key,
+            load,
+            ttl_seconds=ttl_seconds or self.default_ttl,
+        )
+        if "response" in invoked:
+            self._count(namespace, RESULT_MISS)
+            return invoked["response"]
+        if not isinstance(payload, dict) or "content" not in payload:
+            # 并发的首个调用拿到的是不可缓存的回复（工具调用或空内容），这里自己调用
+            self._count(namespace, RESULT_MISS)
+            return await invoke()
+        self._count(namespace, result, payload.get("tokens", 0))
+        return _restore_message(payload)
+
+
+class CachedChatModel:
+    """只拦截 ``ainvoke`` 的缓存代理，其他属性和方法透传给原模型。"""
+
+    def __init__(self, llm: Any, cache: LLMResponseCache, namespace: str, ttl_seconds: Optional[int] = None):
+        self.llm = llm
+        self.cache = cache
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+
+    def _invoke(self, input: Any, config: Any, kwargs: Dict[str, Any]) -> Awaitable[Any]:
+        # 调用方没传 config 时按原样调用，不强加第二个位置参数
+        if config is None:
+            return self.llm.ainvoke(input, **kwargs)
+        return self.llm.ainvoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        try:
+            key = make_cache_key(self.namespace, self.llm, input, kwargs)
+        except Exception as exc:
+            logger.warning("LLM cache key failed for %s, bypassing: %s", self.namespace, exc)
+            self.cache._count(self.namespace, RESULT_BYPASS)
+            return await self._invoke(input, config, kwargs)
+        return await self.cache.get_or_invoke(
+            self.namespace,
+            key,
+            lambda: self._invoke(input, config, kwargs),
+            self.ttl_seconds,
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+
+_llm_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    global _llm_response_cache
+    if _llm_response_cache is None:
+        from config import settings
+
+        _llm_response_cache = LLMResponseCache(
+            max_local_entries=getattr(settings, "LLM_RESPONSE_CACHE_MAX_ENTRIES", 2048),
+            default_ttl=getattr(settings, "LLM_RESPONSE_CACHE_TTL", 3600),
+            enabled=getattr(settings, "LLM_RESPONSE_CACHE_ENABLED", True),
+            distributed_flight=getattr(settings, "SINGLE_FLIGHT_DISTRIBUTED", False),
+        )
+    return _llm_response_cache
+
+
+def with_response_cache(llm: Any, namespace: str, ttl_seconds: Optional[int] = None) -> Any:
+    """为一个调用点开启回复缓存；缓存关闭或没有模型时原样返回。"""
+    if llm is None or isinstance(llm, CachedChatModel):
+        return llm
+    cache = get_llm_response_cache()
+    if not cache.enabled:
+        return llm
+    return CachedChatModel(llm, cache, namespace, ttl_seconds)
+
+
+__all__ = [
+    "CachedChatModel",
+    "LLMResponseCache",
+    "get_llm_response_cache",
+    "make_cache_key",
+    "model_signature",
+    "normalize_messages",
+    "with_response_cache",
+]
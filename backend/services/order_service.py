@@ -8,6 +8,7 @@ from sqlalchemy.orm import joinedload
 from database.models import Order, OrderItem, Product, CartItem, OrderStatus, ProductStatus
 import uuid
 from datetime import datetime
+from .tool_result_cache import publish_product_changed
 
 
 class OrderService:
@@ -229,6 +230,7 @@ class OrderService:
             raise PermissionError("无权操作此订单")
         
         order.status = OrderStatus(status)
+        sold_product_ids = []
         
         # 更新相关时间戳
         if status == "paid":
@@ -249,9 +251,13 @@ class OrderService:
                 product = product_result.scalar_one_or_none()
                 if product:
                     product.sales_count += 1
+                    sold_product_ids.append(product.id)
         
         await self.db.commit()
         await self.db.refresh(order)
+        if sold_product_ids:
+            # 销量只影响这些商品的详情类工具结果，不必让全部搜索缓存失效
+            await publish_product_changed(*sold_product_ids, catalog=False)
         
         return self._order_to_dict(order)
     
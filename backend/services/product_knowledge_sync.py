@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from database.models import Product, Review
 from .knowledge_retriever import knowledge_retriever
+from .startup import aresolve_lazy
 import json
 
 
@@ -28,7 +29,8 @@ class ProductKnowledgeSync:
         Returns:
             是否成功
         """
-        if not knowledge_retriever.available:
+        retriever = await aresolve_lazy(knowledge_retriever)
+        if not retriever.available:
             return False
         
         # 获取商品信息
@@ -93,7 +95,7 @@ class ProductKnowledgeSync:
         }
         
         # 添加到向量数据库
-        await knowledge_retriever.add_documents([document], "product_catalog")
+        await retriever.add_documents([document], "product_catalog")
         
         return True
     
@@ -107,7 +109,8 @@ class ProductKnowledgeSync:
         Returns:
             同步结果统计
         """
-        if not knowledge_retriever.available:
+        retriever = await aresolve_lazy(knowledge_retriever)
+        if not retriever.available:
             return {"success": False, "message": "知识库不可用"}
         
         # 获取所有已发布的商品
@@ -150,11 +153,12 @@ class ProductKnowledgeSync:
         Returns:
             是否成功
         """
-        if not knowledge_retriever.available:
+        retriever = await aresolve_lazy(knowledge_retriever)
+        if not retriever.available:
             return False
         
         try:
-            await knowledge_retriever.delete_document(
+            await retriever.delete_document(
                 f"product_{product_id}",
                 "product_catalog"
             )
@@ -3,12 +3,15 @@
 """
 from typing import List, Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, func, or_, and_, update
 from sqlalchemy.orm import joinedload, selectinload
 from database.models import Product, Category, ProductImage, ProductFile, ProductStatus, ProductDifficulty, User
+import copy
 import uuid
 from datetime import datetime
 from .product_knowledge_sync import product_knowledge_sync
+from .single_flight import RESULT_LEADER, get_single_flight
+from .tool_result_cache import publish_product_changed
 
 
 class ProductService:
@@ -49,6 +52,7 @@ class ProductService:
         self.db.add(product)
         await self.db.commit()
         await self.db.refresh(product)
+        await publish_product_changed(product.id)
         
         return product
     
@@ -76,6 +80,7 @@ class ProductService:
         product.updated_at = datetime.now()
         await self.db.commit()
         await self.db.refresh(product)
+        await publish_product_changed(product_id)
         
         # 如果商品已发布，同步到知识库
         if product.status == ProductStatus.PUBLISHED:
@@ -98,11 +103,34 @@ class ProductService:
         
         await self.db.delete(product)
         await self.db.commit()
+        await publish_product_changed(product_id)
         
         return True
     
     async def get_product(self, product_id: str, increment_view: bool = False) -> Optional[Dict[str, Any]]:
-        """获取商品详情"""
+        """获取商品详情
+
+        热门商品的并发详情查询合并为一次数据库查询，浏览量按调用各自原子递增。
+        """
+        product_dict, flight_result = await get_single_flight("get_product").do_with_status(
+            product_id, lambda: self._load_product(product_id)
+        )
+        if product_dict is None:
+            return None
+        if flight_result != RESULT_LEADER:
+            product_dict = copy.deepcopy(product_dict)
+        
+        if increment_view:
+            await self.db.execute(
+                update(Product)
+                .where(Product.id == product_id)
+                .values(view_count=Product.view_count + 1)
+            )
+            await self.db.commit()
+        
+        return product_dict
+    
+    async def _load_product(self, product_id: str) -> Optional[Dict[str, Any]]:
         result = await self.db.execute(
             select(Product)
             .options(
@@ -118,13 +146,7 @@ class ProductService:
         if not product:
             return None
         
-        product_dict = self._product_to_dict(product)
-        
-        if increment_view:
-            product.view_count += 1
-            await self.db.commit()
-        
-        return product_dict
+        return self._product_to_dict(product)
     
     async def search_products(
         self,
@@ -1,10 +1,13 @@
 """Conversation context cache with Redis-first storage."""
 from __future__ import annotations
 
+import copy
 import json
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     import redis.asyncio as redis
@@ -13,21 +16,59 @@ except ModuleNotFoundError:  # pragma: no cover - optional dependency in some te
 
 from config import settings
 
+from services.telemetry import traced
+
 logger = logging.getLogger(__name__)
 _MISSING = object()
 
+# 只有持有者才能释放锁，避免锁过期后误删其他实例的锁
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _history_entry(user_message: str, assistant_message: str, tokens: Optional[int]) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {
+        "user": user_message,
+        "assistant": assistant_message,
+        "timestamp": datetime.now().isoformat(),
+    }
+    if tokens is not None:
+        # 写入时记录令牌数，后续按预算裁剪历史时无需重新估算
+        entry["tokens"] = tokens
+    return entry
+
 
 class MemoryCache:
     """In-memory cache fallback used in tests and when Redis is unavailable."""
 
-    def __init__(self):
+    # 结构化值的条目上限，超出后淘汰最早写入的条目，与 Redis 的过期配合限制内存占用
+    MAX_PAYLOAD_ENTRIES = 10000
+
+    def __init__(self, max_payload_entries: int = MAX_PAYLOAD_ENTRIES):
         self._cache: Dict[str, Any] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        # key -> (值的副本, 过期时刻)；过期时刻为 None 表示不过期
+        self._payloads: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self.max_payload_entries = max_payload_entries
 
     async def connect(self):
         logger.info("Initialized in-memory cache fallback")
 
     async def disconnect(self):
         self._cache.clear()
+        self._locks.clear()
+        self._payloads.clear()
 
     async def get_context(self, session_id: str) -> Optional[Dict[str, Any]]:
         payload = self._cache.get(f"session:{session_id}:context")
@@ -77,17 +118,17 @@ class MemoryCache:
     async def clear_context(self, session_id: str):
         self._cache.pop(f"session:{session_id}:context", None)
 
-    async def add_message_to_context(self, session_id: str, user_message: str, assistant_message: str):
+    async def add_message_to_context(
+        self,
+        session_id: str,
+        user_message: str,
+        assistant_message: str,
+        tokens: Optional[int] = None,
+    ):
         key = f"session:{session_id}:context"
         existing = self._cache.get(key, {})
         history = list(existing.get("history", []))
-        history.append(
-            {
-                "user": user_message,
-                "assistant": assistant_message,
-                "timestamp": datetime.now().isoformat(),
-            }
-        )
+        history.append(_history_entry(user_message, assistant_message, tokens))
         existing["history"] = history[-settings.CONTEXT_MAX_HISTORY :]
         existing["updated_at"] = datetime.now().isoformat()
         self._cache[key] = existing
@@ -95,6 +136,10 @@ class MemoryCache:
     async def get(self, key: str) -> Optional[str]:
         value = self._cache.get(key)
         if value is None:
+            # Like Redis, a held lock reads back as its owner token
+            holder = self._locks.get(key)
+            if holder is not None and holder[1] > time.monotonic():
+                return holder[0]
             return None
         return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
 
@@ -103,6 +148,52 @@ class MemoryCache:
 
     async def delete(self, key: str):
         self._cache.pop(key, None)
+        self._payloads.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = int(self._cache.get(key) or 0) + 1
+        self._cache[key] = str(value)
+        return value
+
+    async def get_payload(self, key: str) -> Any:
+        entry = self._payloads.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._payloads.pop(key, None)
+            return None
+        # 与 Redis 一样返回独立的副本，调用方修改返回值不影响已缓存的内容
+        return copy.deepcopy(value)
+
+    async def set_payload(self, key: str, value: Any, expire: Optional[int] = None):
+        expires_at = time.monotonic() + expire if expire else None
+        self._payloads.pop(key, None)
+        self._payloads[key] = (copy.deepcopy(value), expires_at)
+        while len(self._payloads) > self.max_payload_entries:
+            self._payloads.popitem(last=False)
+
+    async def acquire_lock(self, key: str, token: str, ttl_seconds: int) -> bool:
+        now = time.monotonic()
+        holder = self._locks.get(key)
+        if holder is not None and holder[1] > now and holder[0] != token:
+            return False
+        self._locks[key] = (token, now + ttl_seconds)
+        return True
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        holder = self._locks.get(key)
+        if holder is None or holder[0] != token:
+            return False
+        self._locks.pop(key, None)
+        return True
+
+    async def extend_lock(self, key: str, token: str, ttl_seconds: int) -> bool:
+        holder = self._locks.get(key)
+        if holder is None or holder[0] != token or holder[1] <= time.monotonic():
+            return False
+        self._locks[key] = (token, time.monotonic() + ttl_seconds)
+        return True
 
     @staticmethod
     def _normalize_context(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -128,6 +219,20 @@ class RedisCache:
         self._client: redis.Redis | None = None
         self._memory = MemoryCache()
         self._connected = False
+        self._codec = None
+
+    @property
+    def codec(self):
+        if self._codec is None:
+            from services.cache_codec import build_codec
+
+            self._codec = build_codec()
+        return self._codec
+
+    @property
+    def shared(self) -> bool:
+        """是否真正连上 Redis；为 False 时读写都落在本进程的内存实现，对其他 worker 不可见。"""
+        return self._connected and self._client is not None
 
     async def connect(self):
         await self._memory.connect()
@@ -137,7 +242,7 @@ class RedisCache:
             logger.warning("redis package is unavailable, using in-memory context cache")
             return
         try:
-            self._client = redis.from_url(settings.redis_url, decode_responses=True)
+            self._client = redis.from_url(settings.redis_url, decode_responses=False)
             await self._client.ping()
             self._connected = True
             logger.info("Connected to Redis context cache")
@@ -158,6 +263,7 @@ class RedisCache:
     def _context_key(self, session_id: str) -> str:
         return f"session:{session_id}:context"
 
+    @traced("redis", "get_context")
     async def get_context(self, session_id: str) -> Optional[Dict[str, Any]]:
         if not self._connected or self._client is None:
             return await self._memory.get_context(session_id)
@@ -166,12 +272,15 @@ class RedisCache:
         if not raw:
             return None
         try:
-            data = json.loads(raw)
-        except json.JSONDecodeError:
+            data = self.codec.decode(raw)
+        except ValueError:
             logger.warning("Failed to decode Redis context for session=%s", session_id)
             return None
+        if not isinstance(data, dict):
+            return None
         return MemoryCache._normalize_context(data)
 
+    @traced("redis", "update_context")
     async def update_context(
         self,
         session_id: str,
@@ -226,44 +335,103 @@ class RedisCache:
         existing["updated_at"] = datetime.now().isoformat()
         await self._client.set(
             self._context_key(session_id),
-            json.dumps(existing, ensure_ascii=False),
+            self.codec.encode(existing),
             ex=settings.CONTEXT_CACHE_TTL_SECONDS,
         )
 
+    @traced("redis", "clear_context")
     async def clear_context(self, session_id: str):
         if not self._connected or self._client is None:
             await self._memory.clear_context(session_id)
             return
         await self._client.delete(self._context_key(session_id))
 
-    async def add_message_to_context(self, session_id: str, user_message: str, assistant_message: str):
+    async def add_message_to_context(
+        self,
+        session_id: str,
+        user_message: str,
+        assistant_message: str,
+        tokens: Optional[int] = None,
+    ):
+        if not self._connected or self._client is None:
+            await self._memory.add_message_to_context(session_id, user_message, assistant_message, tokens=tokens)
+            return
         context = await self.get_context(session_id) or {}
         history = list(context.get("history", []))
-        history.append(
-            {
-                "user": user_message,
-                "assistant": assistant_message,
-                "timestamp": datetime.now().isoformat(),
-            }
-        )
+        history.append(_history_entry(user_message, assistant_message, tokens))
         await self.update_context(session_id=session_id, history=history[-settings.CONTEXT_MAX_HISTORY :])
 
+    @traced("redis", "get")
     async def get(self, key: str) -> Optional[str]:
         if not self._connected or self._client is None:
             return await self._memory.get(key)
-        return await self._client.get(key)
+        value = await self._client.get(key)
+        if isinstance(value, bytes):
+            return value.decode("utf-8", errors="replace")
+        return value
 
+    @traced("redis", "set")
     async def set(self, key: str, value: str, expire: Optional[int] = None):
         if not self._connected or self._client is None:
             await self._memory.set(key, value, expire=expire)
             return
         await self._client.set(key, value, ex=expire)
 
+    @traced("redis", "delete")
     async def delete(self, key: str):
         if not self._connected or self._client is None:
             await self._memory.delete(key)
             return
         await self._client.delete(key)
 
+    @traced("redis", "incr")
+    async def incr(self, key: str) -> int:
+        """Atomically increment an integer counter, creating it at 1."""
+        if not self._connected or self._client is None:
+            return await self._memory.incr(key)
+        return int(await self._client.incr(key))
+
+    @traced("redis", "get_payload")
+    async def get_payload(self, key: str) -> Any:
+        """Read a structured value written by ``set_payload``."""
+        if not self._connected or self._client is None:
+            return await self._memory.get_payload(key)
+        raw = await self._client.get(key)
+        if not raw:
+            return None
+        try:
+            return self.codec.decode(raw)
+        except ValueError:
+            logger.warning("Failed to decode Redis payload for key=%s", key)
+            return None
+
+    @traced("redis", "set_payload")
+    async def set_payload(self, key: str, value: Any, expire: Optional[int] = None):
+        """Store a structured value through the configured payload codec."""
+        if not self._connected or self._client is None:
+            await self._memory.set_payload(key, value, expire=expire)
+            return
+        await self._client.set(key, self.codec.encode(value), ex=expire)
+
+    @traced("redis", "acquire_lock")
+    async def acquire_lock(self, key: str, token: str, ttl_seconds: int) -> bool:
+        """Try once to take a lock identified by ``token``; expires after ``ttl_seconds``."""
+        if not self._connected or self._client is None:
+            return await self._memory.acquire_lock(key, token, ttl_seconds)
+        return bool(await self._client.set(key, token, nx=True, ex=ttl_seconds))
+
+    @traced("redis", "release_lock")
+    async def release_lock(self, key: str, token: str) -> bool:
+        if not self._connected or self._client is None:
+            return await self._memory.release_lock(key, token)
+        return bool(await self._client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token))
+
+    @traced("redis", "extend_lock")
+    async def extend_lock(self, key: str, token: str, ttl_seconds: int) -> bool:
+        """Reset the TTL of a lock still held by ``token``; False once it expired or changed hands."""
+        if not self._connected or self._client is None:
+            return await self._memory.extend_lock(key, token, ttl_seconds)
+        return bool(await self._client.eval(_EXTEND_LOCK_SCRIPT, 1, key, token, ttl_seconds))
+
 
 redis_cache = RedisCache()
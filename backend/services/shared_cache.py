@@ -0,0 +1,344 @@
+"""多 worker 共享的缓存门面。
+
+各服务自己维护的 dict 缓存在多 worker 部署下互不可见：一个 worker 算出的结果，
+其他 worker 还要再算一遍，而且没有容量上限。``SharedCache`` 统一提供：
+
+- 命名空间：``get_shared_cache().namespace("smart_questions", ttl_seconds=3600)``，
+  共享层 key 自动加 ``cache:<namespace>:`` 前缀，本地容量上限和默认 TTL 按命名空间配置
+- 两层存储：本地层为进程内 LRU + TTL；共享层为 Redis，一个 worker 写入后其他 worker 直接命中。
+  Redis 未连接时 ``redis_cache`` 退化为进程内存，此时跳过共享层，避免同一份数据在进程里存两遍
+- 仅本地的命名空间：``CacheNamespace(..., local_only=True)`` 用于模型实例这类无法序列化的对象，
+  同样有容量上限和指标，并提供同步的 ``get_or_create``
+- 仅共享的命名空间：``shared_only=True`` 用于会被多个 worker 轮流读改写的会话状态，
+  共享层可用时不保留本地副本，避免读到本进程的旧值后覆盖其他 worker 的写入
+- 单飞加载：``get_or_load`` 对同一 key 的并发未命中只执行一次加载，其余调用等待同一结果
+  （``services.single_flight``）；``distributed_flight=True`` 时跨 worker 合并
+
+查询结果按命名空间写入 ``ai_shared_cache_requests_total``
+（local_hit / shared_hit / miss / coalesced）。
+"""
+from __future__ import annotations
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from services.single_flight import RESULT_COALESCED as FLIGHT_COALESCED
+from services.single_flight import RESULT_REMOTE as FLIGHT_REMOTE
+from services.single_flight import SingleFlight
+
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cache"
+
+RESULT_LOCAL_HIT = "local_hit"
+RESULT_SHARED_HIT = "shared_hit"
+RESULT_MISS = "miss"
+RESULT_COALESCED = "coalesced"
+
+SHARED_CACHE_REQUESTS = registry.counter(
+    "ai_shared_cache_requests_total",
+    "Shared cache lookups by namespace and result: local_hit, shared_hit, miss, coalesced.",
+    ("namespace", "result"),
+)
+
+
+class LocalLRUCache:
+    """进程内 LRU + TTL 缓存；读取命中会刷新条目的新近度。``ttl_seconds=None`` 表示不过期。"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float]) -> None:
+        expires_at = float("inf") if ttl_seconds is None else time.monotonic() + ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _not_none(value: Any) -> bool:
+    return value is not None
+
+
+class CacheNamespace:
+    """一个命名空间下的两层缓存；``cache`` 为空或 ``local_only=True`` 时只用本地层，
+    ``shared_only=True`` 且共享层可用时只用共享层。"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        cache: Optional["SharedCache"] = None,
+        ttl_seconds: Optional[int] = None,
+        max_local_entries: int = 1024,
+        local_only: bool = False,
+        shared_only: bool = False,
+        copy_values: bool = True,
+        distributed_flight: bool = False,
+    ):
+        self.name = name
+        self.cache = cache
+        self.ttl_seconds = ttl_seconds
+        self.local = LocalLRUCache(max_local_entries)
+        self.local_only = local_only or cache is None
+        self.shared_only = shared_only
+        self.copy_values = copy_values
+        self.stats: Dict[str, int] = {}
+        self._flight = SingleFlight(
+            f"cache:{name}",
+            backend=cache._backend if cache is not None else None,
+            distributed=distributed_flight and not self.local_only,
+        )
+        self._create_lock = threading.RLock()
+
+    def shared_key(self, key: Hashable) -> str:
+        return f"{KEY_PREFIX}:{self.name}:{key}"
+
+    @property
+    def _shared_enabled(self) -> bool:
+        return not self.local_only and self.cache.shared_enabled
+
+    @property
+    def _local_enabled(self) -> bool:
+        return not (self.shared_only and self._shared_enabled)
+
+    def _set_local(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        if self._local_enabled:
+            self.local.set(key, value, ttl)
+
+    def _count(self, result: str) -> None:
+        self.stats[result] = self.stats.get(result, 0) + 1
+        SHARED_CACHE_REQUESTS.inc(namespace=self.name, result=result)
+
+    def hit_rate(self) -> float:
+        hits = self.stats.get(RESULT_LOCAL_HIT, 0) + self.stats.get(RESULT_SHARED_HIT, 0)
+        total = hits + self.stats.get(RESULT_MISS, 0)
+        return hits / total if total else 0.0
+
+    def _out(self, value: Any) -> Any:
+        # 调用方拿到的是副本，修改返回值不会污染缓存里的条目
+        if self.copy_values and isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    # ── 同步本地层 ──────────────────────────────────────────────
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """只走本地层的同步读穿，供无法 await 的调用方（如模型实例缓存）使用。"""
+        value = self.local.get(key)
+        if value is not None:
+            self._count(RESULT_LOCAL_HIT)
+            return value
+        with self._create_lock:
+            value = self.local.get(key)
+            if value is not None:
+                self._count(RESULT_COALESCED)
+                return value
+            self._count(RESULT_MISS)
+            value = factory()
+            if value is not None:
+                self.local.set(key, value, self.ttl_seconds)
+            return value
+
+    # ── 异步两层读写 ────────────────────────────────────────────
+
+    async def lookup(self, key: Hashable) -> Tuple[Any, str]:
+        """返回 ``(value, result)``，未命中时 value 为 None、result 为 ``miss``。"""
+        value = self.local.get(key) if self._local_enabled else None
+        if value is not None:
+            return self._out(value), RESULT_LOCAL_HIT
+        if self._shared_enabled:
+            try:
+                value = await self.cache.backend.get_payload(self.shared_key(key))
+            except Exception as exc:
+                logger.warning("Shared cache read failed for %s: %s", self.name, exc)
+                value = None
+            if value is not None:
+                self._set_local(key, value, self.ttl_seconds)
+                return self._out(value), RESULT_SHARED_HIT
+        return None, RESULT_MISS
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        value, result = await self.lookup(key)
+        self._count(result)
+        return default if value is None else value
+
+    async def _write_shared(self, key: Hashable, value: Any, ttl: Optional[int]) -> None:
+        if not self._shared_enabled:
+            return
+        try:
+            await self.cache.backend.set_payload(self.shared_key(key), value, expire=ttl)
+        except Exception as exc:
+            logger.warning("Shared cache write failed for %s: %s", self.name, exc)
+
+    async def set(self, key: Hashable, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        ttl = ttl_seconds or self.ttl_seconds
+        self._set_local(key, self._out(value), ttl)
+        await self._write_shared(key, value, ttl)
+
+    async def delete(self, key: Hashable) -> None:
+        self.local.pop(key)
+        if self._shared_enabled:
+            try:
+                await self.cache.backend.delete(self.shared_key(key))
+            except Exception as exc:
+                logger.warning("Shared cache delete failed for %s: %s", self.name, exc)
+
+    async def get_or_load_with_status(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        *,
+        ttl_seconds: Optional[int] = None,
+        cacheable: Callable[[Any], bool] = _not_none,
+    ) -> Tuple[Any, str]:
+        value, result = await self.lookup(key)
+        if value is not None:
+            self._count(result)
+            return value, result
+
+        ttl = ttl_seconds or self.ttl_seconds
+
+        async def load() -> Any:
+            loaded = await loader()
+            if cacheable(loaded):
+                self._set_local(key, self._out(loaded), ttl)
+            return loaded
+
+        value, flight_result = await self._flight.do_with_status(key, load)
+        if flight_result == FLIGHT_COALESCED:
+            self._count(RESULT_COALESCED)
+            return self._out(value), RESULT_COALESCED
+        if flight_result == FLIGHT_REMOTE:
+            # 另一个 worker 刚加载完，它也会写共享层，这里只补本地层
+            if cacheable(value):
+                self._set_local(key, self._out(value), ttl)
+            self._count(RESULT_COALESCED)
+            return value, RESULT_COALESCED
+        self._count(RESULT_MISS)
+        if cacheable(value):
+            await self._write_shared(key, value, ttl)
+        return value, RESULT_MISS
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        *,
+        ttl_seconds: Optional[int] = None,
+        cacheable: Callable[[Any], bool] = _not_none,
+    ) -> Any:
+        value, _ = await self.get_or_load_with_status(key, loader, ttl_seconds=ttl_seconds, cacheable=cacheable)
+        return value
+
+    def clear_local(self) -> None:
+        self.local.clear()
+
+
+class SharedCache:
+    """命名空间注册表；同名命名空间在进程内只创建一次。"""
+
+    def __init__(self, backend: Any = None, *, shared_tier: bool = True, max_local_entries: int = 1024):
+        self._backend = backend
+        self.shared_tier = shared_tier
+        self.max_local_entries = max_local_entries
+        self._namespaces: Dict[str, CacheNamespace] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            from services.redis_cache import redis_cache
+
+            self._backend = redis_cache
+        return self._backend
+
+    @property
+    def shared_enabled(self) -> bool:
+        """共享层是否可用；后端声明 ``shared=False``（如未连上 Redis 的 ``redis_cache``）时只用本地层。"""
+        return self.shared_tier and getattr(self.backend, "shared", True)
+
+    def namespace(
+        self,
+        name: str,
+        *,
+        ttl_seconds: Optional[int] = None,
+        max_local_entries: Optional[int] = None,
+        shared_only: bool = False,
+        copy_values: bool = True,
+        distributed_flight: bool = False,
+    ) -> CacheNamespace:
+        namespace = self._namespaces.get(name)
+        if namespace is None:
+            with self._lock:
+                namespace = self._namespaces.get(name)
+                if namespace is None:
+                    namespace = CacheNamespace(
+                        name,
+                        cache=self,
+                        ttl_seconds=ttl_seconds,
+                        max_local_entries=max_local_entries or self.max_local_entries,
+                        shared_only=shared_only,
+                        copy_values=copy_values,
+                        distributed_flight=distributed_flight,
+                    )
+                    self._namespaces[name] = namespace
+        return namespace
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: dict(namespace.stats) for name, namespace in self._namespaces.items()}
+
+
+_shared_cache: Optional[SharedCache] = None
+
+
+def get_shared_cache() -> SharedCache:
+    global _shared_cache
+    if _shared_cache is None:
+        from config import settings
+
+        _shared_cache = SharedCache(
+            shared_tier=getattr(settings, "SHARED_CACHE_REDIS_TIER", True),
+            max_local_entries=getattr(settings, "SHARED_CACHE_LOCAL_MAX_ENTRIES", 1024),
+        )
+    return _shared_cache
+
+
+__all__ = [
+    "CacheNamespace",
+    "LocalLRUCache",
+    "SharedCache",
+    "get_shared_cache",
+]
@@ -0,0 +1,213 @@
+"""按 key 合并并发的相同耗时操作（single-flight）。
+
+促销、热点商品这类流量尖峰下，大量请求会在同一时刻发起完全相同的检索、商品详情查询、
+工具调用或模型调用。``SingleFlight.do(key, fn)`` 保证同一 key 同时只有一次 ``fn`` 在执行，
+其余调用等待并共享它的结果（或异常）：
+
+- 进程内：同一事件循环里的并发调用挂在同一个 future 上
+- 跨 worker（``distributed=True``）：用 Redis 锁（``redis_cache.acquire_lock``）选出一个执行者，
+  锁的值是执行者的 token，结果写入 ``single_flight:<name>:<key>:result:<token>`` 并保留
+  ``result_ttl`` 秒；其他 worker 读出锁里的 token 后轮询这个 key。等待超时、执行者失败或
+  Redis 不可用时退回本地执行，合并只是优化，不影响正确性。跨 worker 的结果需可被
+  ``redis_cache.set_payload`` 序列化
+
+调用按结果写入 ``ai_single_flight_calls_total``（flight / result）：
+``leader`` 实际执行、``coalesced`` 进程内合并、``remote`` 复用其他 worker 的结果、
+``fallback`` 跨 worker 等待失败后本地执行。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from services.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "single_flight"
+
+RESULT_LEADER = "leader"
+RESULT_COALESCED = "coalesced"
+RESULT_REMOTE = "remote"
+RESULT_FALLBACK = "fallback"
+
+SINGLE_FLIGHT_CALLS = registry.counter(
+    "ai_single_flight_calls_total",
+    "Single-flight calls by flight and result: leader, coalesced, remote, fallback.",
+    ("flight", "result"),
+)
+
+_MISSING = object()
+
+
+class SingleFlight:
+    """一组以 ``name`` 区分的 single-flight 调用，见模块说明。"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        backend: Any = None,
+        distributed: bool = False,
+        lock_ttl: int = 30,
+        wait_timeout: float = 10.0,
+        poll_interval: float = 0.025,
+        result_ttl: int = 10,
+    ):
+        self.name = name
+        self._backend = backend
+        self.distributed = distributed
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self.stats: Dict[str, int] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            from services.redis_cache import redis_cache
+
+            self._backend = redis_cache
+        return self._backend
+
+    def _count(self, result: str) -> None:
+        self.stats[result] = self.stats.get(result, 0) + 1
+        SINGLE_FLIGHT_CALLS.inc(flight=self.name, result=result)
+
+    def deduplicated(self) -> int:
+        return sum(self.stats.get(result, 0) for result in (RESULT_COALESCED, RESULT_REMOTE))
+
+    def inflight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        value, _ = await self.do_with_status(key, fn)
+        return value
+
+    async def do_with_status(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """执行或加入 ``key`` 上的调用，返回 ``(value, result)``。"""
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                value = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # 执行者被取消，由当前调用重新执行
+                return await self.do_with_status(key, fn)
+            self._count(RESULT_COALESCED)
+            return value, RESULT_COALESCED
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if self.distributed:
+                value, result = await self._run_distributed(key, fn)
+            else:
+                value, result = await fn(), RESULT_LEADER
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # 没有等待者时也不报 "exception was never retrieved"
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        self._count(result)
+        return value, result
+
+    # ── 跨 worker ───────────────────────────────────────────────
+
+    def _lock_key(self, key: Hashable) -> str:
+        return f"{KEY_PREFIX}:{self.name}:{key}:lock"
+
+    def _result_key(self, key: Hashable, token: str) -> str:
+        return f"{KEY_PREFIX}:{self.name}:{key}:result:{token}"
+
+    async def _run_distributed(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.backend.acquire_lock(lock_key, token, self.lock_ttl)
+        except Exception as exc:
+            logger.warning("Single-flight lock failed for %s, running locally: %s", self.name, exc)
+            return await fn(), RESULT_FALLBACK
+
+        if acquired:
+            try:
+                value = await fn()
+                try:
+                    await self.backend.set_payload(self._result_key(key, token), {"v": value}, expire=self.result_ttl)
+                except Exception as exc:
+                    logger.warning("Single-flight result publish failed for %s: %s", self.name, exc)
+                return value, RESULT_LEADER
+            finally:
+                try:
+                    await self.backend.release_lock(lock_key, token)
+                except Exception as exc:
+                    logger.warning("Single-flight lock release failed for %s: %s", self.name, exc)
+
+        value = await self._wait_remote(key, lock_key)
+        if value is not _MISSING:
+            return value, RESULT_REMOTE
+        return await fn(), RESULT_FALLBACK
+
+    async def _wait_remote(self, key: Hashable, lock_key: str) -> Any:
+        deadline = time.monotonic() + self.wait_timeout
+        leader: Optional[str] = None
+        try:
+            while time.monotonic() < deadline:
+                owner = await self.backend.get(lock_key)
+                leader = owner or leader
+                if leader:
+                    payload = await self.backend.get_payload(self._result_key(key, leader))
+                    if isinstance(payload, dict) and "v" in payload:
+                        return payload["v"]
+                if not owner:
+                    # 锁已释放但没有结果：执行者失败，或在拿到 token 之前就已结束
+                    return _MISSING
+                await asyncio.sleep(self.poll_interval)
+        except Exception as exc:
+            logger.warning("Single-flight wait failed for %s: %s", self.name, exc)
+        return _MISSING
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str, *, distributed: Optional[bool] = None) -> SingleFlight:
+    """返回进程内共享的 ``SingleFlight``；``distributed`` 默认取 ``SINGLE_FLIGHT_DISTRIBUTED``。"""
+    flight = _flights.get(name)
+    if flight is None:
+        with _flights_lock:
+            flight = _flights.get(name)
+            if flight is None:
+                from config import settings
+
+                if distributed is None:
+                    distributed = getattr(settings, "SINGLE_FLIGHT_DISTRIBUTED", False)
+                flight = SingleFlight(
+                    name,
+                    distributed=distributed,
+                    lock_ttl=getattr(settings, "SINGLE_FLIGHT_LOCK_TTL_SECONDS", 30),
+                    wait_timeout=getattr(settings, "SINGLE_FLIGHT_WAIT_TIMEOUT_SECONDS", 10.0),
+                )
+                _flights[name] = flight
+    return flight
+
+
+__all__ = [
+    "SingleFlight",
+    "get_single_flight",
+]
@@ -5,9 +5,11 @@
 from typing import List, Dict, Any, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from config import settings, init_chat_model
+from services.llm_gateway import create_chat_model
+from services.shared_cache import get_shared_cache
+from services.startup import LazyProxy
 import json
 import hashlib
-from datetime import datetime, timedelta
 
 
 class SmartQuestionsService:
@@ -15,36 +17,17 @@ class SmartQuestionsService:
     
     def __init__(self):
         # 初始化LLM
-        self.llm = init_chat_model(temperature=0.7, max_tokens=500)
+        self.llm = create_chat_model(init_chat_model, role="smart_questions", temperature=0.7, max_tokens=500)
         
-        # 内存缓存 (生产环境应使用Redis)
-        self._cache: Dict[str, Dict[str, Any]] = {}
+        # 共享缓存：多个 worker 之间复用生成结果，同一用户上下文的并发请求只调用一次模型
         self._cache_ttl = 3600  # 缓存1小时
+        self._cache = get_shared_cache().namespace("smart_questions", ttl_seconds=self._cache_ttl)
     
     def _get_cache_key(self, user_id: str, context: str) -> str:
         """生成缓存键"""
         # 使用用户ID和上下文的hash作为缓存键
         context_hash = hashlib.md5(context.encode()).hexdigest()[:8]
-        return f"smart_questions:{user_id}:{context_hash}"
-    
-    def _get_cached_questions(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
-        """从缓存获取问题"""
-        if cache_key in self._cache:
-            cached = self._cache[cache_key]
-            # 检查是否过期
-            if datetime.now() < cached["expires_at"]:
-                return cached["questions"]
-            else:
-                # 删除过期缓存
-                del self._cache[cache_key]
-        return None
-    
-    def _set_cached_questions(self, cache_key: str, questions: List[Dict[str, Any]]):
-        """设置缓存"""
-        self._cache[cache_key] = {
-            "questions": questions,
-            "expires_at": datetime.now() + timedelta(seconds=self._cache_ttl)
-        }
+        return f"{user_id}:{context_hash}"
     
     async def generate_smart_questions(
         self,
@@ -68,14 +51,20 @@ class SmartQuestionsService:
         # 构建用户上下文
         context = self._build_user_context(user_profile, recent_orders, browsing_history)
         
-        # 检查缓存
+        # 检查缓存，未命中时生成；生成失败不缓存
         cache_key = self._get_cache_key(user_id, context)
-        cached_questions = self._get_cached_questions(cache_key)
-        if cached_questions:
-            print(f"使用缓存的智能问题: {cache_key}")
-            return cached_questions
-        
-        # 使用AI生成个性化问题
+        questions = await self._cache.get_or_load(
+            cache_key,
+            lambda: self._generate_with_llm(context),
+            cacheable=bool,
+        )
+        if questions is None:
+            # 返回基于规则的智能问题
+            return self._get_rule_based_questions(recent_orders)
+        return questions
+    
+    async def _generate_with_llm(self, context: str) -> Optional[List[Dict[str, Any]]]:
+        """使用AI生成个性化问题，失败时返回 None"""
         prompt = ChatPromptTemplate.from_messages([
             ("system", """你是一个智能客服助手,负责为用户生成个性化的售后服务快速问题。
 
@@ -129,15 +118,11 @@ class SmartQuestionsService:
                     "icon": q.get("icon", "💬")
                 })
             
-            # 缓存结果
-            self._set_cached_questions(cache_key, quick_actions)
-            
             return quick_actions
         
         except Exception as e:
             print(f"生成智能问题失败: {e}")
-            # 返回基于规则的智能问题
-            return self._get_rule_based_questions(recent_orders)
+            return None
     
     def _build_user_context(
         self,
@@ -260,5 +245,5 @@ class SmartQuestionsService:
         return self._get_rule_based_questions()
 
 
-# 全局实例
-smart_questions_service = SmartQuestionsService()
+# 全局实例：首次访问时才创建模型客户端
+smart_questions_service = LazyProxy(SmartQuestionsService, "smart_questions_service")
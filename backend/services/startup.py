@@ -0,0 +1,313 @@
+"""
+启动编排与就绪门控。
+
+- ``LazyProxy``：重量级单例（知识检索器、智能问题服务等）首次被访问时才构造，
+  模块导入只剩类定义，``import main`` 不再同步加载向量库、嵌入模型和 LLM 客户端。
+  启动线程正在构造时，事件循环线程上的访问抛出 ``ProxyInitializing`` 而不是等锁，
+  避免整个事件循环被卡住；异步调用方用 ``aresolve_lazy`` 在线程池里等待构造完成
+- ``StartupOrchestrator``：lifespan 中把各子系统的初始化/预热作为后台任务并发执行，
+  同步初始化放进线程池；关键子系统全部完成前 ``/ready`` 返回 503，``/health`` 不受影响
+- ``StartupProfile``：记录各模块组的导入耗时和各子系统的初始化耗时，启动完成后写日志，
+  也可通过 ``/startup-profile`` 查看；单个模块的细粒度耗时可用 ``python -X importtime`` 补充
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class ProxyInitializing(RuntimeError):
+    """目标正由其他线程构造，事件循环线程上不等待。"""
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class LazyProxy:
+    """首次访问属性时才调用 ``factory`` 构造目标对象的线程安全代理。"""
+
+    __slots__ = ("_factory", "_name", "_target", "_lock")
+
+    def __init__(self, factory: Callable[[], Any], name: str = ""):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name or getattr(factory, "__name__", "lazy"))
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    @property
+    def initialized(self) -> bool:
+        return self._target is not None
+
+    def resolve(self) -> Any:
+        target = self._target
+        if target is not None:
+            return target
+        # 其他线程构造期间，事件循环线程等锁会阻塞所有请求，直接报错
+        if not self._lock.acquire(blocking=not _on_event_loop()):
+            raise ProxyInitializing(f"{self._name} is still initializing")
+        try:
+            target = self._target
+            if target is None:
+                target = self._factory()
+                object.__setattr__(self, "_target", target)
+        finally:
+            self._lock.release()
+        return target
+
+    async def aresolve(self) -> Any:
+        """异步调用方使用：未构造完成时在线程池里等待，不占用事件循环。"""
+        target = self._target
+        if target is not None:
+            return target
+        return await asyncio.to_thread(self.resolve)
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.resolve(), item)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.resolve(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(self.resolve(), name)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self.initialized else "deferred"
+        return f"<LazyProxy {self._name} ({state})>"
+
+
+def resolve_lazy(obj: Any) -> Any:
+    """对 ``LazyProxy`` 返回构造好的目标，其它对象原样返回。"""
+    return obj.resolve() if isinstance(obj, LazyProxy) else obj
+
+
+async def aresolve_lazy(obj: Any) -> Any:
+    """``resolve_lazy`` 的异步版本，构造期间等待而不阻塞事件循环。"""
+    return await obj.aresolve() if isinstance(obj, LazyProxy) else obj
+
+
+@dataclass
+class SubsystemStatus:
+    name: str
+    critical: bool = True
+    state: str = PENDING
+    elapsed: float = 0.0
+    error: str = ""
+
+
+class StartupProfile:
+    """启动耗时记录：模块组导入耗时和子系统初始化耗时。"""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self._created = clock()
+        self.imports: Dict[str, Tuple[float, int]] = {}
+        self.subsystems: Dict[str, SubsystemStatus] = {}
+
+    @contextmanager
+    def importing(self, name: str) -> Iterator[None]:
+        """记录 ``with`` 块内导入的耗时和新加载的模块数。"""
+        loaded = len(sys.modules)
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.imports[name] = (self._clock() - started, len(sys.modules) - loaded)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "uptime_ms": round((self._clock() - self._created) * 1000, 1),
+            "imports": {
+                name: {"ms": round(seconds * 1000, 1), "modules": modules}
+                for name, (seconds, modules) in self.imports.items()
+            },
+            "subsystems": {
+                name: {
+                    "state": status.state,
+                    "critical": status.critical,
+                    "ms": round(status.elapsed * 1000, 1),
+                    **({"error": status.error} if status.error else {}),
+                }
+                for name, status in self.subsystems.items()
+            },
+        }
+
+    def format(self) -> str:
+        lines = ["Startup profile:"]
+        for name, (seconds, modules) in sorted(self.imports.items(), key=lambda item: -item[1][0]):
+            lines.append(f"  import {name:<28} {seconds * 1000:>8.1f} ms  ({modules} modules)")
+        for name, status in sorted(self.subsystems.items(), key=lambda item: -item[1].elapsed):
+            suffix = f"  error: {status.error}" if status.error else ""
+            lines.append(f"  init   {name:<28} {status.elapsed * 1000:>8.1f} ms  [{status.state}]{suffix}")
+        return "\n".join(lines)
+
+
+@dataclass
+class _Subsystem:
+    name: str
+    init: Callable[[], Any]
+    critical: bool
+    after: Tuple[str, ...]
+    timeout: Optional[float]
+
+
+class StartupOrchestrator:
+    """并发执行启动子系统，并给出就绪状态。
+
+    ``after`` 声明依赖的子系统，依赖失败或被跳过时本子系统标记为 ``skipped``。
+    非关键子系统（预热类）失败只记录日志，不影响就绪。
+    """
+
+    def __init__(self, profile: Optional[StartupProfile] = None):
+        self.profile = profile or StartupProfile()
+        self._subsystems: Dict[str, _Subsystem] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._finished: Optional[asyncio.Task] = None
+
+    def register(
+        self,
+        name: str,
+        init: Callable[[], Any],
+        *,
+        critical: bool = True,
+        after: Iterable[str] = (),
+        timeout: Optional[float] = None,
+    ) -> None:
+        if name in self._subsystems:
+            raise ValueError(f"Startup subsystem '{name}' is already registered")
+        self._subsystems[name] = _Subsystem(name, init, critical, tuple(after), timeout)
+        self.profile.subsystems[name] = SubsystemStatus(name=name, critical=critical)
+
+    @property
+    def statuses(self) -> Dict[str, SubsystemStatus]:
+        return self.profile.subsystems
+
+    @property
+    def ready(self) -> bool:
+        return all(status.state == READY for status in self.statuses.values() if status.critical)
+
+    def pending(self) -> List[str]:
+        return [name for name, status in self.statuses.items() if status.state in (PENDING, RUNNING)]
+
+    def failed(self) -> List[str]:
+        return [name for name, status in self.statuses.items() if status.state in (FAILED, SKIPPED)]
+
+    def readiness(self) -> Dict[str, Any]:
+        critical = [name for name, status in self.statuses.items() if status.critical]
+        return {
+            "ready": self.ready,
+            "pending": [name for name in self.pending() if name in critical],
+            "failed": [name for name in self.failed() if name in critical],
+            "warming": [name for name in self.pending() if name not in critical],
+        }
+
+    async def _invoke(self, subsystem: _Subsystem) -> None:
+        if inspect.iscoroutinefunction(subsystem.init):
+            call = subsystem.init()
+        else:
+            call = asyncio.to_thread(subsystem.init)
+        if subsystem.timeout:
+            await asyncio.wait_for(call, timeout=subsystem.timeout)
+        else:
+            await call
+
+    async def _run(self, subsystem: _Subsystem) -> None:
+        status = self.statuses[subsystem.name]
+        try:
+            for dependency in subsystem.after:
+                event = self._done.get(dependency)
+                if event is not None:
+                    await event.wait()
+            blocked = [
+                dependency
+                for dependency in subsystem.after
+                if dependency in self.statuses and self.statuses[dependency].state != READY
+            ]
+            if blocked:
+                status.state = SKIPPED
+                status.error = "dependency not ready: " + ", ".join(blocked)
+                return
+
+            status.state = RUNNING
+            started = time.perf_counter()
+            try:
+                await self._invoke(subsystem)
+            except asyncio.CancelledError:
+                status.state = FAILED
+                status.error = "cancelled"
+                raise
+            except Exception as exc:
+                status.state = FAILED
+                status.error = str(exc) or type(exc).__name__
+                log = logger.error if subsystem.critical else logger.warning
+                log("Startup subsystem %s failed: %s", subsystem.name, status.error)
+            else:
+                status.state = READY
+            finally:
+                status.elapsed = time.perf_counter() - started
+        finally:
+            self._done[subsystem.name].set()
+
+    async def start(self) -> None:
+        """在后台启动所有子系统并立即返回。"""
+        if self._tasks:
+            return
+        self._done = {name: asyncio.Event() for name in self._subsystems}
+        self._tasks = [
+            asyncio.create_task(self._run(subsystem), name=f"startup:{subsystem.name}")
+            for subsystem in self._subsystems.values()
+        ]
+        self._finished = asyncio.create_task(self._report_when_done())
+
+    async def _report_when_done(self) -> None:
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info("%s", self.profile.format())
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待全部子系统结束，返回是否就绪。"""
+        if self._finished is not None:
+            await asyncio.wait({self._finished}, timeout=timeout)
+        return self.ready
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+        pending = [task for task in (*self._tasks, self._finished) if task is not None]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+startup_profile = StartupProfile()
+
+
+__all__ = [
+    "LazyProxy",
+    "ProxyInitializing",
+    "StartupOrchestrator",
+    "StartupProfile",
+    "SubsystemStatus",
+    "aresolve_lazy",
+    "resolve_lazy",
+    "startup_profile",
+]
@@ -0,0 +1,527 @@
+"""
+链路追踪与阶段耗时指标。
+
+- ``span(name, stage=...)``：记录一个阶段（节点、工作流、LLM、工具、检索、Redis、数据库）的耗时
+- 所有阶段耗时写入 ``ai_stage_latency_seconds`` 直方图，``/metrics`` 以 Prometheus 文本格式输出
+- LLM 回调解析服务商返回的前缀缓存命中情况，写入 ``ai_llm_prompt_tokens_total{cache=hit|miss}``
+- 配置 ``TRACING_OTLP_ENDPOINT`` 且安装了 opentelemetry 时，按 ``TRACING_SAMPLE_RATE`` 采样导出 OTLP 链路与指标
+
+span 的 business_id / intent / route 属性取自当前轮次的会话状态（见 ``bind_trace_state``），
+在阶段结束时读取，因此意图识别之前开始的阶段也能带上最终的路由信息。
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+# ── 指标 ──────────────────────────────────────────────────────────
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """带标签的累积直方图，输出格式与 Prometheus 客户端一致。"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name) or "") for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self._series[key] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {"buckets": list(series[0]), "sum": series[1], "count": series[2]}
+                for key, series in self._series.items()
+            }
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.snapshot().items()):
+            labels = _format_labels(self.labelnames, key)
+            for bound, count in zip(self.buckets, series["buckets"]):
+                bucket_labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            inf_labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {series['count']}")
+            lines.append(f"{self.name}_sum{labels} {series['sum']}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(name) or "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        key = tuple(str(labels.get(name) or "") for name in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """进程内指标注册表，其他模块可以注册自己的计数器/直方图一起输出。"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str], buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str]) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_LATENCY = registry.histogram(
+    "ai_stage_latency_seconds",
+    "Latency of AI pipeline stages.",
+    ("stage", "name", "business_id", "intent"),
+)
+STAGE_ERRORS = registry.counter(
+    "ai_stage_errors_total",
+    "Failed AI pipeline stages.",
+    ("stage", "name", "business_id"),
+)
+TOOL_CALL_LATENCY = registry.histogram(
+    "ai_tool_call_latency_seconds",
+    "Latency of individual tool calls requested by the model, by outcome.",
+    ("tool", "outcome"),
+)
+TOOL_CACHE_REQUESTS = registry.counter(
+    "ai_tool_cache_requests_total",
+    "Tool result cache lookups by tool and result (local_hit, shared_hit, miss, coalesced, bypass).",
+    ("tool", "result"),
+)
+
+LLM_PROMPT_TOKENS = registry.counter(
+    "ai_llm_prompt_tokens_total",
+    "Prompt tokens reported by the provider, by model and prefix cache result (hit, miss).",
+    ("model", "cache"),
+)
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+# ── 链路 ──────────────────────────────────────────────────────────
+
+
+class Span:
+    """一次阶段执行。``duration`` 在退出后可读。"""
+
+    __slots__ = ("name", "stage", "attributes", "trace_id", "span_id", "parent_id", "sampled", "start", "duration")
+
+    def __init__(self, name: str, stage: str, attributes: Dict[str, Any], parent: Optional["Span"], sampled: bool):
+        self.name = name
+        self.stage = stage
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.sampled = sampled
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("ai_current_span", default=None)
+_trace_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("ai_trace_state", default=None)
+
+
+class _TracingConfig:
+    sample_rate: float = 1.0
+    log_spans: bool = False
+    tracer = None
+    otel_histogram = None
+
+
+_config = _TracingConfig()
+
+
+def bind_trace_state(state: Optional[Dict[str, Any]]):
+    """把当前轮次的会话状态绑定到上下文，返回用于 ``reset_trace_state`` 的令牌。"""
+    return _trace_state.set(state)
+
+
+def reset_trace_state(token) -> None:
+    try:
+        _trace_state.reset(token)
+    except ValueError:
+        # 流式响应可能在另一个上下文里结束，这时直接清空
+        _trace_state.set(None)
+
+
+def _trace_attributes() -> Dict[str, Any]:
+    state = _trace_state.get()
+    if not state:
+        return {}
+    attributes = {
+        "business_id": state.get("business_id"),
+        "intent": state.get("intent"),
+        "route": state.get("skill_route") or state.get("response_mode"),
+    }
+    return {key: value for key, value in attributes.items() if value}
+
+
+@contextmanager
+def span(name: str, stage: str = "internal", **attributes: Any) -> Iterator[Span]:
+    parent = _current_span.get()
+    sampled = parent.sampled if parent else random.random() < _config.sample_rate
+    current = Span(name, stage, dict(attributes), parent, sampled)
+    token = _current_span.set(current)
+
+    otel_cm = None
+    otel_span = None
+    if _config.tracer is not None and sampled:
+        otel_cm = _config.tracer.start_as_current_span(f"{stage}:{name}")
+        otel_span = otel_cm.__enter__()
+
+    error: Optional[BaseException] = None
+    try:
+        yield current
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            _current_span.set(parent)
+        _finish(current, error, otel_cm, otel_span)
+
+
+def _finish(current: Span, error: Optional[BaseException], otel_cm, otel_span) -> None:
+    attributes = {**_trace_attributes(), **current.attributes}
+    business_id = attributes.get("business_id") or ""
+    STAGE_LATENCY.observe(
+        current.duration,
+        stage=current.stage,
+        name=current.name,
+        business_id=business_id,
+        intent=attributes.get("intent") or "",
+    )
+    if error is not None and isinstance(error, Exception):
+        STAGE_ERRORS.inc(stage=current.stage, name=current.name, business_id=business_id)
+
+    if _config.otel_histogram is not None:
+        _config.otel_histogram.record(
+            current.duration,
+            {"stage": current.stage, "name": current.name, "business_id": business_id},
+        )
+
+    if otel_span is not None:
+        for key, value in attributes.items():
+            if value is not None:
+                otel_span.set_attribute(key, value if isinstance(value, (str, bool, int, float)) else str(value))
+        if error is not None:
+            otel_span.record_exception(error)
+        otel_cm.__exit__(None, None, None)
+
+    if _config.log_spans and current.sampled:
+        logger.info(
+            "span trace=%s span=%s parent=%s stage=%s name=%s duration_ms=%.1f attrs=%s error=%s",
+            current.trace_id,
+            current.span_id,
+            current.parent_id,
+            current.stage,
+            current.name,
+            current.duration * 1000,
+            attributes,
+            type(error).__name__ if error is not None else None,
+        )
+
+
+def traced(stage: str, name: Optional[str] = None) -> Callable:
+    """装饰同步/异步函数，整个调用记为一个 span。"""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, stage=stage):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, stage=stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# ── 集成 ──────────────────────────────────────────────────────────
+
+
+def instrument_sqlalchemy(engine) -> None:
+    """为 SQLAlchemy 引擎注册游标事件，记录每条语句的耗时。"""
+    try:
+        from sqlalchemy import event
+    except Exception:  # pragma: no cover - sqlalchemy 是必装依赖
+        return
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_telemetry_starts", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_telemetry_starts")
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        verb = (statement or "").lstrip().split(" ", 1)[0].upper() or "UNKNOWN"
+        attributes = _trace_attributes()
+        STAGE_LATENCY.observe(
+            duration,
+            stage="db",
+            name=verb,
+            business_id=attributes.get("business_id") or "",
+            intent=attributes.get("intent") or "",
+        )
+
+
+def _as_dict(value: Any) -> Dict[str, Any]:
+    if isinstance(value, dict):
+        return value
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return {}
+
+
+def prompt_cache_usage(response) -> Optional[Tuple[int, int]]:
+    """从 LLMResult 中取出 (命中前缀缓存的 prompt token, 未命中的 prompt token)。
+
+    兼容几种返回格式：DeepSeek 的 ``prompt_cache_hit_tokens`` / ``prompt_cache_miss_tokens``、
+    OpenAI 兼容接口的 ``prompt_tokens_details.cached_tokens``，以及 LangChain 消息上的
+    ``usage_metadata.input_token_details.cache_read``。服务商没有返回缓存信息时返回 None。
+    """
+    llm_output = getattr(response, "llm_output", None) or {}
+    usage = _as_dict(llm_output.get("token_usage") or llm_output.get("usage"))
+    if "prompt_cache_hit_tokens" in usage or "prompt_cache_miss_tokens" in usage:
+        return int(usage.get("prompt_cache_hit_tokens") or 0), int(usage.get("prompt_cache_miss_tokens") or 0)
+    details = _as_dict(usage.get("prompt_tokens_details"))
+    if "cached_tokens" in details:
+        cached = int(details.get("cached_tokens") or 0)
+        return cached, max(0, int(usage.get("prompt_tokens") or 0) - cached)
+
+    # 流式调用和部分集成只在消息的 usage_metadata 上给出用量
+    hit = total = 0
+    found = False
+    for generation_list in getattr(response, "generations", None) or []:
+        for generation in generation_list:
+            metadata = _as_dict(getattr(getattr(generation, "message", None), "usage_metadata", None))
+            token_details = _as_dict(metadata.get("input_token_details"))
+            if "cache_read" not in token_details:
+                continue
+            found = True
+            hit += int(token_details.get("cache_read") or 0)
+            total += int(metadata.get("input_tokens") or 0)
+    if not found:
+        return None
+    return hit, max(0, total - hit)
+
+
+def build_llm_callback():
+    """返回记录 LLM 调用耗时和前缀缓存命中 token 的 LangChain 回调；未安装 langchain_core 时返回 None。"""
+    try:
+        from langchain_core.callbacks import BaseCallbackHandler
+    except Exception:  # pragma: no cover - langchain_core 是必装依赖
+        return None
+
+    class LLMTelemetryCallback(BaseCallbackHandler):
+        def __init__(self):
+            self._starts: Dict[Any, Tuple[float, str]] = {}
+
+        def _start(self, serialized, run_id, kwargs):
+            invocation = kwargs.get("invocation_params") or {}
+            model = invocation.get("model") or invocation.get("model_name") or (serialized or {}).get("name") or "llm"
+            self._starts[run_id] = (time.perf_counter(), str(model))
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(serialized, run_id, kwargs)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(serialized, run_id, kwargs)
+
+        def _end(self, run_id, failed: bool):
+            started = self._starts.pop(run_id, None)
+            if started is None:
+                return
+            start, model = started
+            attributes = _trace_attributes()
+            business_id = attributes.get("business_id") or ""
+            STAGE_LATENCY.observe(
+                time.perf_counter() - start,
+                stage="llm",
+                name=model,
+                business_id=business_id,
+                intent=attributes.get("intent") or "",
+            )
+            if failed:
+                STAGE_ERRORS.inc(stage="llm", name=model, business_id=business_id)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            started = self._starts.get(run_id)
+            self._end(run_id, failed=False)
+            try:
+                usage = prompt_cache_usage(response)
+            except (TypeError, ValueError):
+                usage = None
+            if usage is None:
+                return
+            model = started[1] if started is not None else "llm"
+            LLM_PROMPT_TOKENS.inc(usage[0], model=model, cache="hit")
+            LLM_PROMPT_TOKENS.inc(usage[1], model=model, cache="miss")
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, failed=True)
+
+    return LLMTelemetryCallback()
+
+
+_llm_callbacks: Optional[list] = None
+
+
+def llm_callbacks() -> list:
+    """模型初始化时挂载的共享回调列表。"""
+    global _llm_callbacks
+    if _llm_callbacks is None:
+        callback = build_llm_callback()
+        _llm_callbacks = [callback] if callback is not None else []
+    return _llm_callbacks
+
+
+def configure_tracing(settings) -> None:
+    """按配置初始化采样率与 OTLP 导出，未安装 opentelemetry 时只保留本地指标。"""
+    _config.sample_rate = min(1.0, max(0.0, float(getattr(settings, "TRACING_SAMPLE_RATE", 1.0))))
+    _config.log_spans = bool(getattr(settings, "TRACING_LOG_SPANS", False))
+
+    endpoint = getattr(settings, "TRACING_OTLP_ENDPOINT", "")
+    if not endpoint:
+        return
+    try:
+        from opentelemetry import metrics, trace
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ALWAYS_ON
+    except ImportError:
+        logger.warning("未安装 opentelemetry，跳过 OTLP 导出（仅提供 /metrics）")
+        return
+
+    endpoint = endpoint.rstrip("/")
+    resource = Resource.create({"service.name": getattr(settings, "TRACING_SERVICE_NAME", "ai-customer-service")})
+    # 采样在 span() 中按轮次决定，这里不再二次采样
+    tracer_provider = TracerProvider(resource=resource, sampler=ALWAYS_ON)
+    tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{endpoint}/v1/traces")))
+    trace.set_tracer_provider(tracer_provider)
+
+    reader = PeriodicExportingMetricReader(OTLPMetricExporter(endpoint=f"{endpoint}/v1/metrics"))
+    metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[reader]))
+
+    _config.tracer = trace.get_tracer("ai_module")
+    _config.otel_histogram = metrics.get_meter("ai_module").create_histogram(
+        "ai.stage.latency", unit="s", description="Latency of AI pipeline stages."
+    )
+    logger.info("OTLP 导出已启用 endpoint=%s sample_rate=%.2f", endpoint, _config.sample_rate)
+
+
+__all__ = [
+    "Counter",
+    "Histogram",
+    "MetricsRegistry",
+    "STAGE_LATENCY",
+    "Span",
+    "bind_trace_state",
+    "build_llm_callback",
+    "configure_tracing",
+    "instrument_sqlalchemy",
+    "llm_callbacks",
+    "registry",
+    "render_metrics",
+    "reset_trace_state",
+    "span",
+    "traced",
+]
@@ -0,0 +1,226 @@
+"""只读业务工具的结果缓存。
+
+选题助手的智能体循环和函数调用节点会用相同参数反复调用商品类只读工具，
+每次都查询 MySQL。工具插件通过 ``ToolCachePolicy`` 声明可缓存，缓存分两层：
+
+- 本地层：进程内 LRU + TTL
+- 共享层：Redis（不可用时退化为 ``redis_cache`` 的内存实现），多实例共享
+
+失效采用标签版本号：每条缓存按声明的标签（``products``、``product:<id>``）
+把当前版本号拼进缓存 key；商品变更时 ``publish_product_changed`` 递增相关标签的
+版本号，旧条目不再被命中，随 TTL 自然过期。版本号存放在 Redis，其他实例同样生效。
+各实例把读到的版本号在本地缓存 ``tag_version_ttl_seconds`` 秒（默认 5 秒），
+本地层命中时通常不访问外部存储；其他实例发布的变更最多晚这么久生效，本实例发布的立即生效。
+
+并发的相同未命中经 ``SingleFlight`` 合并为一次执行（合并的调用记为 ``coalesced``）。
+
+命中、未命中按工具名写入 ``ai_tool_cache_requests_total``。
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Mapping, Optional, Sequence
+
+from services.shared_cache import LocalLRUCache
+from services.single_flight import RESULT_COALESCED as FLIGHT_COALESCED
+from services.single_flight import RESULT_REMOTE as FLIGHT_REMOTE
+from services.single_flight import SingleFlight
+
+from services.telemetry import TOOL_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "tool_cache"
+TAG_PRODUCTS = "products"
+
+RESULT_LOCAL_HIT = "local_hit"
+RESULT_SHARED_HIT = "shared_hit"
+RESULT_MISS = "miss"
+RESULT_COALESCED = "coalesced"
+RESULT_BYPASS = "bypass"
+
+
+def product_tag(product_id: Any) -> str:
+    return f"product:{product_id}"
+
+
+def canonical_args_key(args: Mapping[str, Any]) -> str:
+    """默认 key：参数按键排序后序列化，超长时取摘要。"""
+    raw = json.dumps(args, ensure_ascii=False, sort_keys=True, default=str)
+    if len(raw) <= 120:
+        return raw
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class ToolCachePolicy:
+    """工具插件上声明的缓存策略。
+
+    ``key`` 把工具参数规范化为缓存 key；``tags`` 返回该结果依赖的失效标签。
+    """
+
+    ttl_seconds: int = 120
+    key: Callable[[Mapping[str, Any]], str] = canonical_args_key
+    tags: Callable[[Mapping[str, Any]], Sequence[str]] = lambda args: (TAG_PRODUCTS,)
+
+    def is_cacheable_result(self, result: Any) -> bool:
+        # 失败结果（如“项目不存在”）不缓存，避免商品上架后仍返回旧的错误
+        return not (isinstance(result, dict) and result.get("success") is False)
+
+
+class ToolResultCache:
+    """按 ``ToolCachePolicy`` 缓存工具结果，支持标签失效。"""
+
+    def __init__(
+        self,
+        backend: Any = None,
+        max_local_entries: int = 512,
+        enabled: bool = True,
+        distributed_flight: bool = False,
+        tag_version_ttl_seconds: float = 5.0,
+    ):
+        self._backend = backend
+        self.local = LocalLRUCache(max_local_entries)
+        self.tag_versions = LocalLRUCache(max_local_entries)
+        self.tag_version_ttl_seconds = tag_version_ttl_seconds
+        # 同一 key 的并发未命中只执行一次工具
+        self.flight = SingleFlight("tool_result", backend=backend, distributed=distributed_flight)
+        self.enabled = enabled
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            from services.redis_cache import redis_cache
+
+            self._backend = redis_cache
+        return self._backend
+
+    def _count(self, tool_name: str, result: str) -> None:
+        counts = self.stats.setdefault(tool_name, {})
+        counts[result] = counts.get(result, 0) + 1
+        TOOL_CACHE_REQUESTS.inc(tool=tool_name, result=result)
+
+    def hit_rate(self, tool_name: str) -> float:
+        counts = self.stats.get(tool_name, {})
+        hits = counts.get(RESULT_LOCAL_HIT, 0) + counts.get(RESULT_SHARED_HIT, 0)
+        total = hits + counts.get(RESULT_MISS, 0)
+        return hits / total if total else 0.0
+
+    async def _tag_versions(self, tags: Iterable[str]) -> str:
+        versions = []
+        for tag in tags:
+            version = self.tag_versions.get(tag) if self.tag_version_ttl_seconds > 0 else None
+            if version is None:
+                version = str(await self.backend.get(f"{KEY_PREFIX}:tag:{tag}") or 0)
+                if self.tag_version_ttl_seconds > 0:
+                    self.tag_versions.set(tag, version, self.tag_version_ttl_seconds)
+            versions.append(version)
+        return ".".join(versions)
+
+    async def get_or_execute(
+        self,
+        tool_name: str,
+        policy: ToolCachePolicy,
+        args: Mapping[str, Any],
+        execute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        if not self.enabled:
+            return await execute()
+
+        try:
+            versions = await self._tag_versions(policy.tags(args))
+            key = f"{KEY_PREFIX}:{tool_name}:{policy.key(args)}:{versions}"
+        except Exception as exc:
+            logger.warning("Tool cache key failed for %s, bypassing: %s", tool_name, exc)
+            self._count(tool_name, RESULT_BYPASS)
+            return await execute()
+
+        cached = self.local.get(key)
+        if cached is not None:
+            self._count(tool_name, RESULT_LOCAL_HIT)
+            return copy.deepcopy(cached)
+
+        try:
+            cached = await self.backend.get_payload(key)
+        except Exception as exc:
+            logger.warning("Shared tool cache read failed for %s: %s", tool_name, exc)
+            cached = None
+        if cached is not None:
+            self.local.set(key, cached, policy.ttl_seconds)
+            self._count(tool_name, RESULT_SHARED_HIT)
+            return copy.deepcopy(cached)
+
+        result, flight_result = await self.flight.do_with_status(key, execute)
+        if flight_result in (FLIGHT_COALESCED, FLIGHT_REMOTE):
+            # 结果由合并的那次执行写入缓存
+            self._count(tool_name, RESULT_COALESCED)
+            return copy.deepcopy(result)
+
+        self._count(tool_name, RESULT_MISS)
+        if result is not None and policy.is_cacheable_result(result):
+            self.local.set(key, copy.deepcopy(result), policy.ttl_seconds)
+            try:
+                await self.backend.set_payload(key, result, expire=policy.ttl_seconds)
+            except Exception as exc:
+                logger.warning("Shared tool cache write failed for %s: %s", tool_name, exc)
+        return result
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self.tag_versions.pop(tag)
+            try:
+                await self.backend.incr(f"{KEY_PREFIX}:tag:{tag}")
+            except Exception as exc:
+                # 共享层不可写时至少清掉本实例的本地层，其他实例依赖 TTL 兜底
+                logger.warning("Tool cache invalidation failed for tag=%s: %s", tag, exc)
+                self.local.clear()
+
+
+_tool_result_cache: Optional[ToolResultCache] = None
+
+
+def get_tool_result_cache() -> ToolResultCache:
+    global _tool_result_cache
+    if _tool_result_cache is None:
+        from config import settings
+
+        _tool_result_cache = ToolResultCache(
+            max_local_entries=getattr(settings, "TOOL_RESULT_CACHE_MAX_ENTRIES", 512),
+            enabled=getattr(settings, "TOOL_RESULT_CACHE_ENABLED", True),
+            distributed_flight=getattr(settings, "SINGLE_FLIGHT_DISTRIBUTED", False),
+            tag_version_ttl_seconds=getattr(settings, "TOOL_RESULT_CACHE_TAG_VERSION_TTL_SECONDS", 5),
+        )
+    return _tool_result_cache
+
+
+async def publish_product_changed(*product_ids: Any, catalog: bool = True) -> None:
+    """商品创建、更新、删除或销量变化后调用，使依赖这些商品的工具结果失效。
+
+    ``catalog=False`` 用于销量这类只影响单个商品的变化：只递增 ``product:<id>``，
+    不让所有搜索结果失效，搜索里的销量随 TTL 更新。
+    失效不应影响商品写操作本身，这里吞掉并记录异常。
+    """
+    try:
+        tags = [product_tag(product_id) for product_id in product_ids if product_id]
+        if catalog:
+            tags.insert(0, TAG_PRODUCTS)
+        await get_tool_result_cache().invalidate_tags(tags)
+    except Exception as exc:
+        logger.warning("Failed to invalidate tool cache for products=%s: %s", product_ids, exc)
+
+
+__all__ = [
+    "LocalLRUCache",
+    "TAG_PRODUCTS",
+    "ToolCachePolicy",
+    "ToolResultCache",
+    "canonical_args_key",
+    "get_tool_result_cache",
+    "product_tag",
+    "publish_product_changed",
+]
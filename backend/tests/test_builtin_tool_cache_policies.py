@@ -0,0 +1,24 @@
+"""
+Unit tests for the tool result cache policies in builtin_tools.py — argument
+normalisation keeps order-sensitive lists apart and only sorts set-like ones.
+"""
+import pytest
+
+builtin_tools = pytest.importorskip("ai_module.infrastructure.plugins.builtin_tools")
+
+POLICIES = builtin_tools.TOOL_CACHE_POLICIES
+
+
+def test_compare_projects_keys_keep_the_requested_order():
+    key = POLICIES["compare_projects"].key
+
+    assert key({"project_ids": ["B", "A"]}) != key({"project_ids": ["A", "B"]})
+    assert key({"project_ids": [" A", "B "]}) == key({"project_ids": ["A", "B"]})
+
+
+def test_set_like_arguments_share_one_key():
+    key = POLICIES["check_tech_stack_match"].key
+
+    assert key({"project_id": "p1", "user_skills": ["Vue", "Java"]}) == key(
+        {"project_id": " p1 ", "user_skills": ["Java", "Vue"], "extra": None}
+    )
@@ -0,0 +1,106 @@
+"""
+Unit tests for cache_codec.py — versioned payload encoding, compression
+thresholds and backward compatibility with legacy JSON entries.
+"""
+import importlib.util
+import json
+import os
+
+import pytest
+
+# Import the codec directly from the file to avoid the services/__init__.py chain
+_spec = importlib.util.spec_from_file_location(
+    "cache_codec",
+    os.path.join(os.path.dirname(__file__), "..", "services", "cache_codec.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_mod)
+PayloadCodec = _mod.PayloadCodec
+CodecError = _mod.CodecError
+
+
+def _make_context(turns: int = 20) -> dict:
+    return {
+        "history": [
+            {"user": f"我想查订单 ORD2024{i:04d}", "assistant": f"订单 ORD2024{i:04d} 已发货", "timestamp": "t"}
+            for i in range(turns)
+        ],
+        "user_profile": {"vip": True},
+        "last_intent": "订单查询",
+        "active_task": None,
+        "task_stack": [],
+    }
+
+
+class TestRoundTrip:
+    @pytest.mark.parametrize("serializer", ["json", "msgpack"])
+    @pytest.mark.parametrize("compression", ["none", "zstd", "lz4"])
+    def test_round_trip_preserves_payload(self, serializer, compression):
+        codec = PayloadCodec(serializer=serializer, compression=compression, compress_threshold=64)
+        context = _make_context()
+
+        assert codec.decode(codec.encode(context)) == context
+
+    def test_payload_starts_with_version_byte(self):
+        codec = PayloadCodec(compression="none")
+        payload = codec.encode({"a": 1})
+
+        assert payload[0] == _mod.PAYLOAD_VERSION
+
+    def test_small_payload_is_not_compressed(self):
+        codec = PayloadCodec(compression="zstd", compress_threshold=4096)
+        payload = codec.encode({"a": 1})
+
+        assert payload[1] >> 4 == 0
+
+    @pytest.mark.skipif(_mod.zstandard is None, reason="zstandard not installed")
+    def test_large_payload_is_compressed_and_smaller_than_json(self):
+        codec = PayloadCodec(compression="zstd", compress_threshold=256)
+        context = _make_context(turns=40)
+        payload = codec.encode(context)
+
+        assert payload[1] >> 4 == 1
+        assert len(payload) < len(json.dumps(context, ensure_ascii=False).encode("utf-8"))
+
+
+class TestLegacyCompatibility:
+    def test_decodes_legacy_json_string(self):
+        codec = PayloadCodec()
+        legacy = json.dumps({"history": [], "last_intent": "问答"}, ensure_ascii=False)
+
+        assert codec.decode(legacy) == {"history": [], "last_intent": "问答"}
+
+    def test_decodes_legacy_json_bytes(self):
+        codec = PayloadCodec()
+        legacy = json.dumps({"conversation_summary": "摘要"}, ensure_ascii=False).encode("utf-8")
+
+        assert codec.decode(legacy)["conversation_summary"] == "摘要"
+
+    def test_reads_payloads_written_with_other_settings(self):
+        writer = PayloadCodec(serializer="msgpack", compression="zstd", compress_threshold=0)
+        reader = PayloadCodec(serializer="json", compression="none")
+        context = _make_context()
+
+        assert reader.decode(writer.encode(context)) == context
+
+    def test_corrupted_payload_raises_codec_error(self):
+        codec = PayloadCodec()
+
+        with pytest.raises(CodecError):
+            codec.decode(b"not-json")
+
+    def test_empty_payload_returns_none(self):
+        codec = PayloadCodec()
+
+        assert codec.decode(b"") is None
+        assert codec.decode(None) is None
+
+
+class TestConfiguration:
+    def test_unknown_serializer_is_rejected(self):
+        with pytest.raises(ValueError):
+            PayloadCodec(serializer="pickle")
+
+    def test_unknown_compression_is_rejected(self):
+        with pytest.raises(ValueError):
+            PayloadCodec(compression="gzip")
@@ -0,0 +1,85 @@
+"""
+Unit tests for business config hot reload — ConfigLoader.refresh change
+detection and the watcher that rebuilds runtimes for changed packs.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+
+import pytest
+
+from config.loader import ConfigLoader
+
+_spec = importlib.util.spec_from_file_location(
+    "config_watcher",
+    os.path.join(os.path.dirname(__file__), "..", "ai_module", "core", "config_watcher.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    # 保证修改时间前进，避免同一时间片内的两次写入被当成未变化
+    stamp = time.time_ns() + 1_000_000_000
+    os.utime(path, ns=(stamp, stamp))
+
+
+def test_refresh_reports_changed_added_and_removed_packs(tmp_path):
+    _write(tmp_path / "shop.yaml", "business_name: 商城\n")
+    loader = ConfigLoader(str(tmp_path))
+    assert loader.refresh() == []
+
+    _write(tmp_path / "shop.yaml", "business_name: 新商城\n")
+    _write(tmp_path / "clinic.yaml", "business_name: 诊所\n")
+    assert sorted(loader.refresh()) == ["clinic", "shop"]
+    assert loader.get_config("shop")["business_name"] == "新商城"
+
+    (tmp_path / "clinic.yaml").unlink()
+    assert loader.refresh() == ["clinic"]
+    assert loader.get_config("clinic") is None
+
+
+def test_refresh_keeps_previous_config_when_yaml_is_broken(tmp_path):
+    _write(tmp_path / "shop.yaml", "business_name: 商城\n")
+    loader = ConfigLoader(str(tmp_path))
+
+    _write(tmp_path / "shop.yaml", "business_name: [未闭合\n")
+    assert loader.refresh() == []
+    assert loader.get_config("shop")["business_name"] == "商城"
+
+
+class _FakeFactory:
+    def __init__(self, fail_for=()):
+        self.reloaded = []
+        self.fail_for = set(fail_for)
+
+    async def reload(self, business_id, drain_timeout=30.0):
+        if business_id in self.fail_for:
+            raise RuntimeError("adapter unavailable")
+        self.reloaded.append(business_id)
+        return True
+
+
+@pytest.mark.asyncio
+async def test_watcher_reloads_changed_packs_and_survives_failures(tmp_path):
+    _write(tmp_path / "shop.yaml", "business_name: 商城\n")
+    _write(tmp_path / "clinic.yaml", "business_name: 诊所\n")
+    loader = ConfigLoader(str(tmp_path))
+    factory = _FakeFactory(fail_for={"clinic"})
+    watcher = _mod.BusinessConfigWatcher(loader, factory, poll_seconds=0.01, use_watchfiles=False)
+
+    await watcher.start()
+    _write(tmp_path / "shop.yaml", "business_name: 新商城\n")
+    _write(tmp_path / "clinic.yaml", "business_name: 新诊所\n")
+    for _ in range(100):
+        if factory.reloaded:
+            break
+        await asyncio.sleep(0.01)
+    await watcher.stop()
+
+    assert factory.reloaded == ["shop"]
+    assert watcher._task is None
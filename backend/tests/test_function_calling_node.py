@@ -66,7 +66,9 @@ _mock_tools = [
 _ft_mod = types.ModuleType("services.function_tools")
 _ft_mod.all_tools = _mock_tools
 sys.modules["services.function_tools"] = _ft_mod
-sys.modules["services"] = types.ModuleType("services")
+# Keep the real (lazily exporting) ``services`` package so other services
+# submodules stay importable for test modules collected later
+import services  # noqa: E402,F401
 
 # Load function_calling_node.py
 _fc_path = os.path.join(_backend_dir, "ai_module", "core", "nodes", "policy", "function_calling_node.py")
@@ -415,3 +417,56 @@ class TestBuildMessages:
         # Only last 3 turns from history
         assert len(messages) == 8
 
+    def test_system_prefix_is_shared_across_users(self):
+        mock_llm = MagicMock()
+        mock_llm.bind_tools.return_value = MagicMock()
+        node = FunctionCallingNode(mock_llm)
+
+        first = node._build_messages(_make_state(user_id="u1", user_message="查订单"))
+        second = node._build_messages(_make_state(user_id="u2", user_message="查物流"))
+
+        # Volatile data lives in the last message so providers can reuse the cached prefix
+        assert first[0] == second[0]
+        assert "u1" not in first[0][1]
+        assert "当前用户ID: u1" in first[-1][1]
+
+
+
+class TestDeterministicToolPlanning:
+    """Well-structured intents skip the LLM tool-selection call."""
+
+    def _make_node(self):
+        mock_llm = MagicMock()
+        mock_llm_with_tools = AsyncMock()
+        mock_response = MagicMock()
+        mock_response.tool_calls = []
+        mock_llm_with_tools.ainvoke.return_value = mock_response
+        mock_llm.bind_tools.return_value = mock_llm_with_tools
+
+        node = FunctionCallingNode(mock_llm)
+        for name in ("query_order", "get_logistics"):
+            mock_tool = MagicMock()
+            mock_tool.ainvoke = AsyncMock(return_value={"success": True, "tool": name})
+            node.tool_map[name] = mock_tool
+        return node, mock_llm_with_tools
+
+    @pytest.mark.asyncio
+    async def test_order_number_in_message_calls_tool_without_llm(self):
+        node, mock_llm_with_tools = self._make_node()
+
+        state = _make_state(user_message="帮我看下订单 ORD20240207123456 到哪了")
+        result = await node.execute(state)
+
+        mock_llm_with_tools.ainvoke.assert_not_called()
+        assert result["tool_used"] == "get_logistics"
+        node.tool_map["get_logistics"].ainvoke.assert_awaited_once()
+        assert node.tool_map["get_logistics"].ainvoke.await_args.args[0] == {"order_no": "ORD20240207123456"}
+
+    @pytest.mark.asyncio
+    async def test_ambiguous_order_numbers_fall_back_to_llm(self):
+        node, mock_llm_with_tools = self._make_node()
+
+        state = _make_state(user_message="ORD20240207123456 和 ORD20240208000001 哪个先发货")
+        await node.execute(state)
+
+        mock_llm_with_tools.ainvoke.assert_called_once()
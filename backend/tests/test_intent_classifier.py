@@ -0,0 +1,132 @@
+"""
+Unit tests for intent_classifier.py — char n-gram features, training,
+temperature calibration, zero confidence for off-vocabulary messages,
+artifact round trips and evaluation reports.
+"""
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+_spec = importlib.util.spec_from_file_location(
+    "intent_classifier",
+    os.path.join(os.path.dirname(__file__), "..", "ai_module", "core", "intent_classifier.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+IntentClassifier = _mod.IntentClassifier
+
+_TEMPLATES = {
+    "推荐": ["帮我推荐几个{x}项目", "有没有适合我的{x}毕设", "想做一个{x}的选题"],
+    "订单查询": ["我的{x}订单到哪了", "{x}订单什么时候发货", "帮我查一下{x}的物流"],
+    "售后服务": ["{x}项目我要退款", "{x}这个能退货吗", "申请{x}售后"],
+}
+_FILLERS = ["Java", "Python", "Vue", "小程序", "Spring Boot", "Django", "React", "安卓"]
+
+
+def _examples():
+    return [
+        (template.format(x=filler), intent)
+        for intent, templates in _TEMPLATES.items()
+        for template in templates
+        for filler in _FILLERS
+    ]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return IntentClassifier.train(_examples(), epochs=40)
+
+
+def test_char_ngrams_mark_boundaries_and_normalize():
+    grams = _mod.char_ngrams("  退款  ", (1, 2))
+    assert grams == ["退", "款", "^退", "退款", "款$"]
+    assert _mod.char_ngrams("") == []
+
+
+def test_predicts_unseen_phrasings(classifier):
+    assert classifier.predict("推荐一个 Go 项目吧").intent == "推荐"
+    assert classifier.predict("订单到哪了").intent == "订单查询"
+    assert classifier.predict("想退款").intent == "售后服务"
+
+
+def test_confidence_is_calibrated_on_held_out_examples(classifier):
+    assert classifier.metadata["calibration_examples"] > 0
+    assert classifier.temperature != 1.0
+    assert classifier.predict("帮我推荐几个Java项目").confidence > classifier.predict("嗯").confidence
+
+
+@pytest.mark.parametrize("message", ["zzzz", "今天天气怎么样", "股票明天会涨吗", "what is the capital of France"])
+def test_off_vocabulary_messages_get_zero_confidence(classifier, message):
+    prediction = classifier.predict(message)
+
+    assert prediction.coverage < classifier.min_coverage
+    assert prediction.confidence == 0.0
+
+
+def test_in_domain_messages_keep_their_confidence(classifier):
+    prediction = classifier.predict("我要退货")
+
+    assert prediction.coverage >= classifier.min_coverage
+    assert prediction.confidence > 0.85
+
+
+def test_prediction_is_sub_millisecond(classifier):
+    durations = sorted(classifier.predict("帮我查一下Vue的物流").duration_ms for _ in range(50))
+    assert durations[25] < 1.0
+
+
+def test_artifact_round_trip(classifier, tmp_path):
+    path = classifier.save(tmp_path / "pack.json")
+    loaded = IntentClassifier.load(path)
+
+    assert loaded.labels == classifier.labels
+    assert loaded.temperature == pytest.approx(classifier.temperature)
+    assert loaded.min_coverage == classifier.min_coverage
+    original = classifier.predict_proba("我要退货")
+    assert np.allclose(loaded.predict_proba("我要退货"), original, atol=1e-4)
+
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    payload["version"] = 99
+    with pytest.raises(ValueError):
+        IntentClassifier.from_dict(payload)
+
+
+def test_training_requires_two_labels():
+    with pytest.raises(ValueError):
+        IntentClassifier.train([("帮我推荐", "推荐"), ("推荐一下", "推荐")])
+
+
+def test_business_examples_and_traffic_loading(tmp_path):
+    config = {
+        "intent_classifier": {
+            "examples": [{"message": "我的订单到哪了", "intent": "订单查询"}],
+            "rules": {"售后服务": ["退款", ""]},
+        }
+    }
+    assert _mod.business_examples(config) == [("我的订单到哪了", "订单查询"), ("退款", "售后服务")]
+    assert _mod.business_examples(config, include_rules=False) == [("我的订单到哪了", "订单查询")]
+
+    traffic = tmp_path / "traffic.jsonl"
+    traffic.write_text(
+        '{"message": "快递到哪了", "intent": "订单查询"}\n'
+        "not json\n"
+        '{"message": "随便聊聊", "intent": "闲聊"}\n',
+        encoding="utf-8",
+    )
+    assert _mod.load_labelled_traffic([traffic], labels=["订单查询"]) == [("快递到哪了", "订单查询")]
+
+
+def test_evaluate_reports_coverage_above_threshold(classifier):
+    report = _mod.evaluate(classifier, _examples()[:12], threshold=0.99)
+
+    assert report["examples"] == 12
+    assert 0.0 <= report["coverage"] <= 1.0
+    assert report["accuracy"] == 1.0
+    assert set(report["per_label"]) >= {"推荐"}
@@ -38,13 +38,11 @@ _base_mod = importlib.util.module_from_spec(_base_spec)
 sys.modules["backend.ai_module.core.nodes.common.base"] = _base_mod
 _base_spec.loader.exec_module(_base_mod)
 
-# Load config.py
-_config_path = os.path.join(_backend_dir, "config.py")
-_config_spec = importlib.util.spec_from_file_location("backend.config", _config_path)
-_config_mod = importlib.util.module_from_spec(_config_spec)
-sys.modules["backend.config"] = _config_mod
-sys.modules["config"] = _config_mod
-_config_spec.loader.exec_module(_config_mod)
+# Use the real config package: swapping in the bare config.py would hide
+# ``config.loader`` from modules imported later in the same session
+import config as _config_mod  # noqa: E402
+
+sys.modules.setdefault("backend.config", _config_mod)
 
 # Load constants.py
 _constants_path = os.path.join(_backend_dir, "ai_module", "core", "constants.py")
@@ -54,6 +52,24 @@ _constants_mod.__package__ = "backend.ai_module.core"
 sys.modules["backend.ai_module.core.constants"] = _constants_mod
 _constants_spec.loader.exec_module(_constants_mod)
 
+# Load the real LLM response cache (other test modules may have stubbed the services package)
+for _name in (
+    "services.redis_cache",
+    "services.single_flight",
+    "services.shared_cache",
+    "services.tool_result_cache",
+    "services.llm_response_cache",
+):
+    if _name not in sys.modules:
+        try:
+            importlib.import_module(_name)
+        except ImportError:
+            _path = os.path.join(_backend_dir, "services", _name.split(".")[-1] + ".py")
+            _spec = importlib.util.spec_from_file_location(_name, _path)
+            _module = importlib.util.module_from_spec(_spec)
+            sys.modules[_name] = _module
+            _spec.loader.exec_module(_module)
+
 # Load intent_node.py
 _intent_path = os.path.join(_backend_dir, "ai_module", "core", "nodes", "understanding", "intent_node.py")
 _intent_spec = importlib.util.spec_from_file_location(
@@ -69,6 +85,9 @@ _format_intent_history = _intent_mod._format_intent_history
 _find_fallback_intent = _intent_mod._find_fallback_intent
 IntentRecognitionNode = _intent_mod.IntentRecognitionNode
 
+_response_cache_mod = sys.modules["services.llm_response_cache"]
+MemoryCache = sys.modules["services.redis_cache"].MemoryCache
+
 
 # ── _format_intent_history tests ─────────────────────────────────────
 
@@ -190,8 +209,8 @@ class TestAppendIntentHistory:
 
 class TestIntentRecognitionNodeExecute:
     def setup_method(self):
-        # Clear the class-level cache before each test
-        IntentRecognitionNode._intent_cache.clear()
+        # Each test gets its own LLM response cache so mocked replies never leak between tests
+        _response_cache_mod._llm_response_cache = _response_cache_mod.LLMResponseCache(backend=MemoryCache())
 
     def _make_state(self, message="你好", intent_history=None, attachments=None, **overrides):
         state = {
@@ -216,6 +235,7 @@ class TestIntentRecognitionNodeExecute:
         mock_llm = AsyncMock()
         mock_response = MagicMock()
         mock_response.content = response_text
+        mock_response.tool_calls = []
         mock_llm.ainvoke.return_value = mock_response
         return mock_llm
 
@@ -265,11 +285,13 @@ class TestIntentRecognitionNodeExecute:
 
         await node.execute(state)
 
-        # Verify LLM was called with messages that include intent history
+        # Intent history is volatile, so it rides in the human message after the stable system prompt
         call_args = mock_llm.ainvoke.call_args[0][0]
-        system_msg = call_args[0].content
-        assert "意图历史" in system_msg
-        assert "商品推荐" in system_msg
+        system_msg, human_msg = call_args[0].content, call_args[-1].content
+        assert "最近的意图历史" not in system_msg
+        assert "最近的意图历史" in human_msg
+        assert "商品推荐" in human_msg
+        assert human_msg.endswith("我想继续刚才的话题")
 
     @pytest.mark.asyncio
     async def test_execute_uses_basic_prompt_when_no_history(self):
@@ -280,8 +302,7 @@ class TestIntentRecognitionNodeExecute:
         await node.execute(state)
 
         call_args = mock_llm.ainvoke.call_args[0][0]
-        system_msg = call_args[0].content
-        assert "最近的意图历史" not in system_msg
+        assert all("最近的意图历史" not in message.content for message in call_args)
 
     @pytest.mark.asyncio
     async def test_attachment_shortcut_appends_to_history(self):
@@ -400,3 +421,68 @@ class TestIntentRecognitionNodeExecute:
         assert len(result["intent_history"]) == 1
         assert result["intent_history"][0]["intent"] == "问答"
 
+    @pytest.mark.asyncio
+    async def test_repeated_prompt_is_served_from_response_cache(self):
+        mock_llm = self._make_mock_llm("订单查询")
+        first = await IntentRecognitionNode(llm=mock_llm).execute(self._make_state(message="帮我看看这个东西"))
+        second = await IntentRecognitionNode(llm=mock_llm).execute(self._make_state(message="帮我看看这个东西"))
+
+        assert first["intent"] == second["intent"] == "订单查询"
+        assert mock_llm.ainvoke.await_count == 1
+        assert _response_cache_mod.get_llm_response_cache().hit_rate("intent") == 0.5
+
+    @pytest.mark.asyncio
+    async def test_failed_classification_is_not_cached(self):
+        failing_llm = AsyncMock()
+        failing_llm.ainvoke.side_effect = Exception("LLM error")
+        await IntentRecognitionNode(llm=failing_llm).execute(self._make_state(message="帮我看看这个东西"))
+
+        mock_llm = self._make_mock_llm("订单查询")
+        result = await IntentRecognitionNode(llm=mock_llm).execute(self._make_state(message="帮我看看这个东西"))
+
+        assert result["intent"] == "订单查询"
+        assert mock_llm.ainvoke.await_count == 1
+
+
+    @pytest.mark.asyncio
+    async def test_confident_local_classifier_skips_llm(self):
+        mock_llm = self._make_mock_llm("问答")
+        node = IntentRecognitionNode(llm=mock_llm, runtime=_ClassifierRuntime("订单查询", 0.97))
+
+        result = await node.execute(self._make_state(message="东西寄出来没"))
+
+        assert result["intent"] == "订单查询"
+        assert result["confidence"] == 0.97
+        mock_llm.ainvoke.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_low_confidence_classifier_falls_back_to_llm(self):
+        mock_llm = self._make_mock_llm("订单查询")
+        node = IntentRecognitionNode(llm=mock_llm, runtime=_ClassifierRuntime("问答", 0.4))
+
+        result = await node.execute(self._make_state(message="东西寄出来没"))
+
+        assert result["intent"] == "订单查询"
+        assert mock_llm.ainvoke.await_count == 1
+
+
+class _ClassifierRuntime:
+    """Minimal runtime exposing default labels/rules plus a fixed classifier prediction."""
+
+    def __init__(self, intent, confidence):
+        self._prediction = types.SimpleNamespace(intent=intent, confidence=confidence)
+
+    def get_intent_classifier(self):
+        return types.SimpleNamespace(predict=lambda message: self._prediction)
+
+    def get_intent_labels(self):
+        return list(_constants_mod.DEFAULT_INTENT_LABELS)
+
+    def get_intent_rules(self):
+        return dict(_constants_mod.DEFAULT_INTENT_RULES)
+
+    def get_intent_examples(self):
+        return []
+
+    def get_prompt(self, prompt_name, default=None):
+        return default
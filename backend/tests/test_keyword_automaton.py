@@ -0,0 +1,106 @@
+"""
+Unit tests for keyword_automaton.py — Aho-Corasick matching, rule priority
+parity with the old substring scans, regex cues, capability hits and the
+per-pack / per-turn reuse of compiled matchers.
+"""
+import importlib
+import os
+import sys
+import types
+
+# Load ai_module/core as an isolated package so the relative imports resolve
+# without pulling in the whole runtime stack.
+_core = types.ModuleType("_keyword_core")
+_core.__path__ = [os.path.join(os.path.dirname(__file__), "..", "ai_module", "core")]
+sys.modules.setdefault("_keyword_core", _core)
+
+_mod = importlib.import_module("_keyword_core.keyword_automaton")
+_registry = importlib.import_module("_keyword_core.capability_registry")
+_constants = importlib.import_module("_keyword_core.constants")
+
+KeywordMatcher = _mod.KeywordMatcher
+
+
+def _default_matcher():
+    return KeywordMatcher.from_business_config(
+        {intent: list(keywords) for intent, keywords in _constants.DEFAULT_INTENT_RULES.items()}
+    )
+
+
+def test_automaton_reports_overlapping_matches():
+    automaton = _mod.AhoCorasick(["he", "she", "his", "hers"])
+    found = sorted((end, automaton.patterns[pattern_id]) for end, pattern_id in automaton.iter_matches("ushers"))
+    assert found == [(4, "he"), (4, "she"), (6, "hers")]
+
+
+def test_rule_match_keeps_legacy_priority():
+    matcher = _default_matcher()
+
+    assert matcher.scan("你好！").rule_match() == ("问答", 0.99, _mod.CUE_SMALLTALK)
+    assert matcher.scan("帮我看看毕设选什么").rule_match()[:2] == ("推荐", 0.98)
+    assert matcher.scan("我要一个 Java 项目").rule_match()[:2] == ("推荐", 0.95)
+    # 多个意图命中时按规则字典顺序取第一个，关键词按配置顺序
+    assert matcher.scan("订单还没发货我要退款").rule_match() == ("售后服务", 0.95, "退款")
+    assert matcher.scan("今天天气怎么样").rule_match() is None
+
+
+def test_project_cues_follow_regex_semantics():
+    matcher = _default_matcher()
+
+    seeking = matcher.scan("要个项目")
+    assert _mod.CUE_PROJECT_SEEKING in seeking.cues
+    assert _mod.CUE_PROJECT_WANTED not in seeking.cues
+    assert _mod.CUE_PROJECT_WANTED in matcher.scan("想要 Vue 源码").cues
+    assert _mod.CUE_PROJECT_SEEKING not in matcher.scan("项目要怎么部署").cues
+    assert _mod.CUE_PROJECT_SEEKING not in matcher.scan("我要\n项目").cues
+
+
+def test_business_signal_ignores_qa_keywords_but_counts_capabilities():
+    rules = {"问答": ["怎么"], "订单查询": ["订单"]}
+    matcher = KeywordMatcher.from_business_config(rules)
+
+    assert matcher.scan("这个怎么用").has_business_signal is False
+    assert matcher.scan("我的订单呢").has_business_signal is True
+    assert matcher.scan("能开发票吗").has_business_signal is True
+    assert matcher.scan("能开发票吗").capability_hits == {"invoice_service": ("发票",)}
+
+
+def test_find_unsupported_capability_uses_compiled_specs():
+    config = {
+        "capability_registry": [
+            {"key": "gift_card", "label": "礼品卡", "keywords": ["礼品卡", "购物卡"], "enabled_by_default": False}
+        ]
+    }
+    matcher = _mod.matcher_for_config(config)
+
+    assert _mod.matcher_for_config(config) is matcher
+    match = _registry.find_unsupported_capability("我有一张礼品卡", config=config, matcher=matcher)
+    assert match["key"] == "gift_card"
+    assert match["matched_keywords"] == ["礼品卡"]
+    assert _registry.find_unsupported_capability("我有一张礼品卡") is None
+
+
+def test_features_are_memoized_per_message():
+    matcher = _default_matcher()
+
+    first = matcher.features("  帮我查订单 ")
+    assert matcher.features("帮我查订单") is first
+    assert matcher.scan("帮我查订单") is not first
+
+
+def test_runtime_matcher_resolution():
+    class _StubRuntime:
+        business_pack = types.SimpleNamespace(config={})
+
+        def get_intent_rules(self):
+            return {"订单查询": ["快递"]}
+
+    stub = _StubRuntime()
+    matcher = _mod.get_keyword_matcher(stub)
+    assert _mod.get_keyword_matcher(stub) is matcher
+    assert _mod.turn_features("快递到哪了", runtime=stub).rule_match()[0] == "订单查询"
+
+    compiled = _default_matcher()
+    runtime = types.SimpleNamespace(get_keyword_matcher=lambda: compiled)
+    assert _mod.get_keyword_matcher(runtime) is compiled
+    assert _mod.get_keyword_matcher() is _mod.get_keyword_matcher()
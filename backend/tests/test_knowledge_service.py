@@ -11,16 +11,19 @@ import pytest
 
 _backend_dir = os.path.join(os.path.dirname(__file__), "..")
 
-for pkg in ["backend", "backend.services", "services"]:
+for pkg in ["backend", "backend.services"]:
     if pkg not in sys.modules:
         sys.modules[pkg] = types.ModuleType(pkg)
 
-_config_path = os.path.join(_backend_dir, "config.py")
-_config_spec = importlib.util.spec_from_file_location("backend.config", _config_path)
-_config_mod = importlib.util.module_from_spec(_config_spec)
-sys.modules["backend.config"] = _config_mod
-sys.modules["config"] = _config_mod
-_config_spec.loader.exec_module(_config_mod)
+# The real ``services`` package only exports lazily; a bare stub would hide
+# its submodules from test modules collected after this one
+import services  # noqa: E402,F401
+
+# Use the real config package: swapping in the bare config.py would hide
+# ``config.loader`` from modules imported later in the same session
+import config as _config_mod  # noqa: E402
+
+sys.modules.setdefault("backend.config", _config_mod)
 
 _kr_stub = types.ModuleType("backend.services.knowledge_retriever")
 _kr_stub.knowledge_retriever = SimpleNamespace(
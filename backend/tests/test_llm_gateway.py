@@ -0,0 +1,200 @@
+"""
+Unit tests for services/llm_gateway.py — retries on transient errors only,
+hedged requests, circuit breaking, concurrency limits and the model proxy.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "llm_gateway",
+    os.path.join(os.path.dirname(__file__), "..", "services", "llm_gateway.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+LLMGateway = _mod.LLMGateway
+RetryPolicy = _mod.RetryPolicy
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class _FakeModel:
+    def __init__(self, outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+        self.bound = None
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        delay = outcome[1] if isinstance(outcome, tuple) else self.delay
+        outcome = outcome[0] if isinstance(outcome, tuple) else outcome
+        await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    async def astream(self, input, config=None, **kwargs):
+        outcome = self.outcomes.pop(0) if self.outcomes else ["a", "b"]
+        self.calls += 1
+        for item in outcome:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def bind_tools(self, tools, **kwargs):
+        bound = _FakeModel(self.outcomes)
+        bound.bound = tools
+        return bound
+
+
+def _gateway(**kwargs):
+    kwargs.setdefault("retry", RetryPolicy(max_retries=2, base_delay=0.0, max_delay=0.0))
+    kwargs.setdefault("hedge_roles", ())
+    return LLMGateway(**kwargs)
+
+
+def test_retryable_error_classification():
+    assert _mod.is_retryable_error(asyncio.TimeoutError())
+    assert _mod.is_retryable_error(_StatusError(429))
+    assert _mod.is_retryable_error(_StatusError(503))
+    assert not _mod.is_retryable_error(_StatusError(400))
+    assert not _mod.is_retryable_error(ValueError("bad output"))
+    assert _mod.parse_role_limits("intent=8, chat=x,,summary=2") == {"intent": 8, "summary": 2}
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_and_client_errors_are_not():
+    gateway = _gateway()
+    model = _FakeModel([_StatusError(502), asyncio.TimeoutError(), "done"])
+    wrapped = gateway.wrap(model, provider="deepseek", role="chat")
+    assert await wrapped.ainvoke([]) == "done"
+    assert model.calls == 3
+
+    model = _FakeModel([_StatusError(400), "never"])
+    wrapped = gateway.wrap(model, provider="deepseek", role="chat")
+    with pytest.raises(_StatusError):
+        await wrapped.ainvoke([])
+    assert model.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_returns_first_success_and_cancels_the_other():
+    gateway = _gateway(hedge_roles=("intent",), hedge_delay=0.02)
+    model = _FakeModel([("slow", 0.5), ("fast", 0.0)])
+    wrapped = gateway.wrap(model, provider="deepseek", role="intent")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert await wrapped.ainvoke([]) == "fast"
+    assert loop.time() - started < 0.3
+    assert model.calls == 2
+    assert _mod.LLM_GATEWAY_EVENTS.value(provider="deepseek", role="intent", event="hedge_won") >= 1
+
+
+@pytest.mark.asyncio
+async def test_fast_responses_do_not_hedge():
+    gateway = _gateway(hedge_roles=("intent",), hedge_delay=0.2)
+    model = _FakeModel(["quick"])
+    assert await gateway.wrap(model, provider="deepseek", role="intent").ainvoke([]) == "quick"
+    assert model.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_rejects_fast_and_recovers_after_probe():
+    now = [0.0]
+    gateway = _gateway(
+        retry=RetryPolicy(max_retries=0),
+        failure_threshold=2,
+        recovery_timeout=10.0,
+        clock=lambda: now[0],
+    )
+    model = _FakeModel([_StatusError(503), _StatusError(503)])
+    wrapped = gateway.wrap(model, provider="openai", role="chat")
+    for _ in range(2):
+        with pytest.raises(_StatusError):
+            await wrapped.ainvoke([])
+
+    assert gateway.breaker("openai").state == "open"
+    with pytest.raises(_mod.LLMUnavailableError):
+        await wrapped.ainvoke([])
+    assert model.calls == 2
+
+    now[0] = 11.0
+    assert gateway.breaker("openai").state == "half_open"
+    model.outcomes = ["recovered"]
+    assert await wrapped.ainvoke([]) == "recovered"
+    assert gateway.breaker("openai").state == "closed"
+
+
+def test_half_open_breaker_admits_a_single_probe():
+    now = [0.0]
+    breaker = _mod.CircuitBreaker(failure_threshold=1, recovery_timeout=5.0, clock=lambda: now[0])
+    assert breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 6.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.record_failure()
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_role_concurrency_limits_in_flight_calls():
+    gateway = _gateway(role_concurrency={"summary": 2})
+    in_flight = 0
+    peak = 0
+
+    async def call():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return "ok"
+
+    await asyncio.gather(*(gateway.call(call, provider="deepseek", role="summary") for _ in range(6)))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_retries_only_before_first_chunk():
+    gateway = _gateway()
+    model = _FakeModel([[_StatusError(502)], ["x", "y"]])
+    wrapped = gateway.wrap(model, provider="deepseek", role="chat")
+    assert [chunk async for chunk in wrapped.astream([])] == ["x", "y"]
+    assert model.calls == 2
+
+    model = _FakeModel([["x", _StatusError(502)], ["never"]])
+    wrapped = gateway.wrap(model, provider="deepseek", role="chat")
+    received = []
+    with pytest.raises(_StatusError):
+        async for chunk in wrapped.astream([]):
+            received.append(chunk)
+    assert received == ["x"]
+    assert model.calls == 1
+
+
+def test_bind_tools_keeps_the_gateway_and_passes_attributes_through():
+    gateway = _gateway()
+    model = _FakeModel([])
+    model.model_name = "deepseek-chat"
+    wrapped = gateway.wrap(model, provider="DeepSeek", role="chat")
+
+    bound = wrapped.bind_tools(["search_projects"])
+    assert isinstance(bound, _mod.GatewayChatModel)
+    assert bound.model.bound == ["search_projects"]
+    assert (bound.provider, bound.role) == ("deepseek", "chat")
+    assert wrapped.model_name == "deepseek-chat"
+    assert gateway.wrap(wrapped, provider="x", role="y") is wrapped
+    assert gateway.client_kwargs("anthropic") == {}
@@ -0,0 +1,138 @@
+"""
+Unit tests for llm_response_cache.py — key normalization, local and shared
+tiers, LRU eviction, tokens-saved accounting and what is never cached.
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_here = os.path.dirname(__file__)
+
+
+def _load(name, relative_path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_here, "..", *relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_mod = _load("llm_response_cache", ("services", "llm_response_cache.py"))
+MemoryCache = _load("redis_cache_for_llm_cache", ("services", "redis_cache.py")).MemoryCache
+
+messages_mod = pytest.importorskip("langchain_core.messages")
+AIMessage = messages_mod.AIMessage
+HumanMessage = messages_mod.HumanMessage
+SystemMessage = messages_mod.SystemMessage
+
+
+class _FakeLLM:
+    def __init__(self, content="推荐", model_name="deepseek-chat", temperature=0.0, tool_calls=None):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.content = content
+        self.tool_calls = tool_calls or []
+        self.calls = 0
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        return AIMessage(
+            content=self.content,
+            tool_calls=self.tool_calls,
+            usage_metadata={"input_tokens": 90, "output_tokens": 10, "total_tokens": 100},
+        )
+
+
+PROMPT = [SystemMessage(content="只输出一个意图标签"), HumanMessage(content="推荐几个 Java 项目")]
+
+
+def test_key_ignores_whitespace_but_not_model_or_params():
+    llm = _FakeLLM()
+    base = _mod.make_cache_key("intent", llm, PROMPT)
+    spaced = [SystemMessage(content="只输出一个意图标签\n"), HumanMessage(content="推荐几个  Java 项目")]
+
+    assert _mod.make_cache_key("intent", llm, spaced) == base
+    assert _mod.make_cache_key("intent", _FakeLLM(temperature=0.7), PROMPT) != base
+    assert _mod.make_cache_key("intent", _FakeLLM(model_name="qwen"), PROMPT) != base
+    assert _mod.make_cache_key("intent", llm, PROMPT, {"stop": ["\n"]}) != base
+    assert _mod.make_cache_key("rerank", llm, PROMPT) != base
+
+
+@pytest.mark.asyncio
+async def test_repeated_prompt_hits_local_tier_and_counts_tokens_saved():
+    cache = _mod.LLMResponseCache(backend=MemoryCache())
+    llm = _FakeLLM()
+    cached_llm = _mod.CachedChatModel(llm, cache, "intent")
+
+    first = await cached_llm.ainvoke(PROMPT)
+    second = await cached_llm.ainvoke(PROMPT)
+
+    assert first.content == second.content == "推荐"
+    assert second.response_metadata["cache"] == "hit"
+    assert llm.calls == 1
+    assert cache.stats["intent"]["local_hit"] == 1
+    assert cache.tokens_saved("intent") == 100
+    assert cache.hit_rate("intent") == 0.5
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_serves_other_workers():
+    backend = MemoryCache()
+    llm = _FakeLLM()
+    await _mod.CachedChatModel(llm, _mod.LLMResponseCache(backend=backend), "query_rewrite").ainvoke(PROMPT)
+
+    other = _mod.LLMResponseCache(backend=backend)
+    response = await _mod.CachedChatModel(llm, other, "query_rewrite").ainvoke(PROMPT)
+
+    assert response.content == "推荐"
+    assert llm.calls == 1
+    assert other.stats["query_rewrite"] == {"shared_hit": 1, "tokens_saved": 100}
+
+
+@pytest.mark.asyncio
+async def test_tool_call_and_empty_responses_are_not_cached():
+    cache = _mod.LLMResponseCache(backend=MemoryCache())
+    tool_llm = _FakeLLM(content="", tool_calls=[{"name": "search_projects", "args": {}, "id": "c1"}])
+    for _ in range(2):
+        await _mod.CachedChatModel(tool_llm, cache, "chat").ainvoke(PROMPT)
+
+    assert tool_llm.calls == 2
+    assert len(cache.local) == 0
+
+
+def test_local_tier_evicts_least_recently_used():
+    tier = _mod.LocalLRUCache(max_entries=2)
+    tier.set("a", 1, 60)
+    tier.set("b", 2, 60)
+    assert tier.get("a") == 1
+    tier.set("c", 3, 60)
+
+    assert tier.get("b") is None
+    assert tier.get("a") == 1 and tier.get("c") == 3
+
+
+def test_disabled_cache_returns_model_unchanged(monkeypatch):
+    llm = _FakeLLM()
+    monkeypatch.setattr(_mod, "_llm_response_cache", _mod.LLMResponseCache(enabled=False))
+    assert _mod.with_response_cache(llm, "intent") is llm
+    assert _mod.with_response_cache(None, "intent") is None
+
+
+@pytest.mark.asyncio
+async def test_config_is_only_forwarded_when_given():
+    class _PlainLLM:
+        def __init__(self):
+            self.inputs = []
+
+        async def ainvoke(self, input):
+            self.inputs.append(input)
+            return AIMessage(content="好的")
+
+    llm = _PlainLLM()
+    cached_llm = _mod.CachedChatModel(llm, _mod.LLMResponseCache(backend=MemoryCache()), "out_of_scope")
+
+    assert (await cached_llm.ainvoke(PROMPT)).content == "好的"
+    assert (await cached_llm.ainvoke(PROMPT)).content == "好的"
+    assert len(llm.inputs) == 1
@@ -0,0 +1,175 @@
+"""
+Unit tests for long_term_memory.py — per-user memory index, relevance
+retrieval within a token budget, locked concurrent writes, stored term
+counts, and the memory-aware prompt window.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import types
+from unittest.mock import MagicMock
+
+import pytest
+
+_backend_dir = os.path.join(os.path.dirname(__file__), "..")
+
+for pkg in ["backend", "backend.ai_module", "backend.ai_module.core"]:
+    if pkg not in sys.modules:
+        sys.modules[pkg] = types.ModuleType(pkg)
+
+
+def _load(name, *parts, package=None):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_backend_dir, *parts))
+    module = importlib.util.module_from_spec(spec)
+    if package:
+        module.__package__ = package
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+if "backend.ai_module.core.summarizer" not in sys.modules:
+    _load("backend.ai_module.core.summarizer", "ai_module", "core", "summarizer.py", package="backend.ai_module.core")
+_ltm_mod = _load(
+    "backend.ai_module.core.long_term_memory",
+    "ai_module", "core", "long_term_memory.py",
+    package="backend.ai_module.core",
+)
+_builder_mod = _load("backend.ai_module.core.memory_builder", "ai_module", "core", "memory_builder.py")
+_cache_mod = _load("redis_cache_for_memory", "services", "redis_cache.py")
+
+LongTermMemoryIndex = _ltm_mod.LongTermMemoryIndex
+history_source_ref = _ltm_mod.history_source_ref
+tokenize_for_memory = _ltm_mod.tokenize_for_memory
+MemoryContextBuilder = _builder_mod.MemoryContextBuilder
+MemoryCache = _cache_mod.MemoryCache
+
+
+@pytest.fixture
+def memory_index():
+    return LongTermMemoryIndex(cache=MemoryCache(), max_records=50)
+
+
+def test_tokenize_mixes_cjk_bigrams_and_identifiers():
+    terms = tokenize_for_memory("订单ORD2024001退款")
+
+    assert "订单" in terms
+    assert "退款" in terms
+    assert "ord2024001" in terms
+
+
+@pytest.mark.asyncio
+async def test_recalls_order_number_from_many_turns_ago(memory_index):
+    await memory_index.add_turn("u1", "s1", "我的订单号是ORD2024001，帮我看看", "好的，订单 ORD2024001 已发货")
+    for index in range(20):
+        await memory_index.add_turn("u1", "s1", f"推荐一个 Python 项目 {index}", f"推荐项目 {index}")
+
+    memories = await memory_index.retrieve("u1", "ORD2024001 什么时候到", token_budget=200, top_k=3)
+
+    assert memories
+    assert "ORD2024001" in memories[0]["text"]
+
+
+@pytest.mark.asyncio
+async def test_retrieval_respects_token_budget_and_top_k(memory_index):
+    for index in range(10):
+        await memory_index.add_turn("u1", "s1", f"退款问题 {index}", "退款会在三个工作日内到账" * 5)
+
+    memories = await memory_index.retrieve("u1", "退款", token_budget=120, top_k=5)
+
+    assert 0 < len(memories) <= 5
+    assert sum(memory["tokens"] for memory in memories) <= 120
+
+
+@pytest.mark.asyncio
+async def test_memories_are_shared_across_sessions_but_not_users(memory_index):
+    await memory_index.add_turn("u1", "s1", "我喜欢 Django 框架", "好的，已记住")
+
+    assert await memory_index.retrieve("u1", "Django 项目推荐")
+    assert await memory_index.retrieve("u2", "Django 项目推荐") == []
+
+
+@pytest.mark.asyncio
+async def test_excluded_refs_are_skipped(memory_index):
+    turn = {"user": "订单 ORD9 有问题", "assistant": "请描述问题"}
+    await memory_index.add_turn("u1", "s1", turn["user"], turn["assistant"])
+
+    memories = await memory_index.retrieve("u1", "ORD9", exclude_refs=[history_source_ref("s1", turn)])
+
+    assert memories == []
+
+
+@pytest.mark.asyncio
+async def test_session_summary_is_replaced(memory_index):
+    await memory_index.add_summary("u1", "s1", "用户想买毕业设计")
+    await memory_index.add_summary("u1", "s1", "用户已下单毕业设计")
+
+    records = await memory_index.load("u1")
+
+    assert [record.text for record in records] == ["会话摘要：用户已下单毕业设计"]
+
+
+class _SlowReadCache(MemoryCache):
+    """Yields between reading and writing the index, as a remote round trip would."""
+
+    async def get_payload(self, key):
+        payload = await super().get_payload(key)
+        await asyncio.sleep(0.01)
+        return payload
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sessions_of_one_user_keep_every_memory():
+    memory_index = LongTermMemoryIndex(cache=_SlowReadCache())
+
+    await asyncio.gather(
+        *(memory_index.add_turn("u1", f"s{index}", f"订单ORD00{index}怎么样了", "已发货") for index in range(4))
+    )
+
+    records = await memory_index.load("u1")
+    assert sorted(record.session_id for record in records) == ["s0", "s1", "s2", "s3"]
+
+
+@pytest.mark.asyncio
+async def test_term_counts_are_stored_with_each_record(memory_index, monkeypatch):
+    await memory_index.add_turn("u1", "s1", "订单ORD2024001还没到", "正在派送")
+    stored = await memory_index.cache.get_payload(memory_index._key("u1"))
+    assert stored[0]["terms"]["ord2024001"] == 1
+
+    calls = []
+    original = _ltm_mod.tokenize_for_memory
+    monkeypatch.setattr(_ltm_mod, "tokenize_for_memory", lambda text: calls.append(text) or original(text))
+    memories = await memory_index.retrieve("u1", "ORD2024001")
+
+    assert memories and calls == ["ORD2024001"]
+
+
+@pytest.mark.asyncio
+async def test_embeddings_are_blended_with_lexical_score():
+    embeddings = MagicMock()
+    embeddings.embed_documents.side_effect = lambda texts: [[1.0, 0.0] if "猫" in t else [0.0, 1.0] for t in texts]
+    embeddings.embed_query.return_value = [1.0, 0.0]
+    memory_index = LongTermMemoryIndex(cache=MemoryCache(), embeddings=embeddings)
+
+    await memory_index.add_turn("u1", "s1", "我养了一只猫", "好的")
+    await memory_index.add_turn("u1", "s1", "今天天气不错", "是的")
+
+    memories = await memory_index.retrieve("u1", "宠物", top_k=1)
+
+    assert "猫" in memories[0]["text"]
+
+
+def test_memory_builder_shrinks_recent_window_when_memories_retrieved():
+    builder = MemoryContextBuilder(recent_turn_limit=6, memory_recent_turns=2)
+    state = {
+        "conversation_history": [{"user": f"user-{i}", "assistant": f"assistant-{i}"} for i in range(6)],
+        "retrieved_memories": [{"text": "用户：订单号 ORD1\n助手：已记录"}],
+    }
+
+    result = builder.build_short_term_memory_text(state, include_task_snapshot=False)
+
+    assert "user-3" not in result
+    assert "user-5" in result
+    assert "相关历史记忆：" in result
+    assert "ORD1" in result
@@ -1,6 +1,10 @@
-﻿import pytest
+﻿import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
 
 from ai_module.core.constants import DEFAULT_INTENT_RULES
+from ai_module.core.nodes.understanding import message_entry_node as entry_module
 from ai_module.core.nodes.understanding.message_entry_node import MessageEntryNode
 
 
@@ -314,3 +318,46 @@ class TestMessageEntryNode:
         assert result["intent"] is None
         assert result["response_mode"] == "answer_then_resume"
         assert result["continue_previous_task"] is False
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("merged, expected_calls", [(True, 1), (False, 2)])
+    async def test_inflow_turn_understanding_and_classification_share_one_llm_call(
+        self, monkeypatch, merged, expected_calls
+    ):
+        monkeypatch.setattr(entry_module.settings, "TURN_MERGED_UNDERSTANDING_ENABLED", merged, raising=False)
+        response = MagicMock()
+        response.content = json.dumps(
+            {
+                "dialogue_act": "new_request",
+                "inflow_type": "related_question",
+                "domain_intent": "推荐",
+                "global_intent": "推荐",
+                "global_intent_confidence": 0.8,
+                "self_contained_request": False,
+                "continue_previous_task": True,
+                "need_clarification": False,
+                "confidence": 0.82,
+                "slot_updates": {},
+            },
+            ensure_ascii=False,
+        )
+        llm = AsyncMock()
+        llm.ainvoke.return_value = response
+        node = MessageEntryNode(llm=llm)
+        state = _make_state(
+            "还有吗",
+            last_intent="推荐",
+            active_task={"intent": "推荐", "status": "awaiting_user"},
+            pending_action="select_recommended_item",
+            pending_question="这些里你更喜欢哪一个？",
+            conversation_history=[
+                {"user": "帮我推荐几个 Java 项目", "assistant": "我先给你 3 个方向。"}
+            ],
+        )
+
+        result = await node.execute(state)
+
+        assert llm.ainvoke.await_count == expected_calls
+        assert result["inflow_type"] == "related_question"
+        assert result["intent"] == "推荐"
+        assert result["continue_previous_task"] is True
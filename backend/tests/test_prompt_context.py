@@ -0,0 +1,147 @@
+"""
+Unit tests for prompt_context.py — per-turn section memoization, section
+token budgets and per-consumer prompt metrics.
+"""
+import importlib.util
+import os
+import sys
+import types
+from unittest.mock import MagicMock
+
+_backend_dir = os.path.join(os.path.dirname(__file__), "..")
+
+for pkg in ["backend", "backend.ai_module", "backend.ai_module.core"]:
+    if pkg not in sys.modules:
+        sys.modules[pkg] = types.ModuleType(pkg)
+
+
+def _load(name, *parts, package=None):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_backend_dir, *parts))
+    module = importlib.util.module_from_spec(spec)
+    if package:
+        module.__package__ = package
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+if "backend.ai_module.core.summarizer" not in sys.modules:
+    _load("backend.ai_module.core.summarizer", "ai_module", "core", "summarizer.py", package="backend.ai_module.core")
+if "backend.ai_module.core.memory_builder" not in sys.modules:
+    _load("backend.ai_module.core.memory_builder", "ai_module", "core", "memory_builder.py")
+_mod = _load(
+    "backend.ai_module.core.prompt_context",
+    "ai_module", "core", "prompt_context.py",
+    package="backend.ai_module.core",
+)
+
+PromptContextAssembler = _mod.PromptContextAssembler
+finalize_prompt_context = _mod.finalize_prompt_context
+parse_section_budgets = _mod.parse_section_budgets
+truncate_to_tokens = _mod.truncate_to_tokens
+
+
+def _state(**overrides):
+    state = {
+        "conversation_history": [{"user": f"user-{i}", "assistant": f"assistant-{i}"} for i in range(6)],
+        "conversation_summary": "",
+        "retrieved_memories": None,
+        "retrieved_docs": [],
+        "attachments": [],
+    }
+    state.update(overrides)
+    return state
+
+
+def test_parse_section_budgets_overrides_defaults_and_skips_invalid():
+    budgets = parse_section_budgets("docs=100, summary=abc,memories=50")
+
+    assert budgets["docs"] == 100
+    assert budgets["memories"] == 50
+    assert budgets["summary"] == _mod.DEFAULT_SECTION_BUDGETS["summary"]
+
+
+def test_truncate_to_tokens_respects_budget():
+    text = "退款会在三个工作日内到账" * 20
+
+    truncated = truncate_to_tokens(text, 10)
+
+    assert truncated.endswith("…")
+    assert _mod.estimate_tokens(truncated[:-1]) <= 10
+
+
+def test_sections_are_rendered_once_per_turn_and_shared_by_consumers():
+    loader = MagicMock(return_value="附件正文")
+    assembler = PromptContextAssembler(attachment_loader=loader)
+    state = _state(attachments=[{"file_path": "/tmp/a.pdf", "file_name": "a.pdf"}])
+
+    first = assembler.attachments(state, consumer="qa")
+    second = assembler.attachments(state, consumer="topic_advisor")
+
+    assert first == second
+    assert "附件正文" in first
+    loader.assert_called_once_with("/tmp/a.pdf")
+
+
+def test_replaced_docs_invalidate_cached_section():
+    assembler = PromptContextAssembler()
+    state = _state(retrieved_docs=[{"content": "旧文档"}])
+    assert "旧文档" in assembler.docs(state)
+
+    state["retrieved_docs"] = [{"content": "新文档"}]
+
+    assert "新文档" in assembler.docs(state)
+
+
+def test_docs_are_trimmed_to_section_budget():
+    assembler = PromptContextAssembler(budgets={"docs": 30})
+    state = _state(retrieved_docs=[{"content": "知识库内容" * 40} for _ in range(3)])
+
+    docs = assembler.docs(state, consumer="qa")
+
+    assert _mod.estimate_tokens(docs) <= 32
+    assert "文档2" not in docs
+
+
+def test_recent_turns_follow_window_and_history_budget():
+    assembler = PromptContextAssembler(budgets={"recent_history": 10})
+    state = _state()
+
+    turns = assembler.recent_turns(state, 3, consumer="function_calling")
+
+    assert 0 < len(turns) < 3
+    assert turns[-1]["user"] == "user-5"
+
+
+def test_metrics_record_tokens_per_section_and_consumer():
+    assembler = PromptContextAssembler()
+    state = _state(conversation_summary="用户之前咨询了退款")
+
+    assembler.short_term_memory(state, consumer="clarify")
+    assembler.summary(state, consumer="qa")
+
+    metrics = state["prompt_metrics"]
+    assert set(metrics["calls"]) == {"clarify", "qa"}
+    assert metrics["calls"]["clarify"]["recent_history"] > 0
+    assert metrics["calls"]["qa"]["summary"] == metrics["sections"]["summary"] > 0
+
+
+def test_short_term_memory_includes_relevant_memories():
+    assembler = PromptContextAssembler()
+    state = _state(retrieved_memories=[{"text": "用户：订单号 ORD1\n助手：已记录", "tokens": 10}])
+
+    text = assembler.short_term_memory(state, include_task_snapshot=False)
+
+    assert "相关历史记忆：" in text
+    assert "ORD1" in text
+
+
+def test_finalize_releases_memo_and_keeps_metrics():
+    assembler = PromptContextAssembler()
+    state = _state()
+    assembler.recent_history_text(state, 2, consumer="topic_advisor")
+
+    finalize_prompt_context(state)
+
+    assert PromptContextAssembler.STATE_KEY not in state
+    assert state["prompt_metrics"]["calls"]["topic_advisor"]
@@ -27,13 +27,11 @@ for pkg in [
     if pkg not in sys.modules:
         sys.modules[pkg] = types.ModuleType(pkg)
 
-# Stub config
-_config_path = os.path.join(_backend_dir, "config.py")
-_config_spec = importlib.util.spec_from_file_location("backend.config", _config_path)
-_config_mod = importlib.util.module_from_spec(_config_spec)
-sys.modules["backend.config"] = _config_mod
-sys.modules["config"] = _config_mod
-_config_spec.loader.exec_module(_config_mod)
+# Use the real config package: swapping in the bare config.py would hide
+# ``config.loader`` from modules imported later in the same session
+import config as _config_mod  # noqa: E402
+
+sys.modules.setdefault("backend.config", _config_mod)
 
 # Stub knowledge_retriever
 _kr_mod = types.ModuleType("services.knowledge_retriever")
@@ -121,9 +119,10 @@ class TestQANodeSummaryInjection:
 
         messages = await node._prepare_messages(state)
 
-        system_content = messages[0].content
-        assert "对话历史摘要" in system_content
-        assert summary_text in system_content
+        system_content, human_content = messages[0].content, messages[-1].content
+        assert "对话历史摘要" not in system_content
+        assert "对话历史摘要" in human_content
+        assert summary_text in human_content
 
     @pytest.mark.asyncio
     async def test_no_summary_section_when_empty(self):
@@ -133,8 +132,7 @@ class TestQANodeSummaryInjection:
 
         messages = await node._prepare_messages(state)
 
-        system_content = messages[0].content
-        assert "对话历史摘要" not in system_content
+        assert all("对话历史摘要" not in message.content for message in messages)
 
     @pytest.mark.asyncio
     async def test_no_summary_section_when_missing(self):
@@ -145,8 +143,7 @@ class TestQANodeSummaryInjection:
 
         messages = await node._prepare_messages(state)
 
-        system_content = messages[0].content
-        assert "对话历史摘要" not in system_content
+        assert all("对话历史摘要" not in message.content for message in messages)
 
     @pytest.mark.asyncio
     async def test_chitchat_skips_rag_prompt(self):
@@ -156,8 +153,7 @@ class TestQANodeSummaryInjection:
 
         messages = await node._prepare_messages(state)
 
-        system_content = messages[0].content
-        assert "对话历史摘要" not in system_content
+        assert all("对话历史摘要" not in message.content for message in messages)
 
     @pytest.mark.asyncio
     async def test_short_reply_with_continuation_uses_rag_prompt(self):
@@ -172,7 +168,30 @@ class TestQANodeSummaryInjection:
 
         messages = await node._prepare_messages(state)
 
-        system_content = messages[0].content
-        assert "对话历史摘要" in system_content
+        assert "对话历史摘要" in messages[-1].content
         _mock_retriever.retrieve.assert_awaited()
 
+
+
+class TestQANodeSpeculativeCandidates:
+    @pytest.mark.asyncio
+    async def test_prefetched_candidates_are_rewritten_and_reranked_after_routing(self):
+        """Prefetch only recalls candidates; the claimant hands them to the full retrieval."""
+        node = QANode(llm=MagicMock())
+        service_mod = sys.modules[type(node.service).__module__]
+        speculation = sys.modules[service_mod.claim_prefetched.__module__]
+        candidates = [("doc", 0.9)]
+        prefetcher = speculation.SpeculativePrefetcher()
+
+        async def fetch(query):
+            return candidates
+
+        prefetcher.register(speculation.PREFETCH_KNOWLEDGE_DOCS, lambda state: state["user_message"], fetch)
+        state = _make_state()
+        prefetcher.start(state)
+        _mock_retriever.retrieve.reset_mock()
+
+        await node._prepare_messages(state)
+
+        assert _mock_retriever.retrieve.await_args.kwargs["candidates"] is candidates
+        assert prefetcher.stats[speculation.PREFETCH_KNOWLEDGE_DOCS]["hits"] == 1
@@ -1,6 +1,7 @@
 ﻿"""
 Unit tests for redis_cache.py — verifying intent_history and conversation_summary
-support in get_context and update_context methods.
+support in get_context and update_context methods, and expiring, copied
+structured payloads in the in-memory fallback.
 """
 import sys
 import os
@@ -200,3 +201,33 @@ async def test_update_context_all_fields_together(cache: MemoryCache):
     assert ctx["conversation_summary"] == summary
     assert ctx["updated_at"] is not None
 
+
+
+# ── structured payloads ───────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_payloads_are_copied_and_expire(cache: MemoryCache, monkeypatch):
+    value = {"items": [1]}
+    await cache.set_payload("p1", value, expire=10)
+    value["items"].append(2)
+
+    stored = await cache.get_payload("p1")
+    stored["items"].append(3)
+    assert await cache.get_payload("p1") == {"items": [1]}
+
+    now = _mod.time.monotonic()
+    monkeypatch.setattr(_mod.time, "monotonic", lambda: now + 11)
+    assert await cache.get_payload("p1") is None
+    assert "p1" not in cache._payloads
+
+
+@pytest.mark.asyncio
+async def test_payload_entries_are_capped_oldest_first():
+    cache = MemoryCache(max_payload_entries=2)
+    for key in ("a", "b", "c"):
+        await cache.set_payload(key, key)
+
+    assert await cache.get_payload("a") is None
+    assert [await cache.get_payload(key) for key in ("b", "c")] == ["b", "c"]
+    await cache.delete("b")
+    assert await cache.get_payload("b") is None
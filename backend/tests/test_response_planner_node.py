@@ -219,3 +219,26 @@ class TestResponsePlannerNode:
         assert "更自然示例" in prompt_text
         assert "不要直接写“我们先说回刚才的项目选择”" in prompt_text
 
+
+    @pytest.mark.asyncio
+    async def test_conversation_control_out_of_scope_reply_is_served_from_response_cache(self):
+        llm = _CapturingLLM("西藏风景很好。说回刚才的订单问题，您要查哪一单？")
+        calls = []
+        original = llm.ainvoke
+
+        async def counting_ainvoke(messages):
+            calls.append(messages)
+            return await original(messages)
+
+        llm.ainvoke = counting_ainvoke
+        node = ConversationControlNode(llm=llm)
+
+        first = await node.execute(
+            _make_state(active_flow="订单查询", response_mode="answer_then_resume", user_message="西藏去过吗")
+        )
+        second = await node.execute(
+            _make_state(active_flow="订单查询", response_mode="answer_then_resume", user_message="西藏去过吗")
+        )
+
+        assert first["response"] == second["response"] == "西藏风景很好。说回刚才的订单问题，您要查哪一单？"
+        assert len(calls) == 1
@@ -1,5 +1,12 @@
+import asyncio
+import threading
+import types
+
+import pytest
+
+from ai_module.core import runtime as runtime_module
 from ai_module.core.constants import INTENT_CART_QUERY, INTENT_ORDER_QUERY
-from ai_module.core.runtime import BusinessPack
+from ai_module.core.runtime import AIRuntimeFactory, BusinessPack
 
 
 def test_business_pack_merges_default_intent_labels_and_rules():
@@ -21,3 +28,72 @@ def test_business_pack_merges_default_intent_labels_and_rules():
     assert INTENT_CART_QUERY in labels
     assert "购物车" in rules[INTENT_CART_QUERY]
     assert "查订单" in rules[INTENT_ORDER_QUERY]
+
+
+def test_business_pack_is_an_immutable_snapshot():
+    config = {"intent_classifier": {"rules": {INTENT_ORDER_QUERY: ["查订单"]}}, "intent_handlers": {"问答": "faq"}}
+    pack = BusinessPack("demo", config)
+    config["intent_classifier"]["rules"][INTENT_ORDER_QUERY].append("物流单号")
+
+    rules = pack.get_intent_rules()
+    assert rules is pack.get_intent_rules()
+    assert "物流单号" not in rules[INTENT_ORDER_QUERY]
+    with pytest.raises(TypeError):
+        rules[INTENT_ORDER_QUERY] = ()
+    assert pack.get_handler_for_intent("问答") == "faq"
+    assert pack.get_handler_for_intent("不存在的意图") == "clarify"
+
+    builds = []
+    first = pack.get_compiled("prompt", lambda: builds.append(1) or object())
+    assert pack.get_compiled("prompt", lambda: builds.append(1) or object()) is first
+    assert builds == [1]
+
+
+@pytest.mark.asyncio
+async def test_factory_reload_swaps_runtime_and_waits_for_inflight_turns(monkeypatch):
+    configs = {"demo": {"business_name": "旧配置"}}
+    monkeypatch.setattr(runtime_module, "config_loader", types.SimpleNamespace(get_config=configs.get))
+    monkeypatch.setattr(AIRuntimeFactory, "_create_adapter", lambda self, business_id, config: None)
+    monkeypatch.setattr(AIRuntimeFactory, "_build_workflow", lambda self, runtime: types.SimpleNamespace(runtime=runtime))
+
+    factory = AIRuntimeFactory()
+    old_workflow = factory.get_workflow("demo")
+    old_runtime = old_workflow.runtime
+
+    configs["demo"] = {"business_name": "新配置"}
+    with old_runtime.track_turn():
+        reload_task = asyncio.create_task(factory.reload("demo", drain_timeout=5))
+        while factory.get_runtime("demo") is old_runtime:
+            await asyncio.sleep(0.01)
+        new_workflow = factory.get_workflow("demo")
+        assert new_workflow is not old_workflow
+        assert new_workflow.runtime.business_pack.business_name == "新配置"
+        assert factory.get_runtime("demo") is new_workflow.runtime
+        assert not reload_task.done()
+    assert await reload_task is True
+
+    del configs["demo"]
+    assert await factory.reload("demo") is True
+    with pytest.raises(ValueError):
+        factory.get_runtime("demo")
+
+
+@pytest.mark.asyncio
+async def test_factory_reload_builds_the_workflow_off_the_event_loop(monkeypatch):
+    configs = {"demo": {"business_name": "旧配置"}}
+    build_threads = []
+
+    def build_workflow(self, runtime):
+        build_threads.append(threading.current_thread())
+        return types.SimpleNamespace(runtime=runtime)
+
+    monkeypatch.setattr(runtime_module, "config_loader", types.SimpleNamespace(get_config=configs.get))
+    monkeypatch.setattr(AIRuntimeFactory, "_create_adapter", lambda self, business_id, config: None)
+    monkeypatch.setattr(AIRuntimeFactory, "_build_workflow", build_workflow)
+
+    factory = AIRuntimeFactory()
+    factory.get_workflow("demo")
+    assert await factory.reload("demo") is True
+
+    assert build_threads[0] is threading.main_thread()
+    assert build_threads[1] is not threading.main_thread()
@@ -124,6 +124,7 @@ async def test_saves_message_and_intent_history():
         session_id="test-session",
         user_message="hello",
         assistant_message="hi there",
+        tokens=_summarizer_mod.estimate_entry_tokens("hello", "hi there"),
     )
     mock_cache.update_context.assert_awaited_once_with(
         session_id="test-session",
@@ -0,0 +1,134 @@
+"""
+Unit tests for shared_cache.py — namespaced local and shared tiers, TTL and
+size limits, single-flight loading, local-only namespaces and skipping the
+shared tier when the backend is not actually shared.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_here = os.path.dirname(__file__)
+
+
+def _load(name, relative_path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_here, "..", *relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_mod = _load("shared_cache", ("services", "shared_cache.py"))
+MemoryCache = _load("redis_cache_for_shared_cache", ("services", "redis_cache.py")).MemoryCache
+
+SharedCache = _mod.SharedCache
+
+
+class _Loader:
+    def __init__(self, result=None, delay=0.0, error=None):
+        self.calls = 0
+        self.result = result
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result if self.result is not None else {"n": self.calls}
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_serves_other_workers_under_namespace_prefix():
+    backend = MemoryCache()
+    worker_a = SharedCache(backend).namespace("smart_questions", ttl_seconds=60)
+    worker_b = SharedCache(backend).namespace("smart_questions", ttl_seconds=60)
+    loader = _Loader()
+
+    assert await worker_a.get_or_load("u1:abc", loader) == {"n": 1}
+    value, result = await worker_b.get_or_load_with_status("u1:abc", loader)
+
+    assert value == {"n": 1} and result == _mod.RESULT_SHARED_HIT
+    assert loader.calls == 1
+    assert await backend.get_payload("cache:smart_questions:u1:abc") == {"n": 1}
+    assert (await worker_b.lookup("u1:abc"))[1] == _mod.RESULT_LOCAL_HIT
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_load_once():
+    namespace = SharedCache(MemoryCache()).namespace("image_analysis", ttl_seconds=60)
+    loader = _Loader(delay=0.02)
+
+    results = await asyncio.gather(*(namespace.get_or_load("f1", loader) for _ in range(5)))
+
+    assert loader.calls == 1
+    assert all(result == {"n": 1} for result in results)
+    assert namespace.stats == {"miss": 1, "coalesced": 4}
+
+
+@pytest.mark.asyncio
+async def test_loader_errors_reach_waiters_and_are_not_cached():
+    namespace = SharedCache(MemoryCache()).namespace("flaky")
+    loader = _Loader(delay=0.01, error=RuntimeError("boom"))
+
+    results = await asyncio.gather(*(namespace.get_or_load("k", loader) for _ in range(3)), return_exceptions=True)
+
+    assert loader.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert await namespace.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_returned_values_are_copies_and_uncacheable_results_skip_storage():
+    namespace = SharedCache(MemoryCache(), shared_tier=False).namespace("copies")
+    first = await namespace.get_or_load("k", _Loader(result={"items": [1]}))
+    first["items"].append(2)
+    assert await namespace.get("k") == {"items": [1]}
+
+    empty = _Loader(result=[])
+    await namespace.get_or_load("empty", empty, cacheable=bool)
+    await namespace.get_or_load("empty", empty, cacheable=bool)
+    assert empty.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_is_skipped_when_backend_is_not_shared():
+    # Mirrors ``redis_cache`` before Redis connects: writes would only land in process memory
+    backend = MemoryCache()
+    backend.shared = False
+    namespace = SharedCache(backend).namespace("offline", ttl_seconds=60)
+
+    await namespace.set("k", {"v": 1})
+
+    assert await namespace.get("k") == {"v": 1}
+    assert await backend.get_payload(namespace.shared_key("k")) is None
+    backend.shared = True
+    await namespace.set("k", {"v": 2})
+    assert await backend.get_payload(namespace.shared_key("k")) == {"v": 2}
+
+
+def test_local_only_namespace_is_bounded_and_synchronous():
+    namespace = _mod.CacheNamespace("runtime_models", local_only=True, max_local_entries=2)
+    built = []
+
+    def factory(name):
+        return lambda: built.append(name) or object()
+
+    model = namespace.get_or_create(("chat", ()), factory("chat"))
+    assert namespace.get_or_create(("chat", ()), factory("chat")) is model
+    namespace.get_or_create(("intent", ()), factory("intent"))
+    namespace.get_or_create(("rerank", ()), factory("rerank"))
+
+    assert built == ["chat", "intent", "rerank"]
+    assert len(namespace.local) == 2
+    assert namespace.get_or_create(("chat", ()), factory("chat")) is not model
+
+
+def test_namespaces_are_registered_once():
+    cache = SharedCache(MemoryCache())
+    assert cache.namespace("a", ttl_seconds=5) is cache.namespace("a")
+    assert cache.namespace("a") is not cache.namespace("b")
@@ -0,0 +1,118 @@
+"""
+Unit tests for single_flight.py — in-process coalescing of identical
+concurrent calls, shared failures, and cross-worker coalescing through the
+Redis lock (simulated with two flights over one in-memory backend).
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_here = os.path.dirname(__file__)
+
+
+def _load(name, relative_path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_here, "..", *relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_mod = _load("single_flight", ("services", "single_flight.py"))
+MemoryCache = _load("redis_cache_for_single_flight", ("services", "redis_cache.py")).MemoryCache
+
+SingleFlight = _mod.SingleFlight
+
+
+class _Op:
+    def __init__(self, delay=0.02, error=None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"product": "p1", "call": self.calls}
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_execution():
+    flight = SingleFlight("get_product")
+    op, other = _Op(), _Op()
+
+    results = await asyncio.gather(*(flight.do("p1", op) for _ in range(6)), flight.do("p2", other))
+
+    assert (op.calls, other.calls) == (1, 1)
+    assert results[:6] == [{"product": "p1", "call": 1}] * 6
+    assert flight.stats == {"leader": 2, "coalesced": 5}
+    assert flight.deduplicated() == 5
+    assert not flight.inflight("p1")
+
+
+@pytest.mark.asyncio
+async def test_failures_are_shared_but_not_remembered():
+    flight = SingleFlight("retrieve")
+    failing = _Op(error=RuntimeError("vector store down"))
+
+    results = await asyncio.gather(*(flight.do("q", failing) for _ in range(3)), return_exceptions=True)
+    assert failing.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    assert (await flight.do("q", _Op(delay=0)))["call"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_over_to_waiter():
+    flight = SingleFlight("tool_result")
+    op = _Op(delay=0.05)
+
+    leader = asyncio.create_task(flight.do("k", op))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(flight.do("k", op))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert (await follower)["call"] == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_distributed_follower_reuses_other_workers_result():
+    backend = MemoryCache()
+    worker_a = SingleFlight("get_product", backend=backend, distributed=True, poll_interval=0.005)
+    worker_b = SingleFlight("get_product", backend=backend, distributed=True, poll_interval=0.005)
+    op_a, op_b = _Op(delay=0.05), _Op(delay=0)
+
+    task_a = asyncio.create_task(worker_a.do_with_status("p1", op_a))
+    await asyncio.sleep(0.01)
+    value_b, result_b = await worker_b.do_with_status("p1", op_b)
+    value_a, result_a = await task_a
+
+    assert (result_a, result_b) == (_mod.RESULT_LEADER, _mod.RESULT_REMOTE)
+    assert value_b == value_a
+    assert op_b.calls == 0
+    assert await backend.get(worker_a._lock_key("p1")) is None
+
+
+@pytest.mark.asyncio
+async def test_distributed_follower_falls_back_when_leader_fails():
+    backend = MemoryCache()
+    worker_a = SingleFlight("retrieve", backend=backend, distributed=True, poll_interval=0.005)
+    worker_b = SingleFlight("retrieve", backend=backend, distributed=True, poll_interval=0.005)
+
+    task_a = asyncio.create_task(worker_a.do("q", _Op(delay=0.03, error=RuntimeError("boom"))))
+    await asyncio.sleep(0.01)
+    op_b = _Op(delay=0)
+    value, result = await worker_b.do_with_status("q", op_b)
+
+    assert result == _mod.RESULT_FALLBACK
+    assert op_b.calls == 1 and value["call"] == 1
+    with pytest.raises(RuntimeError):
+        await task_a
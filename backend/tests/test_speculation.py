@@ -0,0 +1,150 @@
+"""
+Unit tests for speculation.py — speculative prefetch during intent
+preparation, claim/fallback semantics and hit/waste accounting, including
+the exported ai_speculative_prefetch_total counter.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "speculation",
+    os.path.join(os.path.dirname(__file__), "..", "ai_module", "core", "speculation.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+SpeculativePrefetcher = _mod.SpeculativePrefetcher
+claim_prefetched = _mod.claim_prefetched
+finalize_speculation = _mod.finalize_speculation
+
+
+def _prefetcher(fetch, predictor=lambda state: state.get("user_message")):
+    prefetcher = SpeculativePrefetcher()
+    prefetcher.register("docs", predictor, fetch)
+    return prefetcher
+
+
+@pytest.mark.asyncio
+async def test_claimed_prefetch_is_a_hit():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        return [f"doc:{key}"]
+
+    prefetcher = _prefetcher(fetch)
+    state = {"user_message": "怎么退款？"}
+    prefetcher.start(state)
+
+    result = await claim_prefetched(state, "docs", "怎么退款？")
+    finalize_speculation(state)
+
+    assert result == ["doc:怎么退款？"]
+    assert calls == ["怎么退款？"]
+    assert prefetcher.stats["docs"] == {"started": 1, "hits": 1, "wasted": 0, "failed": 0}
+    assert "_speculation" not in state
+
+
+@pytest.mark.asyncio
+async def test_results_are_exported_as_a_counter():
+    async def fetch(key):
+        return key
+
+    counter = _mod.SPECULATIVE_PREFETCHES
+    before = {result: counter.value(kind="docs", result=result) for result in ("started", "hit", "wasted")}
+    prefetcher = _prefetcher(fetch)
+
+    claimed = {"user_message": "怎么退款？"}
+    prefetcher.start(claimed)
+    await claim_prefetched(claimed, "docs", "怎么退款？")
+    finalize_speculation(claimed)
+    unclaimed = {"user_message": "发货了吗？"}
+    prefetcher.start(unclaimed)
+    finalize_speculation(unclaimed)
+
+    assert counter.value(kind="docs", result="started") - before["started"] == 2
+    assert counter.value(kind="docs", result="hit") - before["hit"] == 1
+    assert counter.value(kind="docs", result="wasted") - before["wasted"] == 1
+    assert "ai_speculative_prefetch_total" in sys.modules["services.telemetry"].render_metrics()
+
+
+@pytest.mark.asyncio
+async def test_unclaimed_prefetch_is_cancelled_and_counted_as_waste():
+    started = asyncio.Event()
+
+    async def fetch(key):
+        started.set()
+        await asyncio.sleep(10)
+
+    prefetcher = _prefetcher(fetch)
+    state = {"user_message": "这个项目用什么技术？"}
+    prefetcher.start(state)
+    await started.wait()
+    task = state["_speculation"].items["docs"].task
+
+    finalize_speculation(state)
+    await asyncio.sleep(0)
+
+    assert task.cancelled()
+    assert prefetcher.stats["docs"]["wasted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_key_mismatch_falls_back_to_caller():
+    async def fetch(key):
+        return ["stale"]
+
+    prefetcher = _prefetcher(fetch)
+    state = {"user_message": "旧问题"}
+    prefetcher.start(state)
+
+    assert await claim_prefetched(state, "docs", "新问题") is None
+    finalize_speculation(state)
+    assert prefetcher.stats["docs"]["wasted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_prefetch_returns_none_and_counts_failure():
+    async def fetch(key):
+        raise RuntimeError("vector store down")
+
+    prefetcher = _prefetcher(fetch)
+    state = {"user_message": "怎么开发票？"}
+    prefetcher.start(state)
+
+    assert await claim_prefetched(state, "docs", "怎么开发票？") is None
+    assert prefetcher.stats["docs"]["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_predictor_none_skips_prefetch():
+    async def fetch(key):
+        raise AssertionError("should not run")
+
+    prefetcher = _prefetcher(fetch, predictor=lambda state: None)
+    state = {"user_message": "你好"}
+    prefetcher.start(state)
+
+    assert await claim_prefetched(state, "docs", "你好") is None
+    assert prefetcher.stats["docs"]["started"] == 0
+
+
+@pytest.mark.asyncio
+async def test_claim_without_speculation_is_noop():
+    assert await claim_prefetched({}, "docs", "x") is None
+
+
+def test_default_predictors_pick_retrieval_or_orders():
+    assert _mod._predict_knowledge_docs({"user_message": "毕业设计支持哪些技术栈？"})
+    assert _mod._predict_knowledge_docs({"user_message": "你好"}) is None
+    assert _mod._predict_knowledge_docs({"user_message": "我的订单发货了吗？"}) is None
+    assert _mod._predict_order_list({"user_message": "我的订单发货了吗？", "user_id": "u1"}) == ("u1", "list")
+    assert _mod._predict_order_list(
+        {"user_message": "订单ORD20240101123000ABC123到哪了", "user_id": "u1"}
+    ) == ("u1", "detail")
+    assert _mod._predict_order_list({"user_message": "推荐一个项目", "user_id": "u1"}) is None
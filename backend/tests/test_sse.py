@@ -0,0 +1,181 @@
+"""
+Unit tests for api/sse.py — content coalescing, ordering of control events,
+heartbeats, backpressure from a slow ASGI send and client disconnects.
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("starlette")
+
+_spec = importlib.util.spec_from_file_location(
+    "sse_under_test",
+    os.path.join(os.path.dirname(__file__), "..", "api", "sse.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+SSEWriter = _mod.SSEWriter
+
+
+class _Sink:
+    def __init__(self, delay=0.0):
+        self.bodies = []
+        self.delay = delay
+
+    async def __call__(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.bodies.append(message["body"])
+
+    def events(self):
+        raw = b"".join(self.bodies).decode("utf-8")
+        return [json.loads(block[6:]) for block in raw.split("\n\n") if block.startswith("data: ")]
+
+
+@pytest.mark.asyncio
+async def test_content_deltas_are_coalesced_into_few_writes():
+    sink = _Sink()
+    async with SSEWriter(sink, flush_interval=0.05) as writer:
+        await writer.send_event({"type": "start"})
+        for char in "这是一个逐字生成的回答" * 20:
+            await writer.send_event({"type": "content", "delta": char})
+        await writer.send_event({"type": "end", "status": "success"})
+
+    events = sink.events()
+    assert [event["type"] for event in events] == ["start", "content", "end"]
+    assert events[1]["delta"] == "这是一个逐字生成的回答" * 20
+    assert len(sink.bodies) == 2
+    assert writer.stats["events"] == 222
+
+
+@pytest.mark.asyncio
+async def test_flush_window_sends_pending_content_without_new_events():
+    sink = _Sink()
+    async with SSEWriter(sink, flush_interval=0.01) as writer:
+        await writer.send_event({"type": "content", "delta": "首个"})
+        await asyncio.sleep(0.05)
+        assert sink.events() == [{"type": "content", "delta": "首个"}]
+
+
+@pytest.mark.asyncio
+async def test_byte_window_flushes_immediately():
+    sink = _Sink()
+    async with SSEWriter(sink, flush_interval=10, flush_bytes=8) as writer:
+        await writer.send_event({"type": "content", "delta": "abc"})
+        assert sink.bodies == []
+        await writer.send_event({"type": "content", "delta": "defgh"})
+        assert sink.events() == [{"type": "content", "delta": "abcdefgh"}]
+
+
+@pytest.mark.asyncio
+async def test_events_with_extra_fields_are_not_merged():
+    sink = _Sink()
+    async with SSEWriter(sink) as writer:
+        await writer.send_event({"type": "content", "delta": "a"})
+        await writer.send_event({"type": "content", "delta": "b", "final": True})
+
+    assert sink.events() == [
+        {"type": "content", "delta": "a"},
+        {"type": "content", "delta": "b", "final": True},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_is_sent_when_idle():
+    sink = _Sink()
+    async with SSEWriter(sink, heartbeat_interval=0.02) as writer:
+        await asyncio.sleep(0.07)
+
+    assert _mod.HEARTBEAT in sink.bodies
+    assert writer.stats["heartbeats"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_slow_client_throttles_producer():
+    sink = _Sink(delay=0.05)
+    async with SSEWriter(sink, flush_interval=10, flush_bytes=4) as writer:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(4):
+            await writer.send_event({"type": "content", "delta": "abcd"})
+        elapsed = loop.time() - started
+
+    assert elapsed >= 0.15
+    assert len(sink.bodies) == 4
+
+
+@pytest.mark.asyncio
+async def test_write_failure_surfaces_to_producer():
+    async def broken_send(message):
+        raise ConnectionResetError("client gone")
+
+    with pytest.raises(ConnectionResetError):
+        async with SSEWriter(broken_send, flush_interval=0.0) as writer:
+            await writer.send_event({"type": "content", "delta": "x"})
+            await asyncio.sleep(0.02)
+            await writer.send_event({"type": "content", "delta": "y"})
+
+
+def _receive_disconnect_after(delay):
+    async def receive():
+        if delay is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(delay)
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_handler_and_counts_abandoned_stream():
+    sink_messages = []
+    cleanup = []
+
+    async def send(message):
+        sink_messages.append(message)
+
+    async def handler(send_event):
+        await send_event({"type": "start"})
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cleanup.append("cancelled")
+            raise
+
+    path = "/api/chat/stream-disconnect-test"
+    response = _mod.SSEResponse(handler)
+    await asyncio.wait_for(response({"type": "http", "path": path}, _receive_disconnect_after(0.02), send), timeout=1)
+
+    assert cleanup == ["cancelled"]
+    assert _mod.STREAM_ABANDONED.value(path=path) == 1
+    assert not any(message.get("more_body") is False for message in sink_messages)
+
+
+@pytest.mark.asyncio
+async def test_completed_handler_closes_body_normally():
+    sink_messages = []
+
+    async def send(message):
+        sink_messages.append(message)
+
+    async def handler(send_event):
+        await send_event({"type": "end", "status": "success"})
+
+    await _mod.SSEResponse(handler)({"type": "http", "path": "/x"}, _receive_disconnect_after(None), send)
+
+    assert sink_messages[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+@pytest.mark.asyncio
+async def test_handler_errors_still_propagate():
+    async def handler(send_event):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await _mod.run_until_disconnect(handler(None), _receive_disconnect_after(None))
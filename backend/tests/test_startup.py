@@ -0,0 +1,148 @@
+"""
+Unit tests for services/startup.py — lazy singletons that never block the
+event loop, background subsystem initialization with readiness gating, and
+the startup profile report.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import threading
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "startup",
+    os.path.join(os.path.dirname(__file__), "..", "services", "startup.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+
+class _Heavy:
+    built = 0
+
+    def __init__(self):
+        type(self).built += 1
+        self.value = 42
+
+    def ping(self):
+        return "pong"
+
+
+def test_lazy_proxy_defers_construction_and_builds_once():
+    _Heavy.built = 0
+    proxy = _mod.LazyProxy(_Heavy, "heavy")
+    assert not proxy.initialized
+    assert _Heavy.built == 0
+
+    threads = [threading.Thread(target=proxy.ping) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert _Heavy.built == 1
+    assert proxy.initialized
+    assert proxy.value == 42
+    proxy.value = 7
+    assert _mod.resolve_lazy(proxy).value == 7
+    assert _mod.resolve_lazy("plain") == "plain"
+
+
+@pytest.mark.asyncio
+async def test_event_loop_access_fails_fast_while_another_thread_builds():
+    started, release = threading.Event(), threading.Event()
+
+    class _Slow(_Heavy):
+        def __init__(self):
+            started.set()
+            release.wait(5)
+            super().__init__()
+
+    proxy = _mod.LazyProxy(_Slow, "slow")
+    builder = threading.Thread(target=proxy.resolve)
+    builder.start()
+    started.wait(5)
+
+    with pytest.raises(_mod.ProxyInitializing):
+        proxy.ping()
+    waiting = asyncio.ensure_future(_mod.aresolve_lazy(proxy))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    release.set()
+    assert (await waiting).ping() == "pong"
+    builder.join()
+    assert await _mod.aresolve_lazy("plain") == "plain"
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_gates_readiness_on_critical_subsystems():
+    release = threading.Event()
+    calls = []
+
+    def build_index():
+        release.wait(timeout=5)
+        calls.append("index")
+
+    async def warm_connections():
+        calls.append("connections")
+        raise ConnectionError("provider unreachable")
+
+    startup = _mod.StartupOrchestrator(_mod.StartupProfile())
+    startup.register("index", build_index)
+    startup.register("connections", warm_connections, critical=False)
+    assert not startup.ready
+
+    await startup.start()
+    await asyncio.sleep(0.05)
+    assert not startup.ready
+    assert startup.readiness()["pending"] == ["index"]
+
+    release.set()
+    assert await startup.wait(timeout=5) is True
+    assert sorted(calls) == ["connections", "index"]
+    assert startup.statuses["connections"].state == _mod.FAILED
+    assert startup.readiness()["failed"] == []
+    await startup.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_dependency_skips_dependents_and_blocks_readiness():
+    ran = []
+
+    def broken():
+        raise RuntimeError("index corrupted")
+
+    startup = _mod.StartupOrchestrator()
+    startup.register("workflow", broken)
+    startup.register("warm", lambda: ran.append("warm"), critical=False, after=("workflow",))
+
+    await startup.start()
+    assert await startup.wait(timeout=5) is False
+    assert ran == []
+    assert startup.statuses["warm"].state == _mod.SKIPPED
+    assert startup.readiness()["failed"] == ["workflow"]
+    with pytest.raises(ValueError):
+        startup.register("workflow", broken)
+    await startup.stop()
+
+
+@pytest.mark.asyncio
+async def test_profile_reports_imports_and_subsystem_timings():
+    profile = _mod.StartupProfile()
+    with profile.importing("json_tool"):
+        import json.tool  # noqa: F401
+
+    startup = _mod.StartupOrchestrator(profile)
+    startup.register("quick", lambda: None)
+    await startup.start()
+    await startup.wait(timeout=5)
+
+    report = profile.report()
+    assert "json_tool" in report["imports"]
+    assert report["subsystems"]["quick"]["state"] == _mod.READY
+    assert "quick" in profile.format()
+    await startup.stop()
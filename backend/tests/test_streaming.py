@@ -0,0 +1,82 @@
+"""
+Unit tests for streaming.py — forwarding astream deltas as they arrive,
+holding back text once tool calls start, and stream event wrapping.
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "streaming",
+    os.path.join(os.path.dirname(__file__), "..", "ai_module", "core", "streaming.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+messages_mod = pytest.importorskip("langchain_core.messages")
+AIMessageChunk = messages_mod.AIMessageChunk
+
+
+class _StreamingLLM:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.yielded = 0
+
+    async def astream(self, messages):
+        for chunk in self.chunks:
+            self.yielded += 1
+            yield chunk
+
+
+async def _collect(llm):
+    deltas, final = [], None
+    async for delta, message in _mod.astream_message(llm, []):
+        if delta is not None:
+            deltas.append((delta, llm.yielded))
+        else:
+            final = message
+    return deltas, final
+
+
+@pytest.mark.asyncio
+async def test_text_deltas_are_forwarded_before_generation_finishes():
+    llm = _StreamingLLM([AIMessageChunk(content="推荐"), AIMessageChunk(content="这个"), AIMessageChunk(content="项目")])
+
+    deltas, final = await _collect(llm)
+
+    assert deltas == [("推荐", 1), ("这个", 2), ("项目", 3)]
+    assert final.content == "推荐这个项目"
+    assert not final.tool_calls
+    assert type(final).__name__ == "AIMessage"
+
+
+@pytest.mark.asyncio
+async def test_tool_call_chunks_stop_forwarding_and_are_merged():
+    llm = _StreamingLLM(
+        [
+            AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": "search_projects", "args": '{"keyword"', "id": "call_1", "index": 0}],
+            ),
+            AIMessageChunk(content="x", tool_call_chunks=[{"name": None, "args": ': "Java"}', "id": None, "index": 0}]),
+        ]
+    )
+
+    deltas, final = await _collect(llm)
+
+    assert deltas == []
+    assert final.tool_calls[0]["name"] == "search_projects"
+    assert final.tool_calls[0]["args"] == {"keyword": "Java"}
+
+
+def test_stream_events_wrap_text_and_pass_through_progress():
+    assert _mod.as_stream_event("你好") == {"type": "content", "delta": "你好"}
+    progress = _mod.progress_event("正在搜索项目: Java...")
+    assert _mod.as_stream_event(progress) == {"type": "thinking", "content": "正在搜索项目: Java..."}
+
+
+def test_chunk_text_handles_content_parts():
+    assert _mod.chunk_text(AIMessageChunk(content=[{"type": "text", "text": "a"}, "b"])) == "ab"
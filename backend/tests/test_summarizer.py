@@ -48,6 +48,8 @@ ConversationSummarizer = _summarizer_mod.ConversationSummarizer
 estimate_tokens = _summarizer_mod.estimate_tokens
 estimate_history_tokens = _summarizer_mod.estimate_history_tokens
 _format_history_for_summary = _summarizer_mod._format_history_for_summary
+history_token_prefix_sums = _summarizer_mod.history_token_prefix_sums
+trim_history_to_budget = _summarizer_mod.trim_history_to_budget
 
 
 # ── Helpers ──────────────────────────────────────────────────────────
@@ -109,6 +111,60 @@ class TestEstimateHistoryTokens:
         assert estimate_history_tokens(history) == total
 
 
+    def test_uses_stored_token_count(self):
+        history = [{"user": "你好", "assistant": "你好！", "tokens": 42}]
+        assert estimate_history_tokens(history) == 42
+
+
+# ── prefix sums / budget trimming tests ──────────────────────────────
+
+class TestTrimHistoryToBudget:
+    def test_prefix_sums(self):
+        history = [{"tokens": 3}, {"tokens": 5}, {"user": "四个汉字", "assistant": ""}]
+        assert history_token_prefix_sums(history) == [0, 3, 8, 10]
+
+    def test_within_budget_keeps_everything(self):
+        history = _make_history(5)
+        assert trim_history_to_budget(history, estimate_history_tokens(history)) == history
+
+    def test_drops_oldest_until_within_budget(self):
+        history = [{"tokens": 10, "user": str(i)} for i in range(6)]
+
+        trimmed = trim_history_to_budget(history, 35)
+
+        assert [m["user"] for m in trimmed] == ["3", "4", "5"]
+
+    def test_matches_one_by_one_trimming(self):
+        history = [{"tokens": (i * 7) % 11 + 1} for i in range(50)]
+        for budget in range(0, 400, 13):
+            expected = list(history)
+            while expected and estimate_history_tokens(expected) > budget:
+                expected = expected[1:]
+            assert trim_history_to_budget(history, budget) == expected
+
+    def test_negative_budget_drops_everything(self):
+        assert trim_history_to_budget(_make_history(3), -5) == []
+
+
+# ── pluggable estimator tests ────────────────────────────────────────
+
+class TestTokenEstimator:
+    def test_custom_estimator_is_used(self):
+        class WordEstimator:
+            name = "words"
+
+            def count(self, text):
+                return len(text.split())
+
+        _summarizer_mod.set_token_estimator(WordEstimator())
+        try:
+            assert estimate_tokens("one two three") == 3
+        finally:
+            _summarizer_mod.set_token_estimator(None)
+
+        assert estimate_tokens("hello world") == 5
+
+
 # ── _format_history_for_summary tests ────────────────────────────────
 
 class TestFormatHistoryForSummary:
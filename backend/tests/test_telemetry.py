@@ -0,0 +1,155 @@
+"""
+Unit tests for telemetry.py — stage spans, trace attributes from the bound
+conversation state, Prometheus text exposition and provider prefix-cache
+token accounting.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "telemetry_under_test",
+    os.path.join(os.path.dirname(__file__), "..", "services", "telemetry.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+
+@pytest.fixture
+def telemetry():
+    _mod.STAGE_LATENCY._series.clear()
+    _mod.STAGE_ERRORS._values.clear()
+    _mod.LLM_PROMPT_TOKENS._values.clear()
+    token = _mod.bind_trace_state(None)
+    yield _mod
+    _mod.reset_trace_state(token)
+
+
+def _series(telemetry, stage, name):
+    return {
+        key: value
+        for key, value in telemetry.STAGE_LATENCY.snapshot().items()
+        if key[0] == stage and key[1] == name
+    }
+
+
+def test_span_records_latency_with_state_attributes(telemetry):
+    state = {"business_id": "graduation_project", "intent": None}
+    telemetry.bind_trace_state(state)
+
+    with telemetry.span("IntentRecognitionNode", stage="node") as current:
+        state["intent"] = "商品咨询"
+
+    series = _series(telemetry, "node", "IntentRecognitionNode")
+    assert list(series) == [("node", "IntentRecognitionNode", "graduation_project", "商品咨询")]
+    assert series[next(iter(series))]["count"] == 1
+    assert current.duration >= 0
+
+
+def test_nested_spans_share_trace_id(telemetry):
+    with telemetry.span("turn", stage="turn") as outer:
+        with telemetry.span("retrieve", stage="retrieval") as inner:
+            pass
+
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+
+
+def test_errors_are_counted_and_reraised(telemetry):
+    with pytest.raises(RuntimeError):
+        with telemetry.span("search_products", stage="tool"):
+            raise RuntimeError("boom")
+
+    assert telemetry.STAGE_ERRORS.value(stage="tool", name="search_products", business_id="") == 1
+    assert _series(telemetry, "tool", "search_products")
+
+
+@pytest.mark.asyncio
+async def test_traced_decorator_supports_async_and_sync(telemetry):
+    @telemetry.traced("retrieval", "vector_search")
+    async def vector_search():
+        await asyncio.sleep(0)
+        return ["doc"]
+
+    @telemetry.traced("retrieval", "bm25_search")
+    def bm25_search():
+        return ["doc"]
+
+    assert await vector_search() == ["doc"]
+    assert bm25_search() == ["doc"]
+    assert _series(telemetry, "retrieval", "vector_search")
+    assert _series(telemetry, "retrieval", "bm25_search")
+
+
+def test_metrics_render_prometheus_histogram(telemetry):
+    telemetry.STAGE_LATENCY.observe(0.2, stage="llm", name="qwen", business_id="b1", intent="")
+
+    text = telemetry.render_metrics()
+
+    assert "# TYPE ai_stage_latency_seconds histogram" in text
+    assert 'ai_stage_latency_seconds_bucket{stage="llm",name="qwen",business_id="b1",intent="",le="0.25"} 1' in text
+    assert 'ai_stage_latency_seconds_bucket{stage="llm",name="qwen",business_id="b1",intent="",le="0.1"} 0' in text
+    assert 'ai_stage_latency_seconds_count{stage="llm",name="qwen",business_id="b1",intent=""} 1' in text
+
+
+def test_sampling_does_not_drop_metrics(telemetry, monkeypatch):
+    monkeypatch.setattr(telemetry._config, "sample_rate", 0.0)
+
+    with telemetry.span("qa_flow", stage="workflow") as current:
+        pass
+
+    assert current.sampled is False
+    assert _series(telemetry, "workflow", "qa_flow")
+
+
+def test_llm_callback_records_model_latency(telemetry):
+    callback = telemetry.build_llm_callback()
+    if callback is None:
+        pytest.skip("langchain_core not installed")
+
+    callback.on_chat_model_start({}, [], run_id="r1", invocation_params={"model": "qwen-plus"})
+    callback.on_llm_end(None, run_id="r1")
+
+    assert _series(telemetry, "llm", "qwen-plus")
+
+
+@pytest.mark.parametrize(
+    "llm_output, expected",
+    [
+        ({"token_usage": {"prompt_tokens": 1200, "prompt_cache_hit_tokens": 1024, "prompt_cache_miss_tokens": 176}}, (1024, 176)),
+        ({"token_usage": {"prompt_tokens": 900, "prompt_tokens_details": {"cached_tokens": 768}}}, (768, 132)),
+        ({"token_usage": {"prompt_tokens": 900, "completion_tokens": 20}}, None),
+        (None, None),
+    ],
+)
+def test_prompt_cache_usage_reads_provider_token_usage(telemetry, llm_output, expected):
+    response = type("Result", (), {"llm_output": llm_output, "generations": []})()
+
+    assert telemetry.prompt_cache_usage(response) == expected
+
+
+def test_llm_callback_counts_prompt_cache_tokens(telemetry):
+    callback = telemetry.build_llm_callback()
+    if callback is None:
+        pytest.skip("langchain_core not installed")
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, LLMResult
+
+    message = AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": 500,
+            "output_tokens": 10,
+            "total_tokens": 510,
+            "input_token_details": {"cache_read": 384},
+        },
+    )
+    callback.on_chat_model_start({}, [], run_id="r2", invocation_params={"model": "deepseek-chat"})
+    callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id="r2")
+
+    assert telemetry.LLM_PROMPT_TOKENS.value(model="deepseek-chat", cache="hit") == 384
+    assert telemetry.LLM_PROMPT_TOKENS.value(model="deepseek-chat", cache="miss") == 116
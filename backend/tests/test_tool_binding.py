@@ -0,0 +1,75 @@
+"""
+Unit tests for tool_binding.py — shared tool bindings and per-call
+execution context injection through RunnableConfig.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "tool_binding",
+    os.path.join(os.path.dirname(__file__), "..", "ai_module", "core", "tool_binding.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+build_tool_binding = _mod.build_tool_binding
+execution_context_from_config = _mod.execution_context_from_config
+tool_invocation_config = _mod.tool_invocation_config
+
+
+def _context_tool():
+    from langchain_core.runnables import RunnableConfig
+    from langchain_core.tools import StructuredTool
+
+    async def whoami(config: RunnableConfig, order_no: str = "") -> dict:
+        await asyncio.sleep(0)
+        context = execution_context_from_config(config) or {}
+        return {"user_id": context.get("user_id"), "order_no": order_no}
+
+    return StructuredTool.from_function(coroutine=whoami, name="whoami", description="whoami")
+
+
+def test_binding_binds_llm_once():
+    tool = MagicMock()
+    tool.name = "search_products"
+    llm = MagicMock()
+
+    binding = build_tool_binding([tool], llm)
+
+    llm.bind_tools.assert_called_once_with([tool])
+    assert binding.llm_with_tools is llm.bind_tools.return_value
+    assert binding.tool_map["search_products"] is tool
+    with pytest.raises(TypeError):
+        binding.tool_map["other"] = tool
+
+
+def test_binding_without_llm_or_tools():
+    assert build_tool_binding([], MagicMock()).llm_with_tools is None
+    assert build_tool_binding([MagicMock()], None).llm_with_tools is None
+
+
+def test_config_roundtrip():
+    assert execution_context_from_config(tool_invocation_config({"user_id": "u1"})) == {"user_id": "u1"}
+    assert execution_context_from_config(None) is None
+    assert execution_context_from_config({}) is None
+
+
+@pytest.mark.asyncio
+async def test_shared_tool_receives_context_per_invocation():
+    pytest.importorskip("langchain_core")
+    tool = _context_tool()
+
+    first, second = await asyncio.gather(
+        tool.ainvoke({"order_no": "ORD1"}, config=tool_invocation_config({"user_id": "u1"})),
+        tool.ainvoke({"order_no": "ORD2"}, config=tool_invocation_config({"user_id": "u2"})),
+    )
+
+    assert first == {"user_id": "u1", "order_no": "ORD1"}
+    assert second == {"user_id": "u2", "order_no": "ORD2"}
+    assert "config" not in tool.args
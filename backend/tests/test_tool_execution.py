@@ -0,0 +1,124 @@
+"""
+Unit tests for tool_execution.py — concurrent tool calls with a bounded
+semaphore, per-tool timeouts and deterministic result ordering.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "tool_execution",
+    os.path.join(os.path.dirname(__file__), "..", "ai_module", "core", "tool_execution.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+
+ToolCallExecutor = _mod.ToolCallExecutor
+
+
+class _SleepTool:
+    def __init__(self, name, delay=0.05, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.active = 0
+        self.peak = 0
+        self.configs = []
+        self.cancelled = False
+
+    async def ainvoke(self, args, config=None):
+        self.configs.append(config)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(args.get("delay", self.delay))
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            self.active -= 1
+        if self.error:
+            raise self.error
+        return {"id": args.get("project_id")}
+
+
+def _calls(name, *ids, **extra):
+    return [{"name": name, "args": {"project_id": pid, **extra}, "id": f"call_{pid}"} for pid in ids]
+
+
+@pytest.mark.asyncio
+async def test_independent_calls_run_concurrently():
+    tool = _SleepTool("get_project_detail", delay=0.1)
+    executor = ToolCallExecutor(max_concurrency=4, default_timeout=5)
+
+    started = time.perf_counter()
+    outcomes = await executor.run(_calls("get_project_detail", 1, 2, 3), {tool.name: tool})
+    elapsed = time.perf_counter() - started
+
+    assert [outcome.result for outcome in outcomes] == [{"id": 1}, {"id": 2}, {"id": 3}]
+    assert elapsed < 0.25
+    assert tool.peak == 3
+
+
+@pytest.mark.asyncio
+async def test_results_keep_model_order_regardless_of_completion():
+    tool = _SleepTool("get_project_detail")
+    calls = [
+        {"name": "get_project_detail", "args": {"project_id": 1, "delay": 0.06}, "id": "a"},
+        {"name": "get_project_detail", "args": {"project_id": 2, "delay": 0.0}, "id": "b"},
+        {"name": "get_project_detail", "args": {"project_id": 3, "delay": 0.03}, "id": "c"},
+    ]
+
+    outcomes = await ToolCallExecutor().run(calls, {tool.name: tool})
+
+    assert [outcome.call_id for outcome in outcomes] == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_semaphore_bounds_concurrency():
+    tool = _SleepTool("search_projects", delay=0.02)
+
+    await ToolCallExecutor(max_concurrency=2).run(_calls("search_projects", 1, 2, 3, 4, 5), {tool.name: tool})
+
+    assert tool.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_timeout_cancels_only_the_slow_call():
+    slow = _SleepTool("compare_projects", delay=1.0)
+    fast = _SleepTool("get_project_detail", delay=0.0)
+    executor = ToolCallExecutor(default_timeout=5, timeouts={"compare_projects": 0.05})
+
+    outcomes = await executor.run(
+        _calls("compare_projects", 1) + _calls("get_project_detail", 2),
+        {slow.name: slow, fast.name: fast},
+    )
+
+    assert outcomes[0].outcome == _mod.OUTCOME_TIMEOUT
+    assert "超时" in outcomes[0].error
+    assert slow.cancelled
+    assert outcomes[1].ok and outcomes[1].result == {"id": 2}
+
+
+@pytest.mark.asyncio
+async def test_errors_and_missing_tools_are_reported_per_call():
+    broken = _SleepTool("search_projects", delay=0.0, error=RuntimeError("db down"))
+    calls = _calls("search_projects", 1) + [{"name": "nope", "args": {}}]
+
+    outcomes = await ToolCallExecutor().run(calls, {broken.name: broken}, config={"configurable": {}})
+
+    assert (outcomes[0].outcome, outcomes[0].error) == (_mod.OUTCOME_ERROR, "db down")
+    assert outcomes[1].outcome == _mod.OUTCOME_MISSING
+    assert broken.configs == [{"configurable": {}}]
+
+
+def test_parse_tool_timeouts():
+    assert _mod.parse_tool_timeouts("get_project_detail=5, search_projects=8.5,bad=x,") == {
+        "get_project_detail": 5.0,
+        "search_projects": 8.5,
+    }
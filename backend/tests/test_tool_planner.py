@@ -0,0 +1,84 @@
+"""
+Unit tests for tool_planner.py — slot extraction, rule order, ambiguity
+fallback, per-pack rule configuration and the rules shipped with the
+graduation-marketplace pack.
+"""
+import importlib
+import os
+import sys
+import types
+
+import yaml
+
+# Load ai_module/core as an isolated package so the relative imports resolve
+# without pulling in the whole runtime stack.
+_core = types.ModuleType("_tool_planner_core")
+_core.__path__ = [os.path.join(os.path.dirname(__file__), "..", "ai_module", "core")]
+sys.modules.setdefault("_tool_planner_core", _core)
+
+_mod = importlib.import_module("_tool_planner_core.tool_planner")
+
+ToolPlanner = _mod.ToolPlanner
+
+ALL_TOOLS = {"query_order", "get_logistics", "check_inventory", "search_products"}
+PRODUCT_ID = "3f2b8c1e-9d4a-4b7e-8f10-2a6c5d9e7b31"
+
+
+def test_default_rules_map_slots_to_tool_calls():
+    planner = ToolPlanner.from_business_config({})
+
+    order = planner.plan("订单查询", "订单ORD20240207123456什么状态", ALL_TOOLS)
+    logistics = planner.plan("订单查询", "ORD20240207123456 发货了吗", ALL_TOOLS)
+    stock = planner.plan("商品咨询", f"{PRODUCT_ID.upper()} 还有货吗", ALL_TOOLS)
+    search = planner.plan("商品咨询", "《校园二手交易平台》支持哪些功能", ALL_TOOLS)
+
+    assert order.planned and order.tool_calls[0]["name"] == "query_order"
+    assert order.tool_calls[0]["args"] == {"order_no": "ORD20240207123456"}
+    assert logistics.tool_calls[0]["name"] == "get_logistics"
+    assert stock.tool_calls[0]["args"] == {"product_id": PRODUCT_ID}
+    assert search.tool_calls[0]["args"] == {"keyword": "校园二手交易平台"}
+
+
+def test_missing_ambiguous_and_unmatched_turns_are_left_to_the_llm():
+    planner = ToolPlanner.from_business_config(None)
+
+    assert planner.plan("订单查询", "我的订单怎么还没到", ALL_TOOLS).result == "missing"
+    assert planner.plan("订单查询", "ORD20240207123456 和 ORD20240207999999", ALL_TOOLS).result == "ambiguous"
+    assert planner.plan("订单查询", "ORD20240207123456 ORD20240207123456 查一下", ALL_TOOLS).planned
+    assert planner.plan("售后服务", "ORD20240207123456 想退款", ALL_TOOLS).result == "no_rule"
+
+
+def test_business_pack_rules_replace_defaults_and_respect_enabled_tools():
+    planner = ToolPlanner.from_business_config(
+        {
+            "tool_planner": {
+                "rules": [
+                    {"intent": "订单查询", "tool": "get_logistics", "args": {"order_no": "order_no"}},
+                    {"intent": "订单查询", "tool": "query_order", "args": {"order_no": "order_no"}},
+                    {"intent": "订单查询", "tool": "query_order", "args": {"order_no": "phone_number"}},
+                ]
+            }
+        }
+    )
+
+    assert len(planner.rules) == 2
+    plan = planner.plan("订单查询", "ORD20240207123456", {"query_order"})
+    assert plan.tool_calls[0]["name"] == "query_order"
+
+    disabled = ToolPlanner.from_business_config({"tool_planner": {"enabled": False}})
+    assert not disabled.plan("订单查询", "ORD20240207123456", ALL_TOOLS).planned
+
+
+def test_shipped_pack_routes_logistics_questions_to_get_logistics():
+    path = os.path.join(os.path.dirname(__file__), "..", "config", "businesses", "graduation-marketplace.yaml")
+    with open(path, encoding="utf-8") as handle:
+        config = yaml.safe_load(handle)
+    enabled_tools = {plugin["name"] for plugin in config["plugins"] if plugin.get("enabled")}
+    planner = ToolPlanner.from_business_config(config)
+
+    logistics = planner.plan("订单查询", "ORD20240101001 快递到哪了", enabled_tools)
+    order = planner.plan("订单查询", "ORD20240101001 什么状态", enabled_tools)
+
+    assert logistics.tool_calls[0]["name"] == "get_logistics"
+    assert logistics.tool_calls[0]["args"] == {"order_no": "ORD20240101001"}
+    assert order.tool_calls[0]["name"] == "query_order"
@@ -0,0 +1,207 @@
+"""
+Unit tests for tool_result_cache.py — local and shared tiers, tag-version
+invalidation on product changes, locally cached tag versions, per-tool hit
+accounting and coalescing of concurrent misses.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_here = os.path.dirname(__file__)
+
+
+def _load(name, relative_path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_here, "..", *relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_mod = _load("tool_result_cache", ("services", "tool_result_cache.py"))
+MemoryCache = _load("redis_cache_for_tool_cache", ("services", "redis_cache.py")).MemoryCache
+
+ToolCachePolicy = _mod.ToolCachePolicy
+ToolResultCache = _mod.ToolResultCache
+
+DETAIL_POLICY = ToolCachePolicy(ttl_seconds=60, tags=lambda args: (_mod.product_tag(args["project_id"]),))
+SEARCH_POLICY = ToolCachePolicy(ttl_seconds=60)
+
+
+class _Counter:
+    def __init__(self, result=None):
+        self.calls = 0
+        self.result = result
+
+    async def __call__(self):
+        self.calls += 1
+        return self.result if self.result is not None else {"success": True, "n": self.calls}
+
+
+@pytest.mark.asyncio
+async def test_repeated_call_hits_local_tier():
+    cache = ToolResultCache(backend=MemoryCache())
+    execute = _Counter()
+
+    first = await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, execute)
+    second = await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, execute)
+
+    assert first == second == {"success": True, "n": 1}
+    assert execute.calls == 1
+    assert cache.stats["get_project_detail"] == {"miss": 1, "local_hit": 1}
+    assert cache.hit_rate("get_project_detail") == 0.5
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_serves_other_instances():
+    backend = MemoryCache()
+    execute = _Counter()
+
+    await ToolResultCache(backend=backend).get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "Java"}, execute)
+    other = ToolResultCache(backend=backend)
+    result = await other.get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "Java"}, execute)
+
+    assert result == {"success": True, "n": 1}
+    assert execute.calls == 1
+    assert other.stats["search_projects"] == {"shared_hit": 1}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_execute_once():
+    cache = ToolResultCache(backend=MemoryCache())
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"success": True, "items": [1]}
+
+    results = await asyncio.gather(
+        *(cache.get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "Java"}, execute) for _ in range(4))
+    )
+
+    assert len(calls) == 1
+    assert all(result == {"success": True, "items": [1]} for result in results)
+    assert results[0] is not results[1]
+    assert cache.stats["search_projects"] == {"miss": 1, "coalesced": 3}
+
+
+@pytest.mark.asyncio
+async def test_product_change_invalidates_dependent_entries_only():
+    backend = MemoryCache()
+    cache = ToolResultCache(backend=backend)
+    detail_p1, detail_p2 = _Counter(), _Counter()
+
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, detail_p1)
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p2"}, detail_p2)
+    await cache.invalidate_tags([_mod.TAG_PRODUCTS, _mod.product_tag("p1")])
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, detail_p1)
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p2"}, detail_p2)
+
+    assert detail_p1.calls == 2
+    assert detail_p2.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_results_are_not_cached():
+    cache = ToolResultCache(backend=MemoryCache())
+    execute = _Counter(result={"success": False, "error": "项目不存在"})
+
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "gone"}, execute)
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "gone"}, execute)
+
+    assert execute.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_results_are_copies():
+    cache = ToolResultCache(backend=MemoryCache())
+    execute = _Counter(result={"success": True, "projects": [{"id": "p1"}]})
+
+    first = await cache.get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "vue"}, execute)
+    first["projects"].clear()
+    second = await cache.get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "vue"}, execute)
+
+    assert second["projects"] == [{"id": "p1"}]
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_always_executes():
+    cache = ToolResultCache(backend=MemoryCache(), enabled=False)
+    execute = _Counter()
+
+    await cache.get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "vue"}, execute)
+    await cache.get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "vue"}, execute)
+
+    assert execute.calls == 2
+
+
+class _CountingBackend(MemoryCache):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def get(self, key):
+        self.reads += 1
+        return await super().get(key)
+
+
+@pytest.mark.asyncio
+async def test_local_hits_reuse_cached_tag_versions():
+    backend = _CountingBackend()
+    cache = ToolResultCache(backend=backend, tag_version_ttl_seconds=60)
+    execute = _Counter()
+
+    for _ in range(3):
+        await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, execute)
+
+    assert backend.reads == 1
+    await cache.invalidate_tags([_mod.product_tag("p1")])
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, execute)
+    assert execute.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_other_instances_see_invalidation_once_tag_versions_expire():
+    backend = MemoryCache()
+    writer = ToolResultCache(backend=backend)
+    reader = ToolResultCache(backend=backend, tag_version_ttl_seconds=60)
+    execute = _Counter()
+
+    await reader.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, execute)
+    await writer.invalidate_tags([_mod.product_tag("p1")])
+    await reader.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, execute)
+    assert execute.calls == 1
+
+    reader.tag_versions.clear()
+    await reader.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, execute)
+    assert execute.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_sales_changes_leave_catalog_searches_cached(monkeypatch):
+    cache = ToolResultCache(backend=MemoryCache())
+    monkeypatch.setattr(_mod, "get_tool_result_cache", lambda: cache)
+    search, detail = _Counter(), _Counter()
+
+    await cache.get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "Java"}, search)
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, detail)
+    await _mod.publish_product_changed("p1", catalog=False)
+    await cache.get_or_execute("search_projects", SEARCH_POLICY, {"keyword": "Java"}, search)
+    await cache.get_or_execute("get_project_detail", DETAIL_POLICY, {"project_id": "p1"}, detail)
+
+    assert (search.calls, detail.calls) == (1, 2)
+
+
+def test_local_tier_evicts_least_recently_used():
+    tier = _mod.LocalLRUCache(max_entries=2)
+    tier.set("a", 1, 60)
+    tier.set("b", 2, 60)
+    tier.get("a")
+    tier.set("c", 3, 60)
+
+    assert tier.get("b") is None
+    assert (tier.get("a"), tier.get("c")) == (1, 3)
@@ -0,0 +1,159 @@
+"""
+Unit tests for agent_controller.py — per-turn iteration, time and token
+budgets, early stop on repeated tool calls, and the session-scoped
+observation store shared through the cache facade without losing writes
+from interleaved workers.
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_here = os.path.dirname(__file__)
+
+
+def _load(name, relative_path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_here, "..", *relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_mod = _load(
+    "topic_advisor_agent_controller",
+    ("ai_module", "core", "workflows", "topic_advisor", "agent_controller.py"),
+)
+SharedCache = _load("shared_cache_for_agent_controller", ("services", "shared_cache.py")).SharedCache
+MemoryCache = _load("redis_cache_for_agent_controller", ("services", "redis_cache.py")).MemoryCache
+
+AgentBudget = _mod.AgentBudget
+AgentLoopController = _mod.AgentLoopController
+ObservationStore = _mod.ObservationStore
+SessionObservations = _mod.SessionObservations
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Response:
+    def __init__(self, total_tokens=0):
+        self.usage_metadata = {"total_tokens": total_tokens} if total_tokens else None
+        self.response_metadata = {}
+
+
+def _search_result(*titles):
+    return {
+        "success": True,
+        "projects": [{"id": f"p{index}", "title": title, "price": 300.0} for index, title in enumerate(titles, 1)],
+    }
+
+
+class TestAgentLoopController:
+    @pytest.mark.parametrize(
+        "budget, clock_advance, tokens, expected",
+        [
+            (AgentBudget(max_iterations=2, max_seconds=0, max_tokens=0), 0, 0, _mod.STOP_ITERATIONS),
+            (AgentBudget(max_iterations=9, max_seconds=5, max_tokens=0), 6, 0, _mod.STOP_TIME),
+            (AgentBudget(max_iterations=9, max_seconds=0, max_tokens=1000), 0, 600, _mod.STOP_TOKENS),
+            (AgentBudget(max_iterations=9, max_seconds=5, max_tokens=5000), 1, 600, None),
+        ],
+    )
+    def test_budgets_are_checked_before_each_call(self, budget, clock_advance, tokens, expected):
+        clock = _Clock()
+        controller = AgentLoopController(budget, clock=clock)
+        assert controller.exhausted() is None
+
+        controller.record(_Response(tokens))
+        controller.record(_Response(tokens))
+        clock.now += clock_advance
+
+        assert controller.exhausted() == expected
+
+    def test_repeated_tool_calls_signal_early_stop(self):
+        controller = AgentLoopController(AgentBudget())
+        search = {"name": "search_projects", "args": {"keyword": "Java", "max_price": None}}
+        detail = {"name": "get_project_detail", "args": {"project_id": "p1"}}
+
+        assert controller.repeats([search]) is False
+        assert controller.repeats([{"name": "search_projects", "args": {"keyword": "Java"}}]) is True
+        assert controller.repeats([search, detail]) is False
+        assert controller.repeats([detail]) is True
+
+
+class TestSessionObservations:
+    def test_only_successful_reusable_results_are_remembered(self):
+        observations = SessionObservations(max_entries=2)
+        observations.remember("search_projects", {"keyword": "Java"}, _search_result("图书管理系统"))
+        observations.remember("get_project_detail", {"project_id": "p9"}, {"success": False, "error": "项目不存在"})
+        observations.remember("compare_projects", {"project_ids": ["p1"]}, {"success": True})
+
+        reused = observations.lookup("search_projects", {"keyword": "Java", "user_level": None})
+        assert reused["projects"][0]["title"] == "图书管理系统"
+        reused["projects"].clear()
+        assert observations.lookup("search_projects", {"keyword": "Java"})["projects"]
+        assert observations.lookup("get_project_detail", {"project_id": "p9"}) is None
+        assert observations.lookup("compare_projects", {"project_ids": ["p1"]}) is None
+
+    def test_entries_are_bounded_and_summarised_for_the_prompt(self):
+        observations = SessionObservations(max_entries=2)
+        observations.remember("search_projects", {"keyword": "Java"}, _search_result("图书管理系统"))
+        observations.remember("search_projects", {"keyword": "Python"}, _search_result("在线问诊", "数据可视化"))
+        observations.remember(
+            "get_project_detail",
+            {"project_id": "p2"},
+            {"success": True, "project_id": "p2", "title": "数据可视化", "price": 420.0, "tech_stack": ["Vue"]},
+        )
+
+        summary = observations.summary()
+        assert "Java" not in summary
+        assert "2. id=p2 数据可视化" in summary
+        assert summary.endswith("get_project_detail id=p2: 数据可视化 价格420.0 技术栈Vue")
+
+
+@pytest.mark.asyncio
+async def test_store_shares_observations_across_workers_per_session():
+    backend = MemoryCache()
+    worker_a = ObservationStore(SharedCache(backend).namespace("topic_advisor_observations", ttl_seconds=60))
+    worker_b = ObservationStore(SharedCache(backend).namespace("topic_advisor_observations", ttl_seconds=60))
+
+    observations = await worker_a.load("s1")
+    observations.remember("search_projects", {"keyword": "Java"}, _search_result("图书管理系统"))
+    await worker_a.save("s1", observations)
+
+    restored = await worker_b.load("s1")
+    assert restored.lookup("search_projects", {"keyword": "Java"})["projects"][0]["id"] == "p1"
+    assert (await worker_b.load("s2")).entries == {}
+    assert (await ObservationStore().load("s1")).entries == {}
+
+
+@pytest.mark.asyncio
+async def test_interleaved_workers_do_not_drop_each_others_observations():
+    backend = MemoryCache()
+    worker_a = ObservationStore(SharedCache(backend).namespace("topic_advisor_observations", shared_only=True))
+    worker_b = ObservationStore(SharedCache(backend).namespace("topic_advisor_observations", shared_only=True))
+
+    first = await worker_a.load("s1")
+    first.remember("search_projects", {"keyword": "Java"}, _search_result("图书管理系统"))
+    await worker_a.save("s1", first)
+
+    second = await worker_b.load("s1")
+    second.remember("search_projects", {"keyword": "Python"}, _search_result("在线问诊"))
+    await worker_b.save("s1", second)
+    assert (await worker_a.load("s1")).lookup("search_projects", {"keyword": "Python"}) is not None
+
+    # worker_a read before worker_b saved; its save must merge instead of overwrite
+    stale = SessionObservations(first.entries, max_entries=20)
+    stale.remember("get_project_detail", {"project_id": "p1"}, {"success": True, "project_id": "p1", "title": "图书管理系统"})
+    await worker_a.save("s1", stale)
+
+    restored = await worker_a.load("s1")
+    assert restored.lookup("search_projects", {"keyword": "Python"}) is not None
+    assert restored.lookup("get_project_detail", {"project_id": "p1"}) is not None
+    assert list(restored.entries)[-1].startswith("get_project_detail")
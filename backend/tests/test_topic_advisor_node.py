@@ -35,10 +35,11 @@ _constants_mod.__package__ = "backend.ai_module.core"
 sys.modules["backend.ai_module.core.constants"] = _constants_mod
 _constants_spec.loader.exec_module(_constants_mod)
 
-_services_pkg = types.ModuleType("services")
+# Stub only the tool module; the real ``services`` package stays importable
+import services  # noqa: E402,F401
+
 _function_tools_mod = types.ModuleType("services.function_tools")
 _function_tools_mod.topic_advisor_tools = []
-sys.modules["services"] = _services_pkg
 sys.modules["services.function_tools"] = _function_tools_mod
 
 _node_path = os.path.join(_backend_dir, "ai_module", "core", "nodes", "skills", "topic_advisor_node.py")
@@ -120,3 +121,126 @@ class TestTopicAdvisorNode:
         assert "技术栈" in result["response"]
         assert result["topic_advisor_tool_results"] == []
 
+
+
+class _FakeTool:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    async def ainvoke(self, args, config=None):
+        self.calls.append(args)
+        return self.result
+
+
+class _ScriptedLLM:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(list(messages))
+        return self.responses.pop(0)
+
+
+class _DictNamespace:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    async def set(self, key, value, ttl_seconds=None):
+        self.data[key] = value
+
+
+def _tool_call(name, call_id, **args):
+    from langchain_core.messages import AIMessage
+
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+def _answer(text):
+    from langchain_core.messages import AIMessage
+
+    return AIMessage(content=text)
+
+
+class TestTopicAdvisorAgentLoop:
+    def _make_service(self, monkeypatch, responses, max_iterations=5):
+        service = TopicAdvisorNode().service
+        service_mod = sys.modules[type(service).__module__]
+        controller_mod = sys.modules[service_mod.AgentLoopController.__module__]
+
+        store = controller_mod.ObservationStore(_DictNamespace())
+        monkeypatch.setattr(service_mod, "get_observation_store", lambda: store)
+        budget = controller_mod.AgentBudget(max_iterations=max_iterations, max_seconds=0, max_tokens=0)
+        monkeypatch.setattr(service, "_new_controller", lambda: controller_mod.AgentLoopController(budget))
+
+        search = _FakeTool({"success": True, "projects": [{"id": "p1", "title": "图书管理系统", "price": 299.0}]})
+        service.tool_map = {"search_projects": search}
+        service.llm_with_tools = _ScriptedLLM(responses)
+        return service, search
+
+    def _agent_state(self, message):
+        return _make_state(
+            session_id="s1",
+            user_message=message,
+            dialogue_act="new_request",
+            active_task=None,
+            last_quick_actions=[],
+        )
+
+    @pytest.mark.asyncio
+    async def test_next_turn_reuses_session_observations(self, monkeypatch):
+        service, search = self._make_service(
+            monkeypatch,
+            [
+                _tool_call("search_projects", "c1", keyword="Java"),
+                _answer("推荐图书管理系统"),
+                _tool_call("search_projects", "c2", keyword="Java"),
+                _answer("第二个也不错"),
+            ],
+        )
+
+        await service.run_agent(self._agent_state("推荐几个 Java 项目"))
+        second = await service.run_agent(self._agent_state("第二个怎么样"))
+
+        assert len(search.calls) == 1
+        assert second["response"] == "第二个也不错"
+        assert second["topic_advisor_tool_results"][0]["reused"] is True
+        assert second["quick_actions"][0]["data"]["product_id"] == "p1"
+        assert "id=p1 图书管理系统" in service.llm_with_tools.prompts[2][-1].content
+
+    @pytest.mark.asyncio
+    async def test_repeated_tool_calls_stop_the_loop_early(self, monkeypatch):
+        service, search = self._make_service(
+            monkeypatch,
+            [
+                _tool_call("search_projects", "c1", keyword="Java"),
+                _tool_call("search_projects", "c2", keyword="Java"),
+                _answer("就推荐图书管理系统"),
+            ],
+        )
+
+        result = await service.run_agent(self._agent_state("推荐几个 Java 项目"))
+
+        assert result["response"] == "就推荐图书管理系统"
+        assert len(search.calls) == 1
+        assert service.llm_with_tools.prompts[-1][-1].content == "请直接给出最终推荐结论，不要再调用工具。"
+
+    @pytest.mark.asyncio
+    async def test_iteration_budget_forces_final_answer(self, monkeypatch):
+        service, _ = self._make_service(
+            monkeypatch,
+            [
+                _tool_call("search_projects", "c1", keyword="Java"),
+                _answer("预算内给出的结论"),
+            ],
+            max_iterations=1,
+        )
+
+        result = await service.run_agent(self._agent_state("推荐几个 Java 项目"))
+
+        assert result["response"] == "预算内给出的结论"
+        assert len(service.llm_with_tools.prompts) == 2
@@ -0,0 +1,106 @@
+"""
+Unit tests for turn_analysis.py — schema validation of the merged in-flow
+understanding output and the one-call-per-turn analysis session.
+"""
+import importlib
+import os
+import sys
+import types
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+# Load ai_module/core as an isolated package so the relative imports resolve
+# without pulling in the whole runtime stack.
+_core = types.ModuleType("_turn_analysis_core")
+_core.__path__ = [os.path.join(os.path.dirname(__file__), "..", "ai_module", "core")]
+sys.modules.setdefault("_turn_analysis_core", _core)
+
+_mod = importlib.import_module("_turn_analysis_core.turn_analysis")
+
+MergedTurnAnalysis = _mod.MergedTurnAnalysis
+current_turn_analysis = _mod.current_turn_analysis
+merged_turn_analysis = _mod.merged_turn_analysis
+parse_turn_analysis = _mod.parse_turn_analysis
+
+VALID_INTENTS = ["推荐", "订单查询", "问答"]
+
+
+def _make_llm(content: str):
+    response = MagicMock()
+    response.content = content
+    llm = AsyncMock()
+    llm.ainvoke.return_value = response
+    return llm
+
+
+class TestParseTurnAnalysis:
+    def test_parses_fenced_json_and_projects_both_views(self):
+        raw = """```json
+{"dialogue_act": "provide_slot", "inflow_type": "valid_current_input", "domain_intent": "推荐",
+ "global_intent": "null", "confidence": 1.4, "continue_previous_task": true,
+ "slot_updates": {"budget_max": 800, "color": "red", "language": ""}}
+```"""
+
+        analysis = parse_turn_analysis(raw, VALID_INTENTS)
+
+        assert analysis.understanding() == {
+            "dialogue_act": "provide_slot",
+            "domain_intent": "推荐",
+            "self_contained_request": False,
+            "continue_previous_task": True,
+            "need_clarification": False,
+            "confidence": 1.0,
+            "slot_updates": {"budget_max": 800},
+        }
+        assert analysis.inflow()["inflow_type"] == "valid_current_input"
+        assert analysis.global_intent is None
+
+    def test_unknown_business_labels_are_dropped(self):
+        raw = '{"dialogue_act": "new_request", "inflow_type": "switch_flow", "global_intent": "天气"}'
+
+        assert parse_turn_analysis(raw, VALID_INTENTS).global_intent is None
+
+    @pytest.mark.parametrize(
+        "raw",
+        [
+            "推荐",
+            '{"dialogue_act": "chitchat", "inflow_type": "irrelevant"}',
+            '{"dialogue_act": "confirm", "inflow_type": "continue"}',
+            '{"dialogue_act": "confirm"}',
+            "[1, 2]",
+        ],
+    )
+    def test_invalid_output_is_rejected(self, raw):
+        assert parse_turn_analysis(raw, VALID_INTENTS) is None
+
+
+class TestMergedTurnAnalysis:
+    @pytest.mark.asyncio
+    async def test_calls_llm_once_per_turn_and_builds_payload_lazily(self):
+        llm = _make_llm('{"dialogue_act": "unclear", "inflow_type": "unknown", "need_clarification": true}')
+        built = []
+        session = MergedTurnAnalysis(
+            llm,
+            build_payload=lambda: built.append(1) or {"message": "还有吗"},
+            valid_intents=VALID_INTENTS,
+        )
+        assert built == []
+
+        with merged_turn_analysis(session):
+            first = await current_turn_analysis().get(rule_guess={"dialogue_act": "new_request"})
+            second = await current_turn_analysis().get()
+
+        assert current_turn_analysis() is None
+        assert first is second and first.need_clarification is True
+        assert llm.ainvoke.await_count == 1 and built == [1]
+        assert '"rule_guess"' in llm.ainvoke.await_args.args[0][-1].content
+
+    @pytest.mark.asyncio
+    async def test_invalid_output_is_not_retried(self):
+        llm = _make_llm("我觉得用户想继续")
+        session = MergedTurnAnalysis(llm, build_payload=dict, valid_intents=VALID_INTENTS)
+
+        assert await session.get() is None
+        assert await session.get() is None
+        assert llm.ainvoke.await_count == 1
@@ -0,0 +1,294 @@
+"""
+Unit tests for turn_sequencer.py — per-session ordering, burst coalescing
+behind a running turn, event relay to coalesced requests, handing a shared
+turn to a follower when the leader's client disconnects and the renewed
+distributed turn lock.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "turn_sequencer",
+    os.path.join(os.path.dirname(__file__), "..", "ai_module", "core", "orchestration", "turn_sequencer.py"),
+)
+_mod = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _mod
+_spec.loader.exec_module(_mod)
+TurnSequencer = _mod.TurnSequencer
+
+_cache_spec = importlib.util.spec_from_file_location(
+    "redis_cache_for_sequencer",
+    os.path.join(os.path.dirname(__file__), "..", "services", "redis_cache.py"),
+)
+_cache_mod = importlib.util.module_from_spec(_cache_spec)
+_cache_spec.loader.exec_module(_cache_mod)
+MemoryCache = _cache_mod.MemoryCache
+
+
+async def _run(sequencer, session_id, message, calls, exclusive=False, delay=0.0, work=0.01):
+    await asyncio.sleep(delay)
+    async with sequencer.turn(session_id, message, exclusive=exclusive) as turn:
+        if not turn.is_leader:
+            return {"coalesced": True, **(await turn.wait_result())}
+        calls.append(turn.message)
+        await asyncio.sleep(work)
+        result = {"response": f"reply:{turn.message}", "count": turn.coalesced_count}
+        turn.set_result(result)
+        return result
+
+
+@pytest.mark.asyncio
+async def test_burst_behind_a_running_turn_is_coalesced_into_one_turn():
+    sequencer = TurnSequencer(coalesce_window=0.05, cache=MemoryCache())
+    calls = []
+
+    results = await asyncio.gather(
+        _run(sequencer, "s1", "在吗", calls, work=0.05),
+        _run(sequencer, "s1", "我想退款", calls, delay=0.01),
+        _run(sequencer, "s1", "订单号ORD001", calls, delay=0.02),
+    )
+
+    assert calls == ["在吗", "我想退款\n订单号ORD001"]
+    assert results[1]["count"] == 2
+    assert results[2]["coalesced"]
+    assert results[2]["response"] == results[1]["response"]
+    assert sequencer.stats["coalesced_messages"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_session_does_not_wait_for_the_window():
+    sequencer = TurnSequencer(coalesce_window=5, cache=MemoryCache())
+    calls = []
+
+    await asyncio.wait_for(_run(sequencer, "s1", "hi", calls), timeout=1)
+
+    assert calls == ["hi"]
+
+
+@pytest.mark.asyncio
+async def test_messages_outside_window_run_in_order():
+    sequencer = TurnSequencer(coalesce_window=0, cache=MemoryCache())
+    calls = []
+
+    await asyncio.gather(
+        _run(sequencer, "s1", "first", calls),
+        _run(sequencer, "s1", "second", calls, delay=0.001),
+    )
+
+    assert calls == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_exclusive_turn_is_not_merged_and_keeps_order():
+    sequencer = TurnSequencer(coalesce_window=0.05, cache=MemoryCache())
+    calls = []
+
+    await asyncio.gather(
+        _run(sequencer, "s1", "想买这个", calls),
+        _run(sequencer, "s1", "purchase", calls, exclusive=True, delay=0.01),
+    )
+
+    assert calls == ["想买这个", "purchase"]
+
+
+@pytest.mark.asyncio
+async def test_different_sessions_do_not_block_each_other():
+    sequencer = TurnSequencer(coalesce_window=0, cache=MemoryCache())
+    calls = []
+
+    await asyncio.gather(
+        _run(sequencer, "s1", "a", calls),
+        _run(sequencer, "s2", "b", calls),
+    )
+
+    assert sorted(calls) == ["a", "b"]
+    assert sequencer._queues == {}
+
+
+@pytest.mark.asyncio
+async def test_leader_failure_propagates_to_followers():
+    sequencer = TurnSequencer(coalesce_window=0.05, cache=MemoryCache())
+
+    async def failing_leader():
+        await asyncio.sleep(0.01)
+        async with sequencer.turn("s1", "hi") as turn:
+            assert turn.is_leader
+            raise RuntimeError("llm down")
+
+    async def follower():
+        await asyncio.sleep(0.02)
+        async with sequencer.turn("s1", "there") as turn:
+            return await turn.wait_result()
+
+    results = await asyncio.gather(
+        _run(sequencer, "s1", "busy", [], work=0.05), failing_leader(), follower(), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results[1:])
+
+
+@pytest.mark.asyncio
+async def test_followers_receive_the_leaders_events():
+    sequencer = TurnSequencer(coalesce_window=0.05, cache=MemoryCache())
+
+    async def leader():
+        await asyncio.sleep(0.01)
+        async with sequencer.turn("s1", "我想退款") as turn:
+            assert turn.is_leader
+            for event in ({"type": "content", "delta": "好的"}, {"type": "end", "status": "ok"}):
+                turn.publish(event)
+                await asyncio.sleep(0.005)
+            turn.set_result({"response": "好的"})
+
+    async def follower():
+        await asyncio.sleep(0.02)
+        async with sequencer.turn("s1", "订单号ORD001") as turn:
+            assert not turn.is_leader
+            return [event async for event in turn.relay()]
+
+    results = await asyncio.gather(_run(sequencer, "s1", "在吗", [], work=0.05), leader(), follower())
+
+    assert results[2] == [{"type": "content", "delta": "好的"}, {"type": "end", "status": "ok"}]
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_the_turn_when_the_leader_disconnects():
+    sequencer = TurnSequencer(coalesce_window=0.05, cache=MemoryCache())
+    release = asyncio.Event()
+    end = {"type": "end", "status": "ok"}
+
+    async def work(turn):
+        turn.publish({"type": "content", "delta": "好的"})
+        await release.wait()
+        turn.publish(end)
+        turn.set_result({"response": "好的"})
+
+    async def leader():
+        await asyncio.sleep(0.01)
+        async with sequencer.turn("s1", "我想退款") as turn:
+            assert turn.shared
+            task = turn.share(work(turn))
+            try:
+                return [event async for event in turn.relay()]
+            finally:
+                await turn.settle(task)
+
+    async def follower():
+        await asyncio.sleep(0.02)
+        async with sequencer.turn("s1", "订单号ORD001") as turn:
+            assert not turn.owns_reply
+            return [event async for event in turn.relay()], turn.owns_reply
+
+    busy = asyncio.create_task(_run(sequencer, "s1", "在吗", [], work=0.05))
+    leading = asyncio.create_task(leader())
+    following = asyncio.create_task(follower())
+    await asyncio.sleep(0.15)
+
+    leading.cancel()
+    await asyncio.sleep(0.01)
+    # the leader keeps the session until the handed-off turn finishes
+    assert not leading.done()
+    assert sequencer._queues["s1"].lock.locked()
+
+    release.set()
+    with pytest.raises(_mod.TurnHandedOff):
+        await leading
+    events, owns_reply = await following
+    await busy
+
+    assert events == [{"type": "content", "delta": "好的"}, end]
+    assert owns_reply
+    assert sequencer._queues == {}
+
+
+@pytest.mark.asyncio
+async def test_leader_disconnect_without_waiting_followers_cancels_the_turn():
+    sequencer = TurnSequencer(coalesce_window=0.05, cache=MemoryCache())
+    started = asyncio.Event()
+    cancelled = []
+
+    async def work(turn):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def leader():
+        await asyncio.sleep(0.01)
+        async with sequencer.turn("s1", "我想退款") as turn:
+            task = turn.share(work(turn))
+            try:
+                return await turn.wait_result()
+            finally:
+                await turn.settle(task)
+
+    async def follower():
+        await asyncio.sleep(0.02)
+        async with sequencer.turn("s1", "订单号ORD001") as turn:
+            return await turn.wait_result()
+
+    busy = asyncio.create_task(_run(sequencer, "s1", "在吗", [], work=0.05))
+    leading = asyncio.create_task(leader())
+    following = asyncio.create_task(follower())
+    await started.wait()
+
+    following.cancel()
+    await asyncio.sleep(0)
+    leading.cancel()
+    results = await asyncio.gather(leading, following, busy, return_exceptions=True)
+
+    assert cancelled == [True]
+    assert type(results[0]) is asyncio.CancelledError
+    assert sequencer._queues == {}
+
+
+@pytest.mark.asyncio
+async def test_distributed_lock_is_released_after_turn():
+    cache = MemoryCache()
+    sequencer = TurnSequencer(coalesce_window=0, cache=cache)
+
+    async with sequencer.turn("s1", "hi") as turn:
+        turn.set_result({})
+        assert cache._locks
+
+    assert not cache._locks
+
+
+@pytest.mark.asyncio
+async def test_lock_held_elsewhere_times_out_without_blocking_forever():
+    cache = MemoryCache()
+    await cache.acquire_lock(TurnSequencer.LOCK_KEY_PREFIX.format(session_id="s1"), "other", 60)
+    sequencer = TurnSequencer(coalesce_window=0, lock_wait_seconds=0.05, cache=cache)
+
+    async with sequencer.turn("s1", "hi") as turn:
+        turn.set_result({})
+
+    assert sequencer.stats["lock_timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_distributed_lock_is_renewed_while_the_turn_runs(monkeypatch):
+    cache = MemoryCache()
+    sequencer = TurnSequencer(coalesce_window=0, lock_ttl_seconds=3, cache=cache)
+    renewals = []
+    extend_lock = cache.extend_lock
+
+    async def tracked_extend(key, token, ttl_seconds):
+        renewals.append(ttl_seconds)
+        return await extend_lock(key, token, ttl_seconds)
+
+    monkeypatch.setattr(cache, "extend_lock", tracked_extend)
+    monkeypatch.setattr(sequencer, "lock_ttl_seconds", 0.03)
+
+    async with sequencer.turn("s1", "hi") as turn:
+        await asyncio.sleep(0.05)
+        turn.set_result({})
+
+    assert renewals
+    assert not cache._locks
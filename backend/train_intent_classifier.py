@@ -0,0 +1,112 @@
+"""训练和评估业务包的本地意图分类器
+
+用法:
+    python train_intent_classifier.py train [--business ID] [--traffic 文件.jsonl ...] [--no-rules] [--output 路径]
+    python train_intent_classifier.py evaluate [--business ID] --data 文件.jsonl [--threshold 0.85]
+
+已标注流量为 JSONL，每行 {"message": "...", "intent": "..."}；标签不在业务包标签集合中的行会被跳过。
+训练产物默认写到 INTENT_CLASSIFIER_DIR/<business_id>.json，运行时按业务包加载。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config import config_loader, settings  # noqa: E402
+from ai_module.core.intent_classifier import (  # noqa: E402
+    IntentClassifier,
+    business_examples,
+    evaluate,
+    load_labelled_traffic,
+)
+from ai_module.core.runtime import BusinessPack, runtime_factory  # noqa: E402
+
+
+def _business(args):
+    business_id = args.business or runtime_factory.get_default_business_id()
+    config = config_loader.get_config(business_id)
+    if not config:
+        sys.exit(f"业务包未配置: {business_id}")
+    return BusinessPack(business_id, config)
+
+
+def _print_report(title, report):
+    print(f"== {title} ==")
+    summary = {key: value for key, value in report.items() if key != "per_label"}
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    for label, stats in sorted(report.get("per_label", {}).items()):
+        print(f"  {label:<8} P={stats['precision']:.3f} R={stats['recall']:.3f} n={stats['support']}")
+
+
+def train(args):
+    pack = _business(args)
+    labels = pack.get_intent_labels()
+    examples = business_examples(pack.config, include_rules=not args.no_rules)
+    traffic = load_labelled_traffic(args.traffic, labels) if args.traffic else []
+    examples.extend(traffic)
+    print(f"业务包 {pack.business_id}: 配置样本 {len(examples) - len(traffic)} 条, 流量样本 {len(traffic)} 条")
+
+    holdout = []
+    if args.holdout > 0 and traffic:
+        # 只从真实流量里留出评估集，配置样本全部参与训练
+        rng = random.Random(args.seed)
+        shuffled = list(traffic)
+        rng.shuffle(shuffled)
+        holdout = shuffled[: int(len(shuffled) * args.holdout)]
+        held = set(holdout)
+        examples = [example for example in examples if example not in held]
+
+    classifier = IntentClassifier.train(examples, epochs=args.epochs, seed=args.seed)
+    classifier.metadata["business_id"] = pack.business_id
+    if holdout:
+        report = evaluate(classifier, holdout, threshold=args.threshold)
+        classifier.metadata["holdout"] = {key: value for key, value in report.items() if key != "per_label"}
+        _print_report("留出集", report)
+    else:
+        _print_report("训练集（仅供参考）", evaluate(classifier, examples, threshold=args.threshold))
+
+    output = classifier.save(args.output or pack.get_intent_classifier_path())
+    print(f"已保存: {output} (词表 {len(classifier.vocabulary)}, 温度 {classifier.temperature:.3f})")
+
+
+def evaluate_command(args):
+    pack = _business(args)
+    path = args.model or pack.get_intent_classifier_path()
+    classifier = IntentClassifier.load(path)
+    examples = load_labelled_traffic(args.data, classifier.labels)
+    if not examples:
+        sys.exit("评估集为空")
+    _print_report(f"{path}", evaluate(classifier, examples, threshold=args.threshold))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="训练并保存分类器")
+    train_parser.add_argument("--business", help="业务包 ID，默认 DEFAULT_BUSINESS_ID")
+    train_parser.add_argument("--traffic", nargs="*", default=[], help="已标注流量 JSONL 文件")
+    train_parser.add_argument("--no-rules", action="store_true", help="不使用规则关键词作为弱标注样本")
+    train_parser.add_argument("--holdout", type=float, default=0.2, help="从流量样本中留出的评估比例")
+    train_parser.add_argument("--epochs", type=int, default=80)
+    train_parser.add_argument("--seed", type=int, default=13)
+    train_parser.add_argument("--threshold", type=float, default=settings.INTENT_CLASSIFIER_THRESHOLD)
+    train_parser.add_argument("--output", help="产物路径，默认按业务包解析")
+    train_parser.set_defaults(func=train)
+
+    eval_parser = subparsers.add_parser("evaluate", help="在已标注数据上评估分类器")
+    eval_parser.add_argument("--business", help="业务包 ID，默认 DEFAULT_BUSINESS_ID")
+    eval_parser.add_argument("--model", help="产物路径，默认按业务包解析")
+    eval_parser.add_argument("--data", nargs="+", required=True, help="已标注 JSONL 文件")
+    eval_parser.add_argument("--threshold", type=float, default=settings.INTENT_CLASSIFIER_THRESHOLD)
+    eval_parser.set_defaults(func=evaluate_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -186,7 +186,8 @@ export const useChatStore = defineStore('chat', () => {
       messages.value = [
         ...messages.value,
         {
-          id: response.message_id,
+          // 与同会话前几条消息合并处理时，回复由合并后的那一轮保存，这里没有独立的消息 ID
+          id: response.message_id || `${Date.now()}_assistant`,
           role: 'assistant',
           content: response.content,
           created_at: new Date().toISOString(),